@@ -0,0 +1,108 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AccountRouter:
+    """
+    In-memory account <-> device index.
+
+    Tracks which accounts are signed in on each device (from setup_device's
+    account discovery) and which one is currently active, so a task addressed
+    to a username resolves to its device with a dict lookup.
+    """
+
+    def __init__(self, accounts=None, events=None):
+        """
+        Args:
+            accounts: Initial {device UDID: [usernames]} mapping
+            events: Optional EventBus; 'accounts_updated' events keep the index current
+        """
+        self._accounts_by_device = {}  # udid -> [usernames]
+        self._devices_by_account = {}  # username -> [udids]
+        self._active = {}  # udid -> (username, since)
+        self.events = events
+        self.lock = threading.Lock()
+
+        for device_udid, usernames in (accounts or {}).items():
+            self.set_accounts(device_udid, usernames)
+        if events:
+            events.subscribe(self._on_event)
+
+    def _on_event(self, event):
+        if event['type'] == 'accounts_updated':
+            self.set_accounts(event['device_id'], event['accounts'])
+
+    def set_accounts(self, device_udid, usernames):
+        """Replace the accounts known to be signed in on a device"""
+        usernames = list(dict.fromkeys(usernames))
+        with self.lock:
+            for username in self._accounts_by_device.get(device_udid, []):
+                devices = [d for d in self._devices_by_account.get(username, []) if d != device_udid]
+                if devices:
+                    self._devices_by_account[username] = devices
+                else:
+                    self._devices_by_account.pop(username, None)
+
+            self._accounts_by_device[device_udid] = usernames
+            for username in usernames:
+                self._devices_by_account.setdefault(username, []).append(device_udid)
+
+            active = self._active.get(device_udid)
+            if active and active[0] not in usernames:
+                del self._active[device_udid]
+
+    def accounts_for(self, device_udid):
+        return list(self._accounts_by_device.get(device_udid, []))
+
+    def devices_for(self, username):
+        return list(self._devices_by_account.get(username, []))
+
+    def device_for(self, username):
+        """
+        The device to run a task for an account on.
+
+        Prefers a device where the account is already active, so no switch is
+        needed; otherwise the device that switched accounts least recently
+        (one with no known active account first), so switches spread across
+        devices. Returns None if the account isn't signed in anywhere.
+        """
+        devices = self._devices_by_account.get(username)
+        if not devices:
+            return None
+        for device_udid in devices:
+            active = self._active.get(device_udid)
+            if active and active[0] == username:
+                return device_udid
+        # min() keeps the first of equals, so ties go to the device listed first
+        return min(devices, key=lambda d: self._active.get(d, (None, 0))[1])
+
+    def set_active(self, device_udid, username):
+        """Record the account currently shown on a device"""
+        with self.lock:
+            previous = self._active.get(device_udid)
+            self._active[device_udid] = (username, time.time())
+        if self.events and (not previous or previous[0] != username):
+            self.events.publish('active_account', device_id=device_udid, username=username)
+
+    def clear_active(self, device_udid):
+        """Forget the active account, e.g. after a switch failed part way"""
+        with self.lock:
+            self._active.pop(device_udid, None)
+
+    def active_account(self, device_udid):
+        active = self._active.get(device_udid)
+        return active[0] if active else None
+
+    def to_dict(self):
+        """{username: {'devices': [...], 'active_on': [...]}}"""
+        with self.lock:
+            return {
+                username: {
+                    'devices': list(devices),
+                    'active_on': [d for d in devices if self._active.get(d, (None,))[0] == username]
+                }
+                for username, devices in self._devices_by_account.items()
+            }
@@ -0,0 +1,275 @@
+import json
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import urllib3
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5  # seconds
+DEFAULT_READ_TIMEOUT = None  # commands like session creation can take minutes
+DEFAULT_STATUS_TIMEOUT = 2  # seconds
+
+# Capabilities that don't take an "appium:" prefix in W3C session requests
+W3C_CAPABILITIES = {
+    'platformName', 'browserName', 'browserVersion', 'acceptInsecureCerts',
+    'pageLoadStrategy', 'proxy', 'setWindowRect', 'timeouts', 'unhandledPromptBehavior'
+}
+
+
+_command_timeouts = threading.local()
+
+
+@contextmanager
+def command_timeout(seconds):
+    """
+    Bound how long driver commands sent by this thread wait for a response.
+
+    Applies to drivers whose connection came from AppiumTransport.create_connection.
+    A command that doesn't answer in time raises urllib3's ReadTimeoutError instead
+    of blocking the thread; the server may still finish it. None lifts the bound.
+    """
+    previous = getattr(_command_timeouts, 'seconds', None)
+    _command_timeouts.seconds = seconds
+    try:
+        yield
+    finally:
+        _command_timeouts.seconds = previous
+
+
+def current_command_timeout():
+    """The read timeout set by command_timeout() for this thread, or None"""
+    return getattr(_command_timeouts, 'seconds', None)
+
+
+class CommandTimeoutPool:
+    """A server's shared pool as seen by one driver, applying the calling thread's command_timeout()"""
+
+    def __init__(self, pool, connect_timeout=DEFAULT_CONNECT_TIMEOUT):
+        self.pool = pool
+        self.connect_timeout = connect_timeout
+
+    def request(self, method, url, **kwargs):
+        seconds = current_command_timeout()
+        if seconds is not None and 'timeout' not in kwargs:
+            kwargs['timeout'] = urllib3.Timeout(connect=self.connect_timeout, read=seconds)
+        return self.pool.request(method, url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+
+_pooled_connection_class = None
+
+
+def pooled_connection_class():
+    """
+    AppiumConnection subclass that sends commands over a pool shared by every
+    driver on the same server.
+
+    Built on first use, so importing this module doesn't import appium (and
+    with it all of selenium) before a session is actually started.
+    """
+    global _pooled_connection_class
+    if _pooled_connection_class is None:
+        from appium.webdriver.appium_connection import AppiumConnection
+
+        class PooledAppiumConnection(AppiumConnection):
+            def __init__(self, remote_server_addr, pool_manager):
+                self._shared_pool_manager = pool_manager
+                super().__init__(remote_server_addr, keep_alive=True)
+
+            def _get_connection_manager(self):
+                return self._shared_pool_manager
+
+            def close(self):
+                # The pool outlives any single session; AppiumTransport.close() clears it
+                pass
+
+        _pooled_connection_class = PooledAppiumConnection
+    return _pooled_connection_class
+
+
+class AppiumTransport:
+    """
+    Keep-alive HTTP connection pools, one per Appium server.
+
+    Health checks, driver commands and the async client all draw from the same
+    pool for a server, so a backend driving dozens of devices reuses a small
+    set of sockets instead of opening one per request.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, status_timeout=DEFAULT_STATUS_TIMEOUT):
+        """
+        Args:
+            pool_size: Default max keep-alive connections per server
+            connect_timeout: Seconds to wait for a TCP connection
+            read_timeout: Seconds to wait for a command response (None waits indefinitely)
+            status_timeout: Seconds to wait for a /status health check
+        """
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.status_timeout = status_timeout
+        self._pools = {}  # (host, port) -> urllib3.PoolManager
+        self.lock = threading.Lock()
+
+    def pool_manager(self, host, port, pool_size=None):
+        """Get (or create) the shared pool for a server"""
+        key = (host, int(port))
+        pool = self._pools.get(key)
+        if pool is not None:
+            return pool
+
+        with self.lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = urllib3.PoolManager(
+                    num_pools=1,
+                    maxsize=pool_size or self.pool_size,
+                    block=False,
+                    timeout=urllib3.Timeout(connect=self.connect_timeout, read=self.read_timeout),
+                    retries=False
+                )
+                self._pools[key] = pool
+                logger.info(f"Created connection pool for Appium server {host}:{port}")
+        return pool
+
+    @staticmethod
+    def server_url(host, port, path=''):
+        return f"http://{host}:{port}{path}"
+
+    def create_connection(self, host, port, path='/wd/hub', pool_size=None):
+        """Command executor for webdriver.Remote that uses the server's shared pool (see command_timeout)"""
+        pool = CommandTimeoutPool(self.pool_manager(host, port, pool_size), self.connect_timeout)
+        return pooled_connection_class()(self.server_url(host, port, path), pool)
+
+    def check_status(self, host, port, path=''):
+        """Check if an Appium server answers /status, reusing a pooled connection"""
+        try:
+            response = self.pool_manager(host, port).request(
+                'GET', self.server_url(host, port, f"{path}/status"),
+                timeout=urllib3.Timeout(connect=self.status_timeout, read=self.status_timeout)
+            )
+            return response.status == 200
+        except Exception:
+            return False
+
+    def request(self, host, port, method, path, payload=None, timeout=None):
+        """
+        Send a raw W3C/Appium command over the server's pool.
+
+        Returns:
+            tuple: (HTTP status, decoded JSON body or None)
+        """
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json;charset=UTF-8', 'Accept': 'application/json'}
+        kwargs = {'body': body, 'headers': headers}
+        if timeout is not None:
+            kwargs['timeout'] = urllib3.Timeout(connect=self.connect_timeout, read=timeout)
+        response = self.pool_manager(host, port).request(method, self.server_url(host, port, path), **kwargs)
+        data = response.data.decode('utf-8') if response.data else ''
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, {'value': data}
+
+    def close(self):
+        """Close every pooled connection"""
+        with self.lock:
+            for pool in self._pools.values():
+                pool.clear()
+            self._pools.clear()
+
+
+class AsyncAppiumClient:
+    """
+    asyncio-friendly command client for one Appium server.
+
+    Requests go through the server's shared pool on a small bounded executor,
+    so many coroutines can drive many devices without a dedicated thread each.
+    """
+
+    def __init__(self, transport, host, port, path='/wd/hub', max_concurrency=8):
+        """
+        Args:
+            transport: AppiumTransport owning the connection pools
+            host: Appium server host
+            port: Appium server port
+            path: Base path of the WebDriver endpoints on the server
+            max_concurrency: Max requests in flight at once
+        """
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f'appium-{port}')
+
+    async def _call(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def command(self, method, path, payload=None, timeout=None):
+        """Send a command relative to the server's base path; returns the response 'value'"""
+        status, data = await self._call(
+            lambda: self.transport.request(self.host, self.port, method, f"{self.path}{path}", payload, timeout)
+        )
+        value = data.get('value') if isinstance(data, dict) else data
+        if status >= 400:
+            error = value.get('message') if isinstance(value, dict) else value
+            raise RuntimeError(f"Appium command {method} {path} failed ({status}): {error}")
+        return value
+
+    async def status(self):
+        return await self._call(self.transport.check_status, self.host, self.port)
+
+    async def create_session(self, capabilities):
+        """Start a session; returns the session id"""
+        # W3C requires vendor prefixes on everything but the standard capabilities
+        always_match = {
+            (k if ':' in k or k in W3C_CAPABILITIES else f"appium:{k}"): v
+            for k, v in capabilities.items()
+        }
+        value = await self.command('POST', '/session', {
+            'capabilities': {'alwaysMatch': always_match, 'firstMatch': [{}]}
+        })
+        return value['sessionId']
+
+    async def delete_session(self, session_id):
+        return await self.command('DELETE', f"/session/{session_id}")
+
+    async def window_size(self, session_id):
+        value = await self.command('GET', f"/session/{session_id}/window/rect")
+        return {'width': value['width'], 'height': value['height']}
+
+    async def execute_script(self, session_id, script, args=None):
+        return await self.command('POST', f"/session/{session_id}/execute/sync", {
+            'script': script,
+            'args': [args] if args is not None else []
+        })
+
+    async def activate_app(self, session_id, app_id):
+        return await self.command('POST', f"/session/{session_id}/appium/device/activate_app", {'appId': app_id})
+
+    async def page_source(self, session_id):
+        return await self.command('GET', f"/session/{session_id}/source")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    """Process-wide AppiumTransport shared by the device manager and launcher"""
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = AppiumTransport()
+        return _default_transport
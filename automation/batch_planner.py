@@ -0,0 +1,213 @@
+import time
+import logging
+import itertools
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SWITCH_ESTIMATE = 8.0  # seconds for profile -> username -> switcher -> account
+DEFAULT_TASK_ESTIMATE = 10.0  # seconds for a task we haven't timed yet
+DEFAULT_SMOOTHING = 0.3  # weight of the newest measurement in the running estimates
+
+
+class PlannedJob:
+    """A queued job as the planner sees it"""
+
+    __slots__ = ('job_id', 'account', 'priority', 'deadline', 'duration', 'seq', 'payload')
+
+    _seq = itertools.count()
+
+    def __init__(self, job_id, account, priority=0, deadline=None, duration=DEFAULT_TASK_ESTIMATE, payload=None):
+        """
+        Args:
+            job_id: JobStore id
+            account: Username the job has to run as
+            priority: Higher runs earlier
+            deadline: Epoch seconds the job should finish by, or None
+            duration: Estimated seconds the task itself takes
+            payload: Opaque data for whoever runs the job
+        """
+        self.job_id = job_id
+        self.account = account
+        self.priority = priority
+        self.deadline = deadline
+        self.duration = duration
+        self.seq = next(self._seq)  # submission order, the final tie-breaker
+        self.payload = payload
+
+    def sort_key(self):
+        return (-self.priority, self.deadline if self.deadline is not None else float('inf'), self.seq)
+
+
+class BatchPlan:
+    """An ordering of one device's pending jobs with its estimated cost"""
+
+    def __init__(self, jobs, switches, switch_estimate, estimated_finish, late, started):
+        self.jobs = jobs
+        self.switches = switches
+        self.switch_estimate = switch_estimate
+        self.estimated_switch_time = switches * switch_estimate
+        self.estimated_finish = estimated_finish
+        self.late = late
+        self.started = started
+
+    def to_dict(self):
+        return {
+            'order': [(j.job_id, j.account) for j in self.jobs],
+            'switches': self.switches,
+            'switch_estimate': self.switch_estimate,
+            'estimated_switch_time': self.estimated_switch_time,
+            'estimated_duration': self.estimated_finish - self.started,
+            'predicted_late': self.late
+        }
+
+
+class BatchPlanner:
+    """
+    Orders a device's queued jobs to minimize account switches.
+
+    Jobs are grouped by account and a whole group runs before moving on, so
+    each account is switched to at most once per plan. Groups are chosen by
+    their highest job priority, then staying on the current account, then
+    earliest deadline. If running the chosen group first would make a job in
+    another group miss a deadline it could still meet, that group goes first.
+
+    Switch and task durations are running averages of measured times, so
+    estimates track each device's real speed.
+    """
+
+    def __init__(self, switch_estimate=DEFAULT_SWITCH_ESTIMATE, task_estimate=DEFAULT_TASK_ESTIMATE,
+                 smoothing=DEFAULT_SMOOTHING):
+        """
+        Args:
+            switch_estimate: Seconds per account switch until one has been measured
+            task_estimate: Seconds per task until that task has been measured
+            smoothing: Weight of each new measurement in the running averages
+        """
+        self.default_switch_estimate = switch_estimate
+        self.default_task_estimate = task_estimate
+        self.smoothing = smoothing
+        self._switch_estimates = {}  # device_id -> seconds
+        self._task_estimates = {}  # task name -> seconds
+        self.lock = threading.Lock()
+
+    def _update(self, estimates, key, seconds, default):
+        with self.lock:
+            previous = estimates.get(key, default)
+            estimates[key] = previous + self.smoothing * (seconds - previous)
+
+    def switch_estimate(self, device_id=None):
+        return self._switch_estimates.get(device_id, self.default_switch_estimate)
+
+    def task_estimate(self, task_name):
+        return self._task_estimates.get(task_name, self.default_task_estimate)
+
+    def record_switch(self, device_id, seconds):
+        self._update(self._switch_estimates, device_id, seconds, self.default_switch_estimate)
+
+    def record_task(self, task_name, seconds):
+        self._update(self._task_estimates, task_name, seconds, self.default_task_estimate)
+
+    def plan(self, jobs, active_account=None, device_id=None, now=None):
+        """
+        Order pending jobs for one device.
+
+        Args:
+            jobs: PlannedJobs queued for the device
+            active_account: Account currently on screen, if known
+            device_id: Device the jobs run on, for its switch time estimate
+            now: Planning start time (default: time.time())
+
+        Returns:
+            BatchPlan
+        """
+        started = now if now is not None else time.time()
+        switch = self.switch_estimate(device_id)
+
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job.account, []).append(job)
+        for group in groups.values():
+            group.sort(key=PlannedJob.sort_key)
+
+        def earliest_deadline(group):
+            deadlines = [j.deadline for j in group if j.deadline is not None]
+            return min(deadlines) if deadlines else float('inf')
+
+        order, late = [], []
+        t, current, switches = started, active_account, 0
+        while groups:
+            best = min(groups, key=lambda account: (
+                -groups[account][0].priority,
+                account != current,
+                earliest_deadline(groups[account]),
+                -len(groups[account]),
+                groups[account][0].seq
+            ))
+
+            # A job elsewhere that would be late after `best` but can still make it if run now goes first
+            best_finish = t + (switch if best != current else 0) + sum(j.duration for j in groups[best])
+            at_risk = []
+            for account, group in groups.items():
+                if account == best:
+                    continue
+                start_now = t + (switch if account != current else 0)
+                for job in group:
+                    if job.deadline is None:
+                        continue
+                    if best_finish + switch + job.duration > job.deadline >= start_now + job.duration:
+                        at_risk.append((job.deadline, job.seq, account))
+            if at_risk:
+                best = min(at_risk)[2]
+
+            group = groups.pop(best)
+            if best != current:
+                switches += 1
+                t += switch
+                current = best
+            for job in group:
+                t += job.duration
+                if job.deadline is not None and t > job.deadline:
+                    late.append(job.job_id)
+            order.extend(group)
+
+        return BatchPlan(order, switches, switch, t, late, started)
+
+
+class BatchReport:
+    """Estimated against actual account switching for one drain of a device's queue"""
+
+    def __init__(self, device_id, plan):
+        self.device_id = device_id
+        self.started_at = time.time()
+        self.finished_at = None
+        self.planned_switches = plan.switches
+        self.estimated_switch_time = plan.estimated_switch_time
+        self.switch_estimate = plan.switch_estimate
+        self.switches = []  # (account, seconds)
+        self.jobs_run = 0
+        self.predicted_late = list(plan.late)
+
+    def record_job(self, switch_account=None, switch_seconds=None):
+        self.jobs_run += 1
+        if switch_account is not None:
+            self.switches.append((switch_account, switch_seconds))
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def to_dict(self):
+        actual = sum(seconds for _, seconds in self.switches if seconds is not None)
+        return {
+            'device_id': self.device_id,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'jobs_run': self.jobs_run,
+            'planned_switches': self.planned_switches,
+            'actual_switches': len(self.switches),
+            'switch_estimate': self.switch_estimate,
+            'estimated_switch_time': self.estimated_switch_time,
+            'actual_switch_time': actual,
+            'switches': [{'account': a, 'seconds': s} for a, s in self.switches],
+            'predicted_late': self.predicted_late
+        }
@@ -3,28 +3,81 @@ import json
 import logging
 import time
 import threading
-import requests
-import subprocess
 import re
-from appium import webdriver
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from automation.appium_transport import get_default_transport
+from automation.events import EventBus
+from automation.discovery import DeviceDiscovery
+from automation.metrics import MetricsRegistry, InstrumentedDriver
+from automation.tracing import Tracer
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Min seconds between re-scans for real devices while none are connected
+REAL_DEVICE_RESCAN_INTERVAL = 60
+
+# Default seconds a task waits for a free device before giving up
+DEFAULT_ACQUIRE_TIMEOUT = 300
+
+# Default seconds to wait for a session liveness probe
+DEFAULT_PROBE_TIMEOUT = 5
+
 class DeviceManager:
     """Manages multiple devices running Instagram automation across multiple Appium servers"""
     
-    def __init__(self, config_path=None):
-        """Initialize device manager with configuration"""
+    def __init__(self, config_path=None, transport=None, discovery=None, store=None, metrics=None, tracer=None):
+        """
+        Initialize device manager with configuration.
+        
+        With a ConfigStore the config is read from (and written to) the database,
+        after a one-time import of config_path; otherwise config_path is the JSON
+        config file itself. Session lifecycle timings and every driver command
+        are recorded in metrics (a new MetricsRegistry unless one is given).
+        Driver commands sent while a task is being traced are recorded as spans
+        in tracer (a new Tracer unless one is given).
+        """
         self.devices = {}  # Stores device info
         self.drivers = {}  # Stores Appium drivers
         self.servers = {}  # Stores server info
         self.lock = threading.Lock()  # For thread safety
+        self.device_available = threading.Condition(self.lock)  # Signalled when a device becomes ready
+        self._waiters = deque()  # FIFO of pending acquire_device calls
+        self.events = EventBus()  # Device/server state change notifications
+        self._simulator_cache = {}  # udid -> is_simulator result
+        self.discovery = discovery or DeviceDiscovery()  # Finds physically connected devices
         self.real_device_udids = self._get_real_device_udids()  # Cache real device UDIDs
+        self._real_devices_scanned_at = time.time()
         self.config_path = config_path # Store the config path
+        self.transport = transport or get_default_transport()  # Pooled HTTP connections per Appium server
+        self.store = store  # Optional ConfigStore backing the config
+        self.metrics = metrics or MetricsRegistry()
+        self.tracer = tracer or Tracer()
+        self._init_seconds = self.metrics.histogram(
+            'device_init_seconds', 'Time to start an Appium session', ('device', 'server', 'outcome'))
+        self._init_retries = self.metrics.counter(
+            'device_init_retries_total', 'Session starts for a device that already had one', ('device', 'server'))
+        self._quit_seconds = self.metrics.histogram(
+            'device_quit_seconds', 'Time to quit an Appium session', ('device', 'server'))
+        self._acquire_seconds = self.metrics.histogram(
+            'device_acquire_wait_seconds', 'Time a task waited for a free device', ('device', 'server'))
+        self._acquire_timeouts = self.metrics.counter(
+            'device_acquire_timeouts_total', 'Device requests that timed out', ('platform', 'model', 'server'))
+        self._busy_seconds = self.metrics.histogram(
+            'device_busy_seconds', 'Time a device was held between acquire and release', ('device', 'server'))
+        self._sessions_started = set()  # devices that have had a session
+        self._acquired_at = {}  # device_id -> perf_counter() at acquire
+        self._init_attempts = {}  # device_id -> number of the latest session start
+        self._abandoned_inits = set()  # (device_id, attempt) given up on by a timeout
+        self._init_errors = {}  # device_id -> why its latest session start failed
         
         # Load config if provided, otherwise use defaults
-        if config_path and os.path.exists(config_path):
+        if store:
+            store.migrate_from_json(config_path)
+        if store and not store.is_empty():
+            self.config = store.load_config()
+        elif config_path and os.path.exists(config_path):
             with open(config_path, 'r') as f:
                 self.config = json.load(f)
         else:
@@ -47,46 +100,32 @@ class DeviceManager:
     
     def _get_real_device_udids(self):
         """Get list of connected real device UDIDs"""
-        real_devices = []
-        
-        # Get iOS devices using idevice_id
-        try:
-            result = subprocess.run(['idevice_id', '-l'], 
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE,
-                                   universal_newlines=True)
-            
-            if result.returncode == 0:
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip():
-                        real_devices.append(line.strip())
-        except Exception as e:
-            logger.warning(f"Error getting iOS device list: {str(e)}")
-        
-        # Get Android devices
-        try:
-            result = subprocess.run(['adb', 'devices'], 
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE,
-                                   universal_newlines=True)
-            
-            if result.returncode == 0:
-                for line in result.stdout.splitlines()[1:]:  # Skip header
-                    if '\t' in line and 'device' in line:
-                        udid = line.split('\t')[0].strip()
-                        if udid:
-                            real_devices.append(udid)
-        except Exception as e:
-            logger.warning(f"Error getting Android device list: {str(e)}")
-        
+        real_devices = self.discovery.real_device_udids()
         logger.info(f"Detected real devices: {real_devices}")
         return real_devices
     
     def is_simulator(self, udid):
         """Check if a device is a simulator based on its UDID"""
-        # Refresh real devices list
-        if not hasattr(self, 'real_device_udids') or not self.real_device_udids:
-            self.real_device_udids = self._get_real_device_udids()
+        cached = self._simulator_cache.get(udid)
+        if cached is not None:
+            return cached
+        
+        # Refresh real devices list, but don't shell out on every call while none are connected
+        if not self.real_device_udids and time.time() - self._real_devices_scanned_at > REAL_DEVICE_RESCAN_INTERVAL:
+            self.set_real_device_udids(self._get_real_device_udids())
+        
+        result = self._detect_simulator(udid)
+        self._simulator_cache[udid] = result
+        return result
+    
+    def set_real_device_udids(self, udids):
+        """Replace the cached list of connected real devices"""
+        self.real_device_udids = list(udids)
+        self._real_devices_scanned_at = time.time()
+        self._simulator_cache = {}
+    
+    def _detect_simulator(self, udid):
+        """Classify a UDID as simulator/emulator or real device"""
         
         # Common iOS simulator patterns
         ios_simulator_patterns = [
@@ -112,11 +151,41 @@ class DeviceManager:
     
     def check_appium_server(self, host, port):
         """Check if Appium server is running on the specified host and port"""
-        try:
-            response = requests.get(f"http://{host}:{port}/status", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
+        return self.transport.check_status(host, port)
+    
+    def check_server_health(self):
+        """
+        Probe every Appium server and record whether it is reachable.
+        
+        Returns:
+            dict: server_id -> True if the server answered /status
+        """
+        with self.lock:
+            servers = {server_id: info['config'] for server_id, info in self.servers.items()}
+        
+        health = {}
+        for server_id, server_config in servers.items():
+            health[server_id] = self.check_appium_server(server_config['host'], server_config['port'])
+        
+        with self.lock:
+            for server_id, healthy in health.items():
+                server_info = self.servers.get(server_id)
+                if not server_info:
+                    continue
+                status = 'running' if healthy else 'disconnected'
+                if server_info['status'] != status:
+                    logger.info(f"Appium server {server_id} is now {status}")
+                    server_info['status'] = status
+                    self.events.publish('server_status', server_id=server_id, status=status)
+        
+        return health
+    
+    def _publish_device_status(self, device_id):
+        """Announce a device's current status on the event bus. Call with self.lock held."""
+        device_info = self.devices.get(device_id)
+        if device_info:
+            self.events.publish('device_status', device_id=device_id,
+                                status=device_info['status'], server=device_info.get('server'))
     
     def _initialize_servers(self):
         """Set up the server tracking from configuration"""
@@ -194,9 +263,10 @@ class DeviceManager:
             self.servers[assigned_server]["device_count"] += 1
             
             logger.info(f"Added device: {name} ({udid}) to server {assigned_server} with WDA Port {next_wda_port}")
+            self.events.publish('device_added', device_id=udid, server=assigned_server)
             
-            # Save the updated configuration
-            if not self.save_config(): # Call save_config which uses self.config_path
+            # Save the updated configuration (a single row insert when backed by the store)
+            if not self.save_device_config(device_config):
                 logger.error(f"Failed to save configuration after adding device {name}")
                 # Potentially roll back the add if save fails, though this adds complexity
                 # For now, just log the error. The in-memory config is updated.
@@ -207,6 +277,30 @@ class DeviceManager:
     def initialize_device(self, device_config):
         """Initialize Appium driver for a specific device"""
         device_id = device_config['udid']
+        started = time.perf_counter()
+        success = self._start_session(device_config)
+        
+        server_id = device_config.get('server')
+        self._init_seconds.observe(time.perf_counter() - started, device=device_id, server=server_id,
+                                   outcome='success' if success else 'failure')
+        if device_id in self._sessions_started:
+            self._init_retries.inc(device=device_id, server=server_id)
+        if success:
+            self._sessions_started.add(device_id)
+        return success
+    
+    def _quit_driver(self, device_id, driver):
+        """Quit a driver, recording how long it took; raises whatever quit() raises"""
+        started = time.perf_counter()
+        try:
+            driver.quit()
+        finally:
+            server_id = self.devices.get(device_id, {}).get('server')
+            self._quit_seconds.observe(time.perf_counter() - started, device=device_id, server=server_id)
+    
+    def _start_session(self, device_config):
+        """Create the Appium session for a device and mark it ready (see initialize_device)"""
+        device_id = device_config['udid']
         server_id = device_config.get('server')
         
         # If device has no server assigned, assign one
@@ -216,11 +310,13 @@ class DeviceManager:
                 logger.error(f"No servers available for device {device_config['name']}")
                 # Ensure status reflects failure if no server can be assigned
                 with self.lock:
+                    self._init_errors[device_id] = "No Appium server with capacity available"
                     if device_id not in self.devices:
                         self.devices[device_id] = {'config': device_config, 'status': 'error', 'last_active': time.time(), 'server': None}
                     else:
                         self.devices[device_id]['status'] = 'error'
                         self.devices[device_id]['last_active'] = time.time()
+                    self._publish_device_status(device_id)
                 return False
             device_config['server'] = server_id
         
@@ -228,34 +324,39 @@ class DeviceManager:
         if server_id not in self.servers:
             logger.error(f"Server {server_id} not found in configuration for device {device_config['name']}")
             with self.lock:
+                self._init_errors[device_id] = f"Server {server_id} not found in configuration"
                 if device_id not in self.devices:
                     self.devices[device_id] = {'config': device_config, 'status': 'error', 'last_active': time.time(), 'server': server_id}
                 else:
                     self.devices[device_id]['status'] = 'error'
                     self.devices[device_id]['last_active'] = time.time()
+                self._publish_device_status(device_id)
             return False
             
         server_config = self.servers[server_id]["config"]
 
         # Construct server URL - ensuring /wd/hub is included as Appium servers are started with it
-        server_url = f"http://{server_config['host']}:{server_config['port']}/wd/hub"
+        server_url = self.transport.server_url(server_config['host'], server_config['port'], '/wd/hub')
         
-        # Attempt to quit existing driver for this device_id first, if any
+        # Take any existing driver for this device_id; it is quit below, outside the lock
         with self.lock:
-            if device_id in self.drivers:
-                logger.info(f"Attempting to quit existing driver for device {device_id} before re-initializing.")
-                try:
-                    self.drivers[device_id].quit()
-                except Exception as e_quit:
-                    logger.warning(f"Error quitting existing driver for {device_id}: {str(e_quit)}")
-                finally:
-                    del self.drivers[device_id]
+            old_driver = self.drivers.pop(device_id, None)
+            self._init_errors.pop(device_id, None)
             # Ensure a basic device entry exists if we are trying to initialize it
             if device_id not in self.devices:
                  self.devices[device_id] = {'config': device_config, 'status': 'initializing', 'last_active': time.time(), 'server': server_id}
             else:
                 self.devices[device_id]['status'] = 'initializing'
                 self.devices[device_id]['last_active'] = time.time()
+            self._publish_device_status(device_id)
+            attempt = self._init_attempts[device_id] = self._init_attempts.get(device_id, 0) + 1
+        
+        if old_driver is not None:
+            logger.info(f"Attempting to quit existing driver for device {device_id} before re-initializing.")
+            try:
+                self._quit_driver(device_id, old_driver)
+            except Exception as e_quit:
+                logger.warning(f"Error quitting existing driver for {device_id}: {str(e_quit)}")
 
         try:
             logger.info(f"Initializing device: {device_config['name']} ({device_id}) on server {server_id}")
@@ -278,27 +379,59 @@ class DeviceManager:
             # Use the direct URL format (Appium 2.x) instead of /wd/hub (Appium 1.x)
             logger.info(f"Connecting to Appium at: {server_url}")
             
-            driver = webdriver.Remote(server_url, desired_caps)
+            # Commands go over the server's shared keep-alive pool
+            command_executor = self.transport.create_connection(
+                server_config['host'], server_config['port'], '/wd/hub',
+                pool_size=server_config.get('pool_size')
+            )
+            # Imported on first use rather than at startup: appium pulls in all of selenium
+            from appium import webdriver
+            driver = webdriver.Remote(command_executor, desired_caps)
             logger.info("Driver created successfully!")
             
+            # Every command sent through the driver is timed per device/server/command
+            # Rotating the device drops its cached geometry, so gestures re-measure the screen
+            driver = InstrumentedDriver(driver, self.metrics, device_id, server_id, tracer=self.tracer,
+                                        on_orientation_change=lambda: self.invalidate_screen_size(device_id))
+            
             # Get screen dimensions
             screen_size = driver.get_window_size()
             logger.info(f"Screen size: {screen_size}")
             
-            # Store device info
+            # Store device info, unless a timeout gave up on this attempt while it ran.
+            # Checked under the same lock as the store, so an abandon can't slip in between
             with self.lock:
-                self.drivers[device_id] = driver
-                self.devices[device_id] = {
-                    'config': device_config,
-                    'screen_width': screen_size['width'],
-                    'screen_height': screen_size['height'],
-                    'status': 'ready',
-                    'last_active': time.time(),
-                    'server': server_id
-                }
-                
-                # Ensure server status is updated
-                self.servers[server_id]['status'] = 'running'
+                abandoned = (device_id, attempt) in self._abandoned_inits
+                self._abandoned_inits.discard((device_id, attempt))
+                if abandoned:
+                    self._init_errors[device_id] = "Session started after its initialization had timed out"
+                else:
+                    self.drivers[device_id] = driver
+                    self.devices[device_id] = {
+                        'config': device_config,
+                        'screen_width': screen_size['width'],
+                        'screen_height': screen_size['height'],
+                        'geometry_session': driver.session_id,
+                        'status': 'ready',
+                        'last_active': time.time(),
+                        'server': server_id
+                    }
+                    
+                    # Ensure server status is updated
+                    if self.servers[server_id]['status'] != 'running':
+                        self.servers[server_id]['status'] = 'running'
+                        self.events.publish('server_status', server_id=server_id, status='running')
+                    self.device_available.notify_all()
+                    self._publish_device_status(device_id)
+            
+            if abandoned:
+                logger.warning(f"Discarding session for {device_config['name']} ({device_id}): it was started "
+                               f"after its initialization had timed out")
+                try:
+                    self._quit_driver(device_id, driver)
+                except Exception as e_quit:
+                    logger.warning(f"Error quitting late session for {device_id}: {str(e_quit)}")
+                return False
             
             logger.info(f"Device {device_config['name']} initialized successfully on server {server_id}")
             return True
@@ -309,12 +442,25 @@ class DeviceManager:
             logger.error(traceback.format_exc())
             # Update status to error and remove driver if it exists
             with self.lock:
+                self._abandoned_inits.discard((device_id, attempt))
+                self._init_errors[device_id] = str(e)
                 if device_id in self.drivers:
                     del self.drivers[device_id] # Ensure no stale driver object
                 self.devices[device_id]['status'] = 'error' # Set status to error
                 self.devices[device_id]['last_active'] = time.time()
+                self._publish_device_status(device_id)
             return False
     
+    def _abandon_initialization(self, device_id):
+        """Give up on a device's in-flight session start: mark it 'error' and discard the session if one arrives"""
+        with self.lock:
+            if device_id in self._init_attempts:
+                self._abandoned_inits.add((device_id, self._init_attempts[device_id]))
+            if device_id in self.devices:
+                self.devices[device_id]['status'] = 'error'
+                self.devices[device_id]['last_active'] = time.time()
+                self._publish_device_status(device_id)
+    
     def _assign_server(self, device_id):
         """Assign a device to the least loaded server"""
         with self.lock:
@@ -344,8 +490,26 @@ class DeviceManager:
             logger.info(f"Device {device_id} automatically assigned to server {server_id}")
             return server_id
     
-    def initialize_all_devices(self):
-        """Initialize all devices from configuration"""
+    def initialize_all_devices(self, parallel=False, max_workers=8, per_server_limit=None, timeout=None):
+        """Initialize all devices from configuration
+        
+        Args:
+            parallel: Start sessions concurrently instead of one after another
+            max_workers: Size of the worker pool used in parallel mode
+            per_server_limit: Max simultaneous session starts per Appium server
+            timeout: Seconds to wait for each device before giving up on it
+            
+        Returns:
+            int: Number of devices initialized successfully
+        """
+        if parallel:
+            results = self.initialize_devices_concurrently(
+                max_workers=max_workers,
+                per_server_limit=per_server_limit,
+                timeout=timeout
+            )
+            return sum(1 for r in results.values() if r['success'])
+        
         initialized_count = 0
         
         for device_config in self.config['devices']:
@@ -354,6 +518,106 @@ class DeviceManager:
         
         return initialized_count
     
+    def initialize_devices_concurrently(self, device_configs=None, max_workers=8, per_server_limit=None, timeout=None):
+        """
+        Initialize devices on a bounded worker pool.
+        
+        Sessions on different Appium servers start at the same time, while each
+        server is limited to `per_server_limit` simultaneous handshakes (falling
+        back to the server's `max_concurrent_inits` setting, then 2). A device
+        that does not finish within `timeout` seconds of starting its handshake
+        is reported as timed out and marked 'error'; the worker thread is left
+        to finish in the background because webdriver.Remote cannot be
+        interrupted, and a session it still manages to start is quit rather
+        than marked ready.
+        
+        Args:
+            device_configs: Device configs to initialize (defaults to all configured devices)
+            max_workers: Size of the worker pool
+            per_server_limit: Max simultaneous session starts per Appium server
+            timeout: Per-device timeout in seconds, or None to wait indefinitely
+            
+        Returns:
+            dict: udid -> {'name', 'server', 'success', 'outcome', 'duration', 'error'}
+        """
+        if device_configs is None:
+            device_configs = list(self.config['devices'])
+        if not device_configs:
+            return {}
+        
+        # One semaphore per server bounds concurrent handshakes against it
+        server_slots = {}
+        for server_id, server_info in self.servers.items():
+            limit = per_server_limit or server_info['config'].get('max_concurrent_inits', 2)
+            server_slots[server_id] = threading.Semaphore(max(1, int(limit)))
+        unassigned_slot = threading.Semaphore(1)
+        
+        started_at = {}
+        results = {}
+        
+        def init_one(device_config):
+            device_id = device_config['udid']
+            slot = server_slots.get(device_config.get('server'), unassigned_slot)
+            with slot:
+                # The timeout only counts time spent on the handshake itself
+                started_at[device_id] = time.time()
+                success = self.initialize_device(device_config)
+                return success, time.time() - started_at[device_id]
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(device_configs))),
+                                      thread_name_prefix='device-init')
+        futures = {executor.submit(init_one, cfg): cfg for cfg in device_configs}
+        pending = set(futures)
+        
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    device_config = futures[future]
+                    device_id = device_config['udid']
+                    try:
+                        success, duration = future.result()
+                        error = None if success else self._init_errors.get(device_id, "Initialization failed")
+                    except Exception as e:
+                        success, duration, error = False, time.time() - started_at.get(device_id, time.time()), str(e)
+                    results[device_id] = {
+                        'name': device_config.get('name'),
+                        'server': device_config.get('server'),
+                        'success': success,
+                        'outcome': 'ready' if success else 'failed',
+                        'duration': duration,
+                        'error': error
+                    }
+                
+                if timeout is None:
+                    continue
+                
+                # Give up on devices whose handshake has exceeded the timeout
+                now = time.time()
+                for future in list(pending):
+                    device_config = futures[future]
+                    device_id = device_config['udid']
+                    if device_id in started_at and now - started_at[device_id] > timeout:
+                        pending.discard(future)
+                        logger.error(f"Timed out after {timeout}s initializing device {device_config.get('name')} ({device_id})")
+                        self._abandon_initialization(device_id)
+                        results[device_id] = {
+                            'name': device_config.get('name'),
+                            'server': device_config.get('server'),
+                            'success': False,
+                            'outcome': 'timeout',
+                            'duration': now - started_at[device_id],
+                            'error': f"Initialization timed out after {timeout}s"
+                        }
+        finally:
+            # Don't block on timed-out handshakes; queued work is cancelled
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        succeeded = sum(1 for r in results.values() if r['success'])
+        logger.info(f"Concurrent initialization finished: {succeeded}/{len(device_configs)} devices ready")
+        return results
+    
     def get_device_status(self):
         """Get status of all devices"""
         statuses = {}
@@ -390,35 +654,232 @@ class DeviceManager:
                 
         return statuses
     
-    def get_available_device(self):
-        """Get an available device for automation tasks"""
-        with self.lock:
-            for device_id, device_info in self.devices.items():
-                if device_info['status'] == 'ready':
-                    # Mark as busy
-                    self.devices[device_id]['status'] = 'busy'
-                    self.devices[device_id]['last_active'] = time.time()
-                    return device_id, self.drivers[device_id]
+    def _matches_affinity(self, device_id, device_info, affinity):
+        """Check whether a device satisfies a waiter's device/platform/model/server affinity"""
+        wanted_id, platform, model, server = affinity
+        config = device_info['config']
+        if wanted_id and device_id != wanted_id:
+            return False
+        if platform and config.get('platformName', '').lower() != platform.lower():
+            return False
+        if model and config.get('model') != model:
+            return False
+        if server and device_info.get('server') != server:
+            return False
+        return True
+    
+    def _claim_ready_device(self, waiter):
+        """
+        Find a ready device for a waiter, honouring FIFO order. Must hold self.lock.
         
-        return None, None
+        A device is skipped if an earlier waiter could also use it, so waiters are
+        served in arrival order without a waiter for one model blocking a waiter
+        for another model that has a free device.
+        """
+        earlier_waiters = []
+        for other in self._waiters:
+            if other is waiter:
+                break
+            earlier_waiters.append(other)
+        
+        for device_id, device_info in self.devices.items():
+            if device_info['status'] != 'ready' or device_id not in self.drivers:
+                continue
+            if not self._matches_affinity(device_id, device_info, waiter['affinity']):
+                continue
+            if any(self._matches_affinity(device_id, device_info, other['affinity']) for other in earlier_waiters):
+                continue
+            return device_id
+        return None
+    
+    def acquire_device(self, timeout=None, platform=None, model=None, server=None, device_id=None):
+        """
+        Take a ready device from the pool, waiting for one if they are all busy.
+        
+        Requests for a specific device queue in the same FIFO as any other, so a
+        task addressed to a phone waits for whatever task is running on it.
+        
+        Args:
+            timeout: Seconds to wait for a device; None waits indefinitely, 0 doesn't wait
+            device_id: Only accept this device
+            platform: Only accept devices on this platform (e.g. 'iOS')
+            model: Only accept devices of this model (e.g. 'iphone16_pro')
+            server: Only accept devices on this Appium server
+            
+        Returns:
+            tuple: (device_id, driver), or (None, None) if the wait timed out
+        """
+        requested_at = time.time()
+        deadline = None if timeout is None else requested_at + timeout
+        waiter = {'affinity': (device_id, platform, model, server)}
+        
+        with self.device_available:
+            self._waiters.append(waiter)
+            try:
+                while True:
+                    claimed_id = self._claim_ready_device(waiter)
+                    if claimed_id is not None:
+                        # Mark as busy
+                        self.devices[claimed_id]['status'] = 'busy'
+                        self.devices[claimed_id]['last_active'] = time.time()
+                        self._publish_device_status(claimed_id)
+                        self._acquired_at[claimed_id] = time.perf_counter()
+                        self._acquire_seconds.observe(time.time() - requested_at, device=claimed_id,
+                                                      server=self.devices[claimed_id].get('server'))
+                        return claimed_id, self.drivers[claimed_id]
+                    
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        self._acquire_timeouts.inc(platform=platform, model=model, server=server)
+                        return None, None
+                    self.device_available.wait(remaining)
+            finally:
+                self._waiters.remove(waiter)
+                # Our departure may unblock a later waiter with overlapping affinity
+                self.device_available.notify_all()
+    
+    def get_available_device(self, timeout=0, platform=None, model=None, server=None, device_id=None):
+        """Get an available device for automation tasks, optionally waiting for one (see acquire_device)"""
+        return self.acquire_device(timeout=timeout, platform=platform, model=model, server=server, device_id=device_id)
     
     def release_device(self, device_id):
         """Mark a device as available again"""
         with self.lock:
-            if device_id in self.devices:
+            # A device unplugged mid-task stays disconnected
+            acquired_at = self._acquired_at.pop(device_id, None)
+            if acquired_at is not None and device_id in self.devices:
+                self._busy_seconds.observe(time.perf_counter() - acquired_at, device=device_id,
+                                           server=self.devices[device_id].get('server'))
+            if device_id in self.devices and self.devices[device_id]['status'] != 'disconnected':
                 self.devices[device_id]['status'] = 'ready'
                 self.devices[device_id]['last_active'] = time.time()
                 logger.info(f"Device {self.devices[device_id]['config']['name']} released")
+                self.device_available.notify_all()
+                self._publish_device_status(device_id)
+    
+    def probe_session(self, device_id, timeout=DEFAULT_PROBE_TIMEOUT):
+        """
+        Check that a device's Appium session is still alive on the server.
+        
+        Sends GET /session/<id>/timeouts, the cheapest W3C command, over the
+        server's pooled connection. Like any command it also resets the
+        session's newCommandTimeout idle timer.
+        
+        Only a definitive answer from the server counts as a dead session: an
+        'invalid session id' error or a 404 for the session. Appium runs a
+        session's commands one at a time, so a probe can time out behind a long
+        gesture without anything being wrong; timeouts, connection errors and
+        other failures leave alive as None.
+        
+        Returns:
+            tuple: (alive, seconds taken); (None, None) if there is no session to probe
+        """
+        with self.lock:
+            driver = self.drivers.get(device_id)
+            device_info = self.devices.get(device_id)
+            server_info = self.servers.get(device_info.get('server')) if device_info else None
+        if not driver or not server_info:
+            return None, None
+        
+        server_config = server_info['config']
+        started = time.time()
+        try:
+            status, body = self.transport.request(server_config['host'], server_config['port'], 'GET',
+                                                  f"/wd/hub/session/{driver.session_id}/timeouts", timeout=timeout)
+        except Exception as e:
+            logger.debug(f"Session probe for {device_id} got no answer: {e}")
+            return None, time.time() - started
+        
+        value = body.get('value') if isinstance(body, dict) else None
+        error = value.get('error') if isinstance(value, dict) else None
+        if status == 200:
+            alive = True
+        elif error == 'invalid session id' or (status == 404 and error not in ('unknown command', 'unknown method')):
+            alive = False
+        else:
+            logger.debug(f"Inconclusive session probe for {device_id}: HTTP {status} {error or ''}")
+            alive = None
+        return alive, time.time() - started
+    
+    def reconnect_device(self, device_id):
+        """
+        Replace an idle device's session with a fresh one.
+        
+        The device is claimed first (ready -> initializing) so no task picks it
+        up halfway through; busy or otherwise unavailable devices are left alone.
+        
+        Returns:
+            tuple: (success, seconds taken), or None if the device wasn't idle
+        """
+        with self.lock:
+            device_info = self.devices.get(device_id)
+            if not device_info or device_info['status'] != 'ready':
+                return None
+            device_info['status'] = 'initializing'
+            self._publish_device_status(device_id)
+            device_config = device_info['config']
+        
+        started = time.time()
+        success = self.initialize_device(device_config)
+        return success, time.time() - started
+    
+    def get_screen_size(self, device_id):
+        """
+        Get the cached (width, height) of a device's screen.
+        
+        The size is measured once per Appium session (initialize_device already
+        does this) and reused by every gesture, so taps don't each pay a
+        get_window_size round trip. It is re-measured when the session changes
+        (initialize_device measures the new one) and after the device is
+        rotated through its driver, which calls invalidate_screen_size(). A
+        rotation the automation didn't cause (e.g. the app switching to
+        landscape on its own) isn't seen; call invalidate_screen_size() then.
+        
+        Returns:
+            tuple: (width, height), or None if the device has no session
+        """
+        with self.lock:
+            device_info = self.devices.get(device_id)
+            driver = self.drivers.get(device_id)
+            if not device_info or not driver:
+                return None
+            if ('screen_width' in device_info and 'screen_height' in device_info
+                    and device_info.get('geometry_session') == driver.session_id):
+                return device_info['screen_width'], device_info['screen_height']
+        
+        return self.refresh_screen_size(device_id)
+    
+    def refresh_screen_size(self, device_id):
+        """Measure a device's screen size from its session and update the cache"""
+        driver = self.drivers.get(device_id)
+        if not driver:
+            return None
+        
+        screen_size = driver.get_window_size()
+        with self.lock:
+            if device_id in self.devices:
+                self.devices[device_id]['screen_width'] = screen_size['width']
+                self.devices[device_id]['screen_height'] = screen_size['height']
+                self.devices[device_id]['geometry_session'] = driver.session_id
+        logger.info(f"Measured screen size for {device_id}: {screen_size}")
+        return screen_size['width'], screen_size['height']
+    
+    def invalidate_screen_size(self, device_id):
+        """Forget a device's cached screen size; the next get_screen_size() measures it again"""
+        with self.lock:
+            if device_id in self.devices:
+                self.devices[device_id].pop('geometry_session', None)
     
     def close_device(self, device_id):
         """Close a specific device's Appium session"""
         with self.lock:
             if device_id in self.drivers:
                 try:
-                    self.drivers[device_id].quit()
+                    self._quit_driver(device_id, self.drivers[device_id])
                     del self.drivers[device_id]
                     if device_id in self.devices:
                         self.devices[device_id]['status'] = 'disconnected'
+                        self._publish_device_status(device_id)
                     logger.info(f"Closed session for device {device_id}")
                     return True
                 except Exception as e:
@@ -426,6 +887,65 @@ class DeviceManager:
         
         return False
     
+    def mark_device_attached(self, udid):
+        """
+        Record that a real device was plugged in.
+        
+        Returns:
+            dict: The device's config if it is configured but has no live session
+                  (the caller should initialize it), otherwise None
+        """
+        with self.lock:
+            if udid not in self.real_device_udids:
+                self.real_device_udids = self.real_device_udids + [udid]
+                self._simulator_cache.pop(udid, None)
+            
+            device_config = next((d for d in self.config['devices'] if d['udid'] == udid), None)
+            self.events.publish('device_attached', device_id=udid, configured=device_config is not None)
+            if not device_config:
+                logger.info(f"Unconfigured device attached: {udid}")
+                return None
+            
+            device_info = self.devices.get(udid)
+            if device_info and (device_info['status'] == 'initializing' or
+                                (device_info['status'] in ('ready', 'busy') and udid in self.drivers)):
+                return None
+            logger.info(f"Device attached: {device_config['name']} ({udid})")
+            return device_config
+    
+    def mark_device_detached(self, udid):
+        """
+        Record that a real device was unplugged: drop its session and mark it
+        disconnected so no task is handed a dead device.
+        
+        Returns:
+            bool: True if the device was being managed
+        """
+        with self.lock:
+            if udid in self.real_device_udids:
+                self.real_device_udids = [u for u in self.real_device_udids if u != udid]
+                self._simulator_cache.pop(udid, None)
+            driver = self.drivers.pop(udid, None)
+            device_info = self.devices.get(udid)
+            if device_info:
+                device_info['status'] = 'disconnected'
+                device_info['last_active'] = time.time()
+                device_info.pop('geometry_session', None)
+                self._publish_device_status(udid)
+            self.events.publish('device_detached', device_id=udid)
+        
+        self.discovery.forget(udid)
+        if driver:
+            # The session is already dead on the device side; don't hold the lock for the HTTP call
+            try:
+                self._quit_driver(udid, driver)
+            except Exception as e:
+                logger.debug(f"Error quitting driver for detached device {udid}: {e}")
+        
+        if device_info:
+            logger.info(f"Device detached: {device_info['config']['name']} ({udid})")
+        return device_info is not None
+    
     def close_all_devices(self):
         """Close all Appium sessions"""
         for device_id in list(self.drivers.keys()):
@@ -433,8 +953,29 @@ class DeviceManager:
         
         logger.info("All device sessions closed")
         
+    def save_device_config(self, device_config):
+        """Persist one device's config entry"""
+        if self.store:
+            self.store.upsert_device(device_config)
+            return True
+        return self.save_config()
+    
+    def save_server_config(self, server_config):
+        """Persist one Appium server's config entry"""
+        if self.store:
+            self.store.upsert_server(server_config)
+            return True
+        return self.save_config()
+    
     def save_config(self, config_path=None):
-        """Save the current configuration to file"""
+        """Save the current configuration to the store, or to a JSON file"""
+        if self.store and not config_path:
+            with self.lock:
+                config = json.loads(json.dumps(self.config))
+            self.store.save_config(config)
+            logger.info(f"Configuration saved to {self.store.db_path}")
+            return True
+        
         if not config_path and hasattr(self, 'config_path'):
             config_path = self.config_path
             
@@ -0,0 +1,267 @@
+import time
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMMAND_TIMEOUT = 15  # seconds per tool invocation
+DEFAULT_PROBE_WORKERS = 8  # max device property probes in flight
+
+XCTRACE_DEVICES = ('xcrun', 'xctrace', 'list', 'devices')
+IDEVICE_ID = ('idevice_id', '-l')
+ADB_DEVICES = ('adb', 'devices')
+
+# Android properties read in a single `adb shell` per device, one value per line
+ANDROID_PROPERTIES = ('ro.product.model', 'ro.build.version.release')
+
+
+def run_command(args, timeout=DEFAULT_COMMAND_TIMEOUT):
+    """
+    Run a command and capture its output.
+
+    Returns:
+        tuple: (return code, stdout); the return code is None if the command
+               is missing or timed out
+    """
+    try:
+        result = subprocess.run(list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                universal_newlines=True, timeout=timeout)
+        return result.returncode, result.stdout
+    except subprocess.TimeoutExpired:
+        logger.warning(f"Command timed out after {timeout}s: {' '.join(args)}")
+    except Exception as e:
+        logger.warning(f"Error running {args[0]}: {str(e)}")
+    return None, ''
+
+
+class StubCommandRunner:
+    """Command runner that answers from canned outputs, for tests and benchmarks"""
+
+    def __init__(self, outputs=None, delay=0):
+        """
+        Args:
+            outputs: Map of command tuple -> stdout string or (return code, stdout)
+            delay: Seconds each command takes
+        """
+        self.outputs = dict(outputs or {})
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, args, timeout=DEFAULT_COMMAND_TIMEOUT):
+        args = tuple(args)
+        with self.lock:
+            self.calls.append(args)
+        if self.delay:
+            time.sleep(min(self.delay, timeout))
+        output = self.outputs.get(args)
+        if output is None:
+            return None, ''
+        if isinstance(output, tuple):
+            return output
+        return 0, output
+
+
+class DiscoveredDevice:
+    """A physically connected device found by a discovery pass"""
+
+    __slots__ = ('udid', 'name', 'platform_name', 'platform_version', 'device_name', 'automation_name')
+
+    def __init__(self, udid, name, platform_name, platform_version, device_name, automation_name):
+        self.udid = udid
+        self.name = name
+        self.platform_name = platform_name
+        self.platform_version = platform_version
+        self.device_name = device_name
+        self.automation_name = automation_name
+
+    def to_dict(self):
+        """Device config fields, as used in devices.json and DeviceManager.add_device"""
+        return {
+            "name": self.name,
+            "udid": self.udid,
+            "platformName": self.platform_name,
+            "platformVersion": self.platform_version,
+            "deviceName": self.device_name,
+            "automationName": self.automation_name,
+            "is_simulator": False
+        }
+
+    def __repr__(self):
+        return f"DiscoveredDevice({self.platform_name} {self.name} {self.udid})"
+
+
+class DeviceInventory:
+    """Result of one discovery pass"""
+
+    def __init__(self, devices, real_udids, duration, probes):
+        """
+        Args:
+            devices: DiscoveredDevice list, iOS first
+            real_udids: Every connected real-device UDID reported by idevice_id/adb
+            duration: Seconds the pass took
+            probes: Number of per-device property probes that had to run
+        """
+        self.devices = devices
+        self.real_udids = real_udids
+        self.duration = duration
+        self.probes = probes
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __len__(self):
+        return len(self.devices)
+
+
+class DeviceDiscovery:
+    """
+    Finds connected real iOS and Android devices.
+
+    Each refresh runs every listing tool once (in parallel), then probes only
+    Android devices whose properties aren't cached yet, with bounded
+    concurrency. Model and OS version rarely change, so they're cached by UDID.
+    """
+
+    def __init__(self, runner=None, max_workers=DEFAULT_PROBE_WORKERS, command_timeout=DEFAULT_COMMAND_TIMEOUT):
+        """
+        Args:
+            runner: Callable (args, timeout) -> (return code, stdout); defaults to run_command
+            max_workers: Max commands run at the same time
+            command_timeout: Seconds before a single command is abandoned
+        """
+        self.runner = runner or run_command
+        self.max_workers = max_workers
+        self.command_timeout = command_timeout
+        self._properties = {}  # udid -> {property: value}
+        self.lock = threading.Lock()
+
+    def _run(self, args):
+        return self.runner(args, self.command_timeout)
+
+    def _snapshot(self, commands):
+        """Run each listing command once, in parallel; returns {command: stdout or None}"""
+        with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+            futures = {args: executor.submit(self._run, args) for args in commands}
+        snapshot = {}
+        for args, future in futures.items():
+            returncode, stdout = future.result()
+            snapshot[args] = stdout if returncode == 0 else None
+        return snapshot
+
+    @staticmethod
+    def parse_idevice_id(output):
+        return [line.strip() for line in (output or '').splitlines() if line.strip()]
+
+    @staticmethod
+    def parse_adb_devices(output):
+        """UDIDs of Android devices in the 'device' state (skipping the header, offline and unauthorized)"""
+        udids = []
+        for line in (output or '').splitlines()[1:]:
+            parts = line.strip().split('\t')
+            if len(parts) >= 2 and parts[1].strip() == 'device' and parts[0].strip():
+                udids.append(parts[0].strip())
+        return udids
+
+    @staticmethod
+    def parse_xctrace(output, real_udids):
+        """Real iOS devices from `xctrace list devices`, skipping simulators, Macs and unknown UDIDs"""
+        devices = []
+        for line in (output or '').splitlines():
+            if "(" not in line or ")" not in line or "Simulator" in line or "Mac" in line:
+                continue
+            try:
+                # "<name> (<iOS version>) (<UDID>)"
+                parts = line.strip().split('(')
+                device_name = parts[0].strip()
+                udid = parts[-1].split(')')[0].strip()
+                if len(udid) <= 10 or udid.startswith("com."):
+                    continue
+                if udid not in real_udids:
+                    logger.info(f"Skipping simulator or virtual device: {device_name} ({udid})")
+                    continue
+                ios_version = parts[-2].split(')')[0].strip() if len(parts) > 2 else "Unknown"
+                devices.append(DiscoveredDevice(
+                    udid=udid,
+                    name=device_name,
+                    platform_name="iOS",
+                    platform_version=ios_version,
+                    device_name=device_name.split(" ")[-1],  # Usually iPhone, iPad, etc.
+                    automation_name="XCUITest"
+                ))
+                logger.info(f"Found real iOS device: {device_name} ({udid})")
+            except Exception as parse_error:
+                logger.error(f"Error parsing iOS device line: {line}, error: {str(parse_error)}")
+        return devices
+
+    def real_device_udids(self):
+        """UDIDs of connected real devices, from one run each of idevice_id and adb"""
+        snapshot = self._snapshot([IDEVICE_ID, ADB_DEVICES])
+        return self.parse_idevice_id(snapshot[IDEVICE_ID]) + self.parse_adb_devices(snapshot[ADB_DEVICES])
+
+    def _probe_android(self, udid):
+        """Read model and OS version with a single adb shell; returns None on failure"""
+        script = " && ".join(f"getprop {prop}" for prop in ANDROID_PROPERTIES)
+        returncode, stdout = self._run(('adb', '-s', udid, 'shell', script))
+        values = stdout.splitlines() if returncode == 0 else []
+        if len(values) < len(ANDROID_PROPERTIES):
+            logger.warning(f"Could not read properties of Android device {udid}")
+            return None
+        return {prop: value.strip() for prop, value in zip(ANDROID_PROPERTIES, values)}
+
+    def _android_properties(self, udids):
+        """Cached properties for each UDID, probing the uncached ones in parallel"""
+        with self.lock:
+            missing = [udid for udid in udids if udid not in self._properties]
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                probed = dict(zip(missing, executor.map(self._probe_android, missing)))
+            with self.lock:
+                for udid, props in probed.items():
+                    if props:
+                        self._properties[udid] = props
+
+        with self.lock:
+            return {udid: self._properties.get(udid) for udid in udids}, len(missing)
+
+    def refresh(self):
+        """
+        Take one snapshot of every listing tool and build the device inventory.
+
+        Returns:
+            DeviceInventory
+        """
+        started = time.time()
+        snapshot = self._snapshot([XCTRACE_DEVICES, IDEVICE_ID, ADB_DEVICES])
+
+        ios_udids = self.parse_idevice_id(snapshot[IDEVICE_ID])
+        android_udids = [u for u in self.parse_adb_devices(snapshot[ADB_DEVICES])
+                         if len(u) > 5 and not u.startswith("emulator-")]
+        real_udids = ios_udids + self.parse_adb_devices(snapshot[ADB_DEVICES])
+
+        devices = self.parse_xctrace(snapshot[XCTRACE_DEVICES], set(ios_udids))
+
+        properties, probes = self._android_properties(android_udids)
+        for udid in android_udids:
+            props = properties.get(udid) or {}
+            model = props.get('ro.product.model') or "Android Device"
+            devices.append(DiscoveredDevice(
+                udid=udid,
+                name=model,
+                platform_name="Android",
+                platform_version=props.get('ro.build.version.release') or "Unknown",
+                device_name=model,
+                automation_name="UiAutomator2"
+            ))
+
+        inventory = DeviceInventory(devices, real_udids, time.time() - started, probes)
+        logger.info(f"Discovered {len(devices)} real devices in {inventory.duration:.2f}s ({probes} property probes)")
+        return inventory
+
+    def forget(self, udid):
+        """Drop cached properties for a device, e.g. after it was unplugged"""
+        with self.lock:
+            self._properties.pop(udid, None)
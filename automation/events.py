@@ -0,0 +1,125 @@
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Events kept for clients resuming a stream
+DEFAULT_HISTORY_SIZE = 1000
+
+
+class EventBus:
+    """
+    Minimal publish/subscribe hub for state-change notifications.
+
+    Subscribers are called synchronously on the publishing thread, which may be
+    holding DeviceManager.lock, so callbacks must be quick and must not call
+    back into the DeviceManager.
+
+    Every event also gets an increasing sequence id and is kept in a bounded
+    history, so stream readers can block in wait_for() and resume from the
+    last id they saw without registering a subscriber each.
+    """
+
+    def __init__(self, history_size=DEFAULT_HISTORY_SIZE):
+        """
+        Args:
+            history_size: Number of recent events kept for resuming readers
+        """
+        self._subscribers = []
+        self.lock = threading.Lock()
+        self._history = deque(maxlen=history_size)
+        self._messages = {}  # event id -> SSE-encoded event, shared by every stream reader
+        self._seq = 0
+        self._new_event = threading.Condition(threading.Lock())
+
+    def subscribe(self, callback):
+        """Register callback(event) for every published event; returns the callback"""
+        with self.lock:
+            self._subscribers = self._subscribers + [callback]
+        return callback
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self._subscribers = [s for s in self._subscribers if s is not callback]
+
+    @property
+    def last_id(self):
+        return self._seq
+
+    def publish(self, event_type, **data):
+        """Notify subscribers with {'id', 'type', 'time', **data}"""
+        event = {'type': event_type, 'time': time.time()}
+        event.update(data)
+        with self._new_event:
+            self._seq += 1
+            event['id'] = self._seq
+            if len(self._history) == self._history.maxlen:
+                self._messages.pop(self._history[0]['id'], None)
+            self._history.append(event)
+            self._messages[event['id']] = format_sse(event_type, event, event['id'])
+            self._new_event.notify_all()
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception(f"Event subscriber failed handling {event_type}")
+        return event
+
+    def since(self, last_id):
+        """
+        Events published after last_id, oldest first.
+
+        Returns:
+            list or None: None if events after last_id have already been dropped
+                          from the history, so the reader has to resync
+        """
+        with self._new_event:
+            if last_id >= self._seq:
+                return []
+            if not self._history or self._history[0]['id'] > last_id + 1:
+                return None
+            return [e for e in self._history if e['id'] > last_id]
+
+    def message(self, event):
+        """SSE encoding of a published event, encoded once at publish time"""
+        return self._messages.get(event['id']) or format_sse(event['type'], event, event['id'])
+
+    def wait_for(self, last_id, timeout=None):
+        """Block until an event newer than last_id is published; returns False on timeout"""
+        with self._new_event:
+            return self._new_event.wait_for(lambda: self._seq > last_id, timeout)
+
+
+def coalesce(events):
+    """
+    Collapse a burst of events so each device, server, job or scheduled task is
+    reported once with its latest state. Order follows each key's last update.
+    """
+    latest = {}
+    for event in events:
+        if event['type'] == 'device_status':
+            key = ('device', event['device_id'])
+        elif event['type'] == 'server_status':
+            key = ('server', event['server_id'])
+        elif event.get('job_id') and event['type'].startswith('job_'):
+            key = ('job', event['job_id'])
+        elif event['type'] == 'task_run':
+            key = ('task_run', event['device_id'], event['task_name'])
+        else:
+            key = ('event', event['id'])
+        latest.pop(key, None)
+        latest[key] = event
+    return list(latest.values())
+
+
+def format_sse(event_type, data, event_id=None):
+    """Encode one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return "\n".join(lines) + "\n\n"
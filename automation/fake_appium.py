@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+Stand-in Appium/WebDriverAgent server for running the stack without phones.
+
+Speaks the part of the W3C WebDriver/Appium protocol DeviceManager and
+InstagramTaskRunner use, with configurable per-command latency, failure
+injection and any number of virtual devices:
+
+    python automation/fake_appium.py --port 4723 --devices 50 \
+        --latency lognormal:0.05,0.6 --latency create_session=uniform:2,6 \
+        --failure-rate 0.01
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 4723
+DEFAULT_IDLE_TIMEOUT = 60  # Appium's newCommandTimeout default, in seconds
+
+# Screen sizes in the units each platform's driver reports
+SCREEN_SIZES = {
+    'ios': (393, 852),
+    'android': (1080, 2400),
+}
+
+# Command name -> (method, path pattern relative to /session/<id>); first match wins
+ROUTES = [
+    ('status', 'GET', r'/status'),
+    ('create_session', 'POST', r'/session'),
+    ('delete_session', 'DELETE', r'/session/(?P<sid>[^/]+)'),
+    ('timeouts', 'GET', r'/session/(?P<sid>[^/]+)/timeouts'),
+    ('set_timeouts', 'POST', r'/session/(?P<sid>[^/]+)/timeouts'),
+    ('window_rect', 'GET', r'/session/(?P<sid>[^/]+)/window/rect'),
+    ('window_rect', 'GET', r'/session/(?P<sid>[^/]+)/window/(?:current/)?size'),
+    ('execute', 'POST', r'/session/(?P<sid>[^/]+)/execute/sync'),
+    ('actions', 'POST', r'/session/(?P<sid>[^/]+)/actions'),
+    ('release_actions', 'DELETE', r'/session/(?P<sid>[^/]+)/actions'),
+    ('activate_app', 'POST', r'/session/(?P<sid>[^/]+)/appium/device/activate_app'),
+    ('terminate_app', 'POST', r'/session/(?P<sid>[^/]+)/appium/device/terminate_app'),
+    ('source', 'GET', r'/session/(?P<sid>[^/]+)/source'),
+    ('find_element', 'POST', r'/session/(?P<sid>[^/]+)/element'),
+    ('find_elements', 'POST', r'/session/(?P<sid>[^/]+)/elements'),
+    ('click', 'POST', r'/session/(?P<sid>[^/]+)/element/(?P<eid>[^/]+)/click'),
+    ('element_attribute', 'GET', r'/session/(?P<sid>[^/]+)/element/(?P<eid>[^/]+)/(?:attribute/[^/]+|text|displayed)'),
+    ('session', 'GET', r'/session/(?P<sid>[^/]+)'),
+]
+COMPILED_ROUTES = [(name, method, re.compile(f"^{pattern}$")) for name, method, pattern in ROUTES]
+
+
+class Latency:
+    """
+    A latency distribution in seconds.
+
+    Specs: "0.05" (constant), "uniform:a,b", "normal:mean,stddev",
+    "lognormal:median,sigma" or "exp:mean". Samples are never negative.
+    """
+
+    def __init__(self, kind='constant', params=(0.0,), rng=None):
+        self.kind = kind
+        self.params = tuple(float(p) for p in params)
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def parse(cls, spec, rng=None):
+        if isinstance(spec, Latency):
+            return spec
+        spec = str(spec).strip()
+        if ':' not in spec:
+            return cls('constant', (spec,), rng)
+        kind, _, params = spec.partition(':')
+        kind = kind.lower()
+        expected = {'constant': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+        params = [p for p in params.split(',') if p]
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec '{spec}'")
+        return cls(kind, params, rng)
+
+    def sample(self):
+        p = self.params
+        if self.kind == 'uniform':
+            value = self.rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            value = self.rng.gauss(p[0], p[1])
+        elif self.kind == 'lognormal':
+            # Parameterized by the median, which is what latency numbers are usually quoted as
+            value = p[0] * self.rng.lognormvariate(0, p[1])
+        elif self.kind == 'exp':
+            value = self.rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        else:
+            value = p[0]
+        return max(0.0, value)
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+class FakeDevice:
+    """A virtual phone that can host one session at a time"""
+
+    def __init__(self, udid, platform='iOS', name=None, screen_size=None):
+        self.udid = udid
+        self.platform = platform
+        self.name = name or f"Fake {platform} {udid[-4:]}"
+        self.screen_size = screen_size or SCREEN_SIZES.get(platform.lower(), SCREEN_SIZES['ios'])
+        self.active_app = None
+        self.taps = 0
+        self.swipes = 0
+
+    def to_dict(self):
+        return {
+            'udid': self.udid,
+            'platform': self.platform,
+            'name': self.name,
+            'screen_size': list(self.screen_size),
+            'active_app': self.active_app,
+            'taps': self.taps,
+            'swipes': self.swipes,
+        }
+
+
+class FakeSession:
+    def __init__(self, device, capabilities, idle_timeout):
+        self.session_id = uuid.uuid4().hex
+        self.device = device
+        self.capabilities = capabilities
+        self.idle_timeout = idle_timeout
+        self.last_command = time.time()
+        self.elements = {}
+
+    def expired(self, now):
+        return self.idle_timeout > 0 and now - self.last_command > self.idle_timeout
+
+
+class WebDriverError(Exception):
+    """A W3C error response"""
+
+    def __init__(self, status, error, message):
+        super().__init__(message)
+        self.status = status
+        self.error = error
+
+
+class FakeAppium:
+    """
+    State and command handling for one fake Appium server.
+
+    Every command sleeps for a sample of its latency distribution (or the
+    default one), then fails with probability failure_rates[command] (or
+    failure_rate). Each command on a session also kills it with probability
+    session_death_rate, and sessions expire after their newCommandTimeout
+    like real Appium sessions do. Gestures additionally take as long as the
+    gesture itself when simulate_gestures is set.
+    """
+
+    def __init__(self, devices=0, platform='iOS', latency=0.0, latencies=None, failure_rate=0.0, failure_rates=None,
+                 session_death_rate=0.0, simulate_gestures=True, auto_devices=True, seed=None, udid_prefix='FAKE'):
+        """
+        Args:
+            devices: Number of virtual devices to create up front
+            platform: Platform of those devices ('iOS' or 'Android')
+            latency: Default latency spec or Latency for every command
+            latencies: {command name: latency spec} overrides (see ROUTES for names)
+            failure_rate: Default probability a command fails with a 500
+            failure_rates: {command name: probability} overrides
+            session_death_rate: Probability any session command kills its session
+            simulate_gestures: Sleep for the duration of taps, drags and action sequences
+            auto_devices: Create a virtual device for any unknown UDID a session asks for
+            seed: Random seed for reproducible runs
+            udid_prefix: Prefix of the generated device UDIDs
+        """
+        self.rng = random.Random(seed)
+        self.default_latency = Latency.parse(latency, self.rng)
+        self.latencies = {name: Latency.parse(spec, self.rng) for name, spec in (latencies or {}).items()}
+        self.failure_rate = failure_rate
+        self.failure_rates = dict(failure_rates or {})
+        self.session_death_rate = session_death_rate
+        self.simulate_gestures = simulate_gestures
+        self.auto_devices = auto_devices
+        self.devices = {}  # udid -> FakeDevice
+        self.sessions = {}  # session_id -> FakeSession
+        self.counts = {}  # command -> calls
+        self.failures = {}  # command -> injected failures
+        self.lock = threading.Lock()
+
+        for i in range(devices):
+            self.add_device(f"{udid_prefix}-{i:04d}-{self.rng.getrandbits(48):012X}", platform)
+
+    def add_device(self, udid, platform='iOS', **kwargs):
+        with self.lock:
+            device = self.devices.get(udid)
+            if device is None:
+                device = self.devices[udid] = FakeDevice(udid, platform, **kwargs)
+        return device
+
+    def device_configs(self, server=None, **extra):
+        """devices.json entries for the virtual devices, e.g. to load-test the backend with all of them"""
+        configs = []
+        for device in self.devices.values():
+            ios = device.platform.lower() == 'ios'
+            config = {
+                'name': device.name,
+                'udid': device.udid,
+                'platformName': device.platform,
+                'platformVersion': '18.0' if ios else '14',
+                'deviceName': device.name,
+                'automationName': 'XCUITest' if ios else 'UiAutomator2',
+            }
+            if server:
+                config['server'] = server
+            config.update(extra)
+            configs.append(config)
+        return configs
+
+    def kill_session(self, session_id):
+        """Drop a session as if the device or WebDriverAgent had crashed"""
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'devices': len(self.devices),
+                'sessions': len(self.sessions),
+                'commands': dict(self.counts),
+                'injected_failures': dict(self.failures),
+            }
+
+    # --- dispatch ---
+
+    def handle(self, method, path, body):
+        """
+        Handle one request.
+
+        Returns:
+            tuple: (HTTP status, JSON-serializable response body)
+        """
+        if path.startswith('/wd/hub'):
+            path = path[len('/wd/hub'):] or '/'
+        path = path.rstrip('/') or '/'
+
+        for name, route_method, pattern in COMPILED_ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            return 404, {'value': {'error': 'unknown command', 'message': f"{method} {path} is not supported",
+                                   'stacktrace': ''}}
+
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+        latency = self.latencies.get(name, self.default_latency).sample()
+        if latency:
+            time.sleep(latency)
+
+        try:
+            if self.rng.random() < self.failure_rates.get(name, self.failure_rate):
+                with self.lock:
+                    self.failures[name] = self.failures.get(name, 0) + 1
+                raise WebDriverError(500, 'unknown error', f"Injected failure in {name}")
+            params = match.groupdict()
+            session = self._session(params.pop('sid')) if 'sid' in params else None
+            value = getattr(self, f"_cmd_{name}")(session, body or {}, **params)
+            return 200, {'value': value}
+        except WebDriverError as e:
+            return e.status, {'value': {'error': e.error, 'message': str(e), 'stacktrace': ''}}
+
+    def _session(self, session_id):
+        now = time.time()
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session and session.expired(now):
+                del self.sessions[session_id]
+                session = None
+            if session and self.rng.random() < self.session_death_rate:
+                del self.sessions[session_id]
+                session = None
+            if session is None:
+                raise WebDriverError(404, 'invalid session id', "A session is either terminated or not started")
+            session.last_command = now
+        return session
+
+    # --- commands ---
+
+    def _cmd_status(self, session, body):
+        return {'ready': True, 'message': 'Fake Appium server is ready', 'build': {'version': 'fake'}}
+
+    def _cmd_create_session(self, session, body):
+        capabilities = body.get('capabilities', {})
+        caps = dict(capabilities.get('alwaysMatch', {}))
+        first_match = capabilities.get('firstMatch') or [{}]
+        caps.update(first_match[0])
+        caps.update(body.get('desiredCapabilities', {}))
+        caps = {k.split(':', 1)[-1]: v for k, v in caps.items()}
+
+        platform = caps.get('platformName', 'iOS')
+        udid = caps.get('udid')
+        with self.lock:
+            device = self.devices.get(udid)
+        if device is None:
+            if udid and not self.auto_devices:
+                raise WebDriverError(500, 'session not created', f"Device {udid} is not connected")
+            device = self.add_device(udid or f"FAKE-{uuid.uuid4().hex[:12].upper()}", platform)
+
+        new_session = FakeSession(device, caps, float(caps.get('newCommandTimeout', DEFAULT_IDLE_TIMEOUT)))
+        with self.lock:
+            # Like WebDriverAgent, a device only drives one session: a new one replaces the old
+            for session_id, existing in list(self.sessions.items()):
+                if existing.device is device:
+                    del self.sessions[session_id]
+            self.sessions[new_session.session_id] = new_session
+        return {'sessionId': new_session.session_id, 'capabilities': dict(caps, udid=device.udid)}
+
+    def _cmd_delete_session(self, session, body):
+        self.kill_session(session.session_id)
+        return None
+
+    def _cmd_session(self, session, body):
+        return session.capabilities
+
+    def _cmd_timeouts(self, session, body):
+        return {'implicit': 0, 'pageLoad': 300000, 'script': 30000}
+
+    def _cmd_set_timeouts(self, session, body):
+        return None
+
+    def _cmd_window_rect(self, session, body):
+        width, height = session.device.screen_size
+        return {'x': 0, 'y': 0, 'width': width, 'height': height}
+
+    def _gesture_time(self, seconds):
+        if self.simulate_gestures and seconds > 0:
+            time.sleep(seconds)
+
+    def _cmd_execute(self, session, body):
+        script = body.get('script', '')
+        args = body.get('args') or [{}]
+        args = args[0] if isinstance(args[0], dict) else {}
+        device = session.device
+        if script == 'mobile: tap':
+            device.taps += 1
+        elif script in ('mobile: dragFromToForDuration', 'mobile: swipeGesture', 'mobile: dragGesture'):
+            device.swipes += 1
+            self._gesture_time(float(args.get('duration', 0)))
+        elif script in ('mobile: activateApp', 'mobile: launchApp'):
+            device.active_app = args.get('bundleId') or args.get('appId')
+        return None
+
+    def _cmd_actions(self, session, body):
+        for source in body.get('actions', []):
+            actions = source.get('actions', [])
+            downs = sum(1 for a in actions if a.get('type') == 'pointerDown')
+            drags = sum(1 for a in actions if a.get('type') == 'pointerMove' and a.get('duration'))
+            session.device.swipes += drags
+            session.device.taps += max(0, downs - drags)
+        # Sources run in parallel, so the sequence takes as long as the longest one
+        self._gesture_time(max((sum(a.get('duration', 0) for a in source.get('actions', []))
+                                for source in body.get('actions', [])), default=0) / 1000.0)
+        return None
+
+    def _cmd_release_actions(self, session, body):
+        return None
+
+    def _cmd_activate_app(self, session, body):
+        session.device.active_app = body.get('appId') or body.get('bundleId')
+        return None
+
+    def _cmd_terminate_app(self, session, body):
+        session.device.active_app = None
+        return True
+
+    def _cmd_source(self, session, body):
+        device = session.device
+        width, height = device.screen_size
+        element_type = 'XCUIElementTypeApplication' if device.platform.lower() == 'ios' else 'android.widget.FrameLayout'
+        return (f'<?xml version="1.0" encoding="UTF-8"?><AppiumAUT><{element_type} type="{element_type}" '
+                f'name="{device.active_app or "SpringBoard"}" x="0" y="0" width="{width}" height="{height}" '
+                f'visible="true"/></AppiumAUT>')
+
+    def _element(self, session, body):
+        element_id = uuid.uuid4().hex
+        session.elements[element_id] = (body.get('using'), body.get('value'))
+        # W3C element reference key
+        return {'element-6066-11e4-a52e-4f735466cecf': element_id, 'ELEMENT': element_id}
+
+    def _cmd_find_element(self, session, body):
+        # Every locator matches: the fake has no real UI, and tasks only need the lookup to succeed
+        return self._element(session, body)
+
+    def _cmd_find_elements(self, session, body):
+        return [self._element(session, body)]
+
+    def _cmd_click(self, session, body, eid):
+        if eid not in session.elements:
+            raise WebDriverError(404, 'no such element', f"Element {eid} is not known in this session")
+        session.device.taps += 1
+        return None
+
+    def _cmd_element_attribute(self, session, body, eid):
+        if eid not in session.elements:
+            raise WebDriverError(404, 'no such element', f"Element {eid} is not known in this session")
+        return session.elements[eid][1]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like Appium, so pooled connections get reused
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle's algorithm and
+        # delayed ACKs add ~40ms to every response on a kept-alive connection
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _dispatch(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            body = {}
+        status, payload = self.server.fake.handle(method, self.path.split('?', 1)[0], body)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+class FakeAppiumServer:
+    """Serves a FakeAppium over HTTP on a background thread"""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, fake=None, **kwargs):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+            fake: FakeAppium to serve; otherwise one is built from kwargs
+        """
+        self.fake = fake or FakeAppium(**kwargs)
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self.fake
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=f'fake-appium-{self.port}', daemon=True)
+        self._thread.start()
+        logger.info(f"Fake Appium server listening on {self.url} with {len(self.fake.devices)} virtual devices")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def serve_forever(self):
+        logger.info(f"Fake Appium server listening on {self.url} with {len(self.fake.devices)} virtual devices")
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+
+
+def _parse_overrides(values, convert):
+    """Split repeated "command=value" options into a dict; a bare value sets the default"""
+    default, overrides = None, {}
+    for value in values or []:
+        name, sep, spec = value.partition('=')
+        if sep and re.match(r'^[a-z_]+$', name):
+            overrides[name] = convert(spec)
+        else:
+            default = convert(value)
+    return default, overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Appium/WebDriverAgent server for device-free testing")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--devices", type=int, default=0, help="Virtual devices to create up front")
+    parser.add_argument("--platform", default="iOS", choices=["iOS", "Android"], help="Platform of the virtual devices")
+    parser.add_argument("--latency", action="append",
+                        help="Latency spec, optionally per command (e.g. 'lognormal:0.05,0.6' or 'create_session=uniform:2,6')")
+    parser.add_argument("--failure-rate", action="append",
+                        help="Failure probability, optionally per command (e.g. '0.01' or 'execute=0.05')")
+    parser.add_argument("--session-death-rate", type=float, default=0.0, help="Probability a command kills its session")
+    parser.add_argument("--no-gesture-time", action="store_true", help="Don't sleep for the duration of gestures")
+    parser.add_argument("--strict-devices", action="store_true", help="Reject sessions for unknown UDIDs")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible runs")
+    parser.add_argument("--print-config", action="store_true", help="Print devices.json entries for the virtual devices")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    latency, latencies = _parse_overrides(args.latency, str)
+    failure_rate, failure_rates = _parse_overrides(args.failure_rate, float)
+
+    server = FakeAppiumServer(
+        args.host, args.port,
+        devices=args.devices, platform=args.platform,
+        latency=latency or 0.0, latencies=latencies,
+        failure_rate=failure_rate or 0.0, failure_rates=failure_rates,
+        session_death_rate=args.session_death_rate,
+        simulate_gestures=not args.no_gesture_time,
+        auto_devices=not args.strict_devices,
+        seed=args.seed
+    )
+    if args.print_config:
+        print(json.dumps(server.fake.device_configs(), indent=2))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
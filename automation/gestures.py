@@ -0,0 +1,240 @@
+import time
+import random
+import logging
+from automation.tracing import GESTURE
+
+logger = logging.getLogger(__name__)
+
+# Limits for one W3C actions call: the request blocks for the whole sequence,
+# so long batches are split well inside the client's HTTP read timeout
+DEFAULT_MAX_CHUNK_SECONDS = 20
+DEFAULT_MAX_CHUNK_ACTIONS = 200
+
+TAP_HOLD_MS = 80  # finger down time for a tap
+SWIPE_DURATION_RANGE = (0.3, 1.0)  # seconds, randomized per swipe when not given
+
+
+class Gesture:
+    """One queued gesture and the W3C pointer actions it compiles to"""
+
+    __slots__ = ('kind', 'actions', 'duration', 'label')
+
+    def __init__(self, kind, actions, label=None):
+        self.kind = kind
+        self.actions = actions
+        self.duration = sum(a.get('duration', 0) for a in actions) / 1000.0
+        self.label = label
+
+
+class GestureReport:
+    """Timing for one performed batch: how many calls it took and where the time went"""
+
+    def __init__(self, gestures):
+        self.gestures = len(gestures)
+        self.planned = sum(g.duration for g in gestures)
+        self.chunks = []  # {'gestures', 'actions', 'planned', 'elapsed'}
+        self.completed = 0
+        self.elapsed = 0.0
+        self.error = None
+
+    def record_chunk(self, gestures, planned, elapsed, actions=0):
+        self.chunks.append({'gestures': gestures, 'actions': actions, 'planned': planned, 'elapsed': elapsed})
+        self.completed += gestures
+
+    @property
+    def calls(self):
+        return sum(1 for chunk in self.chunks if chunk['actions'])
+
+    @property
+    def overhead(self):
+        """Seconds spent beyond the gestures' own durations (network, WebDriverAgent, sleeps)"""
+        return max(0.0, self.elapsed - self.planned)
+
+    def to_dict(self):
+        return {
+            'gestures': self.gestures,
+            'completed': self.completed,
+            'calls': self.calls,
+            'calls_saved': max(0, self.completed - self.calls),
+            'planned': self.planned,
+            'elapsed': self.elapsed,
+            'overhead': self.overhead,
+            'chunks': self.chunks,
+            'error': self.error
+        }
+
+
+class GestureBatch:
+    """
+    Queues taps, swipes and pauses and sends them as W3C pointer action sequences.
+
+    Each gesture would otherwise be its own `mobile:` command and HTTP round
+    trip. Here consecutive gestures, including the pauses between them, go to
+    the server as one `POST /session/<id>/actions` call, split into chunks so
+    no single call runs longer than max_chunk_seconds. A pause too long for
+    any chunk is slept client-side between calls.
+
+    Usage:
+        batch = GestureBatch(driver, (width, height))
+        batch.tap(100, 200).pause(1).swipe(200, 600, 200, 200)
+        report = batch.perform()
+    """
+
+    def __init__(self, driver, screen_size, resolver=None, max_chunk_seconds=DEFAULT_MAX_CHUNK_SECONDS,
+                 max_chunk_actions=DEFAULT_MAX_CHUNK_ACTIONS, tracer=None):
+        """
+        Args:
+            driver: Appium driver to send the actions to
+            screen_size: (width, height) used to keep jittered points on screen
+            resolver: Optional callable (screen_name, element_key) -> (x, y) for tap_element
+            max_chunk_seconds: Longest sequence sent in one call
+            max_chunk_actions: Most pointer actions sent in one call
+            tracer: Optional Tracer; perform() is recorded as a 'gesture' span inside a traced task
+        """
+        self.driver = driver
+        self.width, self.height = screen_size
+        self.resolver = resolver
+        self.max_chunk_seconds = max_chunk_seconds
+        self.max_chunk_actions = max_chunk_actions
+        self.tracer = tracer
+        self.gestures = []
+
+    def __len__(self):
+        return len(self.gestures)
+
+    def _clamp(self, x, y, margin):
+        return max(margin, min(int(x), self.width - margin)), max(margin, min(int(y), self.height - margin))
+
+    def tap(self, x, y, jitter=0.0, label=None):
+        """
+        Queue a tap.
+
+        Args:
+            x, y: Screen coordinates
+            jitter: Random offset as a fraction of the screen size, for human-like taps
+            label: Optional name shown in logs
+        """
+        if jitter:
+            x += random.randint(-int(self.width * jitter), int(self.width * jitter))
+            y += random.randint(-int(self.height * jitter), int(self.height * jitter))
+        x, y = self._clamp(x, y, 5)
+        self.gestures.append(Gesture('tap', [
+            {'type': 'pointerMove', 'duration': 0, 'x': x, 'y': y, 'origin': 'viewport'},
+            {'type': 'pointerDown', 'button': 0},
+            {'type': 'pause', 'duration': TAP_HOLD_MS},
+            {'type': 'pointerUp', 'button': 0}
+        ], label or f"({x},{y})"))
+        return self
+
+    def tap_element(self, screen_name, element_key, jitter=0.02):
+        """Queue a tap on a UI map element (needs a resolver)"""
+        point = self.resolver(screen_name, element_key) if self.resolver else None
+        if not point:
+            raise KeyError(f"Element '{element_key}' not found in '{screen_name}' screen")
+        return self.tap(point[0], point[1], jitter=jitter, label=f"{screen_name}.{element_key}")
+
+    def swipe(self, start_x, start_y, end_x, end_y, duration=None):
+        """
+        Queue a swipe.
+
+        Args:
+            duration: Seconds for the drag (random 0.3-1.0s if None)
+        """
+        if duration is None:
+            duration = random.uniform(*SWIPE_DURATION_RANGE)
+        start_x, start_y = self._clamp(start_x, start_y, 10)
+        end_x, end_y = self._clamp(end_x, end_y, 10)
+        self.gestures.append(Gesture('swipe', [
+            {'type': 'pointerMove', 'duration': 0, 'x': start_x, 'y': start_y, 'origin': 'viewport'},
+            {'type': 'pointerDown', 'button': 0},
+            {'type': 'pointerMove', 'duration': int(duration * 1000), 'x': end_x, 'y': end_y, 'origin': 'viewport'},
+            {'type': 'pointerUp', 'button': 0}
+        ], f"({start_x},{start_y})->({end_x},{end_y})"))
+        return self
+
+    def scroll_down(self, distance=None, duration=None):
+        """Queue a swipe up the middle of the screen (content scrolls down)"""
+        start_y = int(self.height * 0.7)
+        end_y = max(10, start_y - distance) if distance else int(self.height * 0.3)
+        return self.swipe(self.width // 2, start_y, self.width // 2, end_y, duration)
+
+    def scroll_up(self, distance=None, duration=None):
+        """Queue a swipe down the middle of the screen (content scrolls up)"""
+        start_y = int(self.height * 0.3)
+        end_y = min(self.height - 10, start_y + distance) if distance else int(self.height * 0.7)
+        return self.swipe(self.width // 2, start_y, self.width // 2, end_y, duration)
+
+    def pause(self, seconds, max_seconds=None):
+        """Queue a pause; with max_seconds, a random one between seconds and max_seconds"""
+        if max_seconds is not None:
+            seconds = random.uniform(seconds, max_seconds)
+        self.gestures.append(Gesture('pause', [{'type': 'pause', 'duration': int(seconds * 1000)}]))
+        return self
+
+    def _chunks(self, gestures):
+        """Split gestures into runs that each fit in one actions call"""
+        chunk, duration, actions = [], 0.0, 0
+        for gesture in gestures:
+            if chunk and (duration + gesture.duration > self.max_chunk_seconds or
+                          actions + len(gesture.actions) > self.max_chunk_actions):
+                yield chunk
+                chunk, duration, actions = [], 0.0, 0
+            chunk.append(gesture)
+            duration += gesture.duration
+            actions += len(gesture.actions)
+        if chunk:
+            yield chunk
+
+    def _send(self, actions):
+        from selenium.webdriver.remote.command import Command
+        self.driver.execute(Command.W3C_ACTIONS, {'actions': [{
+            'type': 'pointer',
+            'id': 'finger',
+            'parameters': {'pointerType': 'touch'},
+            'actions': actions
+        }]})
+
+    def perform(self):
+        """
+        Send the queued gestures and clear the queue.
+
+        Returns:
+            GestureReport; if a call fails, its error is recorded and the
+            gestures from earlier calls count as completed
+        """
+        gestures, self.gestures = self.gestures, []
+        report = GestureReport(gestures)
+        span = self.tracer.start_span('gesture_batch', GESTURE, require_parent=True,
+                                      gestures=len(gestures)) if self.tracer else None
+        started = time.time()
+        try:
+            for chunk in self._chunks(gestures):
+                planned = sum(g.duration for g in chunk)
+                chunk_started = time.time()
+                if all(g.kind == 'pause' for g in chunk):
+                    # Nothing to touch, e.g. a pause longer than a whole chunk: no need for a round trip
+                    time.sleep(planned)
+                    report.record_chunk(len(chunk), planned, time.time() - chunk_started)
+                    continue
+                actions = [action for g in chunk for action in g.actions]
+                if chunk[-1].kind == 'pause':
+                    # A trailing pause is slept here rather than holding the HTTP request open
+                    actions = actions[:-1]
+                    trailing = chunk[-1].duration
+                else:
+                    trailing = 0
+                self._send(actions)
+                if trailing:
+                    time.sleep(trailing)
+                elapsed = time.time() - chunk_started
+                report.record_chunk(len(chunk), planned, elapsed, len(actions))
+                logger.debug(f"Sent {len(chunk)} gestures ({len(actions)} actions) in one call, "
+                             f"{elapsed:.2f}s for {planned:.2f}s planned")
+        except Exception as e:
+            report.error = str(e)
+            logger.error(f"Gesture batch failed after {report.completed}/{report.gestures} gestures: {e}")
+        report.elapsed = time.time() - started
+        if span is not None:
+            span.set_attribute('calls', report.calls)
+            self.tracer.end_span(span, error=report.error)
+        return report
@@ -0,0 +1,295 @@
+import os
+import queue
+import socket
+import struct
+import shutil
+import logging
+import plistlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+USBMUXD_SOCKET = '/var/run/usbmuxd'
+DEFAULT_RECONNECT_DELAY = 5  # seconds before restarting a failed event source
+DEFAULT_INIT_WORKERS = 2  # sessions started at once for re-attached devices
+
+
+class DeviceEvent:
+    """A device attaching to or detaching from the host"""
+
+    __slots__ = ('udid', 'attached', 'platform', 'source')
+
+    def __init__(self, udid, attached, platform=None, source=None):
+        self.udid = udid
+        self.attached = attached
+        self.platform = platform
+        self.source = source
+
+    def __repr__(self):
+        return f"DeviceEvent({'attached' if self.attached else 'detached'} {self.udid} via {self.source})"
+
+
+class DeviceEventSource:
+    """
+    A long-lived feed of attach/detach events.
+
+    Subclasses implement events() as a blocking generator and close() to make
+    it return. The HotplugWatcher restarts a source whose generator ends or
+    raises while the watcher is running.
+    """
+
+    name = 'source'
+
+    def events(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class AdbTrackDevicesSource(DeviceEventSource):
+    """Android devices from `adb track-devices`, which re-sends the full device list on every change"""
+
+    name = 'adb'
+
+    def __init__(self, adb_path='adb'):
+        self.adb_path = adb_path
+        self._process = None
+
+    @staticmethod
+    def parse_device_list(payload):
+        """UDIDs in the 'device' state from one track-devices message"""
+        udids = set()
+        for line in payload.splitlines():
+            parts = line.strip().split('\t')
+            if len(parts) >= 2 and parts[1] == 'device':
+                udids.add(parts[0])
+        return udids
+
+    def events(self):
+        self._process = subprocess.Popen([self.adb_path, 'track-devices'], stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL)
+        stream = self._process.stdout
+        known = set()
+        try:
+            while True:
+                # Each message is a 4 hex digit length followed by "serial\tstate\n" lines
+                header = stream.read(4)
+                if len(header) < 4:
+                    return
+                payload = stream.read(int(header, 16)).decode('utf-8', 'replace')
+                current = self.parse_device_list(payload)
+                for udid in sorted(current - known):
+                    yield DeviceEvent(udid, True, 'Android', self.name)
+                for udid in sorted(known - current):
+                    yield DeviceEvent(udid, False, 'Android', self.name)
+                known = current
+        finally:
+            self.close()
+
+    def close(self):
+        process, self._process = self._process, None
+        if process and process.poll() is None:
+            process.terminate()
+
+
+class UsbmuxdSource(DeviceEventSource):
+    """iOS devices from usbmuxd's Listen notifications (plist protocol over its unix socket)"""
+
+    name = 'usbmuxd'
+
+    # usbmuxd message header: length, version, message type, tag (little-endian uint32s)
+    HEADER = struct.Struct('<IIII')
+    PLIST_VERSION = 1
+    PLIST_MESSAGE = 8
+
+    def __init__(self, socket_path=USBMUXD_SOCKET, include_network=False):
+        """
+        Args:
+            socket_path: Path of the usbmuxd socket
+            include_network: Also report devices paired over Wi-Fi
+        """
+        self.socket_path = socket_path
+        self.include_network = include_network
+        self._sock = None
+
+    @staticmethod
+    def normalize_udid(serial):
+        """usbmuxd reports newer devices' UDIDs without the dash idevice_id and Appium use"""
+        if len(serial) == 24 and '-' not in serial:
+            return f"{serial[:8]}-{serial[8:]}"
+        return serial
+
+    def _send(self, message, tag=1):
+        payload = plistlib.dumps(message)
+        self._sock.sendall(self.HEADER.pack(self.HEADER.size + len(payload), self.PLIST_VERSION,
+                                            self.PLIST_MESSAGE, tag) + payload)
+
+    def _recv_exact(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise EOFError("usbmuxd closed the connection")
+            data += chunk
+        return data
+
+    def _recv(self):
+        length, _, _, _ = self.HEADER.unpack(self._recv_exact(self.HEADER.size))
+        return plistlib.loads(self._recv_exact(length - self.HEADER.size))
+
+    def events(self):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(self.socket_path)
+            self._send({
+                'MessageType': 'Listen',
+                'ClientVersionString': 'instagram-automation',
+                'ProgName': 'instagram-automation'
+            })
+            result = self._recv()
+            if result.get('MessageType') == 'Result' and result.get('Number', 0) != 0:
+                raise RuntimeError(f"usbmuxd refused Listen (error {result.get('Number')})")
+
+            serials = {}  # usbmuxd DeviceID -> UDID, needed to resolve Detached messages
+            while True:
+                message = self._recv()
+                message_type = message.get('MessageType')
+                if message_type == 'Attached':
+                    props = message.get('Properties', {})
+                    if props.get('ConnectionType', 'USB') != 'USB' and not self.include_network:
+                        continue
+                    udid = self.normalize_udid(props.get('SerialNumber', ''))
+                    serials[message.get('DeviceID')] = udid
+                    yield DeviceEvent(udid, True, 'iOS', self.name)
+                elif message_type == 'Detached':
+                    udid = serials.pop(message.get('DeviceID'), None)
+                    if udid:
+                        yield DeviceEvent(udid, False, 'iOS', self.name)
+        except (EOFError, OSError):
+            if self._sock is not None:
+                raise
+        finally:
+            self.close()
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+class ScriptedEventSource(DeviceEventSource):
+    """In-process event feed for tests and local runs; push events with attach()/detach()"""
+
+    name = 'scripted'
+
+    def __init__(self, events=None):
+        """
+        Args:
+            events: Optional DeviceEvents delivered first
+        """
+        self._queue = queue.Queue()
+        for event in events or []:
+            self._queue.put(event)
+
+    def attach(self, udid, platform=None):
+        self._queue.put(DeviceEvent(udid, True, platform, self.name))
+
+    def detach(self, udid, platform=None):
+        self._queue.put(DeviceEvent(udid, False, platform, self.name))
+
+    def events(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self._queue.put(None)
+
+
+def default_sources():
+    """Event sources for the tools available on this host"""
+    sources = []
+    adb_path = shutil.which('adb')
+    if adb_path:
+        sources.append(AdbTrackDevicesSource(adb_path))
+    if os.path.exists(USBMUXD_SOCKET):
+        sources.append(UsbmuxdSource())
+    return sources
+
+
+class HotplugWatcher:
+    """
+    Follows device event sources and keeps the DeviceManager in step.
+
+    A detach drops the device's session and marks it disconnected right away,
+    so tasks are never handed an unplugged phone. An attach of a configured
+    device without a live session starts a new one in the background.
+    """
+
+    def __init__(self, device_manager, sources=None, auto_initialize=True,
+                 reconnect_delay=DEFAULT_RECONNECT_DELAY, init_workers=DEFAULT_INIT_WORKERS):
+        """
+        Args:
+            device_manager: DeviceManager to update
+            sources: DeviceEventSources to follow (default: default_sources())
+            auto_initialize: Start Appium sessions for re-attached devices
+            reconnect_delay: Seconds before restarting a source that failed
+            init_workers: Max sessions started at once
+        """
+        self.device_manager = device_manager
+        self.sources = sources if sources is not None else default_sources()
+        self.auto_initialize = auto_initialize
+        self.reconnect_delay = reconnect_delay
+        self._executor = ThreadPoolExecutor(max_workers=init_workers, thread_name_prefix='hotplug-init')
+        self._threads = []
+        self._stopped = threading.Event()
+
+    def start(self):
+        for source in self.sources:
+            thread = threading.Thread(target=self._follow, args=(source,), name=f"hotplug-{source.name}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        if self.sources:
+            logger.info(f"Watching device hotplug events from: {', '.join(s.name for s in self.sources)}")
+        else:
+            logger.info("No device event sources available; use /api/refresh to pick up device changes")
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        for source in self.sources:
+            source.close()
+        self._executor.shutdown(wait=False)
+
+    def _follow(self, source):
+        while not self._stopped.is_set():
+            try:
+                for event in source.events():
+                    if self._stopped.is_set():
+                        return
+                    self.handle(event)
+            except Exception as e:
+                logger.warning(f"Device event source {source.name} failed: {e}")
+            if self._stopped.wait(self.reconnect_delay):
+                return
+            logger.info(f"Restarting device event source {source.name}")
+
+    def handle(self, event):
+        """Apply one attach/detach event to the DeviceManager"""
+        logger.debug(f"Hotplug: {event}")
+        if not event.attached:
+            self.device_manager.mark_device_detached(event.udid)
+            return
+
+        device_config = self.device_manager.mark_device_attached(event.udid)
+        if device_config and self.auto_initialize and not self._stopped.is_set():
+            self._executor.submit(self.device_manager.initialize_device, device_config)
@@ -0,0 +1,130 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job:
+    """State, timing and result of one submitted task"""
+
+    def __init__(self, task_name, device_id=None, params=None):
+        self.job_id = uuid.uuid4().hex
+        self.task_name = task_name
+        self.device_id = device_id
+        self.params = params or {}
+        self.state = QUEUED
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.scheduler_job_id = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns True if it did within the timeout"""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        now = time.time()
+        queued_for = (self.started_at or self.finished_at or now) - self.submitted_at
+        run_time = None
+        if self.started_at:
+            run_time = (self.finished_at or now) - self.started_at
+        return {
+            'job_id': self.job_id,
+            'task_name': self.task_name,
+            'device_id': self.device_id,
+            'params': self.params,
+            'state': self.state,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'queued_for': queued_for,
+            'run_time': run_time,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class JobStore:
+    """Thread-safe in-memory record of submitted jobs, keeping the most recent `max_jobs`"""
+
+    def __init__(self, max_jobs=1000):
+        """
+        Args:
+            max_jobs: Finished jobs beyond this count are evicted, oldest first
+        """
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()  # job_id -> Job, in submission order
+        self.lock = threading.Lock()
+
+    def create(self, task_name, device_id=None, params=None):
+        job = Job(task_name, device_id, params)
+        with self.lock:
+            self._jobs[job.job_id] = job
+            self._evict()
+        return job
+
+    def _evict(self):
+        """Drop the oldest finished jobs once over capacity. Must hold self.lock."""
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j.job_id for j in self._jobs.values() if j.finished][:excess]:
+            del self._jobs[job_id]
+
+    def mark_running(self, job_id):
+        with self.lock:
+            job = self._jobs.get(job_id)
+            if job and job.state == QUEUED:
+                job.state = RUNNING
+                job.started_at = time.time()
+            return job
+
+    def mark_finished(self, job_id, result=None, error=None, state=None):
+        with self.lock:
+            job = self._jobs.get(job_id)
+            if not job or job.finished:
+                return job
+            job.result = result
+            job.error = error or (result.get('error') if isinstance(result, dict) else None)
+            if state is None:
+                state = SUCCEEDED if isinstance(result, dict) and result.get('success') else FAILED
+            job.state = state
+            job.finished_at = time.time()
+        job._done.set()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def get_many(self, job_ids):
+        return {job_id: self._jobs[job_id] for job_id in job_ids if job_id in self._jobs}
+
+    def list(self, state=None, device_id=None, limit=100):
+        """Most recent jobs first, optionally filtered by state and device"""
+        with self.lock:
+            jobs = list(self._jobs.values())
+        jobs.reverse()
+        if state:
+            jobs = [j for j in jobs if j.state == state]
+        if device_id:
+            jobs = [j for j in jobs if j.device_id == device_id]
+        return jobs[:limit]
@@ -0,0 +1,262 @@
+import re
+import time
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds: Appium commands run from milliseconds (status, taps)
+# to minutes (session creation on a cold WebDriverAgent)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._series = {}  # label values tuple -> state
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        missing = set(self.label_names) - set(labels)
+        if missing:
+            raise ValueError(f"Metric {self.name} missing labels {sorted(missing)}")
+        return tuple(str(labels[name]) if labels[name] is not None else '' for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self.lock:
+            series = sorted(self._series.items())
+        for key, state in series:
+            lines.extend(self._render_series(key, state))
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label set"""
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Observations bucketed by value, with their sum and count, per label set"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self._series.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts plus one overflow slot, then sum
+                state = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def snapshot(self, **labels):
+        """{'count', 'sum'} for one label set"""
+        state = self._series.get(self._key(labels))
+        if state is None:
+            return {'count': 0, 'sum': 0.0}
+        return {'count': sum(state[0]), 'sum': state[1]}
+
+    def _render_series(self, key, state):
+        counts, total = state
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.label_names, key, ('le', _format_value(float(bound))))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms, rendered in the Prometheus text format.
+
+    Metrics are created on first use and looked up by name afterwards, so
+    instrumentation points can declare what they record right where they
+    record it.
+    """
+
+    def __init__(self, prefix='instagram_automation_'):
+        """
+        Args:
+            prefix: Prepended to every metric name
+        """
+        self.prefix = prefix
+        self._metrics = {}  # name -> metric
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labels, **kwargs):
+        name = self.prefix + name
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, documentation, labels, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.type_name}")
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._get(Counter, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self):
+        """All metrics as Prometheus text exposition format"""
+        with self.lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def command_name(method, args):
+    """Metric label for a driver call: the script name for `mobile:` commands, else the method"""
+    if method == 'execute_script' and args and isinstance(args[0], str):
+        # 'mobile: tap' -> 'mobile:tap'; arbitrary JavaScript collapses into one label
+        script = args[0].strip()
+        match = re.match(r'^mobile:\s*(\w+)', script)
+        return f"mobile:{match.group(1)}" if match else 'execute_script'
+    if method == 'execute' and args:
+        # Raw W3C commands (e.g. 'actions' from a GestureBatch)
+        return str(args[0])
+    return method
+
+
+class InstrumentedDriver:
+    """
+    Driver proxy that times every command sent through it.
+
+    Calls to the instrumented methods record appium_command_seconds and, when
+    they raise, appium_command_failures_total, labelled by device, server and
+    command. With a tracer, commands sent inside a traced task are also
+    recorded as 'command' spans. Everything else passes straight through to
+    the wrapped driver.
+
+    Rotating the device (setting driver.orientation, or sending
+    setScreenOrientation directly) calls on_orientation_change once it
+    succeeds, so cached screen geometry can be dropped.
+    """
+
+    INSTRUMENTED = frozenset((
+        'execute_script', 'execute', 'get_window_size', 'activate_app', 'terminate_app',
+        'find_element', 'find_elements', 'quit'
+    ))
+    TIMED_PROPERTIES = frozenset(('page_source',))  # properties that send a command when read
+    ORIENTATION_COMMANDS = frozenset(('setScreenOrientation',))
+
+    def __init__(self, driver, metrics, device_id, server=None, tracer=None, on_orientation_change=None):
+        """
+        Args:
+            driver: Appium driver to wrap
+            metrics: MetricsRegistry to record into
+            device_id: UDID used as the device label
+            server: Appium server name used as the server label
+            tracer: Optional Tracer to record command spans into
+            on_orientation_change: Optional callable run after the device is rotated
+        """
+        self._driver = driver
+        self._tracer = tracer
+        self._on_orientation_change = on_orientation_change
+        self._device_id = device_id
+        self._server = server
+        self._seconds = metrics.histogram('appium_command_seconds', 'Appium command latency',
+                                          ('device', 'server', 'command'))
+        self._failures = metrics.counter('appium_command_failures_total', 'Appium commands that raised',
+                                         ('device', 'server', 'command'))
+
+    @property
+    def wrapped(self):
+        return self._driver
+
+    def _timed(self, method, fn, command=None):
+        def call(*args, **kwargs):
+            name = command or command_name(method, args)
+            span = self._tracer.start_span(name, 'command', require_parent=True) if self._tracer else None
+            started = time.perf_counter()
+            error = None
+            try:
+                result = fn(*args, **kwargs)
+                if name in self.ORIENTATION_COMMANDS and self._on_orientation_change:
+                    self._on_orientation_change()
+                return result
+            except Exception as e:
+                error = e
+                self._failures.inc(device=self._device_id, server=self._server, command=name)
+                raise
+            finally:
+                self._seconds.observe(time.perf_counter() - started, device=self._device_id,
+                                      server=self._server, command=name)
+                if span is not None:
+                    self._tracer.end_span(span, error=error)
+        return call
+
+    def __getattr__(self, name):
+        if name in self.TIMED_PROPERTIES:
+            return self._timed(name, lambda: getattr(self._driver, name))()
+        attr = getattr(self._driver, name)
+        if name in self.INSTRUMENTED and callable(attr):
+            return self._timed(name, attr)
+        return attr
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        elif name == 'orientation':
+            # The driver's property setter sends setScreenOrientation
+            self._timed(name, lambda: setattr(self._driver, name, value), command='setScreenOrientation')()
+        else:
+            setattr(self._driver, name, value)
+
+    def __repr__(self):
+        return f"<InstrumentedDriver device={self._device_id} driver={self._driver!r}>"
@@ -0,0 +1,76 @@
+import time
+import threading
+
+PENDING = 'pending'
+STARTING = 'starting'
+READY = 'ready'
+DEGRADED = 'degraded'
+FAILED = 'failed'
+
+UP = (READY, DEGRADED)  # statuses that count towards the system being ready
+
+
+class Readiness:
+    """
+    Startup state of the backend's components, for liveness/readiness checks.
+
+    Each component moves pending -> starting -> ready, degraded or failed as
+    the staged startup gets to it. The system is ready once every component
+    is ready or degraded (running, but short of something, e.g. some devices).
+    """
+
+    def __init__(self, components):
+        """
+        Args:
+            components: Component names, in the order they start
+        """
+        self.components = tuple(components)
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Mark every component pending again, e.g. before re-initializing"""
+        with self.lock:
+            self._state = {name: {'status': PENDING} for name in self.components}
+
+    def start(self, name):
+        with self.lock:
+            self._state[name] = {'status': STARTING, 'started_at': time.time()}
+
+    def ready(self, name, **detail):
+        """Mark a component ready, with optional details (counts, ...) to report"""
+        self.finish(name, READY, **detail)
+
+    def fail(self, name, error, **detail):
+        self.finish(name, FAILED, error=str(error), **detail)
+
+    def finish(self, name, status, **detail):
+        """Mark a component done with the given status (READY, DEGRADED or FAILED) and details"""
+        with self.lock:
+            state = self._state[name]
+            now = time.time()
+            state.update(detail, status=status, finished_at=now)
+            if 'started_at' in state:
+                state['duration'] = now - state['started_at']
+
+    def status(self, name):
+        return self._state[name]['status']
+
+    @staticmethod
+    def all_up(components):
+        """True if every component in a {name: state} dict is ready or degraded"""
+        return all(state['status'] in UP for state in components.values())
+
+    @property
+    def is_ready(self):
+        return self.all_up(self._state)
+
+    def to_dict(self):
+        with self.lock:
+            components = {name: dict(state) for name, state in self._state.items()}
+        return {
+            'ready': self.all_up(components),
+            'uptime': time.time() - self.started_at,
+            'components': components
+        }
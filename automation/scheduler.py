@@ -0,0 +1,229 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledJob:
+    """A one-shot or recurring unit of work owned by the JobScheduler"""
+
+    def __init__(self, job_id, fn, device_id, interval, next_run, name, group=None):
+        self.job_id = job_id
+        self.fn = fn
+        self.device_id = device_id
+        self.group = group
+        self.interval = interval
+        self.next_run = next_run
+        self.name = name or job_id
+        self.created_at = time.time()
+        self.cancelled = False
+        self.running = False
+        self.run_count = 0
+        self.last_run = None
+        self.last_result = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'name': self.name,
+            'device_id': self.device_id,
+            'group': self.group,
+            'interval': self.interval,
+            'next_run': self.next_run,
+            'running': self.running,
+            'run_count': self.run_count,
+            'last_run': self.last_run,
+            'created_at': self.created_at
+        }
+
+
+class JobScheduler:
+    """
+    Single-threaded timer heap that dispatches due jobs onto a bounded executor.
+
+    - Jobs are ordered by their next run time, so one dispatcher thread can
+      serve any number of recurring jobs without a sleeping thread each.
+    - A recurring job is only re-armed after its current run finishes, so it
+      never overlaps itself; missed runs are skipped rather than bunched up.
+    - Only one job per device runs at a time; jobs that come due while their
+      device is busy wait, in order, until it is released.
+    - A group can be capped (see limit_group) so one kind of job can't take
+      every worker; jobs over the cap wait the same way.
+    - Cancelling a job takes effect immediately: it is never dispatched again.
+    """
+
+    def __init__(self, max_workers=8):
+        """
+        Args:
+            max_workers: Max number of jobs running at the same time
+        """
+        self.max_workers = max_workers
+        self._heap = []  # (next_run, seq, job)
+        self._seq = itertools.count()
+        self._jobs = {}  # job_id -> ScheduledJob
+        self._busy_devices = set()
+        self._deferred = {}  # device_id -> [jobs due while the device was busy]
+        self._group_limits = {}  # group -> max jobs running at once
+        self._group_running = {}  # group -> jobs running
+        self._group_deferred = {}  # group -> [jobs due while the group was at its limit]
+        self._cond = threading.Condition()
+        self._executor = None
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        """Start the dispatcher thread (called automatically by schedule())"""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            self._thread = threading.Thread(target=self._dispatch_loop, name='job-scheduler')
+            self._thread.daemon = True
+            self._thread.start()
+            logger.info(f"Job scheduler started with {self.max_workers} workers")
+
+    def shutdown(self, wait=False):
+        """Stop dispatching; running jobs finish unless the process exits"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+        logger.info("Job scheduler stopped")
+
+    def limit_group(self, group, max_running):
+        """Run at most max_running jobs of a group at once (None removes the limit)"""
+        with self._cond:
+            if max_running is None:
+                self._group_limits.pop(group, None)
+            else:
+                self._group_limits[group] = max_running
+            self._requeue(self._group_deferred.pop(group, []))
+            self._cond.notify()
+
+    def schedule(self, fn, device_id=None, interval=None, delay=0, name=None, group=None):
+        """
+        Schedule a job.
+
+        Args:
+            fn: Callable run with no arguments; its return value is kept as last_result
+            device_id: Device the job runs on; jobs for the same device never overlap
+            interval: Seconds between runs for a recurring job, None for a one-shot job
+            delay: Seconds until the first run
+            name: Optional human-readable name
+            group: Optional group the job counts against (see limit_group)
+
+        Returns:
+            ScheduledJob
+        """
+        self.start()
+        job = ScheduledJob(uuid.uuid4().hex, fn, device_id, interval, time.time() + max(0, delay), name, group)
+        with self._cond:
+            self._jobs[job.job_id] = job
+            heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+            self._cond.notify()
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. A run already in progress finishes, but the job is never dispatched again.
+
+        Returns:
+            bool: True if the job existed
+        """
+        with self._cond:
+            job = self._jobs.pop(job_id, None)
+            if not job:
+                return False
+            job.cancelled = True
+            self._cond.notify()
+        return True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._cond:
+            return list(self._jobs.values())
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                next_run, _, job = self._heap[0]
+                if job.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+
+                delay = next_run - time.time()
+                if delay > 0:
+                    # Woken early by schedule()/cancel() or when the job is due
+                    self._cond.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                if job.device_id is not None and job.device_id in self._busy_devices:
+                    self._deferred.setdefault(job.device_id, []).append(job)
+                    continue
+                limit = self._group_limits.get(job.group)
+                if limit is not None and self._group_running.get(job.group, 0) >= limit:
+                    self._group_deferred.setdefault(job.group, []).append(job)
+                    continue
+
+                if job.device_id is not None:
+                    self._busy_devices.add(job.device_id)
+                if job.group is not None:
+                    self._group_running[job.group] = self._group_running.get(job.group, 0) + 1
+                job.running = True
+                self._executor.submit(self._run_job, job)
+
+    def _run_job(self, job):
+        job.last_run = time.time()
+        try:
+            job.last_result = job.fn()
+        except Exception as e:
+            logger.exception(f"Scheduled job {job.name} failed")
+            job.last_result = {"success": False, "error": str(e)}
+
+        with self._cond:
+            job.running = False
+            job.run_count += 1
+
+            if job.interval and not job.cancelled:
+                # Fixed-rate schedule; skip any runs missed while this one was executing
+                now = time.time()
+                job.next_run += job.interval
+                if job.next_run <= now:
+                    missed = int((now - job.next_run) // job.interval) + 1
+                    job.next_run += missed * job.interval
+                heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+            elif not job.interval:
+                self._jobs.pop(job.job_id, None)
+
+            if job.device_id is not None:
+                self._busy_devices.discard(job.device_id)
+                self._requeue(self._deferred.pop(job.device_id, []))
+            if job.group is not None:
+                self._group_running[job.group] -= 1
+                self._requeue(self._group_deferred.pop(job.group, []))
+
+            self._cond.notify()
+
+    def _requeue(self, jobs):
+        """
+        Put deferred jobs back in the heap. Must hold self._cond.
+
+        They keep their original due time, so they still run in order.
+        """
+        for deferred_job in jobs:
+            if not deferred_job.cancelled:
+                heapq.heappush(self._heap, (deferred_job.next_run, next(self._seq), deferred_job))
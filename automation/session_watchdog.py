@@ -0,0 +1,177 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_TIMEOUT = 360  # newCommandTimeout sessions are created with
+DEFAULT_CHECK_INTERVAL = 60  # seconds between watchdog passes
+DEFAULT_IDLE_MARGIN = 90  # keep at least this much of the idle timeout in hand
+DEFAULT_WATCHDOG_WORKERS = 4
+
+
+class SessionStats:
+    """Probe and reconnect counters for one device"""
+
+    def __init__(self):
+        self.probes = 0
+        self.probe_failures = 0
+        self.probe_errors = 0
+        self.probe_time = 0.0
+        self.last_probe = None
+        self.last_probe_ok = None
+        self.reconnects = 0
+        self.reconnect_failures = 0
+        self.reconnect_time = 0.0
+        self.last_reconnect = None
+        self.last_reconnect_latency = None
+
+    def to_dict(self):
+        return {
+            'probes': self.probes,
+            'probe_failures': self.probe_failures,
+            'probe_errors': self.probe_errors,
+            'avg_probe_latency': self.probe_time / self.probes if self.probes else None,
+            'last_probe': self.last_probe,
+            'last_probe_ok': self.last_probe_ok,
+            'reconnects': self.reconnects,
+            'reconnect_failures': self.reconnect_failures,
+            'avg_reconnect_latency': self.reconnect_time / self.reconnects if self.reconnects else None,
+            'last_reconnect': self.last_reconnect,
+            'last_reconnect_latency': self.last_reconnect_latency
+        }
+
+
+class SessionWatchdog:
+    """
+    Keeps idle devices' Appium sessions alive and replaces dead ones before a task needs them.
+
+    Each pass probes every ready session with a cheap command on a small
+    thread pool. A successful probe also resets Appium's idle timer, so as
+    long as passes come more often than the idle timeout (minus a margin)
+    a healthy session never times out. A session the server reports as gone
+    is recreated in the background while the device is marked initializing,
+    so tasks wait for the new session instead of failing on the old one.
+    Devices claimed by a task are never probed, and a probe that times out
+    or can't connect is only counted, never taken as a dead session.
+    """
+
+    def __init__(self, device_manager, scheduler, interval=DEFAULT_CHECK_INTERVAL, idle_timeout=SESSION_IDLE_TIMEOUT,
+                 idle_margin=DEFAULT_IDLE_MARGIN, max_workers=DEFAULT_WATCHDOG_WORKERS):
+        """
+        Args:
+            device_manager: DeviceManager owning the sessions
+            scheduler: JobScheduler that runs the periodic pass
+            interval: Seconds between passes (capped at idle_timeout - idle_margin)
+            idle_timeout: Appium newCommandTimeout of the sessions
+            idle_margin: Seconds of idle timeout to keep in hand when scheduling probes
+            max_workers: Max probes/reconnects in flight
+        """
+        self.device_manager = device_manager
+        self.scheduler = scheduler
+        self.interval = min(interval, max(1, idle_timeout - idle_margin))
+        self.idle_timeout = idle_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='session-watchdog')
+        self._stats = {}  # device_id -> SessionStats
+        self._reconnecting = set()
+        self.lock = threading.Lock()
+        self._job = None
+
+    def start(self):
+        self._job = self.scheduler.schedule(self.check_sessions, interval=self.interval, delay=self.interval,
+                                            name='session-watchdog')
+        logger.info(f"Session watchdog probing idle sessions every {self.interval}s")
+        return self
+
+    def stop(self):
+        if self._job:
+            self.scheduler.cancel(self._job.job_id)
+            self._job = None
+        self._executor.shutdown(wait=False)
+
+    def _stats_for(self, device_id):
+        with self.lock:
+            return self._stats.setdefault(device_id, SessionStats())
+
+    def check_sessions(self):
+        """Probe every idle session once; returns {device_id: alive}"""
+        with self.device_manager.lock:
+            device_ids = [device_id for device_id, info in self.device_manager.devices.items()
+                          if info['status'] == 'ready' and device_id in self.device_manager.drivers]
+
+        results = dict(zip(device_ids, self._executor.map(self.check_session, device_ids)))
+        dead = [device_id for device_id, alive in results.items() if alive is False]
+        if dead:
+            logger.warning(f"Session watchdog found {len(dead)} dead sessions: {dead}")
+        return results
+
+    def check_session(self, device_id):
+        """
+        Probe one session and start a reconnect if the server says it's gone.
+
+        Returns:
+            True if alive, False if dead, None if there was no session or no definite answer
+        """
+        alive, latency = self.device_manager.probe_session(device_id)
+        if latency is None:
+            return None
+
+        stats = self._stats_for(device_id)
+        stats.probes += 1
+        stats.probe_time += latency
+        stats.last_probe = time.time()
+        stats.last_probe_ok = alive
+        if alive is None:
+            stats.probe_errors += 1
+            logger.info(f"Session probe for {device_id} was inconclusive after {latency:.1f}s; leaving the session")
+        elif not alive:
+            stats.probe_failures += 1
+            self.reconnect(device_id)
+        return alive
+
+    def reconnect(self, device_id):
+        """Recreate a device's session in the background (no-op if one is already in progress)"""
+        with self.lock:
+            if device_id in self._reconnecting:
+                return False
+            self._reconnecting.add(device_id)
+        self._executor.submit(self._reconnect, device_id)
+        return True
+
+    def _reconnect(self, device_id):
+        try:
+            outcome = self.device_manager.reconnect_device(device_id)
+            if outcome is None:
+                return  # Picked up by a task in the meantime; it will surface any failure itself
+            success, latency = outcome
+            stats = self._stats_for(device_id)
+            stats.reconnects += 1
+            stats.reconnect_time += latency
+            stats.last_reconnect = time.time()
+            stats.last_reconnect_latency = latency
+            if not success:
+                stats.reconnect_failures += 1
+            logger.info(f"Session watchdog {'reconnected' if success else 'failed to reconnect'} "
+                        f"{device_id} in {latency:.1f}s")
+            self.device_manager.events.publish('session_reconnected', device_id=device_id,
+                                               success=success, latency=latency)
+        except Exception:
+            logger.exception(f"Session watchdog error reconnecting {device_id}")
+        finally:
+            with self.lock:
+                self._reconnecting.discard(device_id)
+
+    def stats(self):
+        """Per-device probe/reconnect counters and latencies, plus totals"""
+        with self.lock:
+            per_device = {device_id: stats.to_dict() for device_id, stats in self._stats.items()}
+        return {
+            'interval': self.interval,
+            'idle_timeout': self.idle_timeout,
+            'reconnects': sum(s['reconnects'] for s in per_device.values()),
+            'reconnect_failures': sum(s['reconnect_failures'] for s in per_device.values()),
+            'probe_failures': sum(s['probe_failures'] for s in per_device.values()),
+            'probe_errors': sum(s['probe_errors'] for s in per_device.values()),
+            'devices': per_device
+        }
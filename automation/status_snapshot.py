@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seconds a clean snapshot is served before it is rebuilt anyway, so values
+# that change without an event (next_run, run_count) still show up
+DEFAULT_MAX_AGE = 5
+
+# Per-task fields that change on every read and are derived client-side instead
+VOLATILE_TASK_FIELDS = ('running_for',)
+
+
+class StatusSnapshot:
+    """
+    Cached, versioned body for /api/status.
+
+    The snapshot is marked dirty by DeviceManager events and rebuilt lazily on
+    the next read, so polling clients get the same pre-serialized bytes until
+    something actually changes. The version and ETag only move when the
+    content does, which lets clients revalidate with If-None-Match.
+    """
+
+    def __init__(self, device_manager, task_runner=None, accounts_path=None, max_age=DEFAULT_MAX_AGE, store=None):
+        """
+        Args:
+            device_manager: DeviceManager whose event bus drives invalidation
+            task_runner: Optional InstagramTaskRunner for scheduled task status
+            accounts_path: Path of managed_accounts.json, read once at startup
+            max_age: Seconds before a clean snapshot is rebuilt anyway
+            store: Optional ConfigStore to read managed accounts from instead of accounts_path
+        """
+        self.device_manager = device_manager
+        self.task_runner = task_runner
+        self.accounts_path = accounts_path
+        self.max_age = max_age
+        self.store = store
+        self.lock = threading.Lock()
+        self.version = 0
+        self.etag = None
+        self.body = None
+        self.built_at = 0
+        self._digest = None
+        self._dirty = True
+        self._managed_accounts = self._load_managed_accounts()
+        device_manager.events.subscribe(self._on_event)
+
+    def _load_managed_accounts(self):
+        if self.store:
+            return self.store.all_accounts()
+        if not self.accounts_path or not os.path.exists(self.accounts_path):
+            return {}
+        try:
+            with open(self.accounts_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading managed accounts: {str(e)}")
+            return {}
+
+    def _on_event(self, event):
+        # Runs on the publishing thread, possibly under DeviceManager.lock: only flag the change
+        if event['type'] == 'accounts_updated':
+            self._managed_accounts = dict(self._managed_accounts, **{event['device_id']: event['accounts']})
+        self._dirty = True
+
+    def invalidate(self):
+        """Force a rebuild on the next read"""
+        self._dirty = True
+
+    def _build(self):
+        devices = self.device_manager.get_device_status()
+        servers = self.device_manager.get_server_status()
+        tasks = {}
+
+        managed_accounts = self._managed_accounts
+        for device_id, device_info in devices.items():
+            device_info['managed_accounts'] = managed_accounts.get(device_id, [])
+            if self.task_runner:
+                device_info['active_account'] = self.task_runner.accounts.active_account(device_id)
+
+        if self.task_runner:
+            tasks = self.task_runner.get_running_tasks()
+            for task_info in tasks.values():
+                for field in VOLATILE_TASK_FIELDS:
+                    task_info.pop(field, None)
+
+        return {
+            'status': 'running',
+            'devices': devices,
+            'servers': servers,
+            'tasks': tasks
+        }
+
+    def get(self):
+        """
+        Get the current snapshot, rebuilding it first if anything changed.
+
+        Returns:
+            tuple: (version, etag, serialized JSON bytes)
+        """
+        with self.lock:
+            if self._dirty or time.time() - self.built_at > self.max_age:
+                # Clear the flag first so events during the rebuild trigger another one
+                self._dirty = False
+                status = self._build()
+                content = json.dumps(status, sort_keys=True, separators=(',', ':'), default=str)
+                digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+                if digest != self._digest:
+                    self._digest = digest
+                    self.version += 1
+                    status['version'] = self.version
+                    self.body = json.dumps(status, separators=(',', ':'), default=str).encode('utf-8')
+                    self.etag = f'"{self.version}-{digest[:16]}"'
+                self.built_at = time.time()
+            return self.version, self.etag, self.body
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DB_FILENAME = 'automation.db'
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS servers (
+    name TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    max_devices INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    config TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_servers_endpoint ON servers(host, port);
+CREATE TABLE IF NOT EXISTS devices (
+    udid TEXT PRIMARY KEY,
+    server TEXT,
+    position INTEGER NOT NULL,
+    config TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_devices_server ON devices(server);
+CREATE TABLE IF NOT EXISTS accounts (
+    device_udid TEXT NOT NULL,
+    username TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (device_udid, username)
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_username ON accounts(username);
+"""
+
+
+def default_db_path(config_path):
+    """The database lives next to devices.json"""
+    return os.path.join(os.path.dirname(os.path.abspath(config_path)), DB_FILENAME)
+
+
+class ConfigStore:
+    """
+    SQLite store for Appium servers, devices and managed accounts.
+
+    Every write is a single transaction touching only the affected rows, so
+    adding a device or storing one device's accounts doesn't rewrite the rest
+    of the config, and concurrent writers can't lose each other's updates.
+    Each thread gets its own connection; WAL mode lets readers run alongside
+    a writer.
+    """
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: Path of the SQLite database file (created if missing)
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        # executescript manages its own transaction; the statements are idempotent
+        self._connection().executescript(SCHEMA)
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                         (str(SCHEMA_VERSION),))
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            # Autocommit mode; transaction() issues BEGIN/COMMIT itself
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block as one write transaction; rolled back if it raises"""
+        conn = self._connection()
+        if conn.in_transaction:
+            # Nested use joins the outer transaction
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    # --- meta ---
+
+    def get_meta(self, key, default=None):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0]['value'] if rows else default
+
+    def set_meta(self, key, value):
+        with self.transaction() as conn:
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    # --- servers and devices ---
+
+    def upsert_server(self, server_config):
+        """Insert or update one Appium server, keeping its position in the list"""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO servers (name, host, port, max_devices, position, config) "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(position) + 1, 0) FROM servers), ?) "
+                "ON CONFLICT(name) DO UPDATE SET host = excluded.host, port = excluded.port, "
+                "max_devices = excluded.max_devices, config = excluded.config",
+                (server_config['name'], server_config['host'], int(server_config['port']),
+                 int(server_config.get('max_devices', 5)), json.dumps(server_config))
+            )
+
+    def delete_server(self, name):
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM servers WHERE name = ?", (name,)).rowcount > 0
+
+    def get_servers(self):
+        return [json.loads(row['config']) for row in self._query("SELECT config FROM servers ORDER BY position")]
+
+    def upsert_device(self, device_config):
+        """Insert or update one device, keeping its position in the list"""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO devices (udid, server, position, config) "
+                "VALUES (?, ?, (SELECT COALESCE(MAX(position) + 1, 0) FROM devices), ?) "
+                "ON CONFLICT(udid) DO UPDATE SET server = excluded.server, config = excluded.config",
+                (device_config['udid'], device_config.get('server'), json.dumps(device_config))
+            )
+
+    def delete_device(self, udid):
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM devices WHERE udid = ?", (udid,)).rowcount > 0
+
+    def get_device(self, udid):
+        rows = self._query("SELECT config FROM devices WHERE udid = ?", (udid,))
+        return json.loads(rows[0]['config']) if rows else None
+
+    def get_devices(self, server=None):
+        """All devices in config order, or just those assigned to one server"""
+        if server is None:
+            rows = self._query("SELECT config FROM devices ORDER BY position")
+        else:
+            rows = self._query("SELECT config FROM devices WHERE server = ? ORDER BY position", (server,))
+        return [json.loads(row['config']) for row in rows]
+
+    def is_empty(self):
+        return not self._query("SELECT 1 FROM servers LIMIT 1") and not self._query("SELECT 1 FROM devices LIMIT 1")
+
+    def load_config(self):
+        """The config in the devices.json layout: {"appium_servers": [...], "devices": [...], ...}"""
+        config = json.loads(self.get_meta('config_extra', '{}'))
+        config['appium_servers'] = self.get_servers()
+        config['devices'] = self.get_devices()
+        return config
+
+    def save_config(self, config):
+        """Replace servers and devices with those in a devices.json-style config, in one transaction"""
+        servers = config.get('appium_servers', [])
+        devices = config.get('devices', [])
+        extra = {k: v for k, v in config.items() if k not in ('appium_servers', 'devices')}
+
+        with self.transaction() as conn:
+            for server_config in servers:
+                self.upsert_server(server_config)
+            for device_config in devices:
+                self.upsert_device(device_config)
+
+            names = [s['name'] for s in servers]
+            conn.execute(f"DELETE FROM servers WHERE name NOT IN ({','.join('?' * len(names))})", names)
+            udids = [d['udid'] for d in devices]
+            conn.execute(f"DELETE FROM devices WHERE udid NOT IN ({','.join('?' * len(udids))})", udids)
+            self.set_meta('config_extra', json.dumps(extra))
+
+    # --- accounts ---
+
+    def set_accounts(self, device_udid, accounts):
+        """Replace the managed accounts of one device"""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM accounts WHERE device_udid = ?", (device_udid,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO accounts (device_udid, username, position, updated_at) VALUES (?, ?, ?, ?)",
+                [(device_udid, username, i, now) for i, username in enumerate(accounts)]
+            )
+
+    def get_accounts(self, device_udid):
+        rows = self._query("SELECT username FROM accounts WHERE device_udid = ? ORDER BY position", (device_udid,))
+        return [row['username'] for row in rows]
+
+    def all_accounts(self):
+        """{device UDID: [usernames]}, the managed_accounts.json layout"""
+        accounts = {}
+        for row in self._query("SELECT device_udid, username FROM accounts ORDER BY device_udid, position"):
+            accounts.setdefault(row['device_udid'], []).append(row['username'])
+        return accounts
+
+    def devices_for_account(self, username):
+        """UDIDs of the devices an account is signed in on"""
+        rows = self._query("SELECT device_udid FROM accounts WHERE username = ? ORDER BY updated_at DESC", (username,))
+        return [row['device_udid'] for row in rows]
+
+    # --- migration ---
+
+    def migrate_from_json(self, config_path=None, accounts_path=None):
+        """
+        Import devices.json and managed_accounts.json once. Later calls do nothing,
+        so the JSON files can stay in place as a backup.
+
+        Returns:
+            bool: True if this call performed the migration
+        """
+        with self.transaction():
+            if self.get_meta('migrated_at'):
+                return False
+
+            if config_path and os.path.exists(config_path):
+                with open(config_path, 'r') as f:
+                    self.save_config(json.load(f))
+                logger.info(f"Imported configuration from {config_path}")
+
+            if accounts_path and os.path.exists(accounts_path):
+                try:
+                    with open(accounts_path, 'r') as f:
+                        managed_accounts = json.load(f)
+                    for device_udid, accounts in managed_accounts.items():
+                        self.set_accounts(device_udid, accounts)
+                    logger.info(f"Imported managed accounts for {len(managed_accounts)} devices from {accounts_path}")
+                except ValueError:
+                    logger.warning(f"Could not decode {accounts_path}, skipping account import")
+
+            self.set_meta('migrated_at', str(time.time()))
+        return True
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
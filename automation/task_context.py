@@ -0,0 +1,37 @@
+class TaskContext:
+    """
+    State for a single task execution on a single device.
+
+    A new context is built for every execute_task call, so tasks running on
+    different devices (and device models) at the same time never share a
+    driver or a UI map.
+    """
+
+    def __init__(self, device_id, driver, device_info, ui_map):
+        """
+        Args:
+            device_id: UDID of the device the task runs on
+            driver: Appium driver for the device
+            device_info: Device status/config dict from the device manager
+            ui_map: Resolved UIMap for the device's model
+        """
+        self.device_id = device_id
+        self.driver = driver
+        self.device_info = device_info
+        self.ui_map = ui_map
+
+    @property
+    def config(self):
+        return self.device_info.get('config', {})
+
+    @property
+    def name(self):
+        return self.config.get('name', self.device_info.get('name', self.device_id))
+
+    @property
+    def platform_name(self):
+        return self.config.get('platformName', '')
+
+    def __repr__(self):
+        model = self.ui_map.model if self.ui_map is not None else None
+        return f"<TaskContext device={self.device_id} model={model}>"
@@ -0,0 +1,425 @@
+import os
+import re
+import json
+import logging
+import threading
+from automation.waits import ACCESSIBILITY_ID, SCREEN_LANDMARKS
+
+try:
+    import yaml  # Optional: .yaml/.yml definitions are only loaded when PyYAML is installed
+except ImportError:
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+DEFINITION_EXTENSIONS = ('.json', '.yaml', '.yml') if yaml else ('.json',)
+
+# action -> (required fields, optional fields); every step may also set COMMON_FIELDS
+STEP_FIELDS = {
+    'launch_app': ((), ('app',)),
+    'terminate_app': ((), ('app',)),
+    'wait_for_screen': (('screen',), ()),
+    'wait_for_element': (('screen', 'element'), ()),
+    'tap': (('screen', 'element'), ('jitter',)),
+    'swipe': (('direction',), ('distance', 'duration')),
+    'pause': (('seconds',), ('max_seconds',)),
+    'repeat': (('times', 'steps'), ()),
+}
+COMMON_FIELDS = ('action', 'id', 'timeout', 'on_failure')
+
+# Numeric fields that may name a task parameter instead, e.g. "times": "{iterations}"
+PARAM_FIELDS = ('timeout', 'times', 'seconds', 'max_seconds', 'distance', 'duration', 'jitter')
+_PARAM_REF = re.compile(r'^\{(\w+)\}$')
+
+# 'down' scrolls the content down (the finger moves up the screen), as in scroll_down
+SWIPE_DIRECTIONS = ('up', 'down')
+
+DEFAULT_TAP_JITTER = 0.02  # fraction of the screen size, as _tap_on_element_from_map uses
+
+
+class TaskDefinitionError(ValueError):
+    """A task definition is malformed or references elements missing from a UI map"""
+
+
+class Param:
+    """A step value taken from the task's parameters when it runs"""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"{{{self.name}}}"
+
+
+class TaskDefinition:
+    """
+    A validated, model-independent task definition.
+
+    Example (JSON or YAML):
+        {
+          "description": "Open the profile tab",
+          "params": {"settle": 1},
+          "timeout": 60,
+          "steps": [
+            {"action": "launch_app"},
+            {"action": "wait_for_screen", "screen": "initial_screen_before_profile"},
+            {"id": "open_profile", "action": "tap", "screen": "initial_screen_before_profile",
+             "element": "profile-tab_Profile"},
+            {"action": "pause", "seconds": "{settle}"}
+          ]
+        }
+
+    Steps run in order. A failing step fails the task unless it sets
+    on_failure to "continue" or to the id of another step in the same list
+    to jump to. Every step can set a timeout in seconds.
+    """
+
+    def __init__(self, name, steps, description='', params=None, timeout=None, path=None, mtime=None):
+        self.name = name
+        self.steps = steps
+        self.description = description
+        self.params = dict(params or {})
+        self.timeout = timeout
+        self.path = path
+        self.mtime = mtime
+
+    @classmethod
+    def from_dict(cls, name, data, path=None, mtime=None):
+        """
+        Validate a parsed definition.
+
+        Raises:
+            TaskDefinitionError: listing every problem found
+        """
+        if not isinstance(data, dict):
+            raise TaskDefinitionError(f"Task {name}: definition must be a mapping")
+        if data.get('name', name) != name:
+            raise TaskDefinitionError(f"Task {name}: name '{data['name']}' doesn't match its file name")
+        unknown = set(data) - {'name', 'description', 'params', 'timeout', 'steps'}
+        errors = [f"unknown fields {sorted(unknown)}"] if unknown else []
+        params = data.get('params') or {}
+        if not isinstance(params, dict):
+            errors.append("params must be a mapping of name to default value")
+            params = {}
+        timeout = data.get('timeout')
+        if timeout is not None and not _is_number(timeout):
+            errors.append("timeout must be a number of seconds")
+        _validate_steps(data.get('steps'), 'steps', params, errors)
+        if errors:
+            raise TaskDefinitionError(f"Task {name}: " + '; '.join(errors))
+        return cls(name, data['steps'], data.get('description', ''), params, timeout, path, mtime)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'description': self.description,
+            'params': self.params,
+            'timeout': self.timeout,
+            'steps': self.steps
+        }
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _validate_steps(steps, where, params, errors):
+    if not isinstance(steps, list) or not steps:
+        errors.append(f"{where} must be a non-empty list")
+        return
+    ids = set()
+    for i, step in enumerate(steps):
+        step_where = f"{where}[{i}]"
+        if not isinstance(step, dict):
+            errors.append(f"{step_where} must be a mapping")
+            continue
+        action = step.get('action')
+        if action not in STEP_FIELDS:
+            errors.append(f"{step_where}: unknown action {action!r} (expected one of {sorted(STEP_FIELDS)})")
+            continue
+        required, optional = STEP_FIELDS[action]
+        missing = [field for field in required if field not in step]
+        if missing:
+            errors.append(f"{step_where} ({action}): missing {missing}")
+        unknown = set(step) - set(required) - set(optional) - set(COMMON_FIELDS)
+        if unknown:
+            errors.append(f"{step_where} ({action}): unknown fields {sorted(unknown)}")
+        for field in PARAM_FIELDS:
+            value = step.get(field)
+            if value is None or _is_number(value):
+                continue
+            match = _PARAM_REF.match(value) if isinstance(value, str) else None
+            if not match:
+                errors.append(f"{step_where} ({action}): {field} must be a number or a \"{{param}}\" reference")
+            elif match.group(1) not in params:
+                errors.append(f"{step_where} ({action}): {field} references undeclared param '{match.group(1)}'")
+        if action == 'swipe' and step.get('direction') not in SWIPE_DIRECTIONS:
+            errors.append(f"{step_where} (swipe): direction must be one of {list(SWIPE_DIRECTIONS)}")
+        if 'id' in step:
+            if step['id'] in ids:
+                errors.append(f"{step_where}: duplicate id '{step['id']}'")
+            ids.add(step['id'])
+        if action == 'repeat':
+            _validate_steps(step.get('steps'), f"{step_where}.steps", params, errors)
+    for i, step in enumerate(steps):
+        target = step.get('on_failure') if isinstance(step, dict) else None
+        if target not in (None, 'fail', 'continue') and target not in ids:
+            errors.append(f"{where}[{i}]: on_failure must be 'fail', 'continue' or the id of a step in the same list")
+
+
+def _param_or_value(value):
+    if isinstance(value, str):
+        match = _PARAM_REF.match(value)
+        if match:
+            return Param(match.group(1))
+    return value
+
+
+class CompiledStep:
+    """One step with its UI map references resolved to coordinates and locators"""
+
+    __slots__ = ('id', 'action', 'timeout', 'on_failure', 'args', 'body')
+
+    def __init__(self, id, action, timeout, on_failure, args, body=None):
+        self.id = id
+        self.action = action
+        self.timeout = timeout  # seconds, Param, or None for the action's default
+        self.on_failure = on_failure  # 'fail', 'continue' or the index of the step to jump to
+        self.args = args
+        self.body = body  # nested steps of a repeat
+
+    def to_dict(self):
+        step = {'id': self.id, 'action': self.action, 'timeout': self.timeout, 'on_failure': self.on_failure,
+                'args': {k: repr(v) if isinstance(v, Param) else v for k, v in self.args.items()}}
+        if isinstance(step['timeout'], Param):
+            step['timeout'] = repr(step['timeout'])
+        if self.body is not None:
+            step['steps'] = [s.to_dict() for s in self.body]
+        return step
+
+
+class CompiledPlan:
+    """A task definition compiled against one model's UI map"""
+
+    def __init__(self, definition, ui_map, steps):
+        self.definition = definition
+        self.model = ui_map.model
+        self.map_mtime = ui_map.mtime
+        self.steps = steps
+
+    @property
+    def name(self):
+        return self.definition.name
+
+    def to_dict(self):
+        return {'name': self.name, 'model': self.model, 'timeout': self.definition.timeout,
+                'params': self.definition.params, 'steps': [step.to_dict() for step in self.steps]}
+
+
+def compile_definition(definition, ui_map):
+    """
+    Compile a definition for one device model.
+
+    Element references are resolved once here, through the map's index, so
+    running the plan does no UI map lookups.
+
+    Raises:
+        TaskDefinitionError: listing every reference the map can't resolve
+    """
+    errors = []
+    steps = _compile_steps(definition.steps, 'steps', ui_map, errors)
+    if errors:
+        raise TaskDefinitionError(f"Task {definition.name} on {ui_map.model}: " + '; '.join(errors))
+    return CompiledPlan(definition, ui_map, steps)
+
+
+def _resolve(ui_map, screen, element, where, errors):
+    if screen not in ui_map:
+        errors.append(f"{where}: screen '{screen}' not in UI map")
+        return None, None
+    key, data = ui_map.index.resolve(screen, element)
+    if not data:
+        errors.append(f"{where}: element '{element}' not found on '{screen}'")
+    return key, data
+
+
+def _locator(key, data, where, errors):
+    accessibility_id = data.get("content-desc", data.get("name"))
+    if not accessibility_id:
+        errors.append(f"{where}: element '{key}' has no accessibility id to wait for")
+        return None
+    return (ACCESSIBILITY_ID, accessibility_id)
+
+
+def _compile_steps(steps, where, ui_map, errors):
+    ids = {step['id']: i for i, step in enumerate(steps) if 'id' in step}
+    compiled = []
+    for i, step in enumerate(steps):
+        step_where = f"{where}[{i}]"
+        action = step['action']
+        args = {}
+        body = None
+        if action in ('launch_app', 'terminate_app'):
+            args['app'] = step.get('app')
+        elif action == 'wait_for_screen':
+            screen = step['screen']
+            landmark = SCREEN_LANDMARKS.get(screen)
+            if not landmark:
+                errors.append(f"{step_where}: no landmark configured for screen '{screen}'")
+            else:
+                key, data = _resolve(ui_map, screen, landmark, step_where, errors)
+                if data:
+                    args.update(locator=_locator(key, data, step_where, errors), target=screen)
+        elif action == 'wait_for_element':
+            key, data = _resolve(ui_map, step['screen'], step['element'], step_where, errors)
+            if data:
+                args.update(locator=_locator(key, data, step_where, errors), target=f"{step['screen']}.{key}")
+        elif action == 'tap':
+            key, data = _resolve(ui_map, step['screen'], step['element'], step_where, errors)
+            if data:
+                args.update(
+                    x=int(data.get("x", 0)) + int(data.get("width", 0)) // 2,
+                    y=int(data.get("y", 0)) + int(data.get("height", 0)) // 2,
+                    jitter=_param_or_value(step.get('jitter', DEFAULT_TAP_JITTER)),
+                    target=f"{step['screen']}.{key}"
+                )
+        elif action == 'swipe':
+            args.update(direction=step['direction'], distance=_param_or_value(step.get('distance')),
+                        duration=_param_or_value(step.get('duration')))
+        elif action == 'pause':
+            args.update(seconds=_param_or_value(step['seconds']), max_seconds=_param_or_value(step.get('max_seconds')))
+        elif action == 'repeat':
+            args['times'] = _param_or_value(step['times'])
+            body = _compile_steps(step['steps'], f"{step_where}.steps", ui_map, errors)
+
+        on_failure = step.get('on_failure', 'fail')
+        if on_failure not in ('fail', 'continue'):
+            on_failure = ids[on_failure]
+        compiled.append(CompiledStep(step.get('id', f"{i}:{action}"), action, _param_or_value(step.get('timeout')),
+                                     on_failure, args, body))
+    return compiled
+
+
+class TaskLibrary:
+    """
+    Task definitions loaded from a directory, one file per task.
+
+    The file name (without extension) is the task name. Files are re-read
+    when their mtime changes, and each definition is compiled once per
+    device model and UI map version.
+    """
+
+    def __init__(self, tasks_dir=None):
+        """
+        Args:
+            tasks_dir: Directory of .json (and, with PyYAML, .yaml/.yml) definitions
+                       (defaults to tasks/ at the project root)
+        """
+        if tasks_dir is None:
+            project_root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            tasks_dir = os.path.join(project_root_dir, "tasks")
+        self.tasks_dir = tasks_dir
+        self._definitions = {}  # name -> TaskDefinition
+        self._plans = {}  # (name, model) -> (definition mtime, map mtime, CompiledPlan or TaskDefinitionError)
+        self.lock = threading.Lock()
+
+    def _paths(self):
+        """Task name -> definition file path"""
+        try:
+            filenames = sorted(os.listdir(self.tasks_dir))
+        except OSError:
+            return {}
+        paths = {}
+        for filename in filenames:
+            name, ext = os.path.splitext(filename)
+            if ext not in DEFINITION_EXTENSIONS:
+                continue
+            if name in paths:
+                logger.warning(f"Ignoring {filename}: task {name} is already defined by {paths[name]}")
+                continue
+            paths[name] = os.path.join(self.tasks_dir, filename)
+        return paths
+
+    def names(self):
+        return list(self._paths())
+
+    def _load(self, name, path):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        cached = self._definitions.get(name)
+        if cached is not None and cached.path == path and cached.mtime == mtime:
+            return cached
+        try:
+            with open(path, 'r') as f:
+                data = yaml.safe_load(f) if path.endswith(('.yaml', '.yml')) else json.load(f)
+        except Exception as e:
+            raise TaskDefinitionError(f"Task {name}: could not parse {path}: {e}")
+        definition = TaskDefinition.from_dict(name, data, path, mtime)
+        with self.lock:
+            self._definitions[name] = definition
+        logger.info(f"Loaded task definition {name} from {path}")
+        return definition
+
+    def get(self, name):
+        """
+        Get a task definition by name.
+
+        Returns:
+            TaskDefinition, or None if there is no such file
+
+        Raises:
+            TaskDefinitionError: if the file is malformed
+        """
+        path = self._paths().get(name)
+        return self._load(name, path) if path else None
+
+    def definitions(self):
+        """
+        Every definition in the directory.
+
+        Returns:
+            tuple: ([TaskDefinition], {name: error}) for the valid and malformed files
+        """
+        definitions, errors = [], {}
+        for name, path in self._paths().items():
+            try:
+                definition = self._load(name, path)
+            except TaskDefinitionError as e:
+                errors[name] = str(e)
+                continue
+            if definition:
+                definitions.append(definition)
+        return definitions, errors
+
+    def compile(self, name, ui_map):
+        """
+        Get the plan for a task on a UI map's device model, compiling it on first use.
+
+        Returns:
+            CompiledPlan, or None if there is no such task
+
+        Raises:
+            TaskDefinitionError: if the definition is malformed or doesn't match the map
+        """
+        definition = self.get(name)
+        if definition is None:
+            return None
+        key = (name, ui_map.model)
+        cached = self._plans.get(key)
+        if cached is None or cached[0] != definition.mtime or cached[1] != ui_map.mtime:
+            try:
+                plan = compile_definition(definition, ui_map)
+                logger.info(f"Compiled task {name} for {ui_map.model}")
+            except TaskDefinitionError as e:
+                logger.error(str(e))
+                plan = e
+            cached = (definition.mtime, ui_map.mtime, plan)
+            with self.lock:
+                self._plans[key] = cached
+        if isinstance(cached[2], TaskDefinitionError):
+            raise cached[2]
+        return cached[2]
@@ -0,0 +1,217 @@
+import time
+import random
+import logging
+from contextlib import nullcontext
+from automation.task_definitions import Param
+from automation.appium_transport import command_timeout
+from automation.tracing import STAGE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STEP_TIMEOUT = 30  # seconds for app, tap and swipe steps that don't set their own
+MAX_STEPS_RUN = 10000  # guards against on_failure jumps that loop forever
+
+APP_IDS = {'android': 'com.instagram.android', 'ios': 'com.burbn.instagram'}
+
+
+class _Run:
+    """State of one plan execution"""
+
+    def __init__(self, ctx, plan, screen_size, params, deadline, wait_timeout):
+        self.ctx = ctx
+        self.plan = plan
+        self.width, self.height = screen_size
+        self.params = params
+        self.deadline = deadline  # time.time() the task must finish by, or None
+        self.wait_timeout = wait_timeout  # default for wait steps
+        self.steps_run = 0
+
+    def remaining(self):
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def value(self, value):
+        return self.params.get(value.name) if isinstance(value, Param) else value
+
+
+class StepFailed(Exception):
+    pass
+
+
+class TaskEngine:
+    """
+    Runs compiled task plans (see task_definitions) on a device.
+
+    Each step runs within its own timeout and the task's overall timeout,
+    whichever ends first. Waits stop polling at that point and pauses are
+    cut short. The same budget is the read timeout of every driver command
+    the step sends, so a hung tap or launch fails the step instead of
+    blocking the task; the server may still finish the command.
+    """
+
+    def __init__(self, waiter, tracer=None):
+        """
+        Args:
+            waiter: ScreenWaiter used for wait steps and their default timeouts
+            tracer: Optional Tracer; each step is recorded as a 'stage' span
+        """
+        self.waiter = waiter
+        self.tracer = tracer
+
+    def run(self, ctx, plan, screen_size, params=None, timeout=None):
+        """
+        Run a compiled plan.
+
+        Args:
+            ctx: TaskContext of the device to run on
+            plan: CompiledPlan for the device's model
+            screen_size: (width, height) of the device
+            params: Values for the definition's params (other keys are ignored)
+            timeout: Seconds for the whole task (default: the definition's timeout)
+
+        Returns:
+            dict: success, steps_run and duration; on failure also error and the
+                  id of the failing step as stage
+        """
+        definition = plan.definition
+        values = dict(definition.params)
+        values.update({k: v for k, v in (params or {}).items() if k in definition.params})
+        timeout = timeout if timeout is not None else definition.timeout
+        started = time.time()
+        # Same per-task override and device default as the built-in tasks' waits
+        wait_timeout = (params or {}).get('wait_timeout')
+        if wait_timeout is None:
+            wait_timeout = ctx.config.get('waitTimeout', self.waiter.timeout)
+        run = _Run(ctx, plan, screen_size, values, started + float(timeout) if timeout else None, float(wait_timeout))
+
+        logger.info(f"Running task {plan.name} on {ctx.name} ({len(plan.steps)} steps)")
+        ok, stage, error = self._run_steps(run, plan.steps)
+        result = {"success": ok, "steps_run": run.steps_run, "duration": time.time() - started}
+        if not ok:
+            logger.error(f"Task {plan.name} failed at step {stage} on {ctx.name}: {error}")
+            result.update(error=error, stage=stage)
+        return result
+
+    def _run_steps(self, run, steps):
+        """Run a list of steps, following on_failure edges. Returns (ok, failed step id, error)."""
+        i = 0
+        while i < len(steps):
+            step = steps[i]
+            run.steps_run += 1
+            if run.steps_run > MAX_STEPS_RUN:
+                return False, step.id, f"Gave up after {MAX_STEPS_RUN} steps; check on_failure jumps for a loop"
+            error = self._run_step(run, step)
+            if error is None or step.on_failure == 'continue':
+                if error is not None:
+                    logger.warning(f"Step {step.id} of {run.plan.name} failed, continuing: {error}")
+                i += 1
+            elif step.on_failure == 'fail':
+                return False, step.id, error
+            else:
+                logger.warning(f"Step {step.id} of {run.plan.name} failed, jumping to {steps[step.on_failure].id}: "
+                               f"{error}")
+                i = step.on_failure
+        return True, None, None
+
+    def _budget(self, run, step):
+        """Seconds the step may take, or None for no limit"""
+        timeout = run.value(step.timeout)
+        if timeout is None:
+            if step.action in ('wait_for_screen', 'wait_for_element'):
+                timeout = run.wait_timeout
+            elif step.action not in ('pause', 'repeat'):
+                timeout = DEFAULT_STEP_TIMEOUT
+        remaining = run.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(float(timeout), remaining)
+
+    def _run_step(self, run, step):
+        """Run one step. Returns None on success, else the error."""
+        budget = self._budget(run, step)
+        if budget is not None and budget <= 0:
+            return f"Task timed out before step {step.id}"
+        context = self.tracer.span(step.id, STAGE, require_parent=True, action=step.action,
+                                   target=step.args.get('target')) if self.tracer else nullcontext()
+        with context as span:
+            started = time.time()
+            try:
+                with command_timeout(budget) if budget is not None else nullcontext():
+                    getattr(self, f"_step_{step.action}")(run, step, budget)
+                error = None
+                elapsed = time.time() - started
+                if budget is not None and elapsed > budget + 0.05:
+                    error = f"Step {step.id} took {elapsed:.1f}s, over its {budget:.1f}s timeout"
+            except StepFailed as e:
+                error = str(e)
+            except Exception as e:
+                logger.exception(f"Error in step {step.id} of {run.plan.name}")
+                error = str(e)
+            if span is not None and error is not None:
+                span.fail(error)
+        return error
+
+    # --- actions ---
+
+    def _app_id(self, run, step):
+        return step.args.get('app') or APP_IDS['android' if run.ctx.platform_name.lower() == 'android' else 'ios']
+
+    def _step_launch_app(self, run, step, budget):
+        run.ctx.driver.activate_app(self._app_id(run, step))
+
+    def _step_terminate_app(self, run, step, budget):
+        run.ctx.driver.terminate_app(self._app_id(run, step))
+
+    def _step_wait_for_screen(self, run, step, budget):
+        if not self.waiter.wait_for_locator(run.ctx, step.args['locator'], timeout=budget,
+                                            description=step.args['target']):
+            raise StepFailed(f"Timed out after {budget:.1f}s waiting for {step.args['target']}")
+
+    _step_wait_for_element = _step_wait_for_screen
+
+    def _step_tap(self, run, step, budget):
+        jitter = float(run.value(step.args['jitter']) or 0)
+        x = step.args['x'] + random.randint(-int(run.width * jitter), int(run.width * jitter))
+        y = step.args['y'] + random.randint(-int(run.height * jitter), int(run.height * jitter))
+        x = max(5, min(x, run.width - 5))
+        y = max(5, min(y, run.height - 5))
+        logger.info(f"Tapping {step.args['target']} at ({x}, {y})")
+        run.ctx.driver.execute_script('mobile: tap', {'x': x, 'y': y})
+
+    def _step_swipe(self, run, step, budget):
+        distance = run.value(step.args['distance'])
+        duration = run.value(step.args['duration'])
+        x = run.width // 2
+        if step.args['direction'] == 'down':
+            start_y = int(run.height * 0.7)
+            end_y = max(10, start_y - int(distance)) if distance else int(run.height * 0.3)
+        else:
+            start_y = int(run.height * 0.3)
+            end_y = min(run.height - 10, start_y + int(distance)) if distance else int(run.height * 0.7)
+        run.ctx.driver.execute_script('mobile: dragFromToForDuration', {
+            'fromX': x, 'fromY': start_y, 'toX': x, 'toY': end_y,
+            'duration': float(duration) if duration is not None else random.uniform(0.3, 1.0)
+        })
+
+    def _step_pause(self, run, step, budget):
+        seconds = float(run.value(step.args['seconds']))
+        max_seconds = run.value(step.args['max_seconds'])
+        if max_seconds is not None:
+            seconds = random.uniform(seconds, float(max_seconds))
+        if budget is not None and seconds > budget:
+            time.sleep(max(0.0, budget))
+            raise StepFailed(f"Task timed out during a {seconds:.1f}s pause")
+        time.sleep(seconds)
+
+    def _step_repeat(self, run, step, budget):
+        times = int(run.value(step.args['times']))
+        # The loop's own timeout bounds every step inside it
+        deadline = run.deadline
+        if budget is not None:
+            run.deadline = time.time() + budget
+        try:
+            for iteration in range(times):
+                ok, stage, error = self._run_steps(run, step.body)
+                if not ok:
+                    raise StepFailed(f"{stage} (iteration {iteration + 1}/{times}): {error}")
+        finally:
+            run.deadline = deadline
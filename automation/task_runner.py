@@ -3,85 +3,141 @@ import random
 import logging
 import json
 import os
-from appium.webdriver.common.touch_action import TouchAction
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.actions.pointer_input import PointerInput
-from selenium.webdriver.common.actions.interaction import POINTER_TOUCH
+import threading
+from automation.scheduler import JobScheduler
+from automation.job_store import JobStore, RUNNING, CANCELLED
+from automation.device_manager import DEFAULT_ACQUIRE_TIMEOUT
+from automation.ui_map_cache import UIMapCache
+from automation.task_context import TaskContext
+from automation.waits import ScreenWaiter, ACCESSIBILITY_ID
+from automation.account_router import AccountRouter
+from automation.batch_planner import BatchPlanner, BatchReport, PlannedJob
+from automation.gestures import GestureBatch
+from automation.tracing import traced, JOB, TASK, STAGE, WAIT, GESTURE
+from automation.task_definitions import TaskLibrary, TaskDefinitionError
+from automation.task_engine import TaskEngine
 
 logger = logging.getLogger(__name__)
 
+# Scheduler group of submitted jobs that take whichever device frees up first. Each can wait
+# up to its acquire timeout for a device, so they are capped below the scheduler's worker count
+# to leave workers for device jobs and housekeeping (server health, session watchdog).
+ANY_DEVICE_JOBS = 'any-device'
+DEFAULT_MAX_ANY_DEVICE_JOBS = 4
+
 class InstagramTaskRunner:
     """Executes Instagram automation tasks on connected devices"""
     
-    def __init__(self, device_manager):
+    # Tasks implemented as methods; any other task name is looked up in the task definitions
+    BUILTIN_TASKS = {
+        "open_instagram": "Open the Instagram app",
+        "go_to_profile": "Open the profile tab",
+        "scroll_feed": "Scroll through the home feed",
+        "setup_device": "Discover the accounts signed in on the device",
+        "switch_account": "Switch to another signed-in account",
+    }
+    
+    def __init__(self, device_manager, ui_map_cache=None, waiter=None, scheduler=None, job_store=None, accounts=None,
+                 planner=None, task_library=None, max_any_device_jobs=DEFAULT_MAX_ANY_DEVICE_JOBS):
         """
         Initialize the task runner
         
         Args:
             device_manager: The device manager instance
+            ui_map_cache: Optional UIMapCache to share between runners
+            waiter: Optional ScreenWaiter controlling default wait timeouts/poll intervals
+            scheduler: Optional JobScheduler used for submitted and repeating tasks
+            job_store: Optional JobStore recording submitted jobs
+            accounts: Optional AccountRouter mapping usernames to devices
+            planner: Optional BatchPlanner ordering account-addressed jobs per device
+            task_library: Optional TaskLibrary of declarative task definitions
+            max_any_device_jobs: Max submitted jobs without a device running (waiting for one) at once
         """
         self.device_manager = device_manager
-        self.ui_map = None
+        self.ui_map_cache = ui_map_cache or UIMapCache()
+        self.waiter = waiter or ScreenWaiter()
+        self.scheduler = scheduler or JobScheduler()
+        self.scheduler.limit_group(ANY_DEVICE_JOBS, max_any_device_jobs)
+        self.jobs = job_store or JobStore()
+        self.accounts = accounts or AccountRouter(self._load_managed_accounts(), device_manager.events)
+        self.planner = planner or BatchPlanner()
+        
+        # Per task type/device/server timings; driver commands are timed by the DeviceManager's drivers
+        self._task_seconds = device_manager.metrics.histogram(
+            'task_duration_seconds', 'Task execution time', ('task', 'device', 'server', 'outcome'))
+        self._task_failures = device_manager.metrics.counter(
+            'task_failures_total', 'Tasks that failed or raised', ('task', 'device', 'server'))
+        
+        # Jobs, tasks, their stages and gestures are traced alongside the drivers' commands
+        self.tracer = device_manager.tracer
+        
+        # Declarative tasks, compiled once per device model and run by the engine
+        self.task_library = task_library or TaskLibrary()
+        self.engine = TaskEngine(self.waiter, self.tracer)
+        
+        # Account-addressed jobs waiting for their device, ordered by the planner when the device frees up
+        self._pending = {}  # device_id -> [PlannedJob]
+        self._draining = set()  # devices with a drain job scheduled or running
+        self.batch_reports = {}  # device_id -> last BatchReport
+        self.pending_lock = threading.Lock()
         
         # Running tasks
         self.running_tasks = {}
+        self.tasks_lock = threading.Lock()
         
         logger.info("Task runner initialized")
     
+    def _load_managed_accounts(self):
+        """{device UDID: [usernames]} from the store, or managed_accounts.json without one"""
+        if self.device_manager.store:
+            return self.device_manager.store.all_accounts()
+        
+        managed_accounts_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'managed_accounts.json')
+        if not os.path.exists(managed_accounts_path):
+            return {}
+        try:
+            with open(managed_accounts_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading {managed_accounts_path}: {e}")
+            return {}
+    
     def _load_ui_map_for_device(self, device_info):
-        """Load the UI map for the specific device based on its model."""
+        """
+        Get the UI map for the specific device based on its model.
+        
+        Maps come from the shared cache, so the JSON file is only parsed the
+        first time a model is seen or after the file changes on disk.
+        
+        Returns:
+            UIMap or None if the model is unknown or its map can't be loaded
+        """
         if not device_info or 'config' not in device_info or 'model' not in device_info['config']:
             logger.error("Device model not found in device_info.")
-            self.ui_map = None
-            return False
-
-        device_model = device_info['config']['model']
-        ui_map_filename = "instagram_map.json" # Standard name for the map file
-        # Construct path relative to the project root where task_runner.py is likely executed from
-        # Assuming task_runner.py is in automation/ and ui_maps/ is at the project root
-        # So, ../ui_maps/{device_model}/instagram_map.json from automation/
-        # Or, if running from project root: ui_maps/{device_model}/instagram_map.json
-        # Let's assume execution context is project root for simplicity of path construction for now.
-        # This might need adjustment based on how scripts are run.
-        # For now, using a path relative to the root of the project.
-        # A more robust way would be to get the script's directory or a base path.
-        
-        # Let's determine the base path. Assuming this script is in 'automation' directory
-        # and 'ui_maps' is a sibling of 'automation'.
-        current_script_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root_dir = os.path.dirname(current_script_dir) # Goes up one level from 'automation' to project root
-        map_path = os.path.join(project_root_dir, "ui_maps", device_model, ui_map_filename)
+            return None
 
-        if not os.path.exists(map_path):
-            logger.error(f"UI map file not found for model {device_model} at {map_path}")
-            self.ui_map = None
-            return False
-        
-        try:
-            with open(map_path, 'r') as f:
-                self.ui_map = json.load(f)
-            logger.info(f"Successfully loaded UI map for model {device_model} from {map_path}")
-            return True
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding JSON from UI map file {map_path}: {e}")
-            self.ui_map = None
-            return False
-        except Exception as e:
-            logger.error(f"Failed to load UI map {map_path}: {e}")
-            self.ui_map = None
-            return False
+        return self.ui_map_cache.get(device_info['config']['model'])
     
-    def get_element_position(self, screen_name, element_name, device_width, device_height):
+    @traced(WAIT, 'wait_for_screen', arguments=('screen_name',))
+    def _wait_for_screen(self, ctx, screen_name, **kwargs):
+        """Wait for a screen using the per-task `wait_timeout`/`poll_interval` overrides, if any"""
+        return self.waiter.wait_for_screen(
+            ctx, screen_name,
+            timeout=kwargs.get('wait_timeout'),
+            poll_interval=kwargs.get('poll_interval')
+        )
+    
+    def get_element_position(self, ui_map, screen_name, element_name, device_width, device_height):
         """Get the position of an element based on screen dimensions"""
-        if not self.ui_map or screen_name not in self.ui_map:
+        if not ui_map or screen_name not in ui_map:
             logger.error(f"Screen {screen_name} not found in UI map")
             return None
             
-        if element_name not in self.ui_map[screen_name]:
+        if element_name not in ui_map[screen_name]:
             logger.error(f"Element {element_name} not found in {screen_name} screen")
             return None
             
-        element_info = self.ui_map[screen_name][element_name]
+        element_info = ui_map[screen_name][element_name]
         
         # Use relative positioning to adjust for different screen sizes
         # Assuming UI map contains positions as percentages
@@ -94,14 +150,21 @@ class InstagramTaskRunner:
         
         return (x, y)
     
-    def tap_element(self, driver, screen_name, element_name, device_info):
+    def _screen_size(self, ctx):
+        """Screen (width, height) from the device manager's per-session geometry cache"""
+        screen_size = self.device_manager.get_screen_size(ctx.device_id)
+        if not screen_size:
+            raise RuntimeError(f"Screen size unavailable for device {ctx.device_id}")
+        return screen_size
+    
+    @traced(GESTURE, arguments=('screen_name', 'element_name'))
+    def tap_element(self, ctx, screen_name, element_name):
         """Tap on an element based on UI map"""
         # Get device dimensions
-        device_width = device_info['screen_width']
-        device_height = device_info['screen_height']
+        device_width, device_height = self._screen_size(ctx)
         
         # Get element position
-        position = self.get_element_position(screen_name, element_name, device_width, device_height)
+        position = self.get_element_position(ctx.ui_map, screen_name, element_name, device_width, device_height)
         if not position:
             logger.error(f"Could not get position for {element_name} on {screen_name}")
             return False
@@ -118,7 +181,7 @@ class InstagramTaskRunner:
         logger.info(f"Tapping at general coordinates ({x}, {y}) using mobile gestures")
         
         # Use mobile: gesture commands which are supported by iOS 18 and Appium 2.x
-        driver.execute_script('mobile: tap', {
+        ctx.driver.execute_script('mobile: tap', {
             'x': x,
             'y': y
         })
@@ -128,7 +191,8 @@ class InstagramTaskRunner:
         
         return True
         
-    def swipe(self, driver, start_x, start_y, end_x, end_y, duration=None):
+    @traced(GESTURE)
+    def swipe(self, ctx, start_x, start_y, end_x, end_y, duration=None):
         """Perform a swipe gesture using mobile gestures"""
         if duration is None:
             # Random duration for more human-like swipes (in seconds for mobile gestures)
@@ -140,7 +204,7 @@ class InstagramTaskRunner:
         logger.info(f"Swiping from ({start_x},{start_y}) to ({end_x},{end_y}) with duration {duration_sec}s using mobile gestures")
         
         # Use mobile: dragFromToForDuration which is supported by iOS 18 and Appium 2.x
-        driver.execute_script('mobile: dragFromToForDuration', {
+        ctx.driver.execute_script('mobile: dragFromToForDuration', {
             'fromX': start_x,
             'fromY': start_y,
             'toX': end_x,
@@ -151,10 +215,34 @@ class InstagramTaskRunner:
         # Random delay after swipe
         time.sleep(random.uniform(0.5, 1.5))
         
-    def scroll_down(self, driver, device_info, distance=None):
+    def _element_center(self, ctx, screen_name, element_key):
+        """Center (x, y) of a UI map element, or None if it isn't mapped"""
+        if not ctx.ui_map:
+            return None
+        _, element_data = ctx.ui_map.index.resolve(screen_name, element_key)
+        if not element_data:
+            return None
+        return (int(element_data.get("x", 0)) + int(element_data.get("width", 0)) // 2,
+                int(element_data.get("y", 0)) + int(element_data.get("height", 0)) // 2)
+    
+    def gesture_batch(self, ctx, **kwargs):
+        """
+        Start a GestureBatch for a task's device.
+        
+        Queued taps, swipes and pauses are sent as W3C action sequences in as few
+        calls as possible when perform() is called; tap_element resolves UI map
+        elements the same way _tap_on_element_from_map does.
+        
+        Returns:
+            GestureBatch
+        """
+        return GestureBatch(ctx.driver, self._screen_size(ctx),
+                            resolver=lambda screen_name, element_key: self._element_center(ctx, screen_name, element_key),
+                            tracer=self.tracer, **kwargs)
+    
+    def scroll_down(self, ctx, distance=None):
         """Scroll down on the screen"""
-        device_width = device_info['screen_width']
-        device_height = device_info['screen_height']
+        device_width, device_height = self._screen_size(ctx)
         
         # Start from middle-bottom area
         start_x = device_width // 2
@@ -170,12 +258,11 @@ class InstagramTaskRunner:
             end_y = int(device_height * 0.3)
         
         # Perform swipe with random duration
-        self.swipe(driver, start_x, start_y, end_x, end_y)
+        self.swipe(ctx, start_x, start_y, end_x, end_y)
         
-    def scroll_up(self, driver, device_info, distance=None):
+    def scroll_up(self, ctx, distance=None):
         """Scroll up on the screen"""
-        device_width = device_info['screen_width']
-        device_height = device_info['screen_height']
+        device_width, device_height = self._screen_size(ctx)
         
         # Start from middle-top area
         start_x = device_width // 2
@@ -191,67 +278,97 @@ class InstagramTaskRunner:
             end_y = int(device_height * 0.7)
         
         # Perform swipe
-        self.swipe(driver, start_x, start_y, end_x, end_y)
+        self.swipe(ctx, start_x, start_y, end_x, end_y)
     
     def execute_task(self, task_name, device_id=None, device_info=None, **kwargs):
-        """Execute a task on a device"""
-        # Get next available device if not specified
-        _device_id_to_release = None # Keep track if we got a device we need to release
-        if not device_id:
-            selected_device_id, driver = self.device_manager.get_available_device()
-            if not selected_device_id:
+        """Execute a task on a device, claiming it from the pool for the duration of the task"""
+        acquire_timeout = kwargs.pop('acquire_timeout', DEFAULT_ACQUIRE_TIMEOUT)
+        platform = kwargs.pop('platform', None)
+        model = kwargs.pop('model', None)
+        server = kwargs.pop('server', None)
+        
+        if device_id:
+            if device_id not in self.device_manager.devices:
+                logger.error(f"Device {device_id} is not a known device.")
+                return {"success": False, "error": f"Device {device_id} not a known device"}
+            # Attempt to initialize if known but without a session (e.g. after a restart); a session
+            # that is already being (re)created is waited for below instead
+            if (device_id not in self.device_manager.drivers
+                    and self.device_manager.devices[device_id]['status'] != 'initializing'):
+                logger.info(f"Device {device_id} not initialized; attempting to initialize it for task.")
+                if not self.device_manager.initialize_device(self.device_manager.devices[device_id]['config']):
+                    logger.error(f"Failed to initialize device {device_id} for task.")
+                    return {"success": False, "error": f"Device {device_id} could not be initialized."}
+            
+            # Wait for any task already running on the device, in the same queue as pool requests
+            claimed_id, driver = self.device_manager.acquire_device(timeout=acquire_timeout, device_id=device_id)
+            if not claimed_id:
+                logger.error(f"Device {device_id} didn't become available within {acquire_timeout}s")
+                return {"success": False, "error": f"Device {device_id} is busy or unavailable"}
+        else:
+            # Queue for a device rather than failing straight away when all are busy
+            device_id, driver = self.device_manager.acquire_device(timeout=acquire_timeout, platform=platform,
+                                                                   model=model, server=server)
+            if not device_id:
                 logger.error("No available devices")
                 return {"success": False, "error": "No available devices"}
-            device_id = selected_device_id
-            _device_id_to_release = device_id # Mark for release
-        else:
-            # Get driver for the specified device
-            if device_id not in self.device_manager.drivers:
-                logger.error(f"Device {device_id} not found or not initialized.")
-                # Attempt to initialize if known but not in drivers (e.g. after a restart)
-                if device_id in self.device_manager.devices:
-                    logger.info(f"Attempting to initialize device {device_id} for task.")
-                    if not self.device_manager.initialize_device(device_id):
-                        logger.error(f"Failed to initialize device {device_id} for task.")
-                        return {"success": False, "error": f"Device {device_id} could not be initialized."}
-                    driver = self.device_manager.drivers.get(device_id)
-                    if not driver:
-                         logger.error(f"Driver not available for {device_id} even after init attempt.")
-                         return {"success": False, "error": f"Driver for {device_id} unavailable."}
-                else: # Device ID is not even in the known devices list
-                    logger.error(f"Device {device_id} is not a known device.")
-                    return {"success": False, "error": f"Device {device_id} not a known device"}
-
-            driver = self.device_manager.drivers[device_id] # Now get the driver
         
+        try:
+            return self._execute_on_device(task_name, device_id, driver, device_info, **kwargs)
+        finally:
+            self.device_manager.release_device(device_id)
+    
+    def _execute_on_device(self, task_name, device_id, driver, device_info=None, **kwargs):
+        """Run a task on a device the caller has claimed (see execute_task)"""
         # Get device info (which now includes screen dimensions and model from config)
         # If device_info was provided as parameter, use it instead of trying to fetch
+        if device_info is None:
+            device_info = self.device_manager.devices.get(device_id)
         if device_info is None:
             logger.error(f"No device info provided for {device_id}")
-            if _device_id_to_release: # Release if we acquired it
-                self.device_manager.release_device(_device_id_to_release)
             return {"success": False, "error": f"No device info provided for {device_id}"}
 
-        # Load the UI map for this specific device model
-        if not self._load_ui_map_for_device(device_info):
+        # Look up the (cached) UI map for this specific device model
+        ui_map = self._load_ui_map_for_device(device_info)
+        if not ui_map:
             logger.error(f"Failed to load UI map for device {device_id} (model: {device_info.get('config', {}).get('model', 'N/A')}). Cannot proceed with UI-dependent task.")
-            if _device_id_to_release: # Release if we acquired it
-                self.device_manager.release_device(_device_id_to_release)
             return {"success": False, "error": "Failed to load UI map for the device model."}
 
+        # Everything the task needs travels in its own context, so concurrent
+        # tasks on other devices can't swap the driver or map underneath it
+        ctx = TaskContext(device_id, driver, device_info, ui_map)
+        account = kwargs.pop('account', None)
+        switch_result = None
+        result = None
+        task_started = time.perf_counter()
+        span = self.tracer.start_span(task_name, TASK, device_id=device_id, server=device_info.get('server'),
+                                      account=account)
+
         try:
-            # Execute the appropriate task
+            # Tasks addressed to an account first make sure it's the one on screen
+            if account and task_name != "switch_account" and self.accounts.active_account(device_id) != account:
+                switch_result = self.switch_account(ctx, username=account)
+                if not switch_result.get("success"):
+                    return switch_result
+                self.planner.record_switch(device_id, switch_result["duration"])
+            
+            # Execute the appropriate task: a built-in one, else a task definition
             if task_name == "open_instagram":
-                result = self.open_instagram(driver, device_info, **kwargs)
+                result = self.open_instagram(ctx, **kwargs)
             elif task_name == "go_to_profile":
-                result = self.go_to_profile(driver, device_info, **kwargs)
+                result = self.go_to_profile(ctx, **kwargs)
             elif task_name == "scroll_feed":
-                result = self.scroll_feed(driver, device_info, **kwargs)
+                result = self.scroll_feed(ctx, **kwargs)
             elif task_name == "setup_device":
-                result = self.setup_device(driver, device_info, **kwargs)
+                result = self.setup_device(ctx, **kwargs)
+            elif task_name == "switch_account":
+                result = self.switch_account(ctx, **dict(kwargs, username=kwargs.get('username', account)))
             else:
-                result = {"success": False, "error": f"Unknown task: {task_name}"}
+                result = self.run_definition(ctx, task_name, **kwargs)
                 
+            if switch_result:
+                result["account_switch"] = {"account": account, "duration": switch_result["duration"]}
+            
             # If not successful, log the error
             if not result.get("success", False):
                 logger.error(f"Task {task_name} failed: {result.get('error', 'Unknown error')}")
@@ -260,46 +377,91 @@ class InstagramTaskRunner:
             logger.exception(f"Error executing task {task_name}")
             result = {"success": False, "error": str(e)}
         finally:
-            # Release the device if we acquired one for this task
-            if _device_id_to_release: # Use the tracked ID for release
-                self.device_manager.release_device(_device_id_to_release)
+            self._record_task(task_name, ctx, time.perf_counter() - task_started, result)
+            outcome = result or switch_result or {}
+            self.tracer.end_span(span, error=None if outcome.get("success") else outcome.get("error", "Task failed"))
         
         return result
                 
-    def open_instagram(self, driver, device_info, **kwargs):
+    def _record_task(self, task_name, ctx, seconds, result):
+        server = ctx.device_info.get('server')
+        success = bool(result and result.get("success"))
+        self._task_seconds.observe(seconds, task=task_name, device=ctx.device_id, server=server,
+                                   outcome='success' if success else 'failure')
+        if not success:
+            self._task_failures.inc(task=task_name, device=ctx.device_id, server=server)
+    
+    def run_definition(self, ctx, task_name, **kwargs):
+        """Run a declarative task, compiled for the device's UI map on first use"""
+        try:
+            plan = self.task_library.compile(task_name, ctx.ui_map)
+        except TaskDefinitionError as e:
+            return {"success": False, "error": str(e)}
+        if plan is None:
+            return {"success": False, "error": f"Unknown task: {task_name}"}
+        return self.engine.run(ctx, plan, self._screen_size(ctx), params=kwargs)
+    
+    def available_tasks(self):
+        """Built-in and declarative tasks, with each definition's params or load error"""
+        tasks = [{"name": name, "description": description, "source": "builtin"}
+                 for name, description in self.BUILTIN_TASKS.items()]
+        definitions, errors = self.task_library.definitions()
+        for definition in definitions:
+            if definition.name in self.BUILTIN_TASKS:
+                logger.warning(f"Task definition {definition.name} is shadowed by the built-in task")
+                continue
+            tasks.append({"name": definition.name, "description": definition.description, "source": "definition",
+                          "params": definition.params})
+        for name, error in errors.items():
+            tasks.append({"name": name, "source": "definition", "error": error})
+        return tasks
+    
+    def _run_stage(self, stage, fn, *args, **kwargs):
+        """Call one stage of a multi-stage task, recording it as a 'stage' span"""
+        with self.tracer.span(stage, STAGE, require_parent=True) as span:
+            result = fn(*args, **kwargs)
+            if span is not None and not result.get("success"):
+                span.fail(result.get("error"))
+            return result
+    
+    def open_instagram(self, ctx, **kwargs):
         """Open Instagram app"""
-        logger.info(f"Opening Instagram on {device_info['config']['name']}")
+        logger.info(f"Opening Instagram on {ctx.name}")
         
         try:
             # For iOS, the app should already launch through desired capabilities
             # For Android, we can use this to relaunch the app if needed
-            if device_info['config']['platformName'].lower() == 'android':
-                driver.activate_app('com.instagram.android')
+            if ctx.platform_name.lower() == 'android':
+                ctx.driver.activate_app('com.instagram.android')
             else:
-                driver.activate_app('com.burbn.instagram')
+                ctx.driver.activate_app('com.burbn.instagram')
                 
-            # Wait for app to load
-            time.sleep(random.uniform(2, 4))
+            # Continue as soon as the home feed is on screen
+            screen_ready = self._wait_for_screen(ctx, "initial_screen_before_profile", **kwargs)
+            if not screen_ready:
+                return {"success": False, "error": "Timed out waiting for the home feed", "screen_ready": False}
             
-            return {"success": True}
+            return {"success": True, "screen_ready": screen_ready}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def go_to_profile(self, driver, device_info, **kwargs):
+    def go_to_profile(self, ctx, **kwargs):
         """Navigate to the profile page"""
-        logger.info(f"Navigating to profile on {device_info['config']['name']}")
+        logger.info(f"Navigating to profile on {ctx.name}")
         
         try:
             # Tap on the profile tab using the UI map
-            tap_result = self._tap_on_element_from_map(driver, "initial_screen_before_profile", "profile-tab_Profile")
+            tap_result = self._tap_on_element_from_map(ctx, "initial_screen_before_profile", "profile-tab_Profile")
             
             if tap_result and tap_result.get("success"):
                 logger.info("Successfully tapped on profile tab")
                 
-                # Wait for profile to load
-                time.sleep(random.uniform(1, 2))
+                # Continue as soon as the profile header is on screen
+                screen_ready = self._wait_for_screen(ctx, "profile_screen_details", **kwargs)
+                if not screen_ready:
+                    return {"success": False, "error": "Timed out waiting for the profile screen", "screen_ready": False}
                 
-                return {"success": True}
+                return {"success": True, "screen_ready": screen_ready}
             else:
                 error_message = tap_result.get("error") if tap_result else "Unknown error"
                 logger.error(f"Failed to tap on profile tab: {error_message}")
@@ -308,72 +470,77 @@ class InstagramTaskRunner:
             logger.exception("Error navigating to profile")
             return {"success": False, "error": str(e)}
     
-    def scroll_feed(self, driver, device_info, iterations=5, **kwargs):
+    def scroll_feed(self, ctx, iterations=5, **kwargs):
         """Scroll through the feed"""
-        device_name = device_info['config']['name']
+        device_name = ctx.name
         logger.info(f"Scrolling feed on {device_name}, {iterations} iterations")
         
         try:
             # First go to home feed if not already there
-            if self.tap_element(driver, "initial_screen", "home", device_info):
+            if self.tap_element(ctx, "initial_screen", "home"):
                 logger.info(f"Tapped on home icon on {device_name}")
             
             # Wait for feed to load
-            time.sleep(random.uniform(1, 2))
+            self._wait_for_screen(ctx, "initial_screen_before_profile", **kwargs)
             
-            # Scroll down several times
-            for i in range(iterations):
-                logger.info(f"Scroll iteration {i+1}/{iterations} on {device_name}")
-                self.scroll_down(driver, device_info)
+            # Queue every scroll and the pauses between them, then send them in as few calls as possible
+            batch = self.gesture_batch(ctx)
+            for _ in range(iterations):
+                batch.scroll_down()
                 
                 # Random pause between scrolls (2-5 seconds)
-                time.sleep(random.uniform(2, 5))
-                
-            return {"success": True, "iterations_completed": iterations}
+                batch.pause(2, 5)
+            report = batch.perform()
+            
+            # Each iteration is a swipe plus a pause
+            completed = report.completed // 2
+            logger.info(f"Scrolled {completed}/{iterations} times on {device_name} in {report.calls} calls "
+                        f"({report.elapsed:.1f}s, {report.overhead:.1f}s overhead)")
+            if report.error:
+                return {"success": False, "error": report.error, "iterations_completed": completed,
+                        "gestures": report.to_dict()}
+            return {"success": True, "iterations_completed": iterations, "gestures": report.to_dict()}
         except Exception as e:
-            return {"success": False, "error": str(e), "iterations_completed": i}
+            return {"success": False, "error": str(e), "iterations_completed": 0}
             
-    def setup_device(self, driver, device_info, **kwargs):
+    def setup_device(self, ctx, **kwargs):
         """
         Sets up a device by opening Instagram, navigating to the profile,
         tapping the username to open the account switcher, scraping account names,
         and storing them.
         """
-        device_name = device_info['config']['name']
+        device_name = ctx.name
         logger.info(f"Starting device setup task for {device_name}")
 
         try:
             # Step 1: Open Instagram
-            open_result = self.open_instagram(driver, device_info, **kwargs)
+            open_result = self._run_stage("open_instagram", self.open_instagram, ctx, **kwargs)
             if not open_result.get("success"):
                 err_msg = f"Failed to open Instagram on {device_name}: {open_result.get('error')}"
                 logger.error(err_msg)
                 return {"success": False, "error": err_msg, "stage": "open_instagram"}
             logger.info(f"Successfully opened Instagram on {device_name}")
-            time.sleep(random.uniform(1, 2))
 
             # Step 2: Go to Profile
-            profile_result = self.go_to_profile(driver, device_info, **kwargs)
+            profile_result = self._run_stage("go_to_profile", self.go_to_profile, ctx, **kwargs)
             if not profile_result.get("success"):
                 err_msg = f"Failed to navigate to profile on {device_name}: {profile_result.get('error')}"
                 logger.error(err_msg)
                 return {"success": False, "error": err_msg, "stage": "go_to_profile"}
             logger.info(f"Successfully navigated to profile on {device_name}")
-            time.sleep(random.uniform(1, 2))
 
             # Step 3: Tap Profile Username
             logger.info(f"Attempting to tap profile username on {device_name} to open account switcher...")
-            tapped_username_result = self.tap_profile_username(driver, device_info)
+            tapped_username_result = self._run_stage("tap_profile_username", self.tap_profile_username, ctx, **kwargs)
             if not tapped_username_result.get("success"):
                 err_msg = f"Failed to tap profile username on {device_name}: {tapped_username_result.get('error')}"
                 logger.error(err_msg)
                 return {"success": False, "error": err_msg, "stage": "tap_profile_username"}
             logger.info(f"Successfully tapped profile username on {device_name}")
-            time.sleep(random.uniform(2, 3)) # Wait for account switcher to appear
 
             # Step 4: Scrape Account Names from Switcher
             logger.info(f"Attempting to scrape account names from switcher on {device_name}...")
-            scraped_accounts_result = self.scrape_account_names_from_switcher(driver, device_info)
+            scraped_accounts_result = self._run_stage("scrape_account_names", self.scrape_account_names_from_switcher, ctx)
             if not scraped_accounts_result.get("success"):
                 err_msg = f"Failed to scrape account names on {device_name}: {scraped_accounts_result.get('error')}"
                 logger.error(err_msg)
@@ -388,9 +555,9 @@ class InstagramTaskRunner:
 
             # Step 5: Store Discovered Accounts
             if discovered_accounts:
-                device_udid = device_info['config']['udid']  # Extract device_udid from device_info
+                device_udid = ctx.config.get('udid', ctx.device_id)
                 logger.info(f"Storing discovered accounts for device {device_udid}...")
-                store_result = self.store_discovered_accounts(device_udid, discovered_accounts)
+                store_result = self._run_stage("store_accounts", self.store_discovered_accounts, device_udid, discovered_accounts)
                 if not store_result.get("success"):
                     logger.error(f"Failed to store discovered accounts for {device_udid}: {store_result.get('error')}")
                     # This might not be a fatal error for the whole task, but we should report it
@@ -404,6 +571,200 @@ class InstagramTaskRunner:
             logger.exception(f"Error during setup_device task for {device_name}")
             return {"success": False, "error": str(e), "stage": "unknown"}
     
+    def submit_account_task(self, username, task_name, repeat_interval=None, priority=0, deadline=None, **kwargs):
+        """
+        Queue a task for an account on the device it's signed in on.
+        
+        Before the task runs, the device is switched to the account if another one is active.
+        One-off jobs wait in a per-device queue that the BatchPlanner orders to
+        minimize account switches, honouring priority and deadline.
+        
+        Args:
+            username: Account to run the task as
+            task_name: Task to run
+            repeat_interval: Seconds between runs for a repeating task (scheduled directly, not batched)
+            priority: Higher-priority jobs run earlier
+            deadline: Seconds from now the job should finish within, or None
+        
+        Returns:
+            Job, or None if the account isn't signed in on any known device
+        """
+        device_id = self.accounts.device_for(username)
+        if not device_id:
+            return None
+        if repeat_interval:
+            return self.submit_task(task_name, device_id, repeat_interval, account=username, **kwargs)
+        
+        params = dict(kwargs, account=username, priority=priority)
+        if deadline is not None:
+            params['deadline'] = deadline
+        job = self.jobs.create(task_name, device_id, params)
+        planned = PlannedJob(
+            job.job_id, username, priority=priority,
+            deadline=job.submitted_at + float(deadline) if deadline is not None else None,
+            duration=self.planner.task_estimate(task_name),
+            payload=(task_name, kwargs)
+        )
+        
+        with self.pending_lock:
+            self._pending.setdefault(device_id, []).append(planned)
+            start_drain = device_id not in self._draining
+            self._draining.add(device_id)
+        if start_drain:
+            self.scheduler.schedule(lambda: self._drain_account_jobs(device_id), device_id=device_id,
+                                    name=f"batch-{device_id}")
+        
+        self._publish_job(job)
+        logger.info(f"Queued job {job.job_id}: {task_name} as {username} on {device_id}")
+        return job
+    
+    def _queued_job_done(self, job_id):
+        """True if a queued account job no longer needs to run (finished, cancelled or evicted)"""
+        job = self.jobs.get(job_id)
+        return job is None or job.finished
+    
+    def _drain_account_jobs(self, device_id):
+        """Run a device's queued account jobs, re-planning before each one so new arrivals are batched too"""
+        report = None
+        try:
+            while True:
+                with self.pending_lock:
+                    pending = [p for p in self._pending.get(device_id, []) if not self._queued_job_done(p.job_id)]
+                    if not pending:
+                        self._pending.pop(device_id, None)
+                        self._draining.discard(device_id)
+                        break
+                    plan = self.planner.plan(pending, self.accounts.active_account(device_id), device_id)
+                    planned = plan.jobs[0]
+                    self._pending[device_id] = [p for p in pending if p is not planned]
+                
+                if report is None:
+                    report = BatchReport(device_id, plan)
+                    self.batch_reports[device_id] = report
+                    logger.info(f"Batch plan for {device_id}: {len(plan.jobs)} jobs, {plan.switches} account switches "
+                                f"(~{plan.estimated_switch_time:.1f}s switching)")
+                
+                job = self.jobs.mark_running(planned.job_id)
+                if not job or job.state != RUNNING:
+                    continue  # Cancelled while queued
+                self._publish_job(job)
+                
+                task_name, kwargs = planned.payload
+                started = time.time()
+                try:
+                    with self.tracer.span(f"job-{task_name}", JOB, job_id=job.job_id, device_id=device_id,
+                                          account=planned.account) as span:
+                        result = self.execute_task(task_name, device_id, account=planned.account, **kwargs)
+                        if not result.get("success"):
+                            span.fail(result.get("error"))
+                except Exception as e:
+                    logger.exception(f"Job {job.job_id} ({task_name}) failed")
+                    result = {"success": False, "error": str(e)}
+                
+                switch = result.get("account_switch") if isinstance(result, dict) else None
+                elapsed = time.time() - started
+                if switch:
+                    report.record_job(switch["account"], switch["duration"])
+                    elapsed -= switch["duration"]
+                else:
+                    report.record_job()
+                # A failed task stops early (or times out), so its duration says nothing about the task
+                if result.get("success"):
+                    self.planner.record_task(task_name, elapsed)
+                
+                self.jobs.mark_finished(job.job_id, result)
+                self._publish_job(job)
+        except Exception:
+            logger.exception(f"Account job batch on {device_id} stopped early; remaining jobs run with the next one")
+        finally:
+            # Never leave the device marked as draining, or no later account job would start a batch for it
+            with self.pending_lock:
+                self._draining.discard(device_id)
+        
+        if report:
+            report.finish()
+            logger.info(f"Batch on {device_id} finished: {len(report.switches)} switches, "
+                        f"{report.to_dict()['actual_switch_time']:.1f}s actual vs "
+                        f"{report.estimated_switch_time:.1f}s estimated")
+        return report.to_dict() if report else None
+    
+    def submit_task(self, task_name, device_id=None, repeat_interval=None, **kwargs):
+        """
+        Queue a task and return immediately.
+        
+        The task runs on the scheduler's bounded executor, one job at a time per
+        device; its state, timing and result are tracked in self.jobs.
+        
+        Returns:
+            Job: The queued job (see job.job_id / job.to_dict()), or None if device_id
+                 isn't a known device
+        """
+        if device_id and not self._known_device(device_id):
+            logger.error(f"Not queueing {task_name}: {device_id} is not a known device")
+            return None
+        params = dict(kwargs)
+        if repeat_interval:
+            params['repeat_interval'] = repeat_interval
+        job = self.jobs.create(task_name, device_id, params)
+        
+        def run():
+            running = self.jobs.mark_running(job.job_id)
+            if not running or running.state != RUNNING:
+                return None  # Cancelled (or evicted from the store) before it started
+            self._publish_job(job)
+            try:
+                with self.tracer.span(f"job-{task_name}", JOB, job_id=job.job_id, device_id=device_id) as span:
+                    if repeat_interval:
+                        result = self.run_scheduled_task(task_name, device_id, repeat_interval, **kwargs)
+                    else:
+                        result = self.execute_task(task_name, device_id, **kwargs)
+                    if not result.get("success"):
+                        span.fail(result.get("error"))
+            except Exception as e:
+                logger.exception(f"Job {job.job_id} ({task_name}) failed")
+                result = {"success": False, "error": str(e)}
+            self.jobs.mark_finished(job.job_id, result)
+            self._publish_job(job)
+            return result
+        
+        scheduled = self.scheduler.schedule(run, device_id=device_id, name=f"job-{task_name}",
+                                            group=None if device_id else ANY_DEVICE_JOBS)
+        job.scheduler_job_id = scheduled.job_id
+        self._publish_job(job)
+        logger.info(f"Queued job {job.job_id}: {task_name} on {device_id or 'any available device'}")
+        return job
+    
+    def _known_device(self, device_id):
+        """True if a device is configured, whether or not it has a session yet"""
+        return (device_id in self.device_manager.devices
+                or any(d['udid'] == device_id for d in self.device_manager.config['devices']))
+    
+    def _publish_job(self, job):
+        """Announce a job state change (job_queued, job_running, job_succeeded, ...)"""
+        self.device_manager.events.publish(f"job_{job.state}", job_id=job.job_id, task_name=job.task_name,
+                                           device_id=job.device_id, state=job.state,
+                                           queued_for=job.to_dict()['queued_for'], error=job.error)
+    
+    def cancel_job(self, job_id):
+        """Cancel a job that hasn't started yet"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return {"success": False, "error": f"Job {job_id} not found"}
+        if job.finished or job.started_at:
+            return {"success": False, "error": f"Job {job_id} is already {job.state}"}
+        
+        if job.scheduler_job_id:
+            self.scheduler.cancel(job.scheduler_job_id)
+        else:
+            # Account jobs wait in their device's batch queue rather than in the scheduler
+            with self.pending_lock:
+                queued = self._pending.get(job.device_id)
+                if queued:
+                    self._pending[job.device_id] = [p for p in queued if p.job_id != job_id]
+        self.jobs.mark_finished(job_id, {"success": False, "error": "Cancelled"}, state=CANCELLED)
+        self._publish_job(job)
+        return {"success": True}
+    
     def run_scheduled_task(self, task_name, device_id, repeat_interval=None, **kwargs):
         """Run a task and optionally schedule it to repeat"""
         task_key = f"{device_id}_{task_name}"
@@ -417,44 +778,52 @@ class InstagramTaskRunner:
         
         # If repeat interval is set and task was successful, schedule repeating task
         if repeat_interval and result.get("success", False):
-            import threading
-            
-            # Function to run the task repeatedly
-            def run_repeating():
-                while task_key in self.running_tasks:
-                    # Sleep for the interval
-                    time.sleep(repeat_interval)
-                    
-                    # Run the task again
-                    if task_key in self.running_tasks:  # Check again in case it was stopped
-                        try:
-                            self.execute_task(task_name, device_id, **kwargs)
-                        except Exception as e:
-                            logger.error(f"Error in repeating task {task_name}: {e}")
-            
-            # Create and start the thread
-            thread = threading.Thread(target=run_repeating)
-            thread.daemon = True  # Thread will exit when main program exits
-            thread.start()
-            
-            # Store thread reference
-            self.running_tasks[task_key] = {
-                "thread": thread,
-                "interval": repeat_interval,
-                "started_at": time.time()
-            }
+            with self.tasks_lock:
+                if task_key in self.running_tasks:
+                    return {"success": False, "error": f"Task {task_name} is already running on device {device_id}"}
+                
+                # The scheduler re-arms the job after each run and never runs two
+                # jobs for the same device at once
+                job = self.scheduler.schedule(
+                    lambda: self._run_recurring(task_name, device_id, **kwargs),
+                    device_id=device_id,
+                    interval=repeat_interval,
+                    delay=repeat_interval,
+                    name=task_key
+                )
+                
+                self.running_tasks[task_key] = {
+                    "job_id": job.job_id,
+                    "device_id": device_id,
+                    "task_name": task_name,
+                    "interval": repeat_interval,
+                    "started_at": time.time()
+                }
             
+            self.device_manager.events.publish('task_scheduled', task_name=task_name,
+                                               device_id=device_id, interval=repeat_interval)
             result["scheduled"] = True
             
         return result
     
+    def _run_recurring(self, task_name, device_id, **kwargs):
+        """One run of a repeating task"""
+        result = self.execute_task(task_name, device_id, **kwargs)
+        self.device_manager.events.publish('task_run', task_name=task_name, device_id=device_id,
+                                           success=bool(result and result.get("success")))
+        return result
+    
     def stop_scheduled_task(self, task_name, device_id):
         """Stop a repeating task"""
         task_key = f"{device_id}_{task_name}"
         
-        if task_key in self.running_tasks:
-            # Remove from running tasks to signal thread to stop
-            task_info = self.running_tasks.pop(task_key)
+        with self.tasks_lock:
+            task_info = self.running_tasks.pop(task_key, None)
+        
+        if task_info:
+            # Cancelling takes effect immediately; the job is never dispatched again
+            self.scheduler.cancel(task_info["job_id"])
+            self.device_manager.events.publish('task_stopped', task_name=task_name, device_id=device_id)
             
             return {
                 "success": True, 
@@ -468,24 +837,31 @@ class InstagramTaskRunner:
         """Get list of currently running tasks"""
         tasks = {}
         
-        for task_key, task_info in self.running_tasks.items():
-            device_id, task_name = task_key.split('_', 1)
+        with self.tasks_lock:
+            running_tasks = list(self.running_tasks.items())
+        
+        for task_key, task_info in running_tasks:
+            job = self.scheduler.get(task_info["job_id"])
             
             tasks[task_key] = {
-                "device_id": device_id,
-                "task_name": task_name,
+                "device_id": task_info["device_id"],
+                "task_name": task_info["task_name"],
                 "interval": task_info["interval"],
-                "running_for": time.time() - task_info["started_at"]
+                "started_at": task_info["started_at"],
+                "running_for": time.time() - task_info["started_at"],
+                "next_run": job.next_run if job else None,
+                "run_count": job.run_count if job else 0
             }
             
         return tasks 
 
-    def _tap_on_element_from_map(self, driver, screen_name, element_key):
+    @traced(GESTURE, 'tap_element_from_map', arguments=('screen_name', 'element_key'))
+    def _tap_on_element_from_map(self, ctx, screen_name, element_key):
         """
         Taps on an element from the UI map based on its coordinates.
         
         Args:
-            driver: The Appium driver
+            ctx: The TaskContext of the running task
             screen_name: The screen section in the UI map
             element_key: The element key to tap on
             
@@ -494,26 +870,23 @@ class InstagramTaskRunner:
         """
         logger.info(f"Attempting to tap on '{element_key}' in screen '{screen_name}'")
         
-        if not self.ui_map:
+        if not ctx.ui_map:
             logger.error("UI map is not loaded")
             return {"success": False, "error": "UI map not loaded"}
             
-        screen_map = self.ui_map.get(screen_name)
+        screen_map = ctx.ui_map.get(screen_name)
         if not screen_map:
             logger.error(f"Screen '{screen_name}' not found in UI map")
             return {"success": False, "error": f"Screen '{screen_name}' not found in UI map"}
             
-        element_data = screen_map.get(element_key)
+        # Single index lookup: exact key, else the first key containing element_key
+        resolved_key, element_data = ctx.ui_map.index.resolve(screen_name, element_key)
         if not element_data:
-            # Try to find element keys that contain the element_key string
-            matching_keys = [k for k in screen_map.keys() if element_key in k]
-            if matching_keys:
-                logger.info(f"Element '{element_key}' not found, but found possible matches: {matching_keys}")
-                element_key = matching_keys[0]  # Use the first matching key
-                element_data = screen_map.get(element_key)
-            else:
-                logger.error(f"Element '{element_key}' not found in '{screen_name}' screen")
-                return {"success": False, "error": f"Element '{element_key}' not found"}
+            logger.error(f"Element '{element_key}' not found in '{screen_name}' screen")
+            return {"success": False, "error": f"Element '{element_key}' not found"}
+        if resolved_key != element_key:
+            logger.info(f"Element '{element_key}' not found, using closest match '{resolved_key}'")
+            element_key = resolved_key
         
         try:
             # Extract coordinates from UI map
@@ -521,9 +894,7 @@ class InstagramTaskRunner:
             y = int(element_data.get("y", 0)) + int(element_data.get("height", 0)) // 2
             
             # Add small random offset for more human-like behavior
-            window_size = driver.get_window_size()
-            device_width = window_size['width']
-            device_height = window_size['height']
+            device_width, device_height = self._screen_size(ctx)
             
             x_offset = random.randint(-int(device_width * 0.02), int(device_width * 0.02))
             y_offset = random.randint(-int(device_height * 0.02), int(device_height * 0.02))
@@ -536,7 +907,7 @@ class InstagramTaskRunner:
             logger.info(f"Tapping at coordinates ({x}, {y}) for element '{element_key}' using mobile gestures")
             
             # Use mobile: gesture commands which are supported by iOS 18 and Appium 2.x
-            driver.execute_script('mobile: tap', {
+            ctx.driver.execute_script('mobile: tap', {
                 'x': x,
                 'y': y
             })
@@ -549,36 +920,84 @@ class InstagramTaskRunner:
             logger.exception(f"Error tapping on '{element_key}'")
             return {"success": False, "error": str(e)}
 
-    def tap_profile_username(self, driver, device_info):
+    def switch_account(self, ctx, username=None, **kwargs):
+        """Switch the device to another signed-in account through the profile account switcher"""
+        if not username:
+            return {"success": False, "error": "Missing required parameter: username"}
+        if username not in self.accounts.accounts_for(ctx.device_id):
+            return {"success": False, "error": f"Account {username} is not signed in on {ctx.name}"}
+        
+        logger.info(f"Switching {ctx.name} to account {username}")
+        started = time.time()
+        # Until the switch completes we don't know which account is showing
+        self.accounts.clear_active(ctx.device_id)
+        
+        profile_result = self._run_stage("go_to_profile", self.go_to_profile, ctx, **kwargs)
+        if not profile_result.get("success"):
+            return {"success": False, "error": f"Could not open profile: {profile_result.get('error')}", "stage": "go_to_profile"}
+        
+        switcher_result = self._run_stage("open_switcher", self.tap_profile_username, ctx, **kwargs)
+        if not switcher_result.get("success"):
+            return {"success": False, "error": f"Could not open account switcher: {switcher_result.get('error')}", "stage": "open_switcher"}
+        
+        tap_result = self._run_stage("select_account", self._select_account, ctx, username)
+        if not tap_result.get("success"):
+            return {"success": False, "error": f"Could not select account {username}: {tap_result.get('error')}", "stage": "select_account"}
+        
+        # Only an account we saw the profile come back for is recorded as active
+        if not self._wait_for_screen(ctx, "profile_screen_details", **kwargs):
+            return {"success": False, "error": f"Timed out waiting for the profile of {username}",
+                    "stage": "confirm_account", "screen_ready": False}
+        self.accounts.set_active(ctx.device_id, username)
+        return {"success": True, "account": username, "screen_ready": True, "duration": time.time() - started}
+
+    def _select_account(self, ctx, username):
+        """Tap an account's row in the open account switcher"""
+        # Rows are labelled "<username>, Shared access"; use the mapped position when the crawler saw this
+        # account, otherwise find the row on the live screen
+        key, _ = ctx.ui_map.index.resolve("account_switcher_details", f"{username},_") if ctx.ui_map else (None, None)
+        if key and key.startswith(f"{username},"):
+            return self._tap_on_element_from_map(ctx, "account_switcher_details", key)
+        try:
+            ctx.driver.find_element(ACCESSIBILITY_ID, f"{username}, Shared access").click()
+            return {"success": True}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    def tap_profile_username(self, ctx, **kwargs):
         """Taps on the profile username at the top of the profile screen to open the account switcher."""
         # The key for the profile username button in 'profile_screen_details'
         # Based on the user's instagram_ios_ui_map.json, this is "user-switch-title-button"
         element_key = "user-switch-title-button"
         screen_name = "profile_screen_details" # This screen should contain the username button
 
-        logger.info(f"Attempting to tap '{element_key}' on screen '{screen_name}' for device {device_info.get('name', 'Unknown')}")
+        logger.info(f"Attempting to tap '{element_key}' on screen '{screen_name}' for device {ctx.name}")
 
-        tap_result = self._tap_on_element_from_map(driver, screen_name, element_key)
+        tap_result = self._tap_on_element_from_map(ctx, screen_name, element_key)
         if tap_result and tap_result.get("success"):
             logger.info(f"Successfully tapped on '{element_key}'.")
-            return {"success": True, "message": f"Tapped on {element_key}"}
+            # Continue as soon as the account switcher sheet is up
+            screen_ready = self._wait_for_screen(ctx, "account_switcher_details", **kwargs)
+            if not screen_ready:
+                return {"success": False, "error": "Timed out waiting for the account switcher", "screen_ready": False}
+            return {"success": True, "message": f"Tapped on {element_key}", "screen_ready": screen_ready}
         else:
             error_message = tap_result.get("error") if tap_result else "Element not found or tap failed"
             logger.error(f"Failed to tap on '{element_key}': {error_message}")
             return {"success": False, "error": error_message}
 
-    def scrape_account_names_from_switcher(self, driver, device_info):
+    def scrape_account_names_from_switcher(self, ctx):
         """
         Scrapes account names from the account switcher UI using the mapped elements.
         """
-        device_name = device_info.get('name', 'Unknown')
+        device_name = ctx.name
         logger.info(f"Attempting to scrape account names from switcher on {device_name} using UI map...")
 
-        if not self.ui_map:
+        if not ctx.ui_map:
             logger.error("UI map is not loaded. Cannot scrape account names.")
             return {"success": False, "error": "UI map not loaded."}
 
-        account_switcher_screen_map = self.ui_map.get("account_switcher_details")
+        account_switcher_screen_map = ctx.ui_map.get("account_switcher_details")
         if not account_switcher_screen_map:
             logger.error("'account_switcher_details' not found in UI map. Cannot scrape accounts.")
             logger.error("Please ensure the crawler has successfully mapped this screen.")
@@ -589,13 +1008,12 @@ class InstagramTaskRunner:
         try:
             # Look specifically for account buttons in the switcher
             # For iPhone 13 Pro Max UI map, these are the buttons like "morgancryerthequeen, Shared access"
-            account_buttons = []
-            
-            for element_key, element_data in account_switcher_screen_map.items():
-                if (element_data.get("type") == "XCUIElementTypeButton" and 
-                    "Shared access" in element_data.get("label", "") and 
-                    element_data.get("visible") == "true"):
-                    account_buttons.append(element_data)
+            account_buttons = ctx.ui_map.index.query(
+                "account_switcher_details",
+                type="XCUIElementTypeButton",
+                label_contains="Shared access",
+                visible=True
+            )
             
             logger.info(f"Found {len(account_buttons)} account buttons in the switcher")
             
@@ -612,15 +1030,15 @@ class InstagramTaskRunner:
             if not discovered_accounts:
                 # Fallback: try to find account names by other patterns in the UI map
                 logger.info("No accounts found with preferred method, trying fallback...")
-                for element_key, element_data in account_switcher_screen_map.items():
+                for element_data in ctx.ui_map.index.query("account_switcher_details", label_contains="account", ignore_case=True):
                     label = element_data.get("label", "")
-                    if "Instagram account" in label or "account" in label.lower():
+                    if label:
                         # This might be a button related to account management
                         logger.info(f"Found potential account element: {label}")
                         if element_data.get("visible") == "true":
                             # Try to tap on this to see more accounts
                             element_name = element_data.get("name", "")
-                            self._tap_on_element_from_map(driver, "account_switcher_details", element_name)
+                            self._tap_on_element_from_map(ctx, "account_switcher_details", element_name)
                             time.sleep(1.5)  # Wait for UI to update
                 
             return {
@@ -642,6 +1060,17 @@ class InstagramTaskRunner:
         if not device_udid or not isinstance(accounts_list, list):
             return {"success": False, "error": "Invalid device_udid or accounts_list provided."}
 
+        if self.device_manager.store:
+            # One transaction replacing just this device's rows, safe against concurrent setups
+            try:
+                self.device_manager.store.set_accounts(device_udid, accounts_list)
+            except Exception as e:
+                logger.error(f"Error storing accounts for {device_udid}: {e}")
+                return {"success": False, "error": f"Error storing managed accounts: {str(e)}"}
+            logger.info(f"Stored {len(accounts_list)} accounts for device {device_udid}: {accounts_list}")
+            self.device_manager.events.publish('accounts_updated', device_id=device_udid, accounts=list(accounts_list))
+            return {"success": True}
+
         config_dir = os.path.join(os.path.dirname(__file__), '..', 'config')
         if not os.path.exists(config_dir):
             try:
@@ -673,6 +1102,7 @@ class InstagramTaskRunner:
             with open(managed_accounts_path, 'w') as f:
                 json.dump(all_managed_accounts, f, indent=4)
             logger.info(f"Successfully stored accounts for {device_udid} in {managed_accounts_path}")
+            self.device_manager.events.publish('accounts_updated', device_id=device_udid, accounts=list(accounts_list))
             return {"success": True}
         except Exception as e:
             logger.error(f"Error writing to {managed_accounts_path}: {e}")
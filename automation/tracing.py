@@ -0,0 +1,312 @@
+import json
+import time
+import uuid
+import logging
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TRACES = 200  # finished traces kept, oldest evicted first
+DEFAULT_MAX_SPANS = 5000  # spans kept per trace; a runaway recurring task can't eat memory
+
+# Span kinds, outermost first
+JOB = 'job'
+TASK = 'task'
+STAGE = 'stage'
+WAIT = 'wait'
+GESTURE = 'gesture'
+COMMAND = 'command'
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ('span_id', 'trace_id', 'parent_id', 'name', 'kind', 'start', 'end', 'thread_id', 'attributes',
+                 'status', 'error')
+
+    def __init__(self, trace_id, parent_id, name, kind, attributes):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time()
+        self.end = None
+        self.thread_id = threading.get_ident()
+        self.attributes = attributes
+        self.status = 'ok'
+        self.error = None
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def fail(self, error=None):
+        """Mark the span as failed without raising (e.g. a stage that returned success=False)"""
+        self.status = 'error'
+        self.error = str(error) if error is not None else None
+
+    def to_dict(self):
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start': self.start,
+            'end': self.end,
+            'duration': self.duration,
+            'attributes': self.attributes,
+            'status': self.status,
+            'error': self.error
+        }
+
+
+class Trace:
+    """The spans recorded under one root span"""
+
+    def __init__(self, root):
+        self.trace_id = root.trace_id
+        self.root = root
+        self.spans = [root]
+        self.dropped = 0
+
+    @property
+    def job_id(self):
+        return self.root.attributes.get('job_id')
+
+    @property
+    def device_id(self):
+        # Jobs queued for any available device only learn it when their task starts
+        for span in self.spans[:3]:
+            if span.attributes.get('device_id'):
+                return span.attributes['device_id']
+        return None
+
+    @property
+    def finished(self):
+        return self.root.end is not None
+
+    def summary(self):
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'kind': self.root.kind,
+            'job_id': self.job_id,
+            'device_id': self.device_id,
+            'start': self.root.start,
+            'duration': self.root.duration,
+            'finished': self.finished,
+            'status': self.root.status,
+            'spans': len(self.spans),
+            'dropped_spans': self.dropped
+        }
+
+    def to_dict(self):
+        return dict(self.summary(), spans=[span.to_dict() for span in self.spans])
+
+
+class Tracer:
+    """
+    Records nested spans (job -> task -> stage -> gesture -> driver command).
+
+    Spans nest per thread: a span started while another is open on the same
+    thread becomes its child, and a span started with nothing open starts a
+    new trace. Instrumentation below task level passes require_parent=True,
+    so background work (health probes, session setup) doesn't fill the
+    buffer with one-span traces.
+
+    Traces live in a ring buffer of the most recent max_traces and can be
+    exported in the Chrome trace event format (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, max_traces=DEFAULT_MAX_TRACES, max_spans=DEFAULT_MAX_SPANS):
+        """
+        Args:
+            max_traces: Traces kept; the oldest finished ones are evicted first
+            max_spans: Spans kept per trace; later ones are counted but dropped
+        """
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self._traces = OrderedDict()  # trace_id -> Trace, oldest first
+        self._local = threading.local()
+        self.lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_span(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def start_span(self, name, kind=TASK, require_parent=False, **attributes):
+        """
+        Open a span on the current thread; close it with end_span().
+
+        Returns:
+            Span, or None if require_parent is set and no span is open
+        """
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        if parent is None and require_parent:
+            return None
+        attributes = {key: value for key, value in attributes.items() if value is not None}
+
+        if parent is None:
+            span = Span(uuid.uuid4().hex, None, name, kind, attributes)
+            with self.lock:
+                self._traces[span.trace_id] = Trace(span)
+                self._evict()
+        else:
+            span = Span(parent.trace_id, parent.span_id, name, kind, attributes)
+            with self.lock:
+                trace = self._traces.get(span.trace_id)
+                if trace is not None:
+                    if len(trace.spans) < self.max_spans:
+                        trace.spans.append(span)
+                    else:
+                        trace.dropped += 1
+        stack.append(span)
+        return span
+
+    def end_span(self, span, error=None):
+        """Close a span opened with start_span(), marking it failed if error is given"""
+        if span is None:
+            return
+        span.end = time.time()
+        if error is not None:
+            span.fail(error)
+        stack = self._stack()
+        if span in stack:
+            # Anything opened inside and never closed ends with it
+            while stack:
+                if stack.pop() is span:
+                    break
+
+    def span(self, name, kind=TASK, require_parent=False, **attributes):
+        """Context manager around start_span()/end_span(); yields the Span (or None)"""
+        return _SpanContext(self, name, kind, require_parent, attributes)
+
+    def _evict(self):
+        """Drop the oldest finished traces beyond max_traces. Must hold self.lock."""
+        excess = len(self._traces) - self.max_traces
+        if excess <= 0:
+            return
+        for trace_id in [t.trace_id for t in self._traces.values() if t.finished][:excess]:
+            del self._traces[trace_id]
+
+    # --- queries ---
+
+    def get(self, trace_id):
+        return self._traces.get(trace_id)
+
+    def traces(self, job_id=None, device_id=None, limit=None):
+        """Recorded traces, newest first, optionally only those of one job or device"""
+        with self.lock:
+            traces = list(self._traces.values())
+        traces.reverse()
+        if job_id is not None:
+            traces = [t for t in traces if t.job_id == job_id]
+        if device_id is not None:
+            traces = [t for t in traces if t.device_id == device_id]
+        return traces[:limit] if limit else traces
+
+    # --- export ---
+
+    @staticmethod
+    def to_chrome_trace(traces):
+        """
+        Convert traces to the Chrome trace event format.
+
+        Each trace shows as its own process, named after its root span, with
+        one track per thread; span attributes appear as event args.
+        """
+        events = []
+        for pid, trace in enumerate(traces, start=1):
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                           'args': {'name': f"{trace.root.name} ({trace.trace_id[:8]})"}})
+            for span in list(trace.spans):
+                args = dict(span.attributes, kind=span.kind, status=span.status)
+                if span.error:
+                    args['error'] = span.error
+                events.append({
+                    'name': span.name,
+                    'cat': span.kind,
+                    'ph': 'X',
+                    'ts': span.start * 1e6,
+                    'dur': span.duration * 1e6,
+                    'pid': pid,
+                    'tid': span.thread_id,
+                    'args': args
+                })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path, traces=None):
+        """Write traces (default: all recorded) to a Chrome trace JSON file; returns the path"""
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(self.traces() if traces is None else traces), f, default=str)
+        logger.info(f"Exported traces to {path}")
+        return path
+
+
+class _SpanContext:
+    __slots__ = ('tracer', 'name', 'kind', 'require_parent', 'attributes', 'span')
+
+    def __init__(self, tracer, name, kind, require_parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.require_parent = require_parent
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.tracer.start_span(self.name, self.kind, self.require_parent, **self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.end_span(self.span, error=exc if exc_type else None)
+        return False
+
+
+def traced(kind, name=None, arguments=()):
+    """
+    Method decorator that records a span around the call, using self.tracer.
+
+    Only records inside an existing trace, so helpers called outside a task
+    don't start traces of their own. A dict result with success=False marks
+    the span failed.
+
+    Args:
+        kind: Span kind (STAGE, GESTURE, ...)
+        name: Span name (default: the method name)
+        arguments: Names of call arguments to record as span attributes
+    """
+    def decorate(fn):
+        span_name = name or fn.__name__
+        signature = inspect.signature(fn) if arguments else None
+
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, 'tracer', None)
+            if tracer is None or tracer.current_span() is None:
+                return fn(self, *args, **kwargs)
+            attributes = {}
+            if signature is not None:
+                bound = signature.bind_partial(self, *args, **kwargs).arguments
+                attributes = {arg: bound[arg] for arg in arguments if arg in bound}
+            with tracer.span(span_name, kind, require_parent=True, **attributes) as span:
+                result = fn(self, *args, **kwargs)
+                if isinstance(result, dict) and result.get('success') is False:
+                    span.fail(result.get('error'))
+                return result
+        return wrapper
+    return decorate
@@ -0,0 +1,131 @@
+import os
+import json
+import logging
+import threading
+from types import MappingProxyType
+from automation.ui_map_index import UIMapIndex
+
+logger = logging.getLogger(__name__)
+
+# Standard name for the map file inside ui_maps/<model>/
+UI_MAP_FILENAME = "instagram_map.json"
+
+
+def _freeze(value):
+    """Recursively convert parsed JSON into read-only containers"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class UIMap:
+    """Immutable UI map for a single device model"""
+
+    def __init__(self, model, path, mtime, screens):
+        """
+        Args:
+            model: Device model the map belongs to (e.g. 'iphone16_pro')
+            path: Path of the JSON file the map was loaded from
+            mtime: Modification time of the file when it was loaded
+            screens: Parsed map contents (screen name -> element key -> element data)
+        """
+        self.model = model
+        self.path = path
+        self.mtime = mtime
+        self.screens = _freeze(screens)
+        self.index = UIMapIndex(self.screens)
+
+    def get(self, screen_name, default=None):
+        return self.screens.get(screen_name, default)
+
+    def keys(self):
+        return self.screens.keys()
+
+    def __getitem__(self, screen_name):
+        return self.screens[screen_name]
+
+    def __contains__(self, screen_name):
+        return screen_name in self.screens
+
+    def __len__(self):
+        return len(self.screens)
+
+    def __repr__(self):
+        return f"<UIMap model={self.model} screens={len(self.screens)}>"
+
+
+class UIMapCache:
+    """Loads per-model UI maps once and reuses them until the file changes on disk"""
+
+    def __init__(self, ui_maps_dir=None):
+        """
+        Initialize the cache
+
+        Args:
+            ui_maps_dir: Directory holding one sub-directory per device model
+                         (defaults to ui_maps/ at the project root)
+        """
+        if ui_maps_dir is None:
+            project_root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            ui_maps_dir = os.path.join(project_root_dir, "ui_maps")
+        self.ui_maps_dir = ui_maps_dir
+        self._maps = {}  # model -> UIMap
+        self.lock = threading.Lock()
+
+    def map_path(self, model):
+        """Path of the UI map file for a device model"""
+        return os.path.join(self.ui_maps_dir, model, UI_MAP_FILENAME)
+
+    def get(self, model):
+        """
+        Get the UI map for a device model.
+
+        The file is only parsed on first use or when its mtime changes, so
+        repeated calls cost a single stat().
+
+        Returns:
+            UIMap or None if the map is missing or invalid
+        """
+        map_path = self.map_path(model)
+        try:
+            mtime = os.stat(map_path).st_mtime
+        except OSError:
+            logger.error(f"UI map file not found for model {model} at {map_path}")
+            with self.lock:
+                self._maps.pop(model, None)
+            return None
+
+        cached = self._maps.get(model)
+        if cached is not None and cached.mtime == mtime:
+            return cached
+
+        with self.lock:
+            # Another thread may have loaded it while we waited for the lock
+            cached = self._maps.get(model)
+            if cached is not None and cached.mtime == mtime:
+                return cached
+
+            try:
+                with open(map_path, 'r') as f:
+                    screens = json.load(f)
+            except json.JSONDecodeError as e:
+                logger.error(f"Error decoding JSON from UI map file {map_path}: {e}")
+                return None
+            except Exception as e:
+                logger.error(f"Failed to load UI map {map_path}: {e}")
+                return None
+
+            ui_map = UIMap(model, map_path, mtime, screens)
+            self._maps[model] = ui_map
+            logger.info(f"Loaded UI map for model {model} from {map_path}")
+            return ui_map
+
+    def invalidate(self, model=None):
+        """Drop one cached model, or all of them"""
+        with self.lock:
+            if model is None:
+                self._maps.clear()
+            else:
+                self._maps.pop(model, None)
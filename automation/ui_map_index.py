@@ -0,0 +1,145 @@
+import re
+
+# Characters that separate the name and label parts of UI map keys,
+# e.g. "user-switch-title-button_tristanwaite"
+_KEY_SEPARATORS = re.compile(r'[-_,\s]')
+
+
+def _boundary_prefixes(key):
+    """Prefixes of a key that end right before a separator, plus the key itself"""
+    prefixes = {key[:m.start()] for m in _KEY_SEPARATORS.finditer(key) if m.start() > 0}
+    prefixes.add(key)
+    return prefixes
+
+
+class ScreenIndex:
+    """Lookup tables for the elements of one UI map screen"""
+
+    def __init__(self, screen_map):
+        """
+        Args:
+            screen_map: Element key -> element data for a single screen
+        """
+        self.elements = screen_map
+        self.keys = tuple(screen_map.keys())
+        self.by_name = {}
+        self.by_label = {}
+        self.by_type = {}
+        self.by_accessibility_id = {}
+
+        for key, data in screen_map.items():
+            self._add(self.by_name, data.get("name"), key)
+            self._add(self.by_label, data.get("label"), key)
+            self._add(self.by_type, data.get("type"), key)
+            # XCUITest exposes the accessibility identifier as "name";
+            # Android maps carry it as "content-desc"
+            self._add(self.by_accessibility_id, data.get("content-desc", data.get("name")), key)
+
+        # Fallback table: query -> first key (in map order) containing the query.
+        # Pre-filled for every boundary prefix and element name, which covers
+        # the lookups the task runner makes; anything else is memoized on first use.
+        self._fallback = {}
+        candidates = set(self.by_name)
+        for key in self.keys:
+            candidates.update(_boundary_prefixes(key))
+        for query in candidates:
+            self._fallback[query] = self._scan(query)
+
+        self._queries = {}
+
+    @staticmethod
+    def _add(table, value, key):
+        if value:
+            table.setdefault(value, []).append(key)
+
+    def _scan(self, query):
+        for key in self.keys:
+            if query in key:
+                return key
+        return None
+
+    def resolve(self, element_key):
+        """
+        Resolve an element key to (key, data).
+
+        Exact keys win; otherwise the first key containing element_key is used,
+        matching the historical substring fallback.
+
+        Returns:
+            tuple: (resolved key, element data), or (None, None) if nothing matches
+        """
+        data = self.elements.get(element_key)
+        if data is not None:
+            return element_key, data
+
+        try:
+            key = self._fallback[element_key]
+        except KeyError:
+            key = self._fallback[element_key] = self._scan(element_key)
+
+        if key is None:
+            return None, None
+        return key, self.elements[key]
+
+    def query(self, type=None, label_contains=None, ignore_case=False, visible=None):
+        """
+        Find elements by type, label substring and visibility.
+
+        Results are memoized per argument set since the map never changes.
+
+        Returns:
+            tuple: Matching element data, in map order
+        """
+        query_key = (type, label_contains, ignore_case, visible)
+        cached = self._queries.get(query_key)
+        if cached is not None:
+            return cached
+
+        keys = self.by_type.get(type, ()) if type is not None else self.keys
+        needle = label_contains.lower() if (label_contains and ignore_case) else label_contains
+
+        matches = []
+        for key in keys:
+            data = self.elements[key]
+            if visible is not None and (data.get("visible") == "true") != visible:
+                continue
+            if needle:
+                label = data.get("label", "")
+                if ignore_case:
+                    label = label.lower()
+                if needle not in label:
+                    continue
+            matches.append(data)
+
+        result = tuple(matches)
+        self._queries[query_key] = result
+        return result
+
+
+class UIMapIndex:
+    """Precompiled element index for a whole UI map, built once per loaded map"""
+
+    def __init__(self, screens):
+        """
+        Args:
+            screens: Screen name -> element key -> element data
+        """
+        self.screens = {name: ScreenIndex(screen_map) for name, screen_map in screens.items()}
+
+    def screen(self, screen_name):
+        """Get the ScreenIndex for a screen, or None if the screen isn't mapped"""
+        return self.screens.get(screen_name)
+
+    def resolve(self, screen_name, element_key):
+        """Resolve an element on a screen; see ScreenIndex.resolve"""
+        screen_index = self.screens.get(screen_name)
+        if screen_index is None:
+            return None, None
+        return screen_index.resolve(element_key)
+
+    def query(self, screen_name, **filters):
+        """Find elements on a screen; see ScreenIndex.query"""
+        screen_index = self.screens.get(screen_name)
+        if screen_index is None:
+            return ()
+        return screen_index.query(**filters)
@@ -0,0 +1,100 @@
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WAIT_TIMEOUT = 10  # seconds
+DEFAULT_POLL_INTERVAL = 0.25  # seconds
+
+# AppiumBy.ACCESSIBILITY_ID; selenium and appium are imported on first use, not at startup
+ACCESSIBILITY_ID = 'accessibility id'
+
+# Element whose presence proves a UI map screen is showing
+SCREEN_LANDMARKS = {
+    # The feed itself; the tab bar shows on every tabbed screen, so it only proves the app is up
+    "initial_screen_before_profile": "main-feed",
+    "profile_screen_details": "user-switch-title-button",
+    "account_switcher_details": "feed-controls-menu-drag-handle_Close",
+}
+
+
+class ScreenWaiter:
+    """Waits for UI map elements to appear instead of sleeping for a fixed time"""
+
+    def __init__(self, timeout=DEFAULT_WAIT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+        Args:
+            timeout: Default seconds to wait before giving up
+            poll_interval: Default seconds between checks
+        """
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+    def _settings(self, ctx, timeout, poll_interval):
+        """Resolve timeout/poll interval: call args, then device config, then defaults"""
+        if timeout is None:
+            timeout = ctx.config.get('waitTimeout', self.timeout)
+        if poll_interval is None:
+            poll_interval = ctx.config.get('pollInterval', self.poll_interval)
+        return float(timeout), float(poll_interval)
+
+    def locator_for(self, ctx, screen_name, element_key):
+        """Build an accessibility-id locator for a UI map element, or None if it isn't mapped"""
+        if not ctx.ui_map:
+            return None
+        _, element_data = ctx.ui_map.index.resolve(screen_name, element_key)
+        if not element_data:
+            return None
+        accessibility_id = element_data.get("content-desc", element_data.get("name"))
+        if not accessibility_id:
+            return None
+        return (ACCESSIBILITY_ID, accessibility_id)
+
+    def wait_for_element(self, ctx, screen_name, element_key, timeout=None, poll_interval=None):
+        """
+        Block until a UI map element is present on the device.
+
+        Returns:
+            bool: True as soon as the element is found, False on timeout or if
+                  the element has no usable locator
+        """
+        locator = self.locator_for(ctx, screen_name, element_key)
+        if not locator:
+            logger.warning(f"No locator for '{element_key}' on '{screen_name}', can't wait for it")
+            return False
+        return self.wait_for_locator(ctx, locator, timeout, poll_interval, description=element_key)
+
+    def wait_for_locator(self, ctx, locator, timeout=None, poll_interval=None, description=None):
+        """
+        Block until an element matching an already-built locator is present.
+
+        Returns:
+            bool: True as soon as the element is found, False on timeout
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        
+        timeout, poll_interval = self._settings(ctx, timeout, poll_interval)
+        description = description or locator[1]
+        started = time.time()
+        try:
+            WebDriverWait(ctx.driver, timeout, poll_frequency=poll_interval).until(
+                EC.presence_of_element_located(locator)
+            )
+            logger.info(f"'{description}' present on {ctx.name} after {time.time() - started:.2f}s")
+            return True
+        except TimeoutException:
+            logger.warning(f"Timed out after {timeout}s waiting for '{description}' on {ctx.name}")
+            return False
+        except WebDriverException as e:
+            logger.warning(f"Error waiting for '{description}' on {ctx.name}: {e}")
+            return False
+
+    def wait_for_screen(self, ctx, screen_name, timeout=None, poll_interval=None):
+        """Block until the landmark element of a UI map screen is present"""
+        landmark = SCREEN_LANDMARKS.get(screen_name)
+        if not landmark:
+            logger.warning(f"No landmark configured for screen '{screen_name}'")
+            return False
+        return self.wait_for_element(ctx, screen_name, landmark, timeout, poll_interval)
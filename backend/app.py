@@ -1,16 +1,24 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import os
 import json
 import logging
 import sys
 import time
-import subprocess
+import threading
 
 # Add parent directory to path so we can import automation modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from automation.device_manager import DeviceManager
 from automation.task_runner import InstagramTaskRunner
+from automation.status_snapshot import StatusSnapshot
+from automation.events import coalesce
+from automation.hotplug import HotplugWatcher
+from automation.session_watchdog import SessionWatchdog
+from automation.storage import ConfigStore, default_db_path
+from automation.metrics import PROMETHEUS_CONTENT_TYPE
+from automation.task_definitions import TaskDefinitionError
+from automation.readiness import Readiness, READY, DEGRADED, FAILED
 
 app = Flask(__name__)
 CORS(app)  # Enable cross-origin requests
@@ -25,96 +33,260 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Default paths
 DEFAULT_CONFIG_PATH = os.path.join(BASE_DIR, 'config', 'devices.json')
 DEFAULT_UI_MAP_PATH = os.path.join(BASE_DIR, 'instagram_map.json')
+MANAGED_ACCOUNTS_PATH = os.path.join(BASE_DIR, 'config', 'managed_accounts.json')
+DEFAULT_DB_PATH = default_db_path(DEFAULT_CONFIG_PATH)
+
+# Seconds to wait for a single device's Appium session during startup
+DEVICE_INIT_TIMEOUT = 120
+
+# Seconds between Appium server health checks
+SERVER_HEALTH_INTERVAL = 30
+
+# Event stream tuning: how long to gather a burst of events before sending it,
+# and how often to send a keep-alive comment on an idle stream
+EVENT_COALESCE_WINDOW = 0.25
+EVENT_KEEPALIVE_INTERVAL = 15
 
 # Initialize managers
 device_manager = None
 task_runner = None
+status_snapshot = None
+hotplug_watcher = None
+session_watchdog = None
+
+# Startup runs in stages on a background thread while the API is already serving:
+# core services, then device sessions, then hotplug tracking
+startup = Readiness(('core', 'devices', 'hotplug'))
+startup_thread = None
+startup_lock = threading.Lock()
+
+def device_readiness(up, configured):
+    """
+    Status of the devices stage from how many of the configured devices are up.
+    
+    Returns:
+        tuple: (READY, DEGRADED or FAILED, error message or None)
+    """
+    if configured and not up:
+        return FAILED, f"None of the {configured} configured devices could be initialized"
+    if up < configured:
+        return DEGRADED, f"{configured - up} of {configured} configured devices aren't up"
+    return READY, None
 
 def initialize_system():
-    """Initialize the system components"""
-    global device_manager, task_runner
+    """Initialize the system components, stage by stage (see startup)"""
+    global device_manager, task_runner, status_snapshot, hotplug_watcher, session_watchdog
+    previous_runner = task_runner
     
     # Create config directory if it doesn't exist
     os.makedirs(os.path.dirname(DEFAULT_CONFIG_PATH), exist_ok=True)
     
-    # Initialize device manager
-    device_manager = DeviceManager(DEFAULT_CONFIG_PATH)
+    if hotplug_watcher:
+        hotplug_watcher.stop()
+    if session_watchdog:
+        session_watchdog.stop()
     
-    # Initialize task runner
-    task_runner = InstagramTaskRunner(device_manager)
+    startup.start('core')
+    try:
+        # Servers, devices and accounts live in SQLite; the JSON files are imported on first run
+        store = ConfigStore(DEFAULT_DB_PATH)
+        store.migrate_from_json(DEFAULT_CONFIG_PATH, MANAGED_ACCOUNTS_PATH)
+        
+        # Initialize device manager
+        manager = DeviceManager(DEFAULT_CONFIG_PATH, store=store)
+        
+        # Initialize task runner
+        runner = InstagramTaskRunner(manager)
+        
+        # Cached /api/status body, rebuilt only when device/task/account state changes
+        snapshot = StatusSnapshot(manager, runner, MANAGED_ACCOUNTS_PATH, store=store)
+        
+        # Track Appium server health so the dashboard hears about servers going up or down
+        runner.scheduler.schedule(manager.check_server_health, interval=SERVER_HEALTH_INTERVAL,
+                                  delay=SERVER_HEALTH_INTERVAL, name='server-health')
+        
+        # Keep idle sessions alive and recreate dead ones before a task runs into them
+        watchdog = SessionWatchdog(manager, runner.scheduler).start()
+    except Exception as e:
+        logger.exception("Failed to initialize system core")
+        startup.fail('core', e)
+        return
+    
+    # Publish the components together so a request never sees some of them missing
+    device_manager, task_runner, status_snapshot, session_watchdog = manager, runner, snapshot, watchdog
+    startup.ready('core')
+    
+    # The replaced runner's recurring jobs (server health, repeating tasks) would keep firing
+    # against the old DeviceManager
+    if previous_runner:
+        previous_runner.scheduler.shutdown()
     
     logger.info("System core initialized. Attempting to initialize all configured devices...")
-    if device_manager: # Add a check to be safe
-        try:
-            # Initialize devices from config
-            device_count = device_manager.initialize_all_devices()
-            logger.info(f"Attempted to initialize {device_count} devices on startup.")
-        except Exception as e:
-            logger.error(f"Error during automatic device initialization on startup: {str(e)}")
-            
+    startup.start('devices')
+    try:
+        # Initialize devices from config, starting sessions on all servers concurrently
+        device_count = device_manager.initialize_all_devices(parallel=True, timeout=DEVICE_INIT_TIMEOUT)
+        logger.info(f"Attempted to initialize {device_count} devices on startup.")
+        configured = len(device_manager.config['devices'])
+        status, error = device_readiness(device_count, configured)
+        if error:
+            logger.warning(f"Devices not fully up after startup: {error}")
+        startup.finish('devices', status, error=error, initialized=device_count, configured=configured)
+    except Exception as e:
+        logger.error(f"Error during automatic device initialization on startup: {str(e)}")
+        startup.fail('devices', e)
+    
+    # Follow plug/unplug events (adb track-devices, usbmuxd) from here on
+    startup.start('hotplug')
+    try:
+        hotplug_watcher = HotplugWatcher(device_manager).start()
+        startup.ready('hotplug')
+    except Exception as e:
+        logger.exception("Failed to start hotplug watcher")
+        startup.fail('hotplug', e)
+        
     logger.info("Full system initialization routine complete.")
 
+def start_initialization():
+    """
+    Run initialize_system on a background thread.
+    
+    Returns:
+        bool: False if an initialization is already running
+    """
+    global startup_thread
+    with startup_lock:
+        if startup_thread and startup_thread.is_alive():
+            return False
+        startup.reset()
+        startup_thread = threading.Thread(target=initialize_system, name='startup', daemon=True)
+        startup_thread.start()
+        return True
+
+def initializing():
+    return bool(startup_thread and startup_thread.is_alive())
+
 # API routes
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Get system status"""
-    if not device_manager:
+    """Get system status (send If-None-Match with the last ETag to get a 304 when nothing changed)"""
+    if not device_manager or not status_snapshot:
+        if initializing():
+            return jsonify({
+                'status': 'starting',
+                'message': 'System is starting',
+                'startup': startup.to_dict()
+            })
         return jsonify({
             'status': 'not_initialized',
             'message': 'System not initialized'
         })
     
-    devices = device_manager.get_device_status()
-    servers = device_manager.get_server_status()
-    tasks = {}
+    version, etag, body = status_snapshot.get()
+    headers = {'ETag': etag, 'X-Status-Version': str(version), 'Cache-Control': 'no-cache'}
     
-    # Add managed accounts to device status
-    managed_accounts_path = os.path.join(BASE_DIR, 'config', 'managed_accounts.json')
-    if os.path.exists(managed_accounts_path):
-        try:
-            with open(managed_accounts_path, 'r') as f:
-                managed_accounts = json.load(f)
-            
-            # Add accounts to each device in the status
-            for device_id, device_info in devices.items():
-                device_info['managed_accounts'] = managed_accounts.get(device_id, [])
-        except Exception as e:
-            logger.error(f"Error loading managed accounts: {str(e)}")
+    if request.if_none_match.contains(etag.strip('"')):
+        return '', 304, headers
     
-    if task_runner:
-        tasks = task_runner.get_running_tasks()
+    return app.response_class(body, mimetype='application/json', headers=headers)
+
+@app.route('/api/events/stream', methods=['GET'])
+def event_stream():
+    """
+    Server-Sent Events stream of status changes.
     
-    return jsonify({
-        'status': 'running',
-        'devices': devices,
-        'servers': servers,
-        'tasks': tasks
-    })
+    A new connection first gets a 'snapshot' event with the full /api/status body,
+    then incremental events (device_status, server_status, job_*, task_*, ...).
+    Reconnecting clients resume from Last-Event-ID (or ?last_event_id=); if that
+    point has fallen out of the event history they get a fresh snapshot instead.
+    """
+    if not device_manager or not status_snapshot:
+        if initializing():
+            return jsonify({'error': 'System is starting'}), 503
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    events = device_manager.events
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_id = int(last_id) if last_id is not None else None
+    except ValueError:
+        last_id = None
+    
+    def snapshot_message():
+        # Take the cursor first so nothing published while building the snapshot is missed
+        cursor = events.last_id
+        _, _, body = status_snapshot.get()
+        return cursor, f"id: {cursor}\nevent: snapshot\ndata: {body.decode('utf-8')}\n\n"
+    
+    def generate():
+        cursor = last_id
+        if cursor is None or cursor > events.last_id or events.since(cursor) is None:
+            cursor, message = snapshot_message()
+            yield message
+        
+        while True:
+            if not events.wait_for(cursor, EVENT_KEEPALIVE_INTERVAL):
+                yield ": keep-alive\n\n"
+                continue
+            
+            # Let a burst settle so each device/job is sent once with its latest state
+            time.sleep(EVENT_COALESCE_WINDOW)
+            pending = events.since(cursor)
+            if pending is None:
+                # This reader fell further behind than the event history goes
+                cursor, message = snapshot_message()
+                yield message
+                continue
+            if not pending:
+                continue
+            
+            cursor = pending[-1]['id']
+            yield "".join(events.message(event) for event in coalesce(pending))
+    
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
 
 @app.route('/api/initialize', methods=['POST'])
 def initialize():
-    """Initialize the system"""
-    try:
-        # Re-call the main initialization logic, which now includes device init
-        initialize_system()
-
-        # The return value from initialize_all_devices is now logged within initialize_system
-        # We can get the current count of ready devices for the response if needed
-        ready_devices_count = 0
-        if device_manager:
-            ready_devices_count = len([d for d in device_manager.get_device_status().values() if d['status'] == 'ready'])
-
-        return jsonify({
-            'success': True,
-            'message': 'System initialization triggered. Check status for device readiness.',
-            'devices_initialized_or_ready': ready_devices_count
-        })
-    except Exception as e:
-        logger.exception("Failed to initialize system")
+    """(Re)initialize the system in the background; poll /api/health/ready for progress"""
+    if not start_initialization():
         return jsonify({
             'success': False,
-            'error': str(e)
-        }), 500
+            'error': 'System initialization is already running'
+        }), 409
+    
+    return jsonify({
+        'success': True,
+        'message': 'System initialization started. Check /api/health/ready or status for device readiness.',
+        'ready_url': '/api/health/ready'
+    }), 202
+
+@app.route('/api/health/live', methods=['GET'])
+def health_live():
+    """Liveness: the API process is up and serving requests"""
+    return jsonify({'status': 'alive', 'uptime': time.time() - startup.started_at})
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """
+    Readiness of each startup component (core, devices, hotplug).
+    
+    Once device startup has finished, the devices component follows the live
+    device states: failed (503) while none of the configured devices is up,
+    degraded while only some are. Everything else returns 503 until ready.
+    """
+    body = startup.to_dict()
+    body['initializing'] = initializing()
+    devices = body['components']['devices']
+    if device_manager and startup.status('core') == READY:
+        statuses = [info['status'] for info in device_manager.get_device_status().values()]
+        # A device running a task is up too
+        devices['ready_devices'] = statuses.count('ready') + statuses.count('busy')
+        if 'configured' in devices:
+            devices['configured'] = len(device_manager.config['devices'])
+            devices['status'], devices['error'] = device_readiness(devices['ready_devices'], devices['configured'])
+            body['ready'] = Readiness.all_up(body['components'])
+    return jsonify(body), (200 if body['ready'] else 503)
 
 @app.route('/api/devices', methods=['GET'])
 def get_devices():
@@ -233,10 +405,10 @@ def setup_device_endpoint(device_id):
         # Or, uncomment below to return an error if not ready:
         # return jsonify({'success': False, 'error': f'Device not ready (status: {device_info["status"]})'}), 409
 
-    logger.info(f"Executing setup_device task for device: {device_id}, info: {device_info}")
-    result = task_runner.execute_task('setup_device', device_id, device_info=device_info)
+    job = task_runner.submit_task('setup_device', device_id)
+    logger.info(f"Queued setup_device job {job.job_id} for device: {device_id}")
     
-    return jsonify(result)
+    return job_response(job)
 
 @app.route('/api/devices/<device_id>/task', methods=['POST'])
 def execute_task(device_id):
@@ -255,16 +427,17 @@ def execute_task(device_id):
         }), 400
     
     # Additional parameters for the task
-    kwargs = {k: v for k, v in data.items() if k not in ['task_name', 'repeat_interval']}
+    kwargs = {k: v for k, v in data.items() if k not in ['task_name', 'repeat_interval', 'wait']}
     
     try:
-        # Execute scheduled task if interval provided, otherwise just run once
-        if repeat_interval:
-            result = task_runner.run_scheduled_task(task_name, device_id, repeat_interval, **kwargs)
-        else:
-            result = task_runner.execute_task(task_name, device_id, **kwargs)
-            
-        return jsonify(result)
+        # Queue the task (scheduling it to repeat if an interval is provided) and return at once
+        job = task_runner.submit_task(task_name, device_id, repeat_interval, **kwargs)
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': f"Device {device_id} is not a known device"
+            }), 400
+        return job_response(job)
     except Exception as e:
         logger.exception(f"Error executing task {task_name}")
         return jsonify({
@@ -272,6 +445,192 @@ def execute_task(device_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/accounts', methods=['GET'])
+def get_accounts():
+    """Get every managed account with the devices it's signed in on and where it's active"""
+    if not task_runner:
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    return jsonify(task_runner.accounts.to_dict())
+
+@app.route('/api/accounts/<username>/task', methods=['POST'])
+def execute_account_task(username):
+    """Queue a task for an account on the device it's signed in on, switching to it first if needed"""
+    if not task_runner:
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    data = request.json or {}
+    task_name = data.get('task_name')
+    repeat_interval = data.get('repeat_interval')
+    
+    if not task_name:
+        return jsonify({
+            'success': False,
+            'error': "Missing required field: task_name"
+        }), 400
+    
+    kwargs = {k: v for k, v in data.items() if k not in ['task_name', 'repeat_interval', 'wait']}
+    
+    try:
+        job = task_runner.submit_account_task(username, task_name, repeat_interval, **kwargs)
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': f"Account {username} is not signed in on any known device"
+            }), 404
+        return job_response(job)
+    except Exception as e:
+        logger.exception(f"Error executing task {task_name} for account {username}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/batches', methods=['GET'])
+def get_batches():
+    """Get the latest account-switch batch report for each device (estimated vs actual switch time)"""
+    if not task_runner:
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    return jsonify({device_id: report.to_dict() for device_id, report in task_runner.batch_reports.items()})
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Command, session lifecycle and task latency histograms and failure counters, in Prometheus text format"""
+    if not device_manager:
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    return Response(device_manager.metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/api/sessions', methods=['GET'])
+def get_sessions():
+    """Get session watchdog probe and reconnect counts/latencies per device"""
+    if not session_watchdog:
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    return jsonify(session_watchdog.stats())
+
+def job_response(job):
+    """
+    Respond to a task submission with its job ID (202), or, when the client asks
+    for ?wait=<seconds>, with the finished job once it completes within that time.
+    """
+    wait = request.args.get('wait', type=float)
+    if wait:
+        job.wait(wait)
+    
+    body = {
+        'success': True,
+        'job_id': job.job_id,
+        'status_url': f"/api/jobs/{job.job_id}",
+        'job': job.to_dict()
+    }
+    if job.finished:
+        # Keep the shape of the old synchronous responses for clients that wait
+        body.update(job.result or {})
+        body['job_id'] = job.job_id
+        return jsonify(body)
+    return jsonify(body), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    """Get several jobs: ?ids=a,b,c for specific jobs, otherwise the most recent (filter with state/device_id)"""
+    if not task_runner:
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    ids = request.args.get('ids')
+    if ids:
+        jobs = task_runner.jobs.get_many([i for i in ids.split(',') if i])
+        return jsonify({job_id: job.to_dict() for job_id, job in jobs.items()})
+    
+    jobs = task_runner.jobs.list(
+        state=request.args.get('state'),
+        device_id=request.args.get('device_id'),
+        limit=request.args.get('limit', 100, type=int)
+    )
+    return jsonify([job.to_dict() for job in jobs])
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the state, timing and result of a submitted job (?wait=<seconds> blocks until it finishes)"""
+    if not task_runner:
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    job = task_runner.jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': f"Job {job_id} not found"}), 404
+    wait = request.args.get('wait', type=float)
+    if wait:
+        job.wait(wait)
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a job that hasn't started yet"""
+    if not task_runner:
+        return jsonify({'error': 'System not initialized'}), 500
+    
+    result = task_runner.cancel_job(job_id)
+    return jsonify(result), (200 if result['success'] else 409)
+
+def chrome_trace_response(traces, filename):
+    """Traces as a Chrome trace event file download (open in chrome://tracing or ui.perfetto.dev)"""
+    return Response(
+        json.dumps(device_manager.tracer.to_chrome_trace(traces), default=str),
+        mimetype='application/json',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/api/jobs/<job_id>/trace', methods=['GET'])
+def get_job_trace(job_id):
+    """Get the spans recorded while a job ran (?format=chrome for a trace file download)"""
+    if not device_manager:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    traces = device_manager.tracer.traces(job_id=job_id)
+    if not traces:
+        return jsonify({'success': False, 'error': f"No trace recorded for job {job_id}"}), 404
+    if request.args.get('format') == 'chrome':
+        return chrome_trace_response(traces, f"trace-{job_id}.json")
+    return jsonify({'job_id': job_id, 'traces': [trace.to_dict() for trace in traces]})
+
+@app.route('/api/traces', methods=['GET'])
+def get_traces():
+    """Get summaries of the most recent traces (filter with job_id/device_id)"""
+    if not device_manager:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    traces = device_manager.tracer.traces(
+        job_id=request.args.get('job_id'),
+        device_id=request.args.get('device_id'),
+        limit=request.args.get('limit', 50, type=int)
+    )
+    return jsonify([trace.summary() for trace in traces])
+
+@app.route('/api/traces/export', methods=['GET'])
+def export_traces():
+    """Download recent traces (filter with job_id/device_id/limit) as a Chrome trace event file"""
+    if not device_manager:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    traces = device_manager.tracer.traces(
+        job_id=request.args.get('job_id'),
+        device_id=request.args.get('device_id'),
+        limit=request.args.get('limit', type=int)
+    )
+    return chrome_trace_response(traces, f"traces-{int(time.time())}.json")
+
+@app.route('/api/traces/<trace_id>', methods=['GET'])
+def get_trace(trace_id):
+    """Get every span of one trace"""
+    if not device_manager:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    trace = device_manager.tracer.get(trace_id)
+    if not trace:
+        return jsonify({'success': False, 'error': f"Trace {trace_id} not found"}), 404
+    return jsonify(trace.to_dict())
+
 @app.route('/api/devices/<device_id>/task/<task_name>/stop', methods=['POST'])
 def stop_task(device_id, task_name):
     """Stop a scheduled task"""
@@ -296,6 +655,34 @@ def get_tasks():
         
     return jsonify(task_runner.get_running_tasks())
 
+@app.route('/api/tasks/available', methods=['GET'])
+def get_available_tasks():
+    """Get the tasks that can be run: built-in ones and those defined in tasks/"""
+    if not task_runner:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    return jsonify(task_runner.available_tasks())
+
+@app.route('/api/tasks/available/<task_name>', methods=['GET'])
+def get_task_definition(task_name):
+    """Get a task definition, or with ?model=<model> its plan compiled against that model's UI map"""
+    if not task_runner:
+        return jsonify({'error': 'System not initialized'}), 500
+
+    try:
+        definition = task_runner.task_library.get(task_name)
+        if not definition:
+            return jsonify({'success': False, 'error': f"No task definition {task_name}"}), 404
+        model = request.args.get('model')
+        if not model:
+            return jsonify(definition.to_dict())
+        ui_map = task_runner.ui_map_cache.get(model)
+        if not ui_map:
+            return jsonify({'success': False, 'error': f"No UI map for model {model}"}), 404
+        return jsonify(task_runner.task_library.compile(task_name, ui_map).to_dict())
+    except TaskDefinitionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 422
+
 @app.route('/api/servers', methods=['POST'])
 def add_server():
     """Add a new Appium server"""
@@ -328,12 +715,13 @@ def add_server():
                 }), 400
         
         # Add server to config
-        device_manager.config['appium_servers'].append({
+        server_config = {
             'name': data['name'],
             'host': data['host'],
             'port': data['port'],
             'max_devices': data['max_devices']
-        })
+        }
+        device_manager.config['appium_servers'].append(server_config)
         
         # Initialize server in device manager
         device_manager.servers[data['name']] = {
@@ -348,7 +736,8 @@ def add_server():
         }
         
         # Save config
-        device_manager.save_config(DEFAULT_CONFIG_PATH)
+        device_manager.save_server_config(server_config)
+        device_manager.events.publish('server_added', server_id=data['name'])
         
         return jsonify({
             'success': True,
@@ -378,101 +767,10 @@ def refresh_devices():
     try:
         logger.info("Refreshing devices - scanning for connected iOS and Android devices")
         
-        # Get iOS devices using xcrun
-        ios_devices = []
-        try:
-            # Run xcrun to list iOS devices - fixed for Python 3.6 compatibility
-            result = subprocess.run(['xcrun', 'xctrace', 'list', 'devices'], 
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE,
-                                   universal_newlines=True,
-                                   check=True)
-            
-            # Parse the output to find ONLY real devices (not simulators)
-            for line in result.stdout.splitlines():
-                # Filter out simulators and Macs - only include real iOS devices
-                if "(" in line and ")" in line and not "Simulator" in line and not "Mac" in line:
-                    try:
-                        # Extract device name and UDID
-                        parts = line.strip().split('(')
-                        device_name = parts[0].strip()
-                        # Extract UDID which is usually the last (xxx) part
-                        udid = parts[-1].split(')')[0].strip()
-                        
-                        # Validate that it looks like a UDID
-                        if len(udid) > 10 and not udid.startswith("com."):
-                            ios_version = parts[-2].split(')')[0].strip() if len(parts) > 2 else "Unknown"
-                            
-                            # Extra check to make sure it's a real device and not a simulator
-                            if device_manager._get_real_device_udids() and udid in device_manager._get_real_device_udids():
-                                ios_devices.append({
-                                    "name": device_name,
-                                    "udid": udid,
-                                    "platformName": "iOS",
-                                    "platformVersion": ios_version,
-                                    "deviceName": device_name.split(" ")[-1],  # Usually iPhone, iPad, etc.
-                                    "automationName": "XCUITest",
-                                    "is_simulator": False
-                                })
-                                logger.info(f"Found real iOS device: {device_name} ({udid})")
-                            else:
-                                logger.info(f"Skipping simulator or virtual device: {device_name} ({udid})")
-                    except Exception as parse_error:
-                        logger.error(f"Error parsing iOS device line: {line}, error: {str(parse_error)}")
-        except Exception as ios_error:
-            logger.error(f"Error getting iOS devices: {str(ios_error)}")
-        
-        # Get Android devices using adb
-        android_devices = []
-        try:
-            # Run adb to list Android devices - fixed for Python 3.6 compatibility
-            result = subprocess.run(['adb', 'devices'], 
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE,
-                                   universal_newlines=True,
-                                   check=True)
-            
-            # Parse the output to find connected devices
-            lines = result.stdout.splitlines()
-            for line in lines[1:]:  # Skip the first line which is the header
-                if '\t' in line and not "offline" in line and not "emulator" in line:  # Skip emulators
-                    try:
-                        parts = line.strip().split('\t')
-                        udid = parts[0].strip()
-                        
-                        # Skip emulators
-                        if udid and len(udid) > 5 and not udid.startswith("emulator-"):
-                            # Get device model and version - fixed for Python 3.6 compatibility
-                            model_cmd = subprocess.run(
-                                ['adb', '-s', udid, 'shell', 'getprop', 'ro.product.model'],
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                universal_newlines=True)
-                            model = model_cmd.stdout.strip() if model_cmd.returncode == 0 else "Android Device"
-                            
-                            version_cmd = subprocess.run(
-                                ['adb', '-s', udid, 'shell', 'getprop', 'ro.build.version.release'],
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                universal_newlines=True)
-                            version = version_cmd.stdout.strip() if version_cmd.returncode == 0 else "Unknown"
-                            
-                            android_devices.append({
-                                "name": f"{model}",
-                                "udid": udid,
-                                "platformName": "Android",
-                                "platformVersion": version,
-                                "deviceName": model,
-                                "automationName": "UiAutomator2",
-                                "is_simulator": False
-                            })
-                    except Exception as parse_error:
-                        logger.error(f"Error parsing Android device: {line}, error: {str(parse_error)}")
-        except Exception as android_error:
-            logger.error(f"Error getting Android devices: {str(android_error)}")
-        
-        # Combine all devices
-        all_devices = ios_devices + android_devices
+        # One pass over xctrace/idevice_id/adb; Android properties are probed in parallel and cached
+        inventory = device_manager.discovery.refresh()
+        device_manager.set_real_device_udids(inventory.real_udids)
+        all_devices = [d.to_dict() for d in inventory]
         logger.info(f"Found {len(all_devices)} real devices: {all_devices}")
         
         if not all_devices:
@@ -485,6 +783,8 @@ def refresh_devices():
         existing_devices = [d['udid'] for d in device_manager.config['devices']]
         new_devices = []
         updated_devices = []
+        # Configs as they were before this refresh touched them, to persist only the ones that change
+        original_configs = {d['udid']: dict(d) for d in device_manager.config['devices']}
         
         # Process each detected device
         for device in all_devices:
@@ -508,22 +808,23 @@ def refresh_devices():
                 current_device_status_info = device_manager.devices.get(device_id)
                 
                 if current_device_status_info and current_device_status_info.get('status') in ['ready', 'busy']:
-                    driver_instance = device_manager.drivers.get(device_id)
-                    if driver_instance:
-                        try:
-                            # A lightweight check to see if session is alive
-                            _ = driver_instance.session_id 
-                            logger.info(f"Session for device {device['name']} seems alive.")
-                        except Exception: # Typically NoSuchDriverException or similar if session is dead
-                            logger.warning(f"Session for device {device['name']} ({device_id}) is dead. Forcing re-initialization.")
-                            force_reinit = True
+                    # Ask the server whether the session still exists (session_id alone is only a local attribute)
+                    alive, latency = device_manager.probe_session(device_id)
+                    if alive:
+                        logger.info(f"Session for device {device['name']} is alive.")
+                    elif alive is False:
+                        logger.warning(f"Session for device {device['name']} ({device_id}) is dead. Forcing re-initialization.")
+                        force_reinit = True
+                    elif latency is not None:
+                        # Timed out or no answer, e.g. queued behind a running task's gestures; leave it be
+                        logger.info(f"Session probe for device {device['name']} was inconclusive; keeping the session.")
                     else:
                         # Driver not found for a supposedly ready/busy device, something is wrong
                         logger.warning(f"Device {device['name']} ({device_id}) is ready/busy but no driver instance found. Forcing re-initialization.")
                         force_reinit = True
                 else:
                     # Status is not ready/busy (e.g., disconnected, error, initializing)
-                    logger.info(f"Device {device['name']} ({device_id}) status is '{current_device_status_info.get('status', 'unknown')}'. Will attempt initialization.")
+                    logger.info(f"Device {device['name']} ({device_id}) status is '{(current_device_status_info or {}).get('status', 'unknown')}'. Will attempt initialization.")
                     force_reinit = True # Also re-initialize if status is not ideal
 
                 if force_reinit:
@@ -567,8 +868,12 @@ def refresh_devices():
                 else:
                     logger.error(f"Failed to add device: {device['name']}")
         
-        # Save the updated configuration
-        device_manager.save_config(DEFAULT_CONFIG_PATH)
+        # New devices were saved by add_device; persist existing ones whose config changed
+        # (e.g. a server assigned during initialization) one row at a time
+        for config_device in list(device_manager.config['devices']):
+            original = original_configs.get(config_device['udid'])
+            if original is not None and original != config_device:
+                device_manager.save_device_config(config_device)
         
         # NEW STEP: Update status for configured devices that are no longer physically detected
         physically_detected_udids = {d['udid'] for d in all_devices}
@@ -589,6 +894,7 @@ def refresh_devices():
                     else:
                         device_manager.devices[config_udid]['status'] = 'disconnected'
                         device_manager.devices[config_udid]['last_active'] = time.time()
+                    device_manager._publish_device_status(config_udid)
                     
                     # Clean up driver if it exists for this now disconnected device
                     if config_udid in device_manager.drivers:
@@ -630,8 +936,13 @@ def index():
             'frontend_missing': True
         })
 
-# Initialize on startup
-initialize_system()
+# Start initializing in the background so the API serves requests straight away. The debug
+# reloader's parent process only watches files (the child, with WERKZEUG_RUN_MAIN set, serves),
+# so it skips this rather than opening a second set of Appium sessions. AUTOMATION_AUTOSTART=0
+# imports the app without starting anything (benchmarks, tests); POST /api/initialize starts it.
+AUTOSTART = os.environ.get('AUTOMATION_AUTOSTART', '1') != '0'
+if AUTOSTART and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    start_initialization()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8001) 
\ No newline at end of file
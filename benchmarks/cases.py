@@ -0,0 +1,284 @@
+"""
+Benchmarks for the task-execution stack.
+
+Each benchmark takes the parsed command-line options and returns a flat
+{metric: value} dict. Latencies are reported in milliseconds (lower is
+better), rates as *_per_sec or *_rate (higher is better).
+"""
+import os
+import json
+import random
+import logging
+import tempfile
+import threading
+import time
+
+from automation.ui_map_cache import UIMapCache
+from automation.device_manager import DeviceManager
+from automation.discovery import DeviceDiscovery, StubCommandRunner
+from automation.scheduler import JobScheduler
+from automation.task_runner import InstagramTaskRunner
+from automation.status_snapshot import StatusSnapshot
+from automation.waits import ScreenWaiter
+from automation.fake_appium import FakeAppiumServer
+from benchmarks.harness import latency_metrics, time_calls
+
+logger = logging.getLogger(__name__)
+
+UI_MAP_MODEL = 'iphone16_pro'
+
+
+class StubDriver:
+    """Just enough of a driver for benchmarks that never send commands"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+    def quit(self):
+        pass
+
+
+def _device_manager(tmp_dir, config=None):
+    """A DeviceManager on a throwaway config, with device discovery stubbed out"""
+    config_path = os.path.join(tmp_dir, 'devices.json')
+    with open(config_path, 'w') as f:
+        json.dump(config or {'appium_servers': [], 'devices': []}, f)
+    return DeviceManager(config_path, discovery=DeviceDiscovery(StubCommandRunner()))
+
+
+def _add_stub_devices(device_manager, count, server='bench'):
+    for i in range(count):
+        udid = f"BENCH-{i:04d}"
+        device_manager.devices[udid] = {
+            'config': {'name': f"bench-{i}", 'udid': udid, 'platformName': 'iOS', 'model': UI_MAP_MODEL},
+            'status': 'ready',
+            'last_active': time.time(),
+            'server': server,
+            'screen_width': 393,
+            'screen_height': 852,
+        }
+        device_manager.drivers[udid] = StubDriver(f"session-{i}")
+
+
+def bench_ui_map(options):
+    """UI map parse time, cached lookup time, and element resolve/query throughput"""
+    iterations = 20 if options.quick else 100
+    cache = UIMapCache()
+    ui_map = cache.get(UI_MAP_MODEL)
+    if ui_map is None:
+        raise RuntimeError(f"UI map for {UI_MAP_MODEL} not found")
+
+    def cold_load():
+        cache.invalidate(UI_MAP_MODEL)
+        cache.get(UI_MAP_MODEL)
+
+    metrics = latency_metrics(time_calls(cold_load, iterations), 'load_')
+    metrics.update(latency_metrics(time_calls(lambda: cache.get(UI_MAP_MODEL), iterations * 100), 'cached_get_'))
+
+    keys = [(screen, key) for screen in ui_map.keys() for key in ui_map[screen]]
+    lookups = [random.choice(keys) for _ in range(iterations * 200)]
+    started = time.perf_counter()
+    for screen, key in lookups:
+        ui_map.index.resolve(screen, key)
+    metrics['resolve_per_sec'] = len(lookups) / (time.perf_counter() - started)
+
+    screens = list(ui_map.keys())
+    queries = iterations * 20
+    started = time.perf_counter()
+    for i in range(queries):
+        ui_map.index.query(screens[i % len(screens)], type='XCUIElementTypeButton', label_contains='a', ignore_case=True)
+    metrics['query_per_sec'] = queries / (time.perf_counter() - started)
+    metrics['count'] = len(keys)
+    return metrics
+
+
+def bench_device_pool(options):
+    """get_available_device/release throughput and wait time with more workers than devices"""
+    devices = options.devices
+    workers = devices * 4
+    duration = 1.0 if options.quick else 3.0
+    hold = 0.002  # seconds a worker keeps its device
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        device_manager = _device_manager(tmp_dir)
+        _add_stub_devices(device_manager, devices)
+
+        waits, lock = [], threading.Lock()
+        deadline = time.time() + duration
+
+        def worker():
+            local = []
+            while time.time() < deadline:
+                started = time.perf_counter()
+                device_id, _ = device_manager.get_available_device(timeout=5)
+                local.append(time.perf_counter() - started)
+                if device_id:
+                    time.sleep(hold)
+                    device_manager.release_device(device_id)
+            with lock:
+                waits.extend(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    metrics = latency_metrics(waits, 'wait_')
+    metrics.update({'acquisitions_per_sec': len(waits) / elapsed, 'devices': devices, 'workers': workers})
+    return metrics
+
+
+def bench_scheduler(options):
+    """JobScheduler dispatch rate and due-to-start latency for one-shot device jobs"""
+    jobs = 2000 if options.quick else 10000
+    devices = options.devices
+    scheduler = JobScheduler(max_workers=8)
+    done = threading.Event()
+    delays, lock = [], threading.Lock()
+    remaining = [jobs]
+
+    def make_job(due):
+        def run():
+            delay = time.time() - due
+            with lock:
+                delays.append(delay)
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    done.set()
+        return run
+
+    try:
+        started = time.perf_counter()
+        for i in range(jobs):
+            scheduler.schedule(make_job(time.time()), device_id=f"device-{i % devices}")
+        submitted = time.perf_counter() - started
+        done.wait(60)
+        elapsed = time.perf_counter() - started
+    finally:
+        scheduler.shutdown()
+
+    metrics = latency_metrics(delays, 'dispatch_')
+    metrics.update({
+        'schedule_per_sec': jobs / submitted,
+        'jobs_per_sec': len(delays) / elapsed,
+        'count': jobs,
+        'devices': devices
+    })
+    return metrics
+
+
+def bench_api_status(options):
+    """GET /api/status latency with N devices: rebuilt, cached, and revalidated (304)"""
+    # Import the app without its startup, which would open Appium sessions for the checkout's
+    # config and write its database; the benchmark swaps in its own state
+    autostart = os.environ.get('AUTOMATION_AUTOSTART')
+    os.environ['AUTOMATION_AUTOSTART'] = '0'
+    try:
+        import backend.app as api
+    finally:
+        if autostart is None:
+            os.environ.pop('AUTOMATION_AUTOSTART', None)
+        else:
+            os.environ['AUTOMATION_AUTOSTART'] = autostart
+
+    iterations = 100 if options.quick else 500
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        device_manager = _device_manager(tmp_dir)
+        _add_stub_devices(device_manager, options.devices)
+        task_runner = InstagramTaskRunner(device_manager)
+        snapshot = StatusSnapshot(device_manager, task_runner)
+
+        saved = (api.device_manager, api.task_runner, api.status_snapshot)
+        api.device_manager, api.task_runner, api.status_snapshot = device_manager, task_runner, snapshot
+        try:
+            client = api.app.test_client()
+            device_ids = list(device_manager.devices)
+
+            def changed():
+                # A device status change, as a task starting or finishing would publish
+                device_manager._publish_device_status(random.choice(device_ids))
+                client.get('/api/status')
+
+            metrics = latency_metrics(time_calls(changed, iterations), 'rebuild_')
+            metrics.update(latency_metrics(time_calls(lambda: client.get('/api/status'), iterations), 'cached_'))
+            etag = client.get('/api/status').headers['ETag']
+            metrics.update(latency_metrics(
+                time_calls(lambda: client.get('/api/status', headers={'If-None-Match': etag}), iterations), 'not_modified_'
+            ))
+            metrics['body_bytes'] = len(client.get('/api/status').data)
+            metrics['devices'] = options.devices
+        finally:
+            api.device_manager, api.task_runner, api.status_snapshot = saved
+            task_runner.scheduler.shutdown()
+    return metrics
+
+
+def bench_execute_task(options):
+    """End-to-end execute_task throughput against fake Appium devices with injected latency"""
+    devices = options.devices
+    duration = 2.0 if options.quick else 5.0
+    workers = devices * 2
+    server = FakeAppiumServer(port=0, devices=devices, latency=options.latency, seed=options.seed).start()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = {
+            'appium_servers': [{'name': 'fake', 'host': server.host, 'port': server.port,
+                                'max_devices': devices, 'max_concurrent_inits': devices}],
+            'devices': server.fake.device_configs(server='fake', model=UI_MAP_MODEL)
+        }
+        device_manager = _device_manager(tmp_dir, config)
+        task_runner = InstagramTaskRunner(device_manager, waiter=ScreenWaiter(timeout=2, poll_interval=0.05))
+        try:
+            started = time.perf_counter()
+            initialized = device_manager.initialize_all_devices(parallel=True, timeout=60)
+            init_time = time.perf_counter() - started
+
+            latencies, errors, lock = [], [0], threading.Lock()
+            deadline = time.time() + duration
+
+            def worker():
+                local, failed = [], 0
+                while time.time() < deadline:
+                    task_started = time.perf_counter()
+                    result = task_runner.execute_task(options.task, acquire_timeout=10)
+                    local.append(time.perf_counter() - task_started)
+                    failed += 0 if result.get('success') else 1
+                with lock:
+                    latencies.extend(local)
+                    errors[0] += failed
+
+            threads = [threading.Thread(target=worker) for _ in range(workers)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            device_manager.close_all_devices()
+            task_runner.scheduler.shutdown()
+            server.stop()
+
+    metrics = latency_metrics(latencies, 'task_')
+    metrics.update({
+        'tasks_per_sec': len(latencies) / elapsed,
+        'success_rate': (len(latencies) - errors[0]) / len(latencies) if latencies else 0.0,
+        'session_init_ms': init_time * 1000.0,
+        'errors': errors[0],
+        'devices': initialized,
+        'workers': workers
+    })
+    return metrics
+
+
+# Name -> benchmark, in the order they run
+BENCHMARKS = {
+    'ui_map': bench_ui_map,
+    'device_pool': bench_device_pool,
+    'scheduler': bench_scheduler,
+    'api_status': bench_api_status,
+    'execute_task': bench_execute_task,
+}
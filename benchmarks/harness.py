@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import math
+import time
+import platform
+import statistics
+
+# Metrics ending in these are better when higher; everything else (latencies in ms) is better when lower
+HIGHER_IS_BETTER = ('_per_sec', '_rate')
+
+# Metrics that describe the run rather than its performance, never compared against the baseline
+INFORMATIONAL = ('count', 'devices', 'workers', 'errors', 'body_bytes')
+
+# p99 of a few hundred samples is mostly scheduler noise: reported, not compared
+UNCOMPARED_SUFFIXES = ('_p99_ms',)
+
+# Latency changes smaller than this are noise at any tolerance
+MIN_LATENCY_CHANGE_MS = 1.0
+
+DEFAULT_TOLERANCE = 0.25  # allowed relative slowdown before a metric counts as a regression
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (pct in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100.0 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def latency_metrics(samples, prefix=''):
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return {}
+    ms = [s * 1000.0 for s in samples]
+    return {
+        f'{prefix}p50_ms': percentile(ms, 50),
+        f'{prefix}p95_ms': percentile(ms, 95),
+        f'{prefix}p99_ms': percentile(ms, 99),
+        f'{prefix}mean_ms': statistics.fmean(ms),
+    }
+
+
+def time_calls(fn, iterations):
+    """Call fn() repeatedly; returns the duration of each call in seconds"""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def higher_is_better(metric):
+    return metric.endswith(HIGHER_IS_BETTER)
+
+
+def comparable(metric):
+    return metric not in INFORMATIONAL and not metric.endswith(UNCOMPARED_SUFFIXES)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare benchmark results with a baseline.
+
+    Args:
+        results: {'benchmarks': {name: {metric: value}}} from this run
+        baseline: Same layout, from a stored run
+        tolerance: Relative change allowed before a metric is flagged
+
+    Returns:
+        list: One dict per compared metric with the baseline, current value,
+              relative change (positive = better) and whether it regressed
+    """
+    rows = []
+    for name, metrics in results.get('benchmarks', {}).items():
+        base_metrics = baseline.get('benchmarks', {}).get(name, {})
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if not comparable(metric) or not isinstance(value, (int, float)) or not isinstance(base, (int, float)):
+                continue
+            if base == 0:
+                continue
+            change = (value - base) / base
+            if not higher_is_better(metric):
+                change = -change
+            regressed = change < -tolerance
+            if regressed and metric.endswith('_ms') and abs(value - base) < MIN_LATENCY_CHANGE_MS:
+                regressed = False
+            rows.append({
+                'benchmark': name,
+                'metric': metric,
+                'baseline': base,
+                'current': value,
+                'change': change,
+                'regressed': regressed
+            })
+    return rows
+
+
+def environment():
+    """Where the results came from, so baselines from different machines aren't mistaken for each other"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.time(),
+    }
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def print_comparison(rows, out=sys.stdout):
+    for row in rows:
+        flag = 'REGRESSION' if row['regressed'] else ''
+        out.write(f"  {row['benchmark']:<22} {row['metric']:<26} {row['baseline']:>12.3f} -> {row['current']:>12.3f} "
+                  f"{row['change'] * 100:+7.1f}% {flag}\n")
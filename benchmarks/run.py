@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite and compare it with the stored baseline.
+
+    python benchmarks/run.py                      # all benchmarks, compared with benchmarks/baseline.json
+    python benchmarks/run.py --only ui_map scheduler --quick
+    python benchmarks/run.py --devices 20 --latency lognormal:0.02,0.5 --output results.json
+    python benchmarks/run.py --save-baseline      # record this machine's numbers as the new baseline
+
+Exits with status 1 if any metric is worse than the baseline by more than --tolerance.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import traceback
+
+# Add project root to path so we can import automation modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.cases import BENCHMARKS
+from benchmarks.harness import (DEFAULT_TOLERANCE, compare, environment, load_results, print_comparison,
+                                save_results)
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the task-execution stack")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument("--devices", type=int, default=8, help="Devices in the pool, scheduler, status and end-to-end runs")
+    parser.add_argument("--latency", default="lognormal:0.01,0.5",
+                        help="Fake Appium command latency for execute_task (see automation/fake_appium.py)")
+    parser.add_argument("--task", default="open_instagram", help="Task the execute_task benchmark runs")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the fake Appium server")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations, for a fast smoke run")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative slowdown allowed before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    # Per-operation INFO logging would dominate the timings
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {
+        'environment': environment(),
+        'options': {k: v for k, v in vars(args).items() if k in ('devices', 'latency', 'task', 'seed', 'quick')},
+        'benchmarks': {}
+    }
+    failed = []
+    for name in args.only or list(BENCHMARKS):
+        print(f"Running {name}...", flush=True)
+        try:
+            metrics = BENCHMARKS[name](args)
+        except Exception:
+            traceback.print_exc()
+            failed.append(name)
+            continue
+        results['benchmarks'][name] = metrics
+        for metric, value in metrics.items():
+            print(f"  {metric:<26} {value:.3f}" if isinstance(value, float) else f"  {metric:<26} {value}")
+
+    # Benchmarks start background threads (hotplug, schedulers) that may still be winding down
+    logging.disable(logging.CRITICAL)
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if failed else 0
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        baseline = load_results(args.baseline)
+        if baseline.get('options') != results['options']:
+            print(f"Note: baseline was recorded with {json.dumps(baseline.get('options'))}")
+        rows = compare(results, baseline, args.tolerance)
+        print(f"\nComparison with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        print_comparison(rows)
+        regressions = [row for row in rows if row['regressed']]
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed")
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+
+    if failed:
+        print(f"Benchmarks failed: {', '.join(failed)}")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './App.css';
 
@@ -33,6 +33,9 @@ function App() {
   const [error, setError] = useState(null);
   const [taskResult, setTaskResult] = useState(null);
   const [taskInterval, setTaskInterval] = useState('');
+  const [availableTasks, setAvailableTasks] = useState([]); // Built-in and declarative tasks from the API
+  const [selectedTasks, setSelectedTasks] = useState({}); // device ID -> task name picked on its card
+  const statusVersion = useRef(null); // Snapshot version of the last applied /status response
 
   // Toggle showing simulators
   const toggleShowOnlyRealDevices = () => {
@@ -56,17 +59,68 @@ function App() {
     return filtered;
   };
 
-  // Fetch system status when component mounts
+  // Fetch system status when component mounts, then follow the live event stream
   useEffect(() => {
-    fetchStatus();
-    // Poll status every 5 seconds
-    const interval = setInterval(() => {
+    let interval = null;
+    fetchAvailableTasks();
+    
+    // Poll status every 5 seconds while the stream is unavailable
+    const startPolling = () => {
+      if (!interval) {
+        interval = setInterval(() => {
+          fetchStatus();
+        }, 5000);
+      }
+    };
+    const stopPolling = () => {
+      clearInterval(interval);
+      interval = null;
+    };
+    
+    if (typeof EventSource === 'undefined') {
       fetchStatus();
-    }, 5000);
+      startPolling();
+      return () => stopPolling();
+    }
+    
+    // The first message is a full snapshot; EventSource resumes from the last event id on reconnect
+    const source = new EventSource(`${API_BASE_URL}/events/stream`);
+    source.onopen = () => stopPolling();
+    source.onerror = () => startPolling();
+    
+    source.addEventListener('snapshot', (e) => applyStatus(JSON.parse(e.data)));
+    source.addEventListener('device_status', (e) => {
+      const event = JSON.parse(e.data);
+      setDevices(prev => prev[event.device_id]
+        ? { ...prev, [event.device_id]: { ...prev[event.device_id], status: event.status } }
+        : prev);
+    });
+    source.addEventListener('server_status', (e) => {
+      const event = JSON.parse(e.data);
+      setServers(prev => prev[event.server_id]
+        ? { ...prev, [event.server_id]: { ...prev[event.server_id], status: event.status } }
+        : prev);
+    });
+    // Changes that aren't carried in full by the event itself; the refetch is a cheap conditional request
+    ['device_added', 'server_added', 'accounts_updated', 'task_scheduled', 'task_stopped', 'task_run'].forEach(type => {
+      source.addEventListener(type, () => fetchStatus());
+    });
     
-    return () => clearInterval(interval);
+    return () => {
+      source.close();
+      stopPolling();
+    };
   }, []);
 
+  // The backend answers while it is still starting; check back until its core is up
+  useEffect(() => {
+    if (status !== 'starting') {
+      return undefined;
+    }
+    const timer = setInterval(() => fetchStatus(), 1000);
+    return () => clearInterval(timer);
+  }, [status]);
+
   // Toggle server expansion
   const toggleServerExpansion = (serverId) => {
     setExpandedServers(prev => ({
@@ -94,43 +148,59 @@ function App() {
   // Fetch the status from the API
   const fetchStatus = async () => {
     try {
+      // The browser revalidates with If-None-Match, so an unchanged snapshot is a cheap 304
       const response = await axios.get(`${API_BASE_URL}/status`);
-      
-      setStatus(response.data.status);
-      setDevices(response.data.devices || {});
-      setServers(response.data.servers || {});
-      setTasks(response.data.tasks || {});
-      
-      // Create a mapping of server ID -> device IDs
-      const tempServerDevices = {};
-      
-      // Process device data to create server to device mapping
-      Object.entries(response.data.devices || {}).forEach(([deviceId, deviceInfo]) => {
-        const serverId = deviceInfo.server;
-        if (serverId) {
-          if (!tempServerDevices[serverId]) {
-            tempServerDevices[serverId] = [];
-          }
-          tempServerDevices[serverId].push(deviceId);
-        }
-      });
-      
-      setServerDevices(tempServerDevices);
-      
-      setError(null);
+      if (response.data.version !== undefined && response.data.version === statusVersion.current) {
+        setError(null);
+        return;
+      }
+      applyStatus(response.data);
     } catch (err) {
       setError(`Error fetching status: ${err.message}`);
       console.error('Error fetching status:', err);
     }
   };
 
+  // Replace the dashboard state with a full status snapshot
+  const applyStatus = (data) => {
+    statusVersion.current = data.version;
+    
+    setStatus(data.status);
+    setDevices(data.devices || {});
+    setServers(data.servers || {});
+    setTasks(data.tasks || {});
+    
+    // Create a mapping of server ID -> device IDs
+    const tempServerDevices = {};
+    
+    // Process device data to create server to device mapping
+    Object.entries(data.devices || {}).forEach(([deviceId, deviceInfo]) => {
+      const serverId = deviceInfo.server;
+      if (serverId) {
+        if (!tempServerDevices[serverId]) {
+          tempServerDevices[serverId] = [];
+        }
+        tempServerDevices[serverId].push(deviceId);
+      }
+    });
+    
+    setServerDevices(tempServerDevices);
+    
+    setError(null);
+  };
+
   // Initialize the system
   const initializeSystem = async () => {
     try {
       setStatus('initializing');
+      // Runs in the background (202); status and the event stream report progress
       await axios.post(`${API_BASE_URL}/initialize`);
       await fetchStatus();
     } catch (err) {
+      if (err.response && err.response.status === 409) {
+        setError('System initialization is already running');
+        return;
+      }
       setError(`Error initializing system: ${err.message}`);
       console.error('Error initializing system:', err);
     }
@@ -214,37 +284,63 @@ function App() {
     }
   };
 
+  // Load the tasks that can be run (built-in ones plus the definitions in tasks/)
+  const fetchAvailableTasks = async () => {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/tasks/available`);
+      setAvailableTasks(response.data.filter(task => !task.error));
+    } catch (err) {
+      console.error('Error fetching available tasks:', err);
+    }
+  };
+
   // Execute a task on a device
-  // const executeTask = async (deviceId) => { // Commented out original executeTask, will be replaced or removed if not used elsewhere
-  //   try {
-  //     setTaskResult(null);
+  const executeTask = async (deviceId, taskName) => {
+    try {
+      setTaskResult(null);
+      setError(null);
       
-  //     const payload = {
-  //       task_name: selectedTask
-  //     };
+      const payload = {
+        task_name: taskName
+      };
       
-  //     // Add repeat interval if provided
-  //     if (taskInterval && !isNaN(taskInterval) && parseInt(taskInterval) > 0) {
-  //       payload.repeat_interval = parseInt(taskInterval);
-  //     }
+      // Add repeat interval if provided
+      if (taskInterval && !isNaN(taskInterval) && parseInt(taskInterval) > 0) {
+        payload.repeat_interval = parseInt(taskInterval);
+      }
       
-  //     const response = await axios.post(
-  //       `${API_BASE_URL}/devices/${deviceId}/task`, 
-  //       payload
-  //     );
+      const submitResponse = await axios.post(`${API_BASE_URL}/devices/${deviceId}/task`, payload);
+      setTaskResult({
+        device: deviceId,
+        task: taskName,
+        result: { success: true, queued: true, job_id: submitResponse.data.job_id }
+      });
       
-  //     setTaskResult({
-  //       device: deviceId,
-  //       task: selectedTask,
-  //       result: response.data
-  //     });
+      const job = await waitForJob(submitResponse.data.job_id);
+      setTaskResult({
+        device: deviceId,
+        task: taskName,
+        result: job.result || { success: false, error: job.error || `Job ${job.state}` }
+      });
       
-  //     await fetchStatus();
-  //   } catch (err) {
-  //     setError(`Error executing task: ${err.response?.data?.error || err.message}`);
-  //     console.error('Error executing task:', err);
-  //   }
-  // };
+      await fetchStatus();
+    } catch (err) {
+      setError(`Error executing task: ${err.response?.data?.error || err.message}`);
+      console.error('Error executing task:', err);
+    }
+  };
+
+  // Poll a submitted job until it finishes and return its final state
+  const waitForJob = async (jobId, intervalMs = 1000) => {
+    for (;;) {
+      const response = await axios.get(`${API_BASE_URL}/jobs/${jobId}`);
+      const job = response.data;
+      if (['succeeded', 'failed', 'cancelled'].includes(job.state)) {
+        return job;
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+  };
 
   // New function to execute the "setup_device" task
   const executeSetupDeviceTask = async (deviceId) => {
@@ -252,19 +348,28 @@ function App() {
       setTaskResult(null); // Clear previous task results
       setError(null); // Clear previous errors
 
-      const response = await axios.post(`${API_BASE_URL}/devices/${deviceId}/setup`);
+      // The backend queues the task and returns a job ID straight away
+      const submitResponse = await axios.post(`${API_BASE_URL}/devices/${deviceId}/setup`);
+      setTaskResult({
+        device: deviceId,
+        task: 'setup_device', // Task name is fixed
+        result: { success: true, queued: true, job_id: submitResponse.data.job_id }
+      });
+
+      const job = await waitForJob(submitResponse.data.job_id);
+      const result = job.result || { success: false, error: job.error || `Job ${job.state}` };
       
       setTaskResult({
         device: deviceId,
         task: 'setup_device', // Task name is fixed
-        result: response.data
+        result
       });
       
-      if (response.data.success) {
+      if (result.success) {
         // Optionally show a success message or handle as needed
-        console.log(`Setup device task started successfully for ${deviceId}:`, response.data.message);
+        console.log(`Setup device task completed for ${deviceId}:`, result.message);
       } else {
-        setError(`Error starting setup task for ${deviceId}: ${response.data.error || 'Unknown error'}`);
+        setError(`Error running setup task for ${deviceId}: ${result.error || 'Unknown error'}`);
       }
       
       await fetchStatus(); // Refresh status to reflect any changes
@@ -364,6 +469,23 @@ function App() {
           >
             Setup Device
           </button>
+          <select
+            value={selectedTasks[deviceId] || ''}
+            onChange={(e) => setSelectedTasks(prev => ({ ...prev, [deviceId]: e.target.value }))}
+            className="task-select"
+          >
+            <option value="">Choose a task...</option>
+            {availableTasks.map(task => (
+              <option key={task.name} value={task.name} title={task.description}>{task.name}</option>
+            ))}
+          </select>
+          <button 
+            onClick={() => executeTask(deviceId, selectedTasks[deviceId])}
+            disabled={device.status !== 'ready' || !selectedTasks[deviceId]}
+            className="action-button"
+          >
+            Run Task
+          </button>
         </div>
       </div>
     );
@@ -374,7 +496,8 @@ function App() {
       <header className="App-header">
         <h1>Instagram Automation Dashboard</h1>
         <div className={`status-indicator status-${status}`}>
-          Status: {status === 'running' ? 'Running' : status === 'loading' ? 'Loading...' : 'Not Initialized'}
+          Status: {status === 'running' ? 'Running' : status === 'loading' ? 'Loading...' :
+            status === 'starting' ? 'Starting...' : 'Not Initialized'}
         </div>
       </header>
 
@@ -664,7 +787,7 @@ function App() {
                     </span>
                   </div>
                   <div className="task-details">
-                    <p><strong>Running for:</strong> {formatDuration(taskInfo.running_for)}</p>
+                    <p><strong>Running for:</strong> {formatDuration(taskInfo.started_at ? Date.now() / 1000 - taskInfo.started_at : taskInfo.running_for)}</p>
                     <p><strong>Interval:</strong> {taskInfo.interval} seconds</p>
                   </div>
                   <div className="task-actions">
@@ -693,12 +816,16 @@ function App() {
                 {taskResult.task} on {devices[taskResult.device]?.name || taskResult.device}
               </h3>
               <div className="result-details">
-                <p>
-                  <strong>Success:</strong>{' '}
-                  <span className={taskResult.result.success ? 'success' : 'error'}>
-                    {taskResult.result.success ? 'Yes' : 'No'}
-                  </span>
-                </p>
+                {taskResult.result.queued ? (
+                  <p><strong>Status:</strong> Running (job {taskResult.result.job_id})</p>
+                ) : (
+                  <p>
+                    <strong>Success:</strong>{' '}
+                    <span className={taskResult.result.success ? 'success' : 'error'}>
+                      {taskResult.result.success ? 'Yes' : 'No'}
+                    </span>
+                  </p>
+                )}
                 {taskResult.result.error && (
                   <p><strong>Error:</strong> {taskResult.result.error}</p>
                 )}
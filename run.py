@@ -7,36 +7,51 @@ import signal
 import argparse
 import webbrowser
 import json
-import requests
+import urllib.request
 
-def check_appium_running(port=4723):
+# Add project root to path so we can import automation modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from automation.appium_transport import get_default_transport
+from automation.storage import ConfigStore, default_db_path
+
+BACKEND_URL = "http://localhost:8001"
+
+# Seconds to wait for the backend to start serving requests
+BACKEND_START_TIMEOUT = 30
+
+def check_appium_running(port=4723, host="localhost"):
     """Check if Appium server is running on the specified port"""
-    try:
-        response = requests.get(f"http://localhost:{port}/status", timeout=2)
-        return response.status_code == 200
-    except:
-        return False
+    return get_default_transport().check_status(host, port)
 
-def start_appium_servers(config_path):
-    """Start multiple Appium servers based on configuration"""
-    # Load config
+def load_server_configs(config_path):
+    """Appium servers from the configuration, or None if it can't be read"""
+    # Load config, from the database once the backend has imported devices.json into it
     try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
+        db_path = default_db_path(config_path)
+        if os.path.exists(db_path):
+            config = ConfigStore(db_path).load_config()
+        else:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
     except Exception as e:
         print(f"Error loading configuration: {e}")
-        return {}
+        return None
         
     # Get server configs
     if "appium_servers" not in config:
         # Default to single server if not using multi-server config
-        servers = [{
+        return [{
             "name": "server-1",
             "host": "127.0.0.1",
             "port": 4723
         }]
-    else:
-        servers = config["appium_servers"]
+    return config["appium_servers"]
+
+def start_appium_servers(config_path):
+    """Start multiple Appium servers based on configuration"""
+    servers = load_server_configs(config_path)
+    if servers is None:
+        return {}
         
     # Start each server
     appium_processes = {}
@@ -79,8 +94,59 @@ def start_appium_servers(config_path):
     
     return appium_processes
 
+def start_fake_appium_servers(config_path, latency=None, failure_rate=None):
+    """Start a fake Appium server (automation/fake_appium.py) in place of each configured one"""
+    servers = load_server_configs(config_path)
+    if servers is None:
+        return {}
+        
+    fake_appium = os.path.join(os.path.dirname(os.path.abspath(__file__)), "automation", "fake_appium.py")
+    appium_processes = {}
+    
+    for server in servers:
+        server_name = server["name"]
+        port = server["port"]
+        
+        if check_appium_running(port):
+            print(f"Appium server already running on port {port}")
+            continue
+            
+        print(f"Starting fake Appium server {server_name} on port {port}...")
+        cmd = [sys.executable, fake_appium, "--port", str(port)]
+        for spec in latency or []:
+            cmd += ["--latency", spec]
+        for spec in failure_rate or []:
+            cmd += ["--failure-rate", spec]
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        
+        # Starts in well under a second; poll rather than sleep for a fixed time
+        for _ in range(50):
+            if check_appium_running(port):
+                break
+            time.sleep(0.1)
+        
+        if check_appium_running(port):
+            print(f"Fake Appium server {server_name} started on port {port}")
+            appium_processes[server_name] = process
+        else:
+            print(f"Failed to start fake Appium server {server_name} on port {port}")
+            process.terminate()
+    
+    return appium_processes
+
+def get_backend_health(check):
+    """JSON body of /api/health/<check> ('live' or 'ready'), or None if the backend isn't answering"""
+    try:
+        with urllib.request.urlopen(f"{BACKEND_URL}/api/health/{check}", timeout=1) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # /ready answers 503 with the per-component state until everything is up
+        return json.loads(e.read())
+    except Exception:
+        return None
+
 def start_backend():
-    """Start the Flask backend"""
+    """Start the Flask backend and wait until it is serving requests"""
     print("Starting Flask backend...")
     try:
         backend_process = subprocess.Popen(
@@ -88,12 +154,24 @@ def start_backend():
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
-        # Give the backend a moment to start
-        time.sleep(3)
-        return backend_process
     except Exception as e:
         print(f"Error starting backend: {e}")
         return None
+        
+    # Devices are initialized in the background, so the API answers long before they are ready
+    deadline = time.time() + BACKEND_START_TIMEOUT
+    while time.time() < deadline:
+        if backend_process.poll() is not None:
+            print(f"Backend exited during startup (exit code {backend_process.returncode})")
+            return None
+        if get_backend_health("live"):
+            print(f"Backend serving on {BACKEND_URL}")
+            return backend_process
+        time.sleep(0.1)
+        
+    print(f"Backend didn't start serving within {BACKEND_START_TIMEOUT}s")
+    backend_process.terminate()
+    return None
 
 def start_frontend_dev():
     """Start the React development server"""
@@ -130,6 +208,12 @@ def setup_ui_map():
 def main():
     parser = argparse.ArgumentParser(description="Run the Instagram Automation System")
     parser.add_argument("--no-appium", action="store_true", help="Don't start Appium servers")
+    parser.add_argument("--fake-appium", action="store_true",
+                        help="Start fake Appium servers with virtual devices instead of real ones (no phones needed)")
+    parser.add_argument("--fake-latency", action="append",
+                        help="Fake server latency spec, optionally per command (e.g. 'lognormal:0.05,0.6', 'create_session=uniform:2,6')")
+    parser.add_argument("--fake-failure-rate", action="append",
+                        help="Fake server failure probability, optionally per command (e.g. '0.01', 'execute=0.05')")
     parser.add_argument("--no-frontend", action="store_true", help="Don't start React dev server")
     parser.add_argument("--no-browser", action="store_true", help="Don't open browser")
     parser.add_argument("--config", default="config/devices.json", help="Path to configuration file")
@@ -175,7 +259,11 @@ def main():
             print("Warning: UI map setup failed. System may not work properly.")
             
         # Start Appium servers if needed
-        if not args.no_appium:
+        if args.fake_appium:
+            appium_processes = start_fake_appium_servers(config_path, args.fake_latency, args.fake_failure_rate)
+            if not appium_processes:
+                print("Warning: No fake Appium servers started")
+        elif not args.no_appium:
             appium_processes = start_appium_servers(config_path)
             if not appium_processes:
                 print("Warning: No Appium servers started")
@@ -195,7 +283,7 @@ def main():
         if not args.no_browser:
             if args.no_frontend:
                 # Open backend endpoint
-                webbrowser.open("http://localhost:8000")
+                webbrowser.open(BACKEND_URL)
             else:
                 # Open frontend 
                 webbrowser.open("http://localhost:3000")
@@ -204,7 +292,10 @@ def main():
         running_servers = len(appium_processes)
         print(f"\nInstagram Automation System is running!")
         print(f"- Appium Servers: {running_servers} running")
-        print(f"- Backend: Running on http://localhost:8000")
+        print(f"- Backend: Running on {BACKEND_URL}")
+        ready = get_backend_health("ready")
+        if ready and not ready.get("ready"):
+            print(f"  (devices still initializing, see {BACKEND_URL}/api/health/ready)")
         if frontend_process:
             print(f"- Frontend: Running on http://localhost:3000")
         print("Press Ctrl+C to stop all services\n")
@@ -71,17 +71,19 @@ def test_task_runner(device_manager):
     print("\n=== Testing Task Runner ===")
     
     # Initialize task runner
-    ui_map_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instagram_map.json')
-    task_runner = InstagramTaskRunner(device_manager, ui_map_path)
+    task_runner = InstagramTaskRunner(device_manager)
     
-    # Print available UI map screens
+    # Print available UI map screens for each configured device model
     print("\nUI Map Screens:")
-    if task_runner.ui_map:
-        for screen_name in task_runner.ui_map.keys():
-            element_count = len(task_runner.ui_map[screen_name])
-            print(f"  {screen_name}: {element_count} elements")
-    else:
-        print("  No UI map loaded")
+    models = sorted({d['model'] for d in device_manager.config['devices'] if d.get('model')})
+    for model in models:
+        ui_map = task_runner.ui_map_cache.get(model)
+        if ui_map:
+            for screen_name in ui_map.keys():
+                element_count = len(ui_map[screen_name])
+                print(f"  {model}/{screen_name}: {element_count} elements")
+        else:
+            print(f"  No UI map loaded for {model}")
     
     return task_runner
 
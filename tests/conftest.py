@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+import time
+
+import pytest
+
+# Tests import the automation package from the repository root, as the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from automation.device_manager import DeviceManager
+from automation.discovery import DeviceDiscovery, StubCommandRunner
+
+IPHONE_13 = '00008110-000A04D11AD3801E'
+IPHONE_16 = '00008140-000869980208801C'
+PIXEL = '1A2B3C4D5E6F'
+
+TEST_CONFIG = {
+    "appium_servers": [
+        {"name": "server-1", "host": "127.0.0.1", "port": 4723, "max_devices": 5}
+    ],
+    "devices": [
+        {"name": "iPhone 13", "udid": IPHONE_13, "platformName": "iOS", "platformVersion": "18.0",
+         "automationName": "XCUITest", "server": "server-1", "model": "iphone13_pro_max"},
+        {"name": "iPhone 16", "udid": IPHONE_16, "platformName": "iOS", "platformVersion": "18.1.1",
+         "automationName": "XCUITest", "server": "server-1", "model": "iphone16_pro"},
+        {"name": "Pixel 8", "udid": PIXEL, "platformName": "Android", "platformVersion": "14",
+         "automationName": "UiAutomator2", "server": "server-1", "model": "pixel8"},
+    ]
+}
+
+
+class StubDriver:
+    """Stands in for an Appium driver; records quit()"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.quit_calls = 0
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+@pytest.fixture
+def device_manager(tmp_path):
+    """A DeviceManager for TEST_CONFIG with no connected hardware and no Appium server"""
+    config_path = tmp_path / 'devices.json'
+    config_path.write_text(json.dumps(TEST_CONFIG))
+    return DeviceManager(config_path=str(config_path), discovery=DeviceDiscovery(StubCommandRunner()))
+
+
+@pytest.fixture
+def connect_device(device_manager):
+    """Mark a configured device ready with a StubDriver, as a successful initialize_device would"""
+    def connect(udid):
+        device_config = next(d for d in device_manager.config['devices'] if d['udid'] == udid)
+        driver = StubDriver(f"session-{udid}")
+        with device_manager.lock:
+            device_manager.drivers[udid] = driver
+            device_manager.devices[udid] = {
+                'config': device_config,
+                'status': 'ready',
+                'last_active': time.time(),
+                'server': device_config['server']
+            }
+            device_manager.device_available.notify_all()
+        return driver
+    return connect
+
+
+@pytest.fixture
+def backend_app(monkeypatch):
+    """The backend module, imported without starting device initialization"""
+    monkeypatch.setenv('AUTOMATION_AUTOSTART', '0')
+    import backend.app as api
+    return api
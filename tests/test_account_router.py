@@ -0,0 +1,86 @@
+import pytest
+
+from automation.account_router import AccountRouter
+from automation.events import EventBus
+
+from conftest import IPHONE_13, IPHONE_16, PIXEL
+
+
+@pytest.fixture
+def router():
+    return AccountRouter({
+        IPHONE_13: ['alice', 'shared'],
+        IPHONE_16: ['bob', 'shared'],
+        PIXEL: ['shared', 'carol'],
+    })
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('automation.account_router.time.time', lambda: now[0])
+    return now
+
+
+def test_accounts_resolve_in_both_directions(router):
+    assert router.device_for('alice') == IPHONE_13
+    assert router.devices_for('shared') == [IPHONE_13, IPHONE_16, PIXEL]
+    assert router.accounts_for(PIXEL) == ['shared', 'carol']
+    assert router.device_for('mallory') is None
+    assert router.accounts_for('unknown-udid') == []
+
+
+def test_device_with_the_account_active_wins(router, clock):
+    router.set_active(IPHONE_13, 'alice')
+    clock[0] += 10
+    router.set_active(PIXEL, 'shared')
+
+    assert router.device_for('shared') == PIXEL
+
+
+def test_least_recently_switched_device_is_chosen(router, clock):
+    router.set_active(IPHONE_13, 'alice')
+    clock[0] += 10
+    router.set_active(PIXEL, 'carol')
+
+    # iPhone 16 has no known active account, so switching it disturbs nothing
+    assert router.device_for('shared') == IPHONE_16
+
+    clock[0] += 10
+    router.set_active(IPHONE_16, 'bob')
+    assert router.device_for('shared') == IPHONE_13
+
+    # Re-recording the same account is a switch too
+    clock[0] += 10
+    router.set_active(IPHONE_13, 'alice')
+    assert router.device_for('shared') == PIXEL
+
+
+def test_reassigning_accounts_updates_the_index(router, clock):
+    router.set_active(PIXEL, 'carol')
+
+    router.set_accounts(PIXEL, ['dave', 'dave'])
+
+    assert router.accounts_for(PIXEL) == ['dave']
+    assert router.devices_for('shared') == [IPHONE_13, IPHONE_16]
+    assert router.device_for('carol') is None
+    # The active account was signed out, so it is no longer recorded
+    assert router.active_account(PIXEL) is None
+
+
+def test_events_keep_the_index_current():
+    events = EventBus()
+    router = AccountRouter(events=events)
+    published = []
+    events.subscribe(published.append)
+
+    events.publish('accounts_updated', device_id=PIXEL, accounts=['alice'])
+    router.set_active(PIXEL, 'alice')
+    router.set_active(PIXEL, 'alice')
+    router.clear_active(PIXEL)
+
+    assert router.device_for('alice') == PIXEL
+    assert router.active_account(PIXEL) is None
+    # Only a change of account is announced
+    assert [e['type'] for e in published] == ['accounts_updated', 'active_account']
+    assert router.to_dict() == {'alice': {'devices': [PIXEL], 'active_on': []}}
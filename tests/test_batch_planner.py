@@ -0,0 +1,82 @@
+from automation.batch_planner import BatchPlanner, PlannedJob
+
+NOW = 1_000_000.0
+
+
+def accounts(plan):
+    return [job.account for job in plan.jobs]
+
+
+def job_ids(plan):
+    return [job.job_id for job in plan.jobs]
+
+
+def test_jobs_are_grouped_by_account():
+    jobs = [PlannedJob(n, account) for n, account in enumerate(['alice', 'bob', 'alice', 'bob', 'alice'])]
+
+    plan = BatchPlanner(switch_estimate=8).plan(jobs, now=NOW)
+
+    assert job_ids(plan) == [0, 2, 4, 1, 3]
+    assert plan.switches == 2
+    assert plan.estimated_switch_time == 16
+    assert plan.late == []
+
+
+def test_active_account_goes_first():
+    jobs = [PlannedJob(n, account) for n, account in enumerate(['alice', 'bob', 'alice', 'bob'])]
+
+    plan = BatchPlanner().plan(jobs, active_account='bob', now=NOW)
+
+    assert accounts(plan) == ['bob', 'bob', 'alice', 'alice']
+    assert plan.switches == 1
+
+
+def test_priority_beats_staying_on_the_active_account():
+    jobs = [
+        PlannedJob('b1', 'bob'),
+        PlannedJob('a1', 'alice'),
+        PlannedJob('a2', 'alice', priority=5),
+    ]
+
+    plan = BatchPlanner().plan(jobs, active_account='bob', now=NOW)
+
+    # The whole group moves up with its most urgent job, highest priority first within it
+    assert job_ids(plan) == ['a2', 'a1', 'b1']
+    assert plan.switches == 2
+
+
+def test_deadline_at_risk_runs_its_group_first():
+    jobs = [PlannedJob(f"a{n}", 'alice', duration=10) for n in range(3)]
+    jobs.append(PlannedJob('b1', 'bob', duration=10, deadline=NOW + 25))
+
+    plan = BatchPlanner(switch_estimate=8).plan(jobs, active_account='alice', now=NOW)
+
+    assert job_ids(plan) == ['b1', 'a0', 'a1', 'a2']
+    assert plan.switches == 2
+    assert plan.late == []
+
+
+def test_unreachable_deadline_does_not_reorder():
+    jobs = [PlannedJob(f"a{n}", 'alice', duration=10) for n in range(3)]
+    jobs.append(PlannedJob('b1', 'bob', duration=10, deadline=NOW + 15))
+
+    plan = BatchPlanner(switch_estimate=8).plan(jobs, active_account='alice', now=NOW)
+
+    # Switching can't make it in time anyway, so the active account keeps going
+    assert accounts(plan) == ['alice', 'alice', 'alice', 'bob']
+    assert plan.switches == 1
+    assert plan.late == ['b1']
+
+
+def test_estimates_follow_measurements():
+    planner = BatchPlanner(switch_estimate=8, smoothing=0.5)
+
+    planner.record_switch('phone-a', 4)
+    planner.record_task('like_post', 20)
+
+    assert planner.switch_estimate('phone-a') == 6
+    assert planner.switch_estimate('phone-b') == 8
+    assert planner.task_estimate('like_post') == 15
+
+    plan = planner.plan([PlannedJob(1, 'alice'), PlannedJob(2, 'bob')], device_id='phone-a', now=NOW)
+    assert plan.estimated_switch_time == 12
@@ -0,0 +1,130 @@
+import time
+import threading
+
+import pytest
+
+from conftest import IPHONE_13, IPHONE_16, PIXEL, StubDriver
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def device_configs(device_manager, *udids):
+    """Configs as added through add_device, which always sets deviceName"""
+    configs = [dict(d, deviceName=d['name']) for d in device_manager.config['devices']]
+    return [c for c in configs if c['udid'] in udids] if udids else configs
+
+
+def test_outcomes_are_reported_per_device(device_manager, monkeypatch):
+    release = threading.Event()
+
+    def start_session(device_config):
+        udid = device_config['udid']
+        if udid == IPHONE_16:
+            release.wait(2)  # a handshake that hangs past the timeout
+            return False
+        if udid == PIXEL:
+            device_manager._init_errors[udid] = "Could not start UiAutomator2 server"
+            return False
+        with device_manager.lock:
+            device_manager.devices[udid] = {'config': device_config, 'status': 'ready',
+                                            'last_active': time.time(), 'server': 'server-1'}
+        return True
+
+    monkeypatch.setattr(device_manager, '_start_session', start_session)
+    try:
+        results = device_manager.initialize_devices_concurrently(timeout=0.3)
+    finally:
+        release.set()
+
+    assert {udid: r['outcome'] for udid, r in results.items()} == {
+        IPHONE_13: 'ready', IPHONE_16: 'timeout', PIXEL: 'failed'
+    }
+    assert results[IPHONE_13]['error'] is None
+    assert results[PIXEL]['error'] == "Could not start UiAutomator2 server"
+    assert results[IPHONE_16]['error'] == "Initialization timed out after 0.3s"
+    assert results[IPHONE_16]['duration'] >= 0.3
+
+
+def test_handshakes_are_limited_per_server(device_manager, monkeypatch):
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def start_session(device_config):
+        with lock:
+            active.append(device_config['udid'])
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(device_config['udid'])
+        return True
+
+    monkeypatch.setattr(device_manager, '_start_session', start_session)
+    results = device_manager.initialize_devices_concurrently(per_server_limit=1)
+
+    assert all(r['success'] for r in results.values())
+    assert max(peak) == 1
+
+
+def test_failure_carries_the_exception_message(device_manager, monkeypatch):
+    def refuse(*args, **kwargs):
+        raise ConnectionError("Connection refused by 127.0.0.1:4723")
+
+    monkeypatch.setattr(device_manager.transport, 'create_connection', refuse)
+    results = device_manager.initialize_devices_concurrently(device_configs(device_manager, PIXEL))
+
+    assert results[PIXEL]['outcome'] == 'failed'
+    assert results[PIXEL]['error'] == "Connection refused by 127.0.0.1:4723"
+    assert device_manager.devices[PIXEL]['status'] == 'error'
+
+
+class LateSession(StubDriver):
+    def get_window_size(self):
+        return {'width': 393, 'height': 852}
+
+
+def test_session_started_after_a_timeout_is_quit(device_manager, monkeypatch):
+    webdriver = pytest.importorskip('appium.webdriver')
+    release = threading.Event()
+    sessions = []
+
+    def remote(command_executor, desired_caps):
+        release.wait(2)
+        sessions.append(LateSession('late-session'))
+        return sessions[-1]
+
+    monkeypatch.setattr(webdriver, 'Remote', remote)
+    monkeypatch.setattr(device_manager.transport, 'create_connection', lambda *args, **kwargs: None)
+
+    results = device_manager.initialize_devices_concurrently(device_configs(device_manager, IPHONE_16), timeout=0.2)
+    assert results[IPHONE_16]['outcome'] == 'timeout'
+    assert device_manager.devices[IPHONE_16]['status'] == 'error'
+
+    release.set()
+    assert wait_for(lambda: sessions and sessions[0].quit_calls == 1)
+    # The abandoned attempt never marks the device ready or keeps its driver
+    assert IPHONE_16 not in device_manager.drivers
+    assert device_manager.devices[IPHONE_16]['status'] == 'error'
+    assert device_manager._init_errors[IPHONE_16] == "Session started after its initialization had timed out"
+
+
+def test_reinitializing_quits_the_old_driver_outside_the_lock(device_manager, connect_device, monkeypatch):
+    old = connect_device(IPHONE_13)
+    held = []
+    old.quit = lambda: held.append(device_manager.lock.locked())
+
+    def refuse(*args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+    monkeypatch.setattr(device_manager.transport, 'create_connection', refuse)
+    device_manager.initialize_device(device_configs(device_manager, IPHONE_13)[0])
+
+    assert held == [False]
+    assert IPHONE_13 not in device_manager.drivers
@@ -0,0 +1,116 @@
+import time
+import threading
+
+from conftest import IPHONE_13, IPHONE_16, PIXEL
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def start_waiter(device_manager, results, name, **affinity):
+    """Start a thread that acquires a device, records it and releases it; returns once it is queued"""
+    queued = len(device_manager._waiters) + 1
+
+    def run():
+        device_id, _ = device_manager.acquire_device(timeout=2, **affinity)
+        results.append((name, device_id))
+        if device_id:
+            device_manager.release_device(device_id)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert wait_for(lambda: len(device_manager._waiters) >= queued)
+    return thread
+
+
+def test_waiters_are_served_in_arrival_order(device_manager, connect_device):
+    connect_device(PIXEL)
+    device_id, _ = device_manager.acquire_device(timeout=0)
+    assert device_id == PIXEL
+
+    results = []
+    threads = [start_waiter(device_manager, results, n) for n in range(4)]
+    device_manager.release_device(PIXEL)
+    for thread in threads:
+        thread.join(timeout=3)
+
+    assert results == [(0, PIXEL), (1, PIXEL), (2, PIXEL), (3, PIXEL)]
+    assert device_manager.devices[PIXEL]['status'] == 'ready'
+
+
+def test_waiter_for_another_model_is_not_blocked(device_manager, connect_device):
+    connect_device(IPHONE_13)
+    connect_device(IPHONE_16)
+    assert device_manager.acquire_device(timeout=0, model='iphone13_pro_max')[0] == IPHONE_13
+
+    results = []
+    thread = start_waiter(device_manager, results, 'iphone13', model='iphone13_pro_max')
+
+    # The queued iPhone 13 request can't use the iPhone 16, so it is free for us
+    assert device_manager.acquire_device(timeout=0, platform='iOS')[0] == IPHONE_16
+    assert results == []
+
+    device_manager.release_device(IPHONE_13)
+    thread.join(timeout=3)
+    assert results == [('iphone13', IPHONE_13)]
+
+
+def test_earlier_waiter_gets_released_device_before_later_request(device_manager, connect_device):
+    connect_device(IPHONE_13)
+    device_manager.acquire_device(timeout=0)
+
+    results = []
+    thread = start_waiter(device_manager, results, 'first', platform='iOS')
+    # A request arriving after the release still queues behind the earlier waiter
+    late = []
+    late_thread = threading.Thread(target=lambda: late.append(device_manager.acquire_device(timeout=0.3)[0]))
+
+    device_manager.release_device(IPHONE_13)
+    late_thread.start()
+    thread.join(timeout=3)
+    late_thread.join(timeout=3)
+
+    assert results == [('first', IPHONE_13)]
+    assert late in ([IPHONE_13], [None])
+
+
+def test_specific_device_request_waits_for_that_device(device_manager, connect_device):
+    connect_device(IPHONE_16)
+    connect_device(PIXEL)
+    assert device_manager.acquire_device(timeout=0, device_id=PIXEL)[0] == PIXEL
+
+    results = []
+    thread = start_waiter(device_manager, results, 'pixel', device_id=PIXEL)
+    time.sleep(0.1)
+    # The iPhone 16 is free, but this request only takes the Pixel
+    assert results == []
+    assert device_manager.devices[IPHONE_16]['status'] == 'ready'
+
+    device_manager.release_device(PIXEL)
+    thread.join(timeout=3)
+    assert results == [('pixel', PIXEL)]
+
+
+def test_acquire_times_out_when_nothing_matches(device_manager, connect_device):
+    connect_device(IPHONE_16)
+
+    started = time.time()
+    assert device_manager.acquire_device(timeout=0.2, platform='Android') == (None, None)
+
+    assert time.time() - started >= 0.2
+    assert len(device_manager._waiters) == 0
+    assert device_manager.devices[IPHONE_16]['status'] == 'ready'
+
+
+def test_device_without_driver_is_never_handed_out(device_manager, connect_device):
+    connect_device(PIXEL)
+    with device_manager.lock:
+        del device_manager.drivers[PIXEL]
+
+    assert device_manager.acquire_device(timeout=0) == (None, None)
@@ -0,0 +1,152 @@
+import time
+
+from automation.discovery import (
+    DeviceDiscovery, StubCommandRunner, XCTRACE_DEVICES, IDEVICE_ID, ADB_DEVICES, ANDROID_PROPERTIES
+)
+
+IPHONE = '00008140-000869980208801C'
+IPAD = '00008103-001A2B3C4D5E6F70'
+PIXEL = '1A2B3C4D5E6F'
+GALAXY = 'R58N12ABCDE'
+
+XCTRACE_OUTPUT = f"""== Devices ==
+Tristan's MacBook Pro (14.5) (11111111-2222-3333-4444-555555555555)
+Tristan's iPhone (18.1.1) ({IPHONE})
+Work iPad (17.5) ({IPAD})
+
+== Simulators ==
+iPhone 16 Pro Simulator (18.0) (AAAAAAAA-BBBB-CCCC-DDDD-EEEEEEEEEEEE)
+"""
+
+ADB_OUTPUT = f"""List of devices attached
+{PIXEL}\tdevice
+{GALAXY}\tdevice
+UNAUTH1234567\tunauthorized
+OFFLINE123456\toffline
+emulator-5554\tdevice
+
+"""
+
+
+def getprop(udid):
+    """The combined getprop command DeviceDiscovery runs for an Android device"""
+    return ('adb', '-s', udid, 'shell', " && ".join(f"getprop {prop}" for prop in ANDROID_PROPERTIES))
+
+
+def make_runner(**overrides):
+    outputs = {
+        XCTRACE_DEVICES: XCTRACE_OUTPUT,
+        IDEVICE_ID: f"{IPHONE}\n",  # the iPad is listed by xctrace but not connected
+        ADB_DEVICES: ADB_OUTPUT,
+        getprop(PIXEL): "Pixel 8\n14\n",
+        getprop(GALAXY): "SM-S918B\n13\n",
+    }
+    outputs.update(overrides)
+    return StubCommandRunner(outputs)
+
+
+def by_udid(inventory):
+    return {device.udid: device for device in inventory}
+
+
+def test_refresh_builds_inventory_from_all_tools():
+    inventory = DeviceDiscovery(make_runner()).refresh()
+    devices = by_udid(inventory)
+
+    assert set(devices) == {IPHONE, PIXEL, GALAXY}
+    iphone = devices[IPHONE]
+    assert (iphone.name, iphone.platform_name, iphone.platform_version, iphone.automation_name) == \
+        ("Tristan's iPhone", 'iOS', '18.1.1', 'XCUITest')
+    pixel = devices[PIXEL]
+    assert (pixel.name, pixel.platform_name, pixel.platform_version, pixel.automation_name) == \
+        ('Pixel 8', 'Android', '14', 'UiAutomator2')
+    assert devices[GALAXY].platform_version == '13'
+    # iOS devices come first
+    assert inventory.devices[0].udid == IPHONE
+
+
+def test_refresh_skips_unauthorized_offline_and_emulators():
+    inventory = DeviceDiscovery(make_runner()).refresh()
+
+    for udid in ('UNAUTH1234567', 'OFFLINE123456', 'emulator-5554'):
+        assert udid not in by_udid(inventory)
+    # Emulators are real adb devices for session purposes, just not added to the inventory
+    assert inventory.real_udids == [IPHONE, PIXEL, GALAXY, 'emulator-5554']
+
+
+def test_refresh_skips_macs_simulators_and_disconnected_ios_devices():
+    devices = by_udid(DeviceDiscovery(make_runner()).refresh())
+
+    assert IPAD not in devices
+    assert '11111111-2222-3333-4444-555555555555' not in devices
+    assert 'AAAAAAAA-BBBB-CCCC-DDDD-EEEEEEEEEEEE' not in devices
+
+
+def test_refresh_runs_each_listing_tool_once_and_in_parallel():
+    runner = make_runner()
+    runner.delay = 0.2
+    discovery = DeviceDiscovery(runner)
+
+    started = time.time()
+    discovery.refresh()
+    elapsed = time.time() - started
+
+    listings = [call for call in runner.calls if call in (XCTRACE_DEVICES, IDEVICE_ID, ADB_DEVICES)]
+    assert sorted(listings) == sorted([XCTRACE_DEVICES, IDEVICE_ID, ADB_DEVICES])
+    # Three listings and two property probes, each 0.2s: one round for each stage, not five in a row
+    assert elapsed < 0.7
+
+
+def test_android_properties_are_read_in_one_shell_and_cached():
+    runner = make_runner()
+    discovery = DeviceDiscovery(runner)
+
+    first = discovery.refresh()
+    second = discovery.refresh()
+
+    assert runner.calls.count(getprop(PIXEL)) == 1
+    assert runner.calls.count(getprop(GALAXY)) == 1
+    assert (first.probes, second.probes) == (2, 0)
+    assert by_udid(second)[PIXEL].name == 'Pixel 8'
+
+
+def test_failed_property_probe_falls_back_and_is_retried():
+    runner = make_runner()
+    runner.outputs[getprop(PIXEL)] = (1, '')
+    discovery = DeviceDiscovery(runner)
+
+    pixel = by_udid(discovery.refresh())[PIXEL]
+    assert (pixel.name, pixel.platform_version) == ('Android Device', 'Unknown')
+
+    # Failures aren't cached, so the next refresh probes again
+    runner.outputs[getprop(PIXEL)] = "Pixel 8\n14\n"
+    assert by_udid(discovery.refresh())[PIXEL].name == 'Pixel 8'
+    assert runner.calls.count(getprop(PIXEL)) == 2
+
+
+def test_forget_drops_cached_properties():
+    runner = make_runner()
+    discovery = DeviceDiscovery(runner)
+    discovery.refresh()
+
+    discovery.forget(PIXEL)
+    discovery.refresh()
+
+    assert runner.calls.count(getprop(PIXEL)) == 2
+    assert runner.calls.count(getprop(GALAXY)) == 1
+
+
+def test_missing_tools_give_an_empty_inventory():
+    inventory = DeviceDiscovery(StubCommandRunner()).refresh()
+
+    assert len(inventory) == 0
+    assert inventory.real_udids == []
+
+
+def test_real_device_udids_uses_idevice_id_and_adb_only():
+    runner = make_runner()
+
+    udids = DeviceDiscovery(runner).real_device_udids()
+
+    assert udids == [IPHONE, PIXEL, GALAXY, 'emulator-5554']
+    assert XCTRACE_DEVICES not in runner.calls
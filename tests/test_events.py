@@ -0,0 +1,137 @@
+import threading
+
+import pytest
+
+from automation.events import EventBus, coalesce, format_sse
+from automation.status_snapshot import StatusSnapshot
+
+from conftest import IPHONE_16, PIXEL
+
+
+def test_every_subscriber_gets_every_event():
+    bus = EventBus()
+    first, second = [], []
+    bus.subscribe(first.append)
+    bus.subscribe(lambda event: 1 / 0)  # a failing subscriber doesn't stop the others
+    bus.subscribe(second.append)
+
+    bus.publish('device_status', device_id=PIXEL, status='ready')
+    published = bus.publish('server_status', server_id='server-1', status='running')
+
+    assert [e['type'] for e in first] == ['device_status', 'server_status']
+    assert [e['id'] for e in second] == [1, 2]
+    assert published == dict(first[1], id=2)
+
+
+def test_unsubscribed_callback_stops_receiving():
+    bus = EventBus()
+    received = []
+    callback = bus.subscribe(received.append)
+
+    bus.publish('device_added', device_id=PIXEL)
+    bus.unsubscribe(callback)
+    bus.publish('device_removed', device_id=PIXEL)
+
+    assert [e['type'] for e in received] == ['device_added']
+
+
+def test_readers_resume_from_the_last_id_they_saw():
+    bus = EventBus(history_size=3)
+    assert bus.since(0) == []
+    for n in range(5):
+        bus.publish('job_updated', job_id=f'job-{n}')
+
+    assert [e['job_id'] for e in bus.since(3)] == ['job-3', 'job-4']
+    assert bus.since(5) == []
+    # Events after id 1 have been dropped from the history: the reader must resync
+    assert bus.since(1) is None
+    assert [e['id'] for e in bus.since(2)] == [3, 4, 5]
+
+
+def test_each_event_is_encoded_once_for_all_readers():
+    bus = EventBus(history_size=2)
+    event = bus.publish('device_status', device_id=PIXEL, status='busy')
+
+    assert bus.message(event) is bus.message(event)
+    assert bus.message(event) == format_sse('device_status', event, event['id'])
+    assert bus.message(event).startswith(f"id: {event['id']}\nevent: device_status\ndata: {{")
+    # Encodings leave with their events
+    bus.publish('device_status', device_id=PIXEL, status='ready')
+    bus.publish('device_status', device_id=PIXEL, status='busy')
+    assert event['id'] not in bus._messages
+
+
+def test_wait_for_wakes_on_publish_and_times_out():
+    bus = EventBus()
+    assert bus.wait_for(0, timeout=0.05) is False
+
+    threading.Timer(0.05, lambda: bus.publish('task_started', device_id=PIXEL)).start()
+    assert bus.wait_for(0, timeout=2) is True
+
+
+def test_coalesce_keeps_the_latest_state_per_key():
+    bus = EventBus()
+    events = [
+        bus.publish('device_status', device_id=PIXEL, status='initializing'),
+        bus.publish('job_queued', job_id='job-1'),
+        bus.publish('device_status', device_id=IPHONE_16, status='ready'),
+        bus.publish('device_status', device_id=PIXEL, status='ready'),
+        bus.publish('job_finished', job_id='job-1'),
+        bus.publish('session_reconnected', device_id=PIXEL),
+        bus.publish('session_reconnected', device_id=PIXEL),
+    ]
+
+    assert [e['id'] for e in coalesce(events)] == [3, 4, 5, 6, 7]
+
+
+@pytest.fixture
+def stream(backend_app, device_manager, monkeypatch):
+    """Open /api/events/stream and return an iterator over its messages"""
+    monkeypatch.setattr(backend_app, 'EVENT_COALESCE_WINDOW', 0)
+    monkeypatch.setattr(backend_app, 'EVENT_KEEPALIVE_INTERVAL', 0.05)
+    device_manager.events = EventBus(history_size=3)
+    monkeypatch.setattr(backend_app, 'device_manager', device_manager)
+    monkeypatch.setattr(backend_app, 'status_snapshot', StatusSnapshot(device_manager))
+    responses = []
+
+    def open_stream(last_event_id=None):
+        headers = {'Last-Event-ID': str(last_event_id)} if last_event_id is not None else {}
+        response = backend_app.app.test_client().get('/api/events/stream', headers=headers)
+        responses.append(response)
+        assert response.mimetype == 'text/event-stream'
+        return (chunk.decode('utf-8') for chunk in response.response)
+
+    yield open_stream
+    for response in responses:
+        response.close()
+
+
+def test_stream_starts_with_a_snapshot(stream, device_manager):
+    device_manager.events.publish('device_added', device_id=PIXEL)
+
+    messages = stream()
+
+    assert next(messages).startswith("id: 1\nevent: snapshot\ndata: {")
+    assert next(messages) == ": keep-alive\n\n"
+
+
+def test_stream_resumes_with_coalesced_events(stream, device_manager):
+    events = device_manager.events
+    events.publish('device_added', device_id=PIXEL)
+    events.publish('device_status', device_id=PIXEL, status='initializing')
+    events.publish('device_status', device_id=PIXEL, status='ready')
+
+    messages = stream(last_event_id=1)
+    burst = next(messages)
+
+    assert 'event: snapshot' not in burst
+    assert burst == events.message(events.since(2)[-1])
+
+
+def test_reader_that_fell_behind_the_history_gets_a_fresh_snapshot(stream, device_manager):
+    for n in range(5):
+        device_manager.events.publish('job_updated', job_id=f'job-{n}')
+
+    messages = stream(last_event_id=1)
+
+    assert next(messages).startswith("id: 5\nevent: snapshot\n")
@@ -0,0 +1,136 @@
+import pytest
+
+from automation import gestures
+from automation.gestures import GestureBatch
+from automation.tracing import Tracer, TASK
+
+SCREEN_SIZE = (390, 844)
+
+
+class ActionsDriver:
+    """Records W3C actions calls; raises on the call numbered fail_on (1-based)"""
+
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    def execute(self, command, params):
+        self.calls.append(params['actions'][0]['actions'])
+        if len(self.calls) == self.fail_on:
+            raise RuntimeError("session gone")
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(gestures.time, 'sleep', slept.append)
+    return slept
+
+
+def test_chunks_split_by_seconds():
+    batch = GestureBatch(ActionsDriver(), SCREEN_SIZE, max_chunk_seconds=2)
+    batch.tap(10, 10).swipe(100, 600, 100, 200, duration=1).pause(0.5).swipe(100, 600, 100, 200, duration=1)
+
+    chunks = list(batch._chunks(batch.gestures))
+
+    assert [[g.kind for g in chunk] for chunk in chunks] == [['tap', 'swipe', 'pause'], ['swipe']]
+    assert all(sum(g.duration for g in chunk) <= 2 for chunk in chunks)
+
+
+def test_chunks_split_by_action_count():
+    batch = GestureBatch(ActionsDriver(), SCREEN_SIZE, max_chunk_actions=8)
+    for n in range(5):
+        batch.tap(10 * n, 10)
+
+    # Each tap is four actions; a gesture is never split across calls
+    assert [len(chunk) for chunk in batch._chunks(batch.gestures)] == [2, 2, 1]
+
+
+def test_oversized_gesture_gets_a_chunk_of_its_own():
+    batch = GestureBatch(ActionsDriver(), SCREEN_SIZE, max_chunk_seconds=1)
+    batch.tap(10, 10).pause(5).tap(20, 20)
+
+    assert [[g.kind for g in chunk] for chunk in batch._chunks(batch.gestures)] == [['tap'], ['pause'], ['tap']]
+
+
+def test_gestures_go_out_in_one_call(sleeps):
+    driver = ActionsDriver()
+    batch = GestureBatch(driver, SCREEN_SIZE)
+    batch.tap(100, 200).pause(1).swipe(200, 600, 200, 200, duration=0.5)
+
+    report = batch.perform()
+
+    assert len(driver.calls) == 1
+    assert [a['type'] for a in driver.calls[0]] == [
+        'pointerMove', 'pointerDown', 'pause', 'pointerUp',
+        'pause',
+        'pointerMove', 'pointerDown', 'pointerMove', 'pointerUp',
+    ]
+    assert report.to_dict()['calls_saved'] == 2
+    assert (report.completed, report.error) == (3, None)
+    assert len(batch) == 0  # the queue is cleared
+    assert sleeps == []
+
+
+def test_pause_only_chunk_never_hits_the_driver(sleeps):
+    driver = ActionsDriver()
+    batch = GestureBatch(driver, SCREEN_SIZE, max_chunk_seconds=1)
+    batch.tap(10, 10).pause(3).tap(20, 20)
+
+    report = batch.perform()
+
+    assert len(driver.calls) == 2
+    assert sleeps == [3.0]
+    assert [chunk['actions'] for chunk in report.chunks] == [4, 0, 4]
+    assert report.calls == 2
+
+
+def test_trailing_pause_is_slept_instead_of_sent(sleeps):
+    driver = ActionsDriver()
+    batch = GestureBatch(driver, SCREEN_SIZE)
+    batch.swipe(200, 600, 200, 200, duration=0.5).pause(2)
+
+    report = batch.perform()
+
+    assert driver.calls[0][-1]['type'] == 'pointerUp'
+    assert sleeps == [2.0]
+    assert report.chunks[0]['actions'] == 4
+
+
+def test_failed_call_reports_the_gestures_sent_before_it(sleeps):
+    driver = ActionsDriver(fail_on=2)
+    batch = GestureBatch(driver, SCREEN_SIZE, max_chunk_actions=8)
+    for n in range(5):
+        batch.tap(10 * n, 10)
+
+    report = batch.perform().to_dict()
+
+    assert len(driver.calls) == 2  # nothing is sent after the failure
+    assert (report['gestures'], report['completed'], report['calls']) == (5, 2, 1)
+    assert report['error'] == "session gone"
+
+
+def test_taps_stay_on_screen_and_elements_resolve(sleeps):
+    points = {('profile_screen_details', 'profile-tab'): (351, 805)}
+    batch = GestureBatch(ActionsDriver(), SCREEN_SIZE, resolver=lambda screen, key: points.get((screen, key)))
+
+    batch.tap(-50, 2000).tap_element('profile_screen_details', 'profile-tab', jitter=0)
+    with pytest.raises(KeyError):
+        batch.tap_element('profile_screen_details', 'missing')
+
+    first, second = batch.gestures
+    assert (first.actions[0]['x'], first.actions[0]['y']) == (5, 839)
+    assert (second.actions[0]['x'], second.actions[0]['y'], second.label) == (
+        351, 805, 'profile_screen_details.profile-tab')
+
+
+def test_batch_is_traced_inside_a_task(sleeps):
+    tracer = Tracer()
+    batch = GestureBatch(ActionsDriver(fail_on=1), SCREEN_SIZE, tracer=tracer)
+
+    with tracer.span('scroll_feed', TASK) as task:
+        batch.scroll_down(duration=0.5).perform()
+
+    span = tracer.get(task.trace_id).spans[1]
+    assert (span.name, span.attributes, span.error) == ('gesture_batch', {'gestures': 1, 'calls': 0},
+                                                        'session gone')
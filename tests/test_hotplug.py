@@ -0,0 +1,221 @@
+import sys
+import time
+import socket
+import plistlib
+import threading
+
+import pytest
+
+from automation.hotplug import (
+    DeviceEvent, HotplugWatcher, ScriptedEventSource, AdbTrackDevicesSource, UsbmuxdSource
+)
+
+from conftest import IPHONE_13, IPHONE_16, PIXEL
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def initialized(device_manager, monkeypatch):
+    """Device configs the watcher asked the DeviceManager to start sessions for"""
+    calls = []
+    monkeypatch.setattr(device_manager, 'initialize_device', lambda device_config: calls.append(device_config['udid']))
+    return calls
+
+
+def test_detach_drops_session_and_marks_disconnected(device_manager, connect_device, initialized):
+    driver = connect_device(IPHONE_13)
+    source = ScriptedEventSource()
+    watcher = HotplugWatcher(device_manager, sources=[source], reconnect_delay=0.05).start()
+    try:
+        source.detach(IPHONE_13, 'iOS')
+        assert wait_for(lambda: device_manager.devices[IPHONE_13]['status'] == 'disconnected')
+    finally:
+        watcher.stop()
+
+    assert IPHONE_13 not in device_manager.drivers
+    assert driver.quit_calls == 1
+    assert initialized == []
+
+
+def test_attach_initializes_configured_device_without_session(device_manager, connect_device, initialized):
+    connect_device(IPHONE_13)
+    source = ScriptedEventSource([
+        DeviceEvent(IPHONE_13, False, 'iOS', 'scripted'),
+        DeviceEvent(IPHONE_13, True, 'iOS', 'scripted'),
+    ])
+    watcher = HotplugWatcher(device_manager, sources=[source], reconnect_delay=0.05).start()
+    try:
+        assert wait_for(lambda: initialized == [IPHONE_13])
+    finally:
+        watcher.stop()
+
+    assert IPHONE_13 in device_manager.real_device_udids
+
+
+def test_attach_without_auto_initialize_only_records_device(device_manager, initialized):
+    watcher = HotplugWatcher(device_manager, sources=[], auto_initialize=False)
+
+    watcher.handle(DeviceEvent(PIXEL, True, 'Android', 'scripted'))
+
+    assert PIXEL in device_manager.real_device_udids
+    assert initialized == []
+
+
+def test_mark_device_attached_ignores_unconfigured_and_live_devices(device_manager, connect_device):
+    assert device_manager.mark_device_attached('UNKNOWN-UDID') is None
+    assert 'UNKNOWN-UDID' in device_manager.real_device_udids
+
+    connect_device(IPHONE_16)
+    assert device_manager.mark_device_attached(IPHONE_16) is None
+
+    with device_manager.lock:
+        device_manager.devices[IPHONE_16]['status'] = 'busy'
+    assert device_manager.mark_device_attached(IPHONE_16) is None
+
+    assert device_manager.mark_device_attached(PIXEL)['udid'] == PIXEL
+
+
+def test_detached_device_stays_disconnected_after_release(device_manager, connect_device):
+    connect_device(PIXEL)
+    device_id, _ = device_manager.acquire_device(timeout=0)
+    assert device_id == PIXEL
+
+    assert device_manager.mark_device_detached(PIXEL)
+    device_manager.release_device(PIXEL)
+
+    assert device_manager.devices[PIXEL]['status'] == 'disconnected'
+    assert device_manager.acquire_device(timeout=0) == (None, None)
+    assert device_manager.mark_device_attached(PIXEL)['udid'] == PIXEL
+
+
+def adb_frame(lines):
+    payload = ''.join(f"{serial}\t{state}\n" for serial, state in lines).encode()
+    return f"{len(payload):04x}".encode() + payload
+
+
+def test_adb_track_devices_framing(tmp_path):
+    frames = [
+        adb_frame([]),
+        adb_frame([(PIXEL, 'offline')]),
+        adb_frame([(PIXEL, 'device')]),
+        adb_frame([(PIXEL, 'device'), ('R58N12ABCDE', 'unauthorized')]),
+        adb_frame([(PIXEL, 'device'), ('R58N12ABCDE', 'device')]),
+        adb_frame([('R58N12ABCDE', 'device')]),
+    ]
+    fake_adb = tmp_path / 'adb'
+    fake_adb.write_text(f"#!{sys.executable}\n"
+                        "import sys\n"
+                        f"sys.stdout.buffer.write({b''.join(frames)!r})\n")
+    fake_adb.chmod(0o755)
+
+    events = list(AdbTrackDevicesSource(str(fake_adb)).events())
+
+    assert [(e.udid, e.attached) for e in events] == [
+        (PIXEL, True),
+        ('R58N12ABCDE', True),
+        (PIXEL, False),
+    ]
+    assert {e.platform for e in events} == {'Android'}
+
+
+def test_adb_parse_device_list_keeps_only_device_state():
+    payload = f"{PIXEL}\tdevice\nUNAUTH\tunauthorized\nOFF\toffline\n\n"
+
+    assert AdbTrackDevicesSource.parse_device_list(payload) == {PIXEL}
+
+
+def usbmuxd_frame(message, tag=0):
+    payload = plistlib.dumps(message)
+    header = UsbmuxdSource.HEADER
+    return header.pack(header.size + len(payload), UsbmuxdSource.PLIST_VERSION, UsbmuxdSource.PLIST_MESSAGE, tag) + payload
+
+
+def read_usbmuxd_frame(conn):
+    header = UsbmuxdSource.HEADER
+    data = b''
+    while len(data) < header.size:
+        data += conn.recv(header.size - len(data))
+    length = header.unpack(data)[0]
+    payload = b''
+    while len(payload) < length - header.size:
+        payload += conn.recv(length - header.size - len(payload))
+    return plistlib.loads(payload)
+
+
+def serve_usbmuxd(socket_path, messages, received):
+    """Accept one client, answer its Listen, send messages, then hang up"""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(1)
+
+    def run():
+        conn, _ = server.accept()
+        with conn:
+            received.append(read_usbmuxd_frame(conn))
+            conn.sendall(usbmuxd_frame({'MessageType': 'Result', 'Number': 0}, tag=1))
+            for message in messages:
+                conn.sendall(usbmuxd_frame(message))
+        server.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_usbmuxd_listen_attach_and_detach(tmp_path):
+    serial = IPHONE_16.replace('-', '')
+    socket_path = str(tmp_path / 'usbmuxd')
+    received = []
+    thread = serve_usbmuxd(socket_path, [
+        {'MessageType': 'Attached', 'DeviceID': 3,
+         'Properties': {'SerialNumber': serial, 'ConnectionType': 'USB'}},
+        {'MessageType': 'Attached', 'DeviceID': 4,
+         'Properties': {'SerialNumber': IPHONE_13, 'ConnectionType': 'Network'}},
+        {'MessageType': 'Paired', 'DeviceID': 3},
+        {'MessageType': 'Detached', 'DeviceID': 4},
+        {'MessageType': 'Detached', 'DeviceID': 3},
+    ], received)
+
+    events = []
+    with pytest.raises(EOFError):
+        for event in UsbmuxdSource(socket_path).events():
+            events.append(event)
+    thread.join(timeout=2)
+
+    assert received[0]['MessageType'] == 'Listen'
+    # Network devices are skipped by default, so its Detached has no UDID to report
+    assert [(e.udid, e.attached) for e in events] == [(IPHONE_16, True), (IPHONE_16, False)]
+    assert {e.platform for e in events} == {'iOS'}
+
+
+def test_usbmuxd_refused_listen(tmp_path):
+    socket_path = str(tmp_path / 'usbmuxd')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(1)
+
+    def refuse():
+        conn, _ = server.accept()
+        with conn:
+            read_usbmuxd_frame(conn)
+            conn.sendall(usbmuxd_frame({'MessageType': 'Result', 'Number': 6}, tag=1))
+        server.close()
+
+    threading.Thread(target=refuse, daemon=True).start()
+
+    with pytest.raises(RuntimeError, match='error 6'):
+        list(UsbmuxdSource(socket_path).events())
+
+
+def test_usbmuxd_normalize_udid():
+    assert UsbmuxdSource.normalize_udid('00008140000869980208801C') == IPHONE_16
+    assert UsbmuxdSource.normalize_udid('a1b2c3d4e5f60718293a4b5c6d7e8f9012345678') == \
+        'a1b2c3d4e5f60718293a4b5c6d7e8f9012345678'
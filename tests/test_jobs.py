@@ -0,0 +1,176 @@
+import time
+import threading
+
+import pytest
+
+from automation.job_store import JobStore, QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED
+from automation.task_runner import InstagramTaskRunner
+
+from conftest import PIXEL
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_job_store_evicts_oldest_finished_jobs_only():
+    store = JobStore(max_jobs=3)
+    first = store.create('open_instagram')
+    second = store.create('go_to_profile')
+    third = store.create('scroll_feed')
+    store.mark_running(second.job_id)
+    store.mark_finished(third.job_id, {"success": True})
+
+    fourth = store.create('setup_device')
+
+    # The oldest finished job goes; queued and running jobs are never evicted
+    assert store.get(third.job_id) is None
+    assert [j.job_id for j in store.list()] == [fourth.job_id, second.job_id, first.job_id]
+
+    # Over capacity with nothing finished, the store grows rather than dropping live jobs
+    fifth = store.create('scroll_feed')
+    assert len(store.list()) == 4
+    store.mark_finished(first.job_id, {"success": False, "error": "boom"})
+    store.create('scroll_feed')
+    assert store.get(first.job_id) is None
+    assert store.get(fifth.job_id) is not None
+
+
+def test_job_store_state_transitions():
+    store = JobStore()
+    job = store.create('open_instagram', PIXEL, {'iterations': 2})
+    assert job.state == QUEUED and not job.wait(0)
+
+    assert store.mark_running(job.job_id).state == RUNNING
+    store.mark_finished(job.job_id, {"success": False, "error": "No available devices"})
+
+    assert job.wait(0)
+    assert (job.state, job.error) == (FAILED, "No available devices")
+    # A finished job keeps its first outcome
+    store.mark_finished(job.job_id, {"success": True})
+    assert job.state == FAILED
+    assert store.list(state=FAILED, device_id=PIXEL) == [job]
+    assert store.get_many([job.job_id, 'missing']) == {job.job_id: job}
+
+
+@pytest.fixture
+def runner(device_manager):
+    runner = InstagramTaskRunner(device_manager, accounts=None, max_any_device_jobs=2)
+    yield runner
+    runner.scheduler.shutdown()
+
+
+def test_submit_task_rejects_unknown_device(runner):
+    assert runner.submit_task('open_instagram', 'NOT-A-DEVICE') is None
+    assert runner.jobs.list() == []
+
+
+def test_submit_task_runs_on_the_scheduler_and_records_the_result(runner, monkeypatch):
+    calls = []
+    monkeypatch.setattr(runner, 'execute_task',
+                        lambda task_name, device_id, **kwargs: calls.append((task_name, device_id, kwargs))
+                        or {"success": True, "message": "done"})
+
+    # A configured device is accepted before its session exists
+    job = runner.submit_task('open_instagram', PIXEL, wait_timeout=5)
+
+    assert job.wait(2)
+    assert job.state == SUCCEEDED
+    assert job.result == {"success": True, "message": "done"}
+    assert calls == [('open_instagram', PIXEL, {'wait_timeout': 5})]
+
+
+def test_cancelled_job_never_runs(runner, monkeypatch):
+    release = threading.Event()
+    ran = []
+    monkeypatch.setattr(runner, 'execute_task',
+                        lambda task_name, device_id, **kwargs: release.wait(2) and ran.append(task_name)
+                        or {"success": True})
+
+    running = runner.submit_task('open_instagram', PIXEL)
+    queued = runner.submit_task('scroll_feed', PIXEL)
+    assert wait_for(lambda: running.state == RUNNING)
+
+    assert runner.cancel_job(queued.job_id) == {"success": True}
+    assert runner.cancel_job(running.job_id)['success'] is False
+    release.set()
+
+    assert running.wait(2)
+    time.sleep(0.1)
+    assert queued.state == CANCELLED
+    assert ran == ['open_instagram']
+
+
+def test_jobs_without_a_device_are_capped(runner, monkeypatch):
+    release = threading.Event()
+    waiting = []
+    lock = threading.Lock()
+
+    def execute_task(task_name, device_id, **kwargs):
+        with lock:
+            waiting.append(task_name)
+        release.wait(2)
+        return {"success": True}
+
+    monkeypatch.setattr(runner, 'execute_task', execute_task)
+    jobs = [runner.submit_task('scroll_feed') for _ in range(4)]
+    device_job = runner.submit_task('open_instagram', PIXEL)
+
+    # Two jobs wait for any device; the device job and housekeeping still get workers
+    assert wait_for(lambda: 'open_instagram' in waiting)
+    housekeeping = runner.scheduler.schedule(lambda: {"success": True}, name='server-health')
+    assert wait_for(lambda: housekeeping.run_count == 1)
+    assert sum(1 for job in jobs if job.state == RUNNING) == 2
+    assert sum(1 for job in jobs if job.state == QUEUED) == 2
+
+    release.set()
+    assert all(job.wait(2) for job in jobs + [device_job])
+
+
+@pytest.fixture
+def client(backend_app, runner, device_manager, monkeypatch):
+    monkeypatch.setattr(backend_app, 'device_manager', device_manager)
+    monkeypatch.setattr(backend_app, 'task_runner', runner)
+    return backend_app.app.test_client()
+
+
+def test_task_api_rejects_unknown_device(client):
+    response = client.post('/api/devices/NOT-A-DEVICE/task', json={'task_name': 'open_instagram'})
+
+    assert response.status_code == 400
+    assert 'not a known device' in response.get_json()['error']
+
+
+def test_task_api_returns_job_and_waits_on_request(client, runner, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(runner, 'execute_task',
+                        lambda task_name, device_id, **kwargs: release.wait(2) and {"success": True, "scrolled": 3})
+
+    queued = client.post('/api/devices/{}/task'.format(PIXEL), json={'task_name': 'scroll_feed'})
+    assert queued.status_code == 202
+    body = queued.get_json()
+    assert body['status_url'] == f"/api/jobs/{body['job_id']}"
+
+    status = client.get(body['status_url'])
+    assert status.status_code == 200
+    assert status.get_json()['state'] in (QUEUED, RUNNING)
+
+    threading.Timer(0.1, release.set).start()
+    finished = client.get(f"{body['status_url']}?wait=2")
+    assert finished.get_json()['state'] == SUCCEEDED
+    assert finished.get_json()['result'] == {"success": True, "scrolled": 3}
+
+    # Waiting on submission returns the finished job's result in the old synchronous shape
+    waited = client.post('/api/devices/{}/task?wait=2'.format(PIXEL), json={'task_name': 'scroll_feed'})
+    assert waited.status_code == 200
+    assert waited.get_json()['scrolled'] == 3
+
+
+def test_job_api_unknown_job(client):
+    assert client.get('/api/jobs/missing').status_code == 404
+    assert client.post('/api/jobs/missing/cancel').status_code == 409
@@ -0,0 +1,131 @@
+import pytest
+
+from automation.metrics import MetricsRegistry, InstrumentedDriver, PROMETHEUS_CONTENT_TYPE
+
+from conftest import IPHONE_16, StubDriver
+
+
+class CommandDriver(StubDriver):
+    def __init__(self, session_id):
+        super().__init__(session_id)
+        self.orientation = 'PORTRAIT'
+
+    def execute_script(self, script, args=None):
+        return None
+
+    def find_element(self, by, value):
+        raise LookupError(f"No element {value}")
+
+
+def series(text, name):
+    """{labels: value} for the samples of one metric name in Prometheus text"""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith(name + '{') or line.startswith(name + ' '):
+            labels, _, value = line[len(name):].rpartition(' ')
+            samples[labels] = value
+    return samples
+
+
+def test_driver_commands_are_timed_and_failures_counted():
+    metrics = MetricsRegistry(prefix='test_')
+    rotations = []
+    driver = InstrumentedDriver(CommandDriver('session-1'), metrics, IPHONE_16, 'server-1',
+                                on_orientation_change=lambda: rotations.append(1))
+
+    driver.execute_script('mobile: tap', {'x': 1, 'y': 2})
+    driver.execute_script('mobile:tap', {'x': 3, 'y': 4})
+    driver.execute_script('return document.title')
+    with pytest.raises(LookupError):
+        driver.find_element('accessibility id', 'profile-tab')
+    driver.orientation = 'LANDSCAPE'
+
+    seconds = metrics.histogram('appium_command_seconds', '', ('device', 'server', 'command'))
+    labels = {'device': IPHONE_16, 'server': 'server-1'}
+    assert seconds.snapshot(command='mobile:tap', **labels)['count'] == 2
+    assert seconds.snapshot(command='execute_script', **labels)['count'] == 1
+    assert seconds.snapshot(command='setScreenOrientation', **labels)['count'] == 1
+    failures = metrics.counter('appium_command_failures_total', '', ('device', 'server', 'command'))
+    assert failures.value(command='find_element', **labels) == 1
+    assert failures.value(command='mobile:tap', **labels) == 0
+    assert rotations == [1]
+    # Attributes that aren't commands pass straight through
+    assert driver.session_id == 'session-1'
+
+
+def test_render_prometheus_text():
+    metrics = MetricsRegistry(prefix='test_')
+    latency = metrics.histogram('command_seconds', 'Command latency', ('device', 'command'), buckets=(0.1, 1))
+    latency.observe(0.05, device='phone "a"\\b\n', command='tap')
+    latency.observe(0.1, device='phone "a"\\b\n', command='tap')
+    latency.observe(0.5, device='phone "a"\\b\n', command='tap')
+    latency.observe(3, device='phone "a"\\b\n', command='tap')
+    metrics.counter('failures_total', 'Failed commands').inc()
+    metrics.counter('failures_total', 'Failed commands').inc(2)
+
+    text = metrics.render()
+    lines = text.splitlines()
+
+    # Metrics render in name order, each introduced by HELP and TYPE
+    assert lines[:2] == ['# HELP test_command_seconds Command latency', '# TYPE test_command_seconds histogram']
+    assert '# HELP test_failures_total Failed commands' in lines
+    assert '# TYPE test_failures_total counter' in lines
+    assert 'test_failures_total 3' in lines
+
+    device = 'device="phone \\"a\\"\\\\b\\n"'
+    assert series(text, 'test_command_seconds_bucket') == {
+        f'{{{device},command="tap",le="0.1"}}': '2',  # a value equal to a bound lands in its bucket
+        f'{{{device},command="tap",le="1"}}': '3',
+        f'{{{device},command="tap",le="+Inf"}}': '4',
+    }
+    assert series(text, 'test_command_seconds_sum') == {f'{{{device},command="tap"}}': '3.65'}
+    assert series(text, 'test_command_seconds_count') == {f'{{{device},command="tap"}}': '4'}
+    assert text.endswith('\n')
+
+
+def test_metric_names_and_labels_are_checked():
+    metrics = MetricsRegistry()
+    metrics.counter('events_total', 'Events', ('device',))
+
+    with pytest.raises(ValueError):
+        metrics.histogram('events_total', 'Events', ('device',))
+    with pytest.raises(ValueError):
+        metrics.counter('events_total', 'Events', ('device',)).inc()
+
+
+def test_device_lifecycle_is_recorded(device_manager, monkeypatch):
+    outcomes = [True, False, True]
+    monkeypatch.setattr(device_manager, '_start_session', lambda device_config: outcomes.pop(0))
+    device_config = next(d for d in device_manager.config['devices'] if d['udid'] == IPHONE_16)
+
+    for _ in range(3):
+        device_manager.initialize_device(device_config)
+
+    text = device_manager.metrics.render()
+    labels = f'device="{IPHONE_16}",server="server-1"'
+    init_counts = series(text, 'instagram_automation_device_init_seconds_count')
+    assert init_counts[f'{{{labels},outcome="success"}}'] == '2'
+    assert init_counts[f'{{{labels},outcome="failure"}}'] == '1'
+    # Every start after the first successful one is a retry
+    assert series(text, 'instagram_automation_device_init_retries_total') == {f'{{{labels}}}': '2'}
+
+
+def test_metrics_endpoint(backend_app, device_manager, connect_device, monkeypatch):
+    monkeypatch.setattr(backend_app, 'device_manager', device_manager)
+    driver = InstrumentedDriver(CommandDriver('session-1'), device_manager.metrics, IPHONE_16, 'server-1')
+    driver.execute_script('mobile: swipe', {'direction': 'up'})
+
+    response = backend_app.app.test_client().get('/api/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == PROMETHEUS_CONTENT_TYPE
+    body = response.get_data(as_text=True)
+    assert '# TYPE instagram_automation_appium_command_seconds histogram' in body
+    assert (f'instagram_automation_appium_command_seconds_count{{device="{IPHONE_16}",server="server-1",'
+            f'command="mobile:swipe"}} 1') in body
+
+
+def test_metrics_endpoint_before_startup(backend_app, monkeypatch):
+    monkeypatch.setattr(backend_app, 'device_manager', None)
+
+    assert backend_app.app.test_client().get('/api/metrics').status_code == 500
@@ -0,0 +1,201 @@
+import io
+import json
+import time
+import urllib.error
+
+import pytest
+
+import run
+from automation.device_manager import DeviceManager
+from automation.discovery import DeviceDiscovery, StubCommandRunner
+from automation.readiness import Readiness, PENDING, STARTING, READY, DEGRADED, FAILED
+
+from conftest import TEST_CONFIG, IPHONE_13, IPHONE_16, PIXEL
+
+
+def test_components_move_through_their_stages():
+    readiness = Readiness(('core', 'devices'))
+    assert readiness.status('core') == PENDING and not readiness.is_ready
+
+    readiness.start('core')
+    assert readiness.status('core') == STARTING
+    readiness.ready('core')
+    readiness.start('devices')
+    readiness.finish('devices', DEGRADED, error="1 of 3 configured devices aren't up", configured=3)
+
+    body = readiness.to_dict()
+    assert body['ready'] is True
+    assert body['components']['core']['duration'] >= 0
+    assert body['components']['devices']['configured'] == 3
+
+    readiness.reset()
+    assert readiness.to_dict()['components'] == {'core': {'status': PENDING}, 'devices': {'status': PENDING}}
+
+
+def test_a_failed_component_means_not_ready():
+    readiness = Readiness(('core', 'hotplug'))
+    readiness.ready('core')
+    readiness.fail('hotplug', RuntimeError("adb not found"))
+
+    assert not readiness.is_ready
+    assert readiness.to_dict()['components']['hotplug']['error'] == "adb not found"
+
+
+@pytest.mark.parametrize('up, configured, status', [
+    (3, 3, READY), (1, 3, DEGRADED), (0, 3, FAILED), (0, 0, READY),
+])
+def test_device_readiness(backend_app, up, configured, status):
+    assert backend_app.device_readiness(up, configured)[0] == status
+
+
+class StubHotplugWatcher:
+    def __init__(self, device_manager):
+        self.device_manager = device_manager
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def startup(backend_app, tmp_path, monkeypatch):
+    """Run backend initialize_system against a temporary config; returns run(ready_devices)"""
+    config_path = tmp_path / 'devices.json'
+    config_path.write_text(json.dumps(TEST_CONFIG))
+    monkeypatch.setattr(backend_app, 'DEFAULT_CONFIG_PATH', str(config_path))
+    monkeypatch.setattr(backend_app, 'DEFAULT_DB_PATH', str(tmp_path / 'automation.db'))
+    monkeypatch.setattr(backend_app, 'MANAGED_ACCOUNTS_PATH', str(tmp_path / 'managed_accounts.json'))
+    monkeypatch.setattr(backend_app, 'HotplugWatcher', StubHotplugWatcher)
+    monkeypatch.setattr(backend_app, 'startup', Readiness(('core', 'devices', 'hotplug')))
+    for name in ('device_manager', 'task_runner', 'status_snapshot', 'hotplug_watcher', 'session_watchdog'):
+        monkeypatch.setattr(backend_app, name, None)
+
+    def run_startup(ready_devices=()):
+        def make_manager(config_path, store=None):
+            manager = DeviceManager(config_path, store=store, discovery=DeviceDiscovery(StubCommandRunner()))
+            manager._start_session = lambda device_config: start_session(manager, device_config)
+            return manager
+
+        def start_session(manager, device_config):
+            if device_config['udid'] not in ready_devices:
+                return False
+            with manager.lock:
+                manager.devices[device_config['udid']] = {'config': device_config, 'status': 'ready',
+                                                          'last_active': time.time(), 'server': 'server-1'}
+            return True
+
+        monkeypatch.setattr(backend_app, 'DeviceManager', make_manager)
+        backend_app.initialize_system()
+        return backend_app.startup
+
+    yield run_startup
+    if backend_app.task_runner:
+        backend_app.task_runner.scheduler.shutdown()
+    if backend_app.session_watchdog:
+        backend_app.session_watchdog.stop()
+
+
+def ready_check(backend_app):
+    response = backend_app.app.test_client().get('/api/health/ready')
+    return response.status_code, response.get_json()
+
+
+def test_startup_with_every_device_up_is_ready(backend_app, startup):
+    readiness = startup(ready_devices=(IPHONE_13, IPHONE_16, PIXEL))
+
+    assert [readiness.status(c) for c in ('core', 'devices', 'hotplug')] == [READY, READY, READY]
+    code, body = ready_check(backend_app)
+    assert code == 200
+    assert body['components']['devices']['ready_devices'] == 3
+    assert body['initializing'] is False
+
+
+def test_startup_with_some_devices_up_is_degraded_but_ready(backend_app, startup):
+    readiness = startup(ready_devices=(IPHONE_16,))
+
+    assert readiness.status('devices') == DEGRADED
+    code, body = ready_check(backend_app)
+    assert code == 200
+    assert body['components']['devices']['error'] == "2 of 3 configured devices aren't up"
+
+
+def test_failed_device_startup_is_not_ready_until_a_device_comes_up(backend_app, startup):
+    readiness = startup()
+
+    assert readiness.status('devices') == FAILED
+    assert readiness.status('hotplug') == READY  # later stages still run
+    code, body = ready_check(backend_app)
+    assert code == 503
+    assert body['ready'] is False
+    assert body['components']['devices']['error'] == "None of the 3 configured devices could be initialized"
+
+    # After startup, the devices component follows the live device states
+    manager = backend_app.device_manager
+    with manager.lock:
+        manager.devices[PIXEL] = {'config': {'name': 'Pixel 8'}, 'status': 'busy', 'last_active': time.time(),
+                                  'server': 'server-1'}
+    code, body = ready_check(backend_app)
+    assert code == 200
+    assert body['components']['devices']['status'] == DEGRADED
+
+
+def test_core_failure_stops_startup(backend_app, startup, monkeypatch):
+    def broken_store(path):
+        raise OSError("database is locked")
+    monkeypatch.setattr(backend_app, 'ConfigStore', broken_store)
+
+    readiness = startup()
+
+    assert readiness.to_dict()['components']['core']['error'] == "database is locked"
+    assert [readiness.status(c) for c in ('devices', 'hotplug')] == [PENDING, PENDING]
+    assert backend_app.device_manager is None
+    assert ready_check(backend_app)[0] == 503
+
+
+def test_liveness_answers_before_startup(backend_app, monkeypatch):
+    monkeypatch.setattr(backend_app, 'startup', Readiness(('core', 'devices', 'hotplug')))
+
+    assert backend_app.app.test_client().get('/api/health/live').status_code == 200
+    code, body = ready_check(backend_app)
+    assert code == 503
+    assert body['components']['core'] == {'status': PENDING}
+
+
+def test_run_reads_the_ready_body_from_a_503(monkeypatch):
+    body = {'ready': False, 'components': {'devices': {'status': 'starting'}}}
+
+    def unavailable(url, timeout):
+        raise urllib.error.HTTPError(url, 503, 'Service Unavailable', {}, io.BytesIO(json.dumps(body).encode()))
+    monkeypatch.setattr(run.urllib.request, 'urlopen', unavailable)
+    assert run.get_backend_health('ready') == body
+
+    def refused(url, timeout):
+        raise urllib.error.URLError('Connection refused')
+    monkeypatch.setattr(run.urllib.request, 'urlopen', refused)
+    assert run.get_backend_health('live') is None
+
+
+def test_run_waits_for_the_backend_to_serve(monkeypatch):
+    class Process:
+        returncode = None
+
+        def poll(self):
+            return self.returncode
+
+        def terminate(self):
+            self.returncode = -15
+
+    answers = [None, None, {'status': 'alive'}]
+    monkeypatch.setattr(run.subprocess, 'Popen', lambda *args, **kwargs: Process())
+    monkeypatch.setattr(run, 'get_backend_health', lambda check: answers.pop(0))
+    monkeypatch.setattr(run.time, 'sleep', lambda seconds: None)
+
+    assert isinstance(run.start_backend(), Process)
+    assert answers == []
+
+    exited = Process()
+    exited.returncode = 1
+    monkeypatch.setattr(run.subprocess, 'Popen', lambda *args, **kwargs: exited)
+    assert run.start_backend() is None
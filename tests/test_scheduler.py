@@ -0,0 +1,178 @@
+import time
+import threading
+
+import pytest
+
+from automation.scheduler import JobScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(max_workers=4)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_jobs_run_in_due_order(scheduler):
+    ran = []
+    scheduler.schedule(lambda: ran.append('late'), delay=0.15)
+    scheduler.schedule(lambda: ran.append('early'), delay=0.05)
+    scheduler.schedule(lambda: ran.append('middle'), delay=0.1)
+
+    assert wait_for(lambda: len(ran) == 3)
+    assert ran == ['early', 'middle', 'late']
+    # One-shot jobs are forgotten once they have run
+    assert scheduler.jobs() == []
+
+
+def test_recurring_job_skips_missed_runs(scheduler):
+    starts = []
+
+    def slow_first_run():
+        starts.append(time.time())
+        if len(starts) == 1:
+            time.sleep(0.25)
+
+    job = scheduler.schedule(slow_first_run, interval=0.05)
+    assert wait_for(lambda: len(starts) >= 3)
+    scheduler.cancel(job.job_id)
+
+    # The four runs missed during the slow one are dropped, not fired back to back
+    assert starts[1] - starts[0] >= 0.25
+    assert starts[2] - starts[1] >= 0.04
+    # and the schedule stays on its original grid
+    assert job.next_run > starts[2]
+    offset = (job.next_run - (starts[0] + 0.05)) / 0.05
+    assert abs(offset - round(offset)) < 0.2
+
+
+def test_same_device_jobs_never_overlap(scheduler):
+    active = {'phone-a': 0}
+    max_active = {'phone-a': 0}
+    ran = []
+    lock = threading.Lock()
+
+    def job(n):
+        def run():
+            with lock:
+                active['phone-a'] += 1
+                max_active['phone-a'] = max(max_active['phone-a'], active['phone-a'])
+            time.sleep(0.05)
+            with lock:
+                active['phone-a'] -= 1
+                ran.append(n)
+        return run
+
+    for n in range(4):
+        scheduler.schedule(job(n), device_id='phone-a')
+
+    assert wait_for(lambda: len(ran) == 4)
+    assert max_active['phone-a'] == 1
+    # Jobs deferred behind a busy device keep their order
+    assert ran == [0, 1, 2, 3]
+
+
+def test_different_devices_run_concurrently(scheduler):
+    b_started = threading.Event()
+    overlapped = []
+
+    def on_a():
+        overlapped.append(b_started.wait(1.0))
+
+    scheduler.schedule(on_a, device_id='phone-a')
+    scheduler.schedule(b_started.set, device_id='phone-b')
+
+    assert wait_for(lambda: overlapped)
+    assert overlapped == [True]
+
+
+def test_cancel_stops_recurring_job_immediately(scheduler):
+    job = scheduler.schedule(lambda: None, interval=0.05)
+    assert wait_for(lambda: job.run_count >= 1)
+
+    assert scheduler.cancel(job.job_id)
+    runs = job.run_count
+    time.sleep(0.2)
+
+    assert job.run_count <= runs + 1  # a run already in progress may finish
+    assert scheduler.get(job.job_id) is None
+    assert not scheduler.cancel(job.job_id)
+
+
+def test_cancel_removes_job_deferred_behind_busy_device(scheduler):
+    release = threading.Event()
+    ran = []
+
+    scheduler.schedule(lambda: release.wait(1.0), device_id='phone-a')
+    deferred = scheduler.schedule(lambda: ran.append('deferred'), device_id='phone-a')
+    follow_up = scheduler.schedule(lambda: ran.append('follow-up'), device_id='phone-a', delay=0.05)
+    time.sleep(0.1)  # both are now waiting for phone-a
+
+    scheduler.cancel(deferred.job_id)
+    release.set()
+
+    assert wait_for(lambda: ran == ['follow-up'])
+    time.sleep(0.05)
+    assert ran == ['follow-up']
+
+
+def test_cancel_before_due_never_runs(scheduler):
+    ran = []
+    job = scheduler.schedule(lambda: ran.append(1), delay=0.1)
+
+    scheduler.cancel(job.job_id)
+    time.sleep(0.2)
+
+    assert ran == []
+
+
+def test_failing_job_is_recorded_and_recurring_job_continues(scheduler):
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ValueError("boom")
+
+    job = scheduler.schedule(failing, interval=0.05)
+    assert wait_for(lambda: len(calls) >= 2)
+    scheduler.cancel(job.job_id)
+
+    assert job.last_result == {"success": False, "error": "boom"}
+
+
+def test_group_limit_caps_concurrent_jobs_without_blocking_others(scheduler):
+    scheduler.limit_group('any-device', 2)
+    release = threading.Event()
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def grouped():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        release.wait(2.0)
+        with lock:
+            running.pop()
+
+    for _ in range(5):
+        scheduler.schedule(grouped, group='any-device')
+    housekeeping = threading.Event()
+    scheduler.schedule(housekeeping.set, delay=0.05)
+
+    # Workers beyond the cap stay free for jobs outside the group
+    assert housekeeping.wait(1.0)
+    assert len(running) == 2
+
+    release.set()
+    assert wait_for(lambda: len(peak) == 5 and not running)
+    assert max(peak) == 2
@@ -0,0 +1,129 @@
+import time
+import threading
+
+import pytest
+
+from automation.events import EventBus
+from automation.session_watchdog import SessionWatchdog
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class FakeDeviceManager:
+    """
+    The parts of DeviceManager the watchdog uses. Probes answer from
+    `answers` ({device_id: (alive, latency)}); reconnects succeed.
+    """
+
+    def __init__(self, statuses, answers):
+        self.lock = threading.Lock()
+        self.events = EventBus()
+        self.devices = {device_id: {'status': status} for device_id, status in statuses.items()}
+        self.drivers = {device_id: object() for device_id in statuses}
+        self.answers = answers
+        self.probed = []
+        self.reconnected = []
+
+    def probe_session(self, device_id):
+        self.probed.append(device_id)
+        return self.answers.get(device_id, (True, 0.01))
+
+    def reconnect_device(self, device_id):
+        self.reconnected.append(device_id)
+        return True, 0.5
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.scheduled = []
+        self.cancelled = []
+
+    def schedule(self, fn, **kwargs):
+        self.scheduled.append(kwargs)
+        job = type('Job', (), {'job_id': f"job-{len(self.scheduled)}"})()
+        return job
+
+    def cancel(self, job_id):
+        self.cancelled.append(job_id)
+
+
+@pytest.fixture
+def make_watchdog():
+    watchdogs = []
+
+    def make(statuses, answers=None, **kwargs):
+        manager = FakeDeviceManager(statuses, answers or {})
+        watchdog = SessionWatchdog(manager, FakeScheduler(), **kwargs)
+        watchdogs.append(watchdog)
+        return watchdog, manager
+
+    yield make
+    for watchdog in watchdogs:
+        watchdog.stop()
+
+
+def test_only_ready_devices_are_probed(make_watchdog):
+    watchdog, manager = make_watchdog({'ready': 'ready', 'busy': 'busy', 'initializing': 'initializing',
+                                       'error': 'error', 'no-driver': 'ready'})
+    del manager.drivers['no-driver']
+
+    assert watchdog.check_sessions() == {'ready': True}
+    assert manager.probed == ['ready']
+    assert manager.reconnected == []
+
+
+def test_inconclusive_probes_never_reconnect(make_watchdog):
+    watchdog, manager = make_watchdog({'slow': 'ready', 'gone': 'ready'},
+                                      {'slow': (None, 5.0), 'gone': (None, None)})
+
+    assert watchdog.check_sessions() == {'slow': None, 'gone': None}
+    time.sleep(0.05)
+    assert manager.reconnected == []
+    stats = watchdog.stats()
+    assert stats['probe_errors'] == 1 and stats['probe_failures'] == 0
+    # A probe with no latency never reached the server and isn't counted
+    assert 'gone' not in stats['devices']
+
+
+def test_dead_sessions_are_reconnected(make_watchdog):
+    watchdog, manager = make_watchdog({'dead': 'ready', 'alive': 'ready'}, {'dead': (False, 0.2)})
+    events = []
+    manager.events.subscribe(events.append)
+
+    assert watchdog.check_sessions() == {'dead': False, 'alive': True}
+
+    assert wait_for(lambda: events)
+    assert manager.reconnected == ['dead']
+    assert (events[0]['type'], events[0]['device_id'], events[0]['success']) == ('session_reconnected', 'dead', True)
+    stats = watchdog.stats()
+    assert (stats['probe_failures'], stats['reconnects']) == (1, 1)
+    assert stats['devices']['dead']['last_reconnect_latency'] == 0.5
+    assert stats['devices']['alive']['last_probe_ok'] is True
+
+
+def test_one_reconnect_at_a_time_per_device(make_watchdog):
+    watchdog, manager = make_watchdog({'dead': 'ready'})
+    release = threading.Event()
+    manager.reconnect_device = lambda device_id: release.wait(2) and manager.reconnected.append(device_id)
+
+    assert watchdog.reconnect('dead') is True
+    assert watchdog.reconnect('dead') is False
+    release.set()
+    assert wait_for(lambda: watchdog.reconnect('dead'))
+
+
+def test_interval_keeps_a_margin_under_the_idle_timeout(make_watchdog):
+    watchdog, _ = make_watchdog({}, interval=300, idle_timeout=360, idle_margin=90)
+    assert watchdog.interval == 270
+
+    watchdog.start()
+    assert watchdog.scheduler.scheduled == [{'interval': 270, 'delay': 270, 'name': 'session-watchdog'}]
+    watchdog.stop()
+    assert watchdog.scheduler.cancelled == ['job-1']
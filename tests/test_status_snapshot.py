@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from automation.status_snapshot import StatusSnapshot
+
+from conftest import IPHONE_16, PIXEL
+
+
+@pytest.fixture
+def snapshot(device_manager):
+    return StatusSnapshot(device_manager, max_age=60)
+
+
+def test_clean_snapshot_serves_the_same_bytes(snapshot, monkeypatch):
+    version, etag, body = snapshot.get()
+    monkeypatch.setattr(snapshot, '_build', lambda: pytest.fail("rebuilt without a change"))
+
+    assert snapshot.get() == (version, etag, body)
+    assert snapshot.get()[2] is body
+    status = json.loads(body)
+    assert (status['status'], status['devices'], status['version']) == ('running', {}, version)
+    assert list(status['servers']) == ['server-1']
+
+
+def test_published_change_rebuilds_with_a_new_version(snapshot, device_manager, connect_device):
+    version, etag, _ = snapshot.get()
+
+    connect_device(IPHONE_16)
+    device_manager.events.publish('device_status', device_id=IPHONE_16, status='ready')
+    new_version, new_etag, body = snapshot.get()
+
+    assert (new_version, new_etag != etag) == (version + 1, True)
+    assert json.loads(body)['devices'][IPHONE_16]['status'] == 'ready'
+
+
+def test_event_without_a_content_change_keeps_the_etag(snapshot, device_manager):
+    version, etag, body = snapshot.get()
+
+    device_manager.events.publish('server_status', server_id='server-1', status='stopped')
+
+    assert snapshot.get() == (version, etag, body)
+    assert not snapshot._dirty
+
+
+def test_stale_snapshot_is_rebuilt_without_an_event(device_manager, connect_device, monkeypatch):
+    snapshot = StatusSnapshot(device_manager, max_age=5)
+    clock = [1000.0]
+    monkeypatch.setattr('automation.status_snapshot.time.time', lambda: clock[0])
+    version, _, _ = snapshot.get()
+
+    connect_device(PIXEL)  # changes state without publishing
+    assert snapshot.get()[0] == version
+    clock[0] += 6
+    assert snapshot.get()[0] == version + 1
+
+
+def test_account_updates_show_without_rereading_the_file(snapshot, device_manager, connect_device):
+    connect_device(IPHONE_16)
+    snapshot.invalidate()
+    assert json.loads(snapshot.get()[2])['devices'][IPHONE_16]['managed_accounts'] == []
+
+    device_manager.events.publish('accounts_updated', device_id=IPHONE_16, accounts=['alice', 'bob'])
+
+    assert json.loads(snapshot.get()[2])['devices'][IPHONE_16]['managed_accounts'] == ['alice', 'bob']
+
+
+@pytest.fixture
+def client(backend_app, device_manager, snapshot, monkeypatch):
+    monkeypatch.setattr(backend_app, 'device_manager', device_manager)
+    monkeypatch.setattr(backend_app, 'status_snapshot', snapshot)
+    return backend_app.app.test_client()
+
+
+def test_status_api_revalidates_with_etag(client, device_manager, connect_device):
+    first = client.get('/api/status')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['X-Status-Version'] == str(first.get_json()['version'])
+
+    unchanged = client.get('/api/status', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.get_data() == b''
+    assert unchanged.headers['ETag'] == etag
+
+    connect_device(IPHONE_16)
+    device_manager.events.publish('device_status', device_id=IPHONE_16, status='ready')
+    changed = client.get('/api/status', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert IPHONE_16 in changed.get_json()['devices']
@@ -0,0 +1,124 @@
+import json
+import threading
+
+import pytest
+
+from automation.storage import ConfigStore
+
+from conftest import TEST_CONFIG, IPHONE_13, IPHONE_16, PIXEL
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConfigStore(str(tmp_path / 'automation.db'))
+    yield store
+    store.close()
+
+
+def in_thread(fn):
+    """Run fn on another thread (so on another connection) and return its result"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join(5)
+    return result[0]
+
+
+def test_nested_transaction_commits_with_the_outer_one(store):
+    with store.transaction():
+        store.upsert_server(TEST_CONFIG['appium_servers'][0])
+        with store.transaction():
+            store.upsert_device(TEST_CONFIG['devices'][0])
+        # The inner block joined the outer transaction: nothing is visible elsewhere yet
+        assert in_thread(store.get_devices) == []
+
+    assert [d['udid'] for d in in_thread(store.get_devices)] == [IPHONE_13]
+
+
+def test_failure_inside_a_nested_transaction_rolls_back_everything(store):
+    store.set_meta('kept', '1')
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.upsert_device(TEST_CONFIG['devices'][0])
+            with store.transaction():
+                store.set_meta('kept', '2')
+                raise RuntimeError("boom")
+
+    assert store.get_devices() == []
+    assert store.get_meta('kept') == '1'
+    # The connection is usable again afterwards
+    store.upsert_device(TEST_CONFIG['devices'][1])
+    assert [d['udid'] for d in store.get_devices()] == [IPHONE_16]
+
+
+def test_each_thread_gets_its_own_connection(store):
+    mine = store._connection()
+    theirs = in_thread(store._connection)
+
+    assert mine is store._connection()
+    assert theirs is not mine
+    in_thread(lambda: store.set_accounts(PIXEL, ['alice', 'bob']))
+    assert store.get_accounts(PIXEL) == ['alice', 'bob']
+
+
+def test_save_config_round_trips_and_keeps_order(store):
+    config = dict(TEST_CONFIG, poll_interval=5)
+    store.save_config(config)
+    assert store.load_config() == config
+
+    # Dropping a device deletes only its row; the others keep their positions
+    store.save_config(dict(config, devices=[config['devices'][2], config['devices'][0]]))
+    assert [d['udid'] for d in store.get_devices()] == [IPHONE_13, PIXEL]
+    assert [d['udid'] for d in store.get_devices(server='server-1')] == [IPHONE_13, PIXEL]
+
+
+@pytest.fixture
+def json_files(tmp_path):
+    config_path = tmp_path / 'devices.json'
+    accounts_path = tmp_path / 'managed_accounts.json'
+    config_path.write_text(json.dumps(TEST_CONFIG))
+    accounts_path.write_text(json.dumps({IPHONE_16: ['alice', 'bob']}))
+    return str(config_path), str(accounts_path)
+
+
+def test_migration_runs_exactly_once(store, json_files):
+    config_path, accounts_path = json_files
+
+    assert store.migrate_from_json(config_path, accounts_path) is True
+    assert store.load_config()['devices'] == TEST_CONFIG['devices']
+    assert store.all_accounts() == {IPHONE_16: ['alice', 'bob']}
+
+    # Later edits to the JSON files are not imported again
+    with open(accounts_path, 'w') as f:
+        json.dump({IPHONE_16: ['carol']}, f)
+    assert store.migrate_from_json(config_path, accounts_path) is False
+    assert store.devices_for_account('carol') == []
+
+
+def test_malformed_accounts_file_is_skipped_but_migration_completes(store, json_files):
+    config_path, accounts_path = json_files
+    with open(accounts_path, 'w') as f:
+        f.write('{"00008140-000869980208801C": [')
+
+    assert store.migrate_from_json(config_path, accounts_path) is True
+    assert store.all_accounts() == {}
+    assert len(store.get_devices()) == 3
+    assert store.migrate_from_json(config_path, accounts_path) is False
+
+
+def test_malformed_config_file_imports_nothing_until_fixed(store, json_files):
+    config_path, accounts_path = json_files
+    with open(config_path, 'w') as f:
+        f.write('{"appium_servers": [')
+
+    with pytest.raises(ValueError):
+        store.migrate_from_json(config_path, accounts_path)
+    # Rolled back as a whole: no accounts imported and not marked as migrated
+    assert store.all_accounts() == {}
+    assert store.get_meta('migrated_at') is None
+
+    with open(config_path, 'w') as f:
+        json.dump(TEST_CONFIG, f)
+    assert store.migrate_from_json(config_path, accounts_path) is True
+    assert store.migrate_from_json(config_path, accounts_path) is False
@@ -0,0 +1,155 @@
+import json
+import os
+
+import pytest
+
+from automation.task_definitions import TaskDefinition, TaskDefinitionError, TaskLibrary, compile_definition
+from automation.ui_map_cache import UIMapCache
+
+MODELS = ('iphone16_pro', 'iphone13_pro_max')
+CHECKED_IN_TASKS = ('browse_feed', 'check_account_switcher', 'view_profile')
+
+
+@pytest.fixture(scope='module')
+def ui_maps():
+    cache = UIMapCache()
+    return {model: cache.get(model) for model in MODELS}
+
+
+def definition(steps, **fields):
+    return TaskDefinition.from_dict('test_task', dict(fields, steps=steps))
+
+
+@pytest.mark.parametrize('model', MODELS)
+@pytest.mark.parametrize('name', CHECKED_IN_TASKS)
+def test_checked_in_tasks_compile_for_every_model(ui_maps, name, model):
+    plan = TaskLibrary().compile(name, ui_maps[model])
+
+    assert plan.name == name
+    assert plan.model == model
+    for step in plan.steps:
+        if step.action == 'tap':
+            assert step.args['x'] > 0 and step.args['y'] > 0
+        elif step.action == 'wait_for_screen':
+            assert step.args['locator'][0] == 'accessibility id'
+
+
+def test_prefix_references_resolve_against_each_models_map(ui_maps):
+    library = TaskLibrary()
+    plans = {model: library.compile('check_account_switcher', ui_maps[model]) for model in MODELS}
+
+    # The switcher button's key carries each map's account name; the prefix resolves on both
+    targets = {model: plans[model].steps[2].args['target'] for model in MODELS}
+    assert targets == {
+        'iphone16_pro': 'profile_screen_details.user-switch-title-button_tristanwaite',
+        'iphone13_pro_max': 'profile_screen_details.user-switch-title-button_morgancryerthequeen',
+    }
+    assert plans['iphone16_pro'].steps[1].args['locator'] == ('accessibility id', 'user-switch-title-button')
+
+
+def test_unknown_screen_and_element_are_both_reported(ui_maps):
+    task = definition([
+        {"action": "tap", "screen": "no_such_screen", "element": "profile-tab_Profile"},
+        {"action": "tap", "screen": "initial_screen_before_profile", "element": "no-such-element"},
+        {"action": "wait_for_element", "screen": "profile_screen_details", "element": "also-missing"},
+    ])
+
+    with pytest.raises(TaskDefinitionError) as excinfo:
+        compile_definition(task, ui_maps['iphone16_pro'])
+
+    message = str(excinfo.value)
+    assert "steps[0]: screen 'no_such_screen' not in UI map" in message
+    assert "steps[1]: element 'no-such-element' not found" in message
+    assert "steps[2]: element 'also-missing' not found" in message
+
+
+def test_wait_for_unknown_landmark_screen_is_rejected(ui_maps):
+    task = definition([{"action": "wait_for_screen", "screen": "settings_screen"}])
+
+    with pytest.raises(TaskDefinitionError, match="no landmark configured for screen 'settings_screen'"):
+        compile_definition(task, ui_maps['iphone13_pro_max'])
+
+
+@pytest.mark.parametrize('on_failure', ['missing_step', 'retry'])
+def test_on_failure_must_name_a_step_in_the_same_list(on_failure):
+    steps = [
+        {"id": "outer", "action": "pause", "seconds": 1},
+        {"action": "repeat", "times": 2, "steps": [
+            {"id": "retry", "action": "pause", "seconds": 1},
+        ]},
+        {"action": "pause", "seconds": 1, "on_failure": on_failure},
+    ]
+
+    with pytest.raises(TaskDefinitionError, match=r"steps\[2\]: on_failure must be"):
+        definition(steps)
+
+
+def test_definition_validation_lists_every_problem():
+    with pytest.raises(TaskDefinitionError) as excinfo:
+        definition([
+            {"action": "fly"},
+            {"action": "swipe", "direction": "left"},
+            {"action": "pause", "seconds": "{undeclared}"},
+            {"action": "tap", "screen": "s", "colour": "red"},
+        ], timeout="soon")
+
+    message = str(excinfo.value)
+    assert "timeout must be a number" in message
+    assert "unknown action 'fly'" in message
+    assert "direction must be one of" in message
+    assert "undeclared param 'undeclared'" in message
+    assert "missing ['element']" in message
+    assert "unknown fields ['colour']" in message
+
+
+def test_on_failure_compiles_to_step_index(ui_maps):
+    task = definition([
+        {"id": "retry", "action": "launch_app"},
+        {"action": "wait_for_screen", "screen": "initial_screen_before_profile", "on_failure": "retry"},
+        {"action": "pause", "seconds": 1, "on_failure": "continue"},
+    ])
+
+    plan = compile_definition(task, ui_maps['iphone16_pro'])
+
+    assert [step.on_failure for step in plan.steps] == ['fail', 0, 'continue']
+    assert [step.id for step in plan.steps] == ['retry', '1:wait_for_screen', '2:pause']
+
+
+def write_task(tasks_dir, name, data):
+    path = tasks_dir / f"{name}.json"
+    path.write_text(json.dumps(data))
+    return path
+
+
+def test_library_caches_plans_per_model_and_recompiles_on_change(tmp_path, ui_maps):
+    path = write_task(tmp_path, 'launch', {"steps": [{"action": "launch_app"}]})
+    library = TaskLibrary(str(tmp_path))
+
+    plan = library.compile('launch', ui_maps['iphone16_pro'])
+    assert library.compile('launch', ui_maps['iphone16_pro']) is plan
+    assert library.compile('launch', ui_maps['iphone13_pro_max']) is not plan
+
+    write_task(tmp_path, 'launch', {"steps": [{"action": "launch_app"}, {"action": "terminate_app"}]})
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+    updated = library.compile('launch', ui_maps['iphone16_pro'])
+    assert [step.action for step in updated.steps] == ['launch_app', 'terminate_app']
+
+
+def test_library_reports_bad_definitions(tmp_path, ui_maps):
+    write_task(tmp_path, 'good', {"steps": [{"action": "launch_app"}]})
+    write_task(tmp_path, 'bad_ref', {"steps": [{"action": "tap", "screen": "nowhere", "element": "x"}]})
+    (tmp_path / 'broken.json').write_text('{"steps": [')
+    library = TaskLibrary(str(tmp_path))
+
+    assert library.compile('missing', ui_maps['iphone16_pro']) is None
+    with pytest.raises(TaskDefinitionError, match="screen 'nowhere' not in UI map"):
+        library.compile('bad_ref', ui_maps['iphone16_pro'])
+    # The failure is cached like a plan, until the file or map changes
+    with pytest.raises(TaskDefinitionError):
+        library.compile('bad_ref', ui_maps['iphone16_pro'])
+
+    definitions, errors = library.definitions()
+    assert sorted(d.name for d in definitions) == ['bad_ref', 'good']
+    assert list(errors) == ['broken']
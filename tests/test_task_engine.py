@@ -0,0 +1,260 @@
+import time
+
+import pytest
+
+from automation import task_engine
+from automation.appium_transport import AppiumTransport, CommandTimeoutPool, command_timeout, current_command_timeout
+from automation.fake_appium import FakeAppiumServer
+from automation.task_context import TaskContext
+from automation.task_definitions import TaskDefinition, compile_definition
+from automation.task_engine import TaskEngine
+from automation.ui_map_cache import UIMap
+
+SCREENS = {
+    "initial_screen_before_profile": {
+        "main-feed": {"name": "main-feed", "x": "0", "y": "100", "width": "390", "height": "600"},
+        "profile-tab_Profile": {"name": "profile-tab", "x": "312", "y": "780", "width": "78", "height": "50"},
+    },
+    "profile_screen_details": {
+        "user-switch-title-button_alice": {"name": "user-switch-title-button", "x": "100", "y": "60",
+                                           "width": "190", "height": "30"},
+    },
+}
+SCREEN_SIZE = (390, 844)
+
+
+class StubDriver:
+    """Records commands and the command read timeout each was sent with"""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.calls = []
+
+    def _command(self, name, *args):
+        self.calls.append((name, args, current_command_timeout()))
+        time.sleep(self.delays.get(name, 0))
+
+    def activate_app(self, app_id):
+        self._command('activate_app', app_id)
+
+    def terminate_app(self, app_id):
+        self._command('terminate_app', app_id)
+
+    def execute_script(self, script, args):
+        self._command(script, args)
+
+
+class StubWaiter:
+    """Answers wait steps from a script of results; records the timeout each wait got"""
+
+    timeout = 10
+
+    def __init__(self, results=None):
+        self.results = list(results or [])
+        self.waits = []
+
+    def wait_for_locator(self, ctx, locator, timeout=None, poll_interval=None, description=None):
+        self.waits.append((description, timeout))
+        return self.results.pop(0) if self.results else True
+
+
+def make_plan(steps, defaults=None, timeout=None):
+    definition = TaskDefinition.from_dict('test_task', {'steps': steps, 'params': defaults, 'timeout': timeout})
+    return compile_definition(definition, UIMap('test_model', '/dev/null', 0, SCREENS))
+
+
+def run(steps, waiter=None, driver=None, params=None, timeout=None, defaults=None, definition_timeout=None):
+    waiter = waiter or StubWaiter()
+    driver = driver or StubDriver()
+    ctx = TaskContext('device-1', driver, {'config': {'name': 'Test iPhone', 'platformName': 'iOS'}}, None)
+    plan = make_plan(steps, defaults, definition_timeout)
+    result = TaskEngine(waiter).run(ctx, plan, SCREEN_SIZE, params=params, timeout=timeout)
+    return result, waiter, driver
+
+
+def test_steps_run_in_order_with_resolved_coordinates():
+    result, waiter, driver = run([
+        {"action": "launch_app"},
+        {"action": "wait_for_screen", "screen": "initial_screen_before_profile"},
+        {"action": "tap", "screen": "initial_screen_before_profile", "element": "profile-tab", "jitter": 0},
+        {"action": "wait_for_screen", "screen": "profile_screen_details"},
+    ])
+
+    assert result['success'] and result['steps_run'] == 4
+    assert [call[:2] for call in driver.calls] == [
+        ('activate_app', ('com.burbn.instagram',)),
+        ('mobile: tap', ({'x': 351, 'y': 805},)),
+    ]
+    assert [description for description, _ in waiter.waits] == ['initial_screen_before_profile',
+                                                                 'profile_screen_details']
+
+
+def test_step_budget_bounds_waits_and_driver_commands():
+    result, waiter, driver = run([
+        {"action": "launch_app", "timeout": 4},
+        {"action": "wait_for_screen", "screen": "initial_screen_before_profile", "timeout": 2},
+        {"action": "wait_for_screen", "screen": "profile_screen_details"},
+        {"action": "terminate_app"},
+    ])
+
+    assert result['success']
+    assert [timeout for _, timeout in waiter.waits] == [2, 10]  # explicit, then the waiter default
+    assert [(name, timeout) for name, _, timeout in driver.calls] == [
+        ('activate_app', 4), ('terminate_app', task_engine.DEFAULT_STEP_TIMEOUT)
+    ]
+    # Commands sent outside a step are unbounded again
+    assert current_command_timeout() is None
+
+
+def test_step_that_overruns_its_budget_fails():
+    result, _, _ = run([
+        {"id": "slow_launch", "action": "launch_app", "timeout": 0.1},
+        {"action": "terminate_app"},
+    ], driver=StubDriver(delays={'activate_app': 0.3}))
+
+    assert not result['success']
+    assert result['stage'] == 'slow_launch'
+    assert 'over its 0.1s timeout' in result['error']
+    assert result['steps_run'] == 1
+
+
+def test_task_deadline_caps_step_budgets_and_cuts_pauses_short():
+    started = time.time()
+    result, waiter, driver = run([
+        {"action": "wait_for_screen", "screen": "initial_screen_before_profile"},
+        {"id": "nap", "action": "pause", "seconds": 5},
+        {"action": "launch_app"},
+    ], timeout=0.3)
+
+    assert time.time() - started < 1
+    assert not result['success']
+    assert result['stage'] == 'nap'
+    assert 'timed out during a 5.0s pause' in result['error']
+    assert waiter.waits[0][1] <= 0.3
+    assert driver.calls == []
+
+
+def test_definition_timeout_applies_when_run_has_none():
+    result, _, _ = run([{"id": "nap", "action": "pause", "seconds": 5}], definition_timeout=0.2)
+
+    assert not result['success'] and result['stage'] == 'nap'
+
+
+def test_repeat_timeout_bounds_its_body_and_is_restored_afterwards():
+    result, waiter, _ = run([
+        {"id": "loop", "action": "repeat", "times": 10, "timeout": 0.25, "on_failure": "continue", "steps": [
+            {"action": "pause", "seconds": 0.1},
+        ]},
+        {"action": "wait_for_screen", "screen": "profile_screen_details"},
+    ], timeout=60)
+
+    assert result['success']
+    # The loop stopped at its own timeout, but the next step gets the task's budget back
+    assert result['steps_run'] < 10
+    assert waiter.waits == [('profile_screen_details', 10)]
+
+
+def test_repeat_uses_params_and_reports_iteration():
+    result, waiter, _ = run([
+        {"id": "loop", "action": "repeat", "times": "{iterations}", "steps": [
+            {"id": "look", "action": "wait_for_screen", "screen": "initial_screen_before_profile"},
+        ]},
+    ], waiter=StubWaiter([True, True, False]), params={'iterations': 4, 'ignored': 1}, defaults={'iterations': 2})
+
+    assert not result['success']
+    assert len(waiter.waits) == 3
+    assert result['error'].startswith('look (iteration 3/4)')
+
+
+def test_on_failure_jumps_to_recovery_step():
+    result, waiter, driver = run([
+        {"id": "launch", "action": "launch_app"},
+        {"id": "ready", "action": "wait_for_screen", "screen": "initial_screen_before_profile",
+         "on_failure": "relaunch"},
+        {"id": "done", "action": "tap", "screen": "initial_screen_before_profile", "element": "profile-tab"},
+        {"id": "relaunch", "action": "terminate_app", "on_failure": "continue"},
+        {"id": "retry_ready", "action": "wait_for_screen", "screen": "initial_screen_before_profile"},
+    ], waiter=StubWaiter([False, True]))
+
+    assert result['success']
+    # The tap was skipped by the jump; the steps after the recovery step ran
+    assert [name for name, _, _ in driver.calls] == ['activate_app', 'terminate_app']
+    assert result['steps_run'] == 4
+
+
+def test_on_failure_loop_is_stopped_by_the_step_guard(monkeypatch):
+    monkeypatch.setattr(task_engine, 'MAX_STEPS_RUN', 25)
+
+    result, waiter, _ = run([
+        {"id": "relaunch", "action": "launch_app"},
+        {"id": "ready", "action": "wait_for_screen", "screen": "initial_screen_before_profile",
+         "on_failure": "relaunch"},
+    ], waiter=StubWaiter([False] * 100))
+
+    assert not result['success']
+    assert 'Gave up after 25 steps' in result['error']
+    assert result['steps_run'] == 26
+    assert len(waiter.waits) == 12
+
+
+def test_failing_step_stops_the_task_by_default():
+    result, _, driver = run([
+        {"id": "ready", "action": "wait_for_screen", "screen": "initial_screen_before_profile"},
+        {"action": "launch_app"},
+    ], waiter=StubWaiter([False]))
+
+    assert not result['success']
+    assert result['stage'] == 'ready'
+    assert result['error'].startswith('Timed out after 10.0s waiting for initial_screen_before_profile')
+    assert driver.calls == []
+
+
+class RecordingPool:
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append(kwargs.get('timeout'))
+
+    def clear(self):
+        self.requests.append('cleared')
+
+
+def test_command_timeout_pool_applies_the_threads_timeout():
+    recording = RecordingPool()
+    pool = CommandTimeoutPool(recording, connect_timeout=3)
+
+    pool.request('GET', 'http://appium/status')
+    with command_timeout(1.5):
+        pool.request('GET', 'http://appium/status')
+    pool.clear()
+
+    unbounded, bounded, cleared = recording.requests
+    assert unbounded is None
+    assert (bounded.connect_timeout, bounded.read_timeout) == (3, 1.5)
+    assert cleared == 'cleared'
+
+
+def test_hung_driver_command_fails_its_step():
+    webdriver = pytest.importorskip('appium.webdriver')
+    from appium.options.common import AppiumOptions
+
+    server = FakeAppiumServer(port=0, devices=1, latencies={'activate_app': 'constant:2'}).start()
+    transport = AppiumTransport()
+    driver = None
+    try:
+        options = AppiumOptions()
+        options.load_capabilities({'platformName': 'iOS', 'appium:automationName': 'XCUITest'})
+        driver = webdriver.Remote(transport.create_connection(server.host, server.port), options=options)
+
+        started = time.time()
+        result, _, _ = run([{"id": "launch", "action": "launch_app", "timeout": 0.3}], driver=driver)
+
+        assert time.time() - started < 1.5
+        assert not result['success'] and result['stage'] == 'launch'
+        assert 'timed out' in result['error'].lower()
+    finally:
+        if driver:
+            driver.quit()
+        transport.close()
+        server.stop()
@@ -0,0 +1,148 @@
+import pytest
+
+from automation.account_router import AccountRouter
+from automation.task_context import TaskContext
+from automation.task_runner import InstagramTaskRunner
+from automation.ui_map_cache import UIMapCache
+
+from conftest import IPHONE_16, StubDriver
+
+
+class ScriptedWaiter:
+    """Answers screen waits from {screen: [results]}; screens without a script are ready"""
+
+    timeout = 10
+
+    def __init__(self, results=None):
+        self.results = {screen: list(answers) for screen, answers in (results or {}).items()}
+        self.waits = []
+
+    def wait_for_screen(self, ctx, screen_name, timeout=None, poll_interval=None):
+        self.waits.append(screen_name)
+        answers = self.results.get(screen_name)
+        return answers.pop(0) if answers else True
+
+
+class AppDriver(StubDriver):
+    """Records app launches and accessibility-id clicks"""
+
+    def __init__(self, session_id):
+        super().__init__(session_id)
+        self.launched = []
+        self.clicked = []
+
+    def activate_app(self, app_id):
+        self.launched.append(app_id)
+
+    def find_element(self, by, value):
+        driver = self
+
+        class Element:
+            def click(self):
+                driver.clicked.append(value)
+        return Element()
+
+
+@pytest.fixture
+def make_runner(device_manager, monkeypatch):
+    """Build an InstagramTaskRunner around a ScriptedWaiter, with taps that always land"""
+    runners = []
+
+    def make(waits=None, accounts=None):
+        waiter = ScriptedWaiter(waits)
+        router = AccountRouter(accounts if accounts is not None else {IPHONE_16: ['alice', 'bob']})
+        runner = InstagramTaskRunner(device_manager, waiter=waiter, accounts=router)
+        monkeypatch.setattr(runner, '_tap_on_element_from_map',
+                            lambda ctx, screen, element: {"success": True, "message": f"Tapped on '{element}'"})
+        runners.append(runner)
+        return runner, waiter
+
+    yield make
+    for runner in runners:
+        runner.scheduler.shutdown()
+
+
+@pytest.fixture
+def ctx(device_manager):
+    device_config = next(d for d in device_manager.config['devices'] if d['udid'] == IPHONE_16)
+    device_info = {'config': device_config, 'status': 'busy', 'server': device_config['server']}
+    return TaskContext(IPHONE_16, AppDriver('session-1'), device_info, UIMapCache().get('iphone16_pro'))
+
+
+@pytest.mark.parametrize('method, screen', [
+    ('open_instagram', 'initial_screen_before_profile'),
+    ('go_to_profile', 'profile_screen_details'),
+    ('tap_profile_username', 'account_switcher_details'),
+])
+def test_navigation_fails_when_its_screen_never_shows(make_runner, ctx, method, screen):
+    runner, waiter = make_runner({screen: [False]})
+
+    result = getattr(runner, method)(ctx)
+
+    assert result['success'] is False
+    assert result['screen_ready'] is False
+    assert 'Timed out' in result['error']
+    assert waiter.waits == [screen]
+
+
+def test_setup_device_stops_when_the_feed_never_shows(make_runner, ctx):
+    runner, waiter = make_runner({'initial_screen_before_profile': [False]})
+
+    result = runner.setup_device(ctx)
+
+    assert result['success'] is False
+    assert result['stage'] == 'open_instagram'
+    assert waiter.waits == ['initial_screen_before_profile']
+
+
+def test_switch_account_is_not_recorded_without_the_profile_coming_back(make_runner, ctx):
+    runner, waiter = make_runner({'profile_screen_details': [True, False]})
+    runner.accounts.set_active(IPHONE_16, 'bob')
+
+    result = runner.switch_account(ctx, username='alice')
+
+    assert result['success'] is False
+    assert result['stage'] == 'confirm_account'
+    assert waiter.waits == ['profile_screen_details', 'account_switcher_details', 'profile_screen_details']
+    # Neither the old nor the new account is known to be on screen
+    assert runner.accounts.active_account(IPHONE_16) is None
+
+
+def test_switch_account_records_the_confirmed_account(make_runner, ctx):
+    runner, _ = make_runner()
+
+    result = runner.switch_account(ctx, username='alice')
+
+    assert result['success'] is True
+    assert result['account'] == 'alice'
+    assert ctx.driver.clicked == ['alice, Shared access']
+    assert runner.accounts.active_account(IPHONE_16) == 'alice'
+
+
+def test_switch_account_stops_when_the_switcher_never_opens(make_runner, ctx):
+    runner, waiter = make_runner({'account_switcher_details': [False]})
+
+    result = runner.switch_account(ctx, username='alice')
+
+    assert result['success'] is False
+    assert result['stage'] == 'open_switcher'
+    assert waiter.waits == ['profile_screen_details', 'account_switcher_details']
+    assert runner.accounts.active_account(IPHONE_16) is None
+
+
+def test_only_successful_account_jobs_feed_the_planner(make_runner, monkeypatch):
+    runner, _ = make_runner()
+    results = [
+        {"success": False, "error": "Timed out", "account_switch": {"account": "alice", "duration": 0.0}},
+        {"success": False, "error": "Timed out"},
+        {"success": True, "account_switch": {"account": "bob", "duration": 0.0}},
+    ]
+    monkeypatch.setattr(runner, 'execute_task', lambda task_name, device_id, **kwargs: results.pop(0))
+    before = runner.planner.task_estimate('scroll_feed')
+
+    failed = [runner.submit_account_task('alice', 'scroll_feed'), runner.submit_account_task('alice', 'scroll_feed')]
+    assert all(job.wait(2) for job in failed)
+    assert runner.planner.task_estimate('scroll_feed') == before
+
+    assert runner.submit_account_task('bob', 'scroll_feed').wait(2)
+    assert runner.planner.task_estimate('scroll_feed') != before
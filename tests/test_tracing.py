@@ -0,0 +1,146 @@
+import json
+import threading
+
+import pytest
+
+from automation.tracing import Tracer, traced, JOB, TASK, STAGE, COMMAND
+
+
+def test_spans_nest_per_thread():
+    tracer = Tracer()
+    with tracer.span('job-scroll_feed', JOB, job_id='job-1', device_id=None) as job:
+        with tracer.span('scroll_feed', TASK, device_id='phone-a') as task:
+            with tracer.span('tap', COMMAND, require_parent=True) as command:
+                pass
+        # Another thread has no open span, so its span starts a trace of its own
+        other = []
+        thread = threading.Thread(target=lambda: other.append(tracer.start_span('probe', TASK)))
+        thread.start()
+        thread.join()
+        tracer.end_span(other[0])
+
+    assert (task.parent_id, command.parent_id) == (job.span_id, task.span_id)
+    assert job.trace_id == task.trace_id == command.trace_id != other[0].trace_id
+    assert job.end >= task.end >= command.end
+    # None-valued attributes are dropped; the trace picks up the device from its task
+    assert job.attributes == {'job_id': 'job-1'}
+    trace = tracer.get(job.trace_id)
+    assert [span.name for span in trace.spans] == ['job-scroll_feed', 'scroll_feed', 'tap']
+    assert (trace.job_id, trace.device_id, trace.finished) == ('job-1', 'phone-a', True)
+    assert tracer.current_span() is None
+
+
+def test_require_parent_suppresses_root_spans():
+    tracer = Tracer()
+
+    with tracer.span('status', COMMAND, require_parent=True) as span:
+        assert span is None
+    assert tracer.start_span('status', COMMAND, require_parent=True) is None
+    tracer.end_span(None)
+
+    assert tracer.traces() == []
+
+
+def test_exception_fails_the_span_and_unwinds_unclosed_children():
+    tracer = Tracer()
+
+    with pytest.raises(RuntimeError):
+        with tracer.span('go_to_profile', TASK) as task:
+            tracer.start_span('wait', STAGE)  # never closed
+            raise RuntimeError("no profile tab")
+
+    assert (task.status, task.error) == ('error', 'no profile tab')
+    assert tracer.current_span() is None
+
+
+def test_ring_buffer_evicts_the_oldest_finished_traces():
+    tracer = Tracer(max_traces=3, max_spans=2)
+    running = tracer.start_span('long-job', JOB, job_id='job-0')
+    tracer._stack().clear()  # as if it were open on another thread
+
+    for n in range(1, 5):
+        with tracer.span(f'job-{n}', JOB, job_id=f'job-{n}'):
+            tracer.end_span(tracer.start_span('a', STAGE))
+            tracer.end_span(tracer.start_span('b', STAGE))
+
+    # The unfinished trace survives although it is the oldest
+    assert [t.job_id for t in tracer.traces()] == ['job-4', 'job-3', 'job-0']
+    assert tracer.get(running.trace_id) is not None
+    newest = tracer.traces()[0]
+    assert (len(newest.spans), newest.dropped) == (2, 1)
+    assert newest.summary()['dropped_spans'] == 1
+
+
+def test_traces_query_by_job_and_device():
+    tracer = Tracer()
+    for job_id, device_id in [('job-1', 'phone-a'), ('job-2', 'phone-b'), ('job-1', 'phone-a')]:
+        with tracer.span('job', JOB, job_id=job_id, device_id=device_id):
+            pass
+
+    assert len(tracer.traces(job_id='job-1')) == 2
+    assert [t.job_id for t in tracer.traces(device_id='phone-b')] == ['job-2']
+    assert len(tracer.traces(limit=1)) == 1
+    assert tracer.traces(job_id='missing') == []
+
+
+class Stages:
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    @traced(STAGE, arguments=('screen_name',))
+    def wait_for_screen(self, ctx, screen_name, timeout=None):
+        return {"success": False, "error": f"Timed out waiting for {screen_name}"}
+
+
+def test_traced_decorator_only_records_inside_a_trace():
+    tracer = Tracer()
+    stages = Stages(tracer)
+
+    assert stages.wait_for_screen(None, 'profile_screen_details')['success'] is False
+    assert tracer.traces() == []
+
+    with tracer.span('go_to_profile', TASK) as task:
+        stages.wait_for_screen(None, screen_name='profile_screen_details', timeout=5)
+
+    stage = tracer.get(task.trace_id).spans[1]
+    assert (stage.name, stage.kind, stage.attributes) == ('wait_for_screen', STAGE,
+                                                          {'screen_name': 'profile_screen_details'})
+    assert stage.error == 'Timed out waiting for profile_screen_details'
+
+
+def test_export_writes_chrome_trace_events(tmp_path):
+    tracer = Tracer()
+    with tracer.span('job-open_instagram', JOB, job_id='job-1') as job:
+        with tracer.span('activate_app', COMMAND) as command:
+            command.fail('session gone')
+
+    path = tracer.export(str(tmp_path / 'trace.json'))
+    with open(path) as f:
+        exported = json.load(f)
+
+    assert exported['displayTimeUnit'] == 'ms'
+    meta, root, child = exported['traceEvents']
+    assert meta == {'name': 'process_name', 'ph': 'M', 'pid': 1,
+                    'args': {'name': f"job-open_instagram ({job.trace_id[:8]})"}}
+    assert (root['ph'], root['cat'], root['pid'], root['tid']) == ('X', JOB, 1, job.thread_id)
+    assert root['ts'] == job.start * 1e6 and root['dur'] == pytest.approx(job.duration * 1e6)
+    assert root['args'] == {'job_id': 'job-1', 'kind': JOB, 'status': 'ok'}
+    assert child['args'] == {'kind': COMMAND, 'status': 'error', 'error': 'session gone'}
+    assert child['ts'] >= root['ts']
+
+
+def test_job_trace_api(backend_app, device_manager, monkeypatch):
+    monkeypatch.setattr(backend_app, 'device_manager', device_manager)
+    with device_manager.tracer.span('job-scroll_feed', JOB, job_id='job-1'):
+        pass
+    client = backend_app.app.test_client()
+
+    body = client.get('/api/jobs/job-1/trace').get_json()
+    assert body['job_id'] == 'job-1'
+    assert [span['name'] for span in body['traces'][0]['spans']] == ['job-scroll_feed']
+
+    download = client.get('/api/jobs/job-1/trace?format=chrome')
+    assert download.headers['Content-Disposition'] == 'attachment; filename="trace-job-1.json"'
+    assert [event['ph'] for event in download.get_json()['traceEvents']] == ['M', 'X']
+
+    assert client.get('/api/jobs/job-2/trace').status_code == 404
@@ -0,0 +1,101 @@
+import os
+import json
+
+import pytest
+
+from automation.ui_map_cache import UIMapCache, UI_MAP_FILENAME
+
+SCREENS = {
+    "profile_screen_details": {
+        "user-switch-title-button_alice": {"name": "user-switch-title-button", "label": "alice",
+                                           "x": "100", "y": "60", "width": "190", "height": "30"},
+        "profile-tabs": {"name": "profile-tabs", "children": ["posts", "reels"]},
+    }
+}
+
+
+@pytest.fixture
+def maps_dir(tmp_path):
+    return tmp_path / 'ui_maps'
+
+
+def write_map(maps_dir, model, screens, mtime=None):
+    path = maps_dir / model / UI_MAP_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(screens))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_map_is_parsed_once_and_reused(maps_dir, monkeypatch):
+    write_map(maps_dir, 'iphone16_pro', SCREENS, mtime=1000)
+    cache = UIMapCache(str(maps_dir))
+    ui_map = cache.get('iphone16_pro')
+
+    monkeypatch.setattr(json, 'load', lambda f: pytest.fail("map parsed again"))
+    assert cache.get('iphone16_pro') is ui_map
+    assert (ui_map.model, ui_map.mtime, len(ui_map)) == ('iphone16_pro', 1000, 1)
+    assert 'profile_screen_details' in ui_map
+
+
+def test_changed_file_is_reloaded(maps_dir):
+    write_map(maps_dir, 'iphone16_pro', SCREENS, mtime=1000)
+    cache = UIMapCache(str(maps_dir))
+    old = cache.get('iphone16_pro')
+
+    write_map(maps_dir, 'iphone16_pro', dict(SCREENS, account_switcher_details={}), mtime=2000)
+    new = cache.get('iphone16_pro')
+
+    assert new is not old
+    assert set(new.keys()) == {'profile_screen_details', 'account_switcher_details'}
+    # Callers holding the old map keep a consistent snapshot
+    assert set(old.keys()) == {'profile_screen_details'}
+
+
+def test_invalidate_forces_a_reload(maps_dir):
+    write_map(maps_dir, 'iphone16_pro', SCREENS, mtime=1000)
+    write_map(maps_dir, 'iphone13_pro_max', SCREENS, mtime=1000)
+    cache = UIMapCache(str(maps_dir))
+    sixteen, thirteen = cache.get('iphone16_pro'), cache.get('iphone13_pro_max')
+
+    cache.invalidate('iphone16_pro')
+    assert cache.get('iphone16_pro') is not sixteen
+    assert cache.get('iphone13_pro_max') is thirteen
+
+    cache.invalidate()
+    assert cache.get('iphone13_pro_max') is not thirteen
+
+
+def test_missing_or_invalid_map_returns_none(maps_dir):
+    path = write_map(maps_dir, 'iphone16_pro', SCREENS)
+    cache = UIMapCache(str(maps_dir))
+    assert cache.get('iphone16_pro') is not None
+
+    # A deleted map isn't served from the cache
+    path.unlink()
+    assert cache.get('iphone16_pro') is None
+    assert cache.get('pixel8') is None
+
+    path.write_text('{"profile_screen_details": {')
+    assert cache.get('iphone16_pro') is None
+
+
+def test_maps_are_read_only(maps_dir):
+    write_map(maps_dir, 'iphone16_pro', SCREENS)
+    ui_map = UIMapCache(str(maps_dir)).get('iphone16_pro')
+    screen = ui_map['profile_screen_details']
+
+    with pytest.raises(TypeError):
+        screen['profile-tabs'] = {}
+    with pytest.raises(TypeError):
+        screen['user-switch-title-button_alice']['label'] = 'mallory'
+    assert screen['profile-tabs']['children'] == ('posts', 'reels')
+    assert ui_map.get('missing_screen') is None
+
+
+def test_checked_in_maps_load():
+    cache = UIMapCache()
+    for model in ('iphone13_pro_max', 'iphone16_pro'):
+        ui_map = cache.get(model)
+        assert ui_map is not None and 'profile_screen_details' in ui_map
@@ -0,0 +1,90 @@
+import pytest
+
+from automation.ui_map_cache import UIMapCache
+from automation.ui_map_index import UIMapIndex, ScreenIndex
+
+SWITCHER = {
+    "user-switch-title-button_alice": {"name": "user-switch-title-button", "label": "alice", "type": "Button",
+                                       "visible": "true"},
+    "alice,_Shared_access": {"name": "alice, Shared access", "label": "alice, Shared access", "type": "Cell",
+                             "visible": "true"},
+    "alice_bakes,__3_likes___,_Shared_access": {"name": "alice_bakes, 3 likes, Shared access",
+                                                "label": "alice_bakes, 3 likes, Shared access", "type": "Cell",
+                                                "visible": "false"},
+    "Add_Instagram_account": {"name": "Add Instagram account", "label": "Add Instagram account",
+                              "type": "Button", "visible": "true"},
+    "feed_tab": {"content-desc": "Home", "label": "Home", "type": "Button"},
+}
+
+
+@pytest.fixture
+def index():
+    return UIMapIndex({"account_switcher_details": SWITCHER, "empty_screen": {}})
+
+
+def test_exact_key_wins(index):
+    key, data = index.resolve("account_switcher_details", "alice,_Shared_access")
+    assert key == "alice,_Shared_access"
+    assert data is SWITCHER[key]
+
+
+def test_prefix_falls_back_to_the_first_key_in_map_order(index):
+    # "{username},_" must not pick another account whose name merely starts the same way
+    assert index.resolve("account_switcher_details", "alice,_")[0] == "alice,_Shared_access"
+    assert index.resolve("account_switcher_details", "alice_bakes,_")[0] == "alice_bakes,__3_likes___,_Shared_access"
+    # A bare name matches the first key containing it
+    assert index.resolve("account_switcher_details", "alice")[0] == "user-switch-title-button_alice"
+    assert index.resolve("account_switcher_details", "user-switch-title-button")[0] == "user-switch-title-button_alice"
+
+
+def test_queries_outside_the_prefilled_table_are_memoized(index):
+    screen = index.screen("account_switcher_details")
+    assert "Shared_acc" not in screen._fallback
+
+    assert screen.resolve("Shared_acc")[0] == "alice,_Shared_access"
+    assert screen._fallback["Shared_acc"] == "alice,_Shared_access"
+    assert screen.resolve("bob,_") == (None, None)
+    assert screen._fallback["bob,_"] is None
+
+
+def test_unknown_screen_or_element(index):
+    assert index.resolve("missing_screen", "alice") == (None, None)
+    assert index.resolve("empty_screen", "alice") == (None, None)
+    assert index.screen("missing_screen") is None
+    assert index.query("missing_screen", type="Button") == ()
+
+
+def test_lookup_tables():
+    screen = ScreenIndex(SWITCHER)
+
+    assert screen.by_type["Cell"] == ["alice,_Shared_access", "alice_bakes,__3_likes___,_Shared_access"]
+    assert screen.by_label["alice"] == ["user-switch-title-button_alice"]
+    # Android maps carry the accessibility id as content-desc
+    assert screen.by_accessibility_id["Home"] == ["feed_tab"]
+    assert screen.by_accessibility_id["user-switch-title-button"] == ["user-switch-title-button_alice"]
+
+
+def test_query_filters_and_memoizes(index):
+    cells = index.query("account_switcher_details", type="Cell", label_contains="SHARED", ignore_case=True)
+    assert [e["label"] for e in cells] == ["alice, Shared access", "alice_bakes, 3 likes, Shared access"]
+
+    visible = index.query("account_switcher_details", type="Cell", label_contains="Shared", visible=True)
+    assert [e["label"] for e in visible] == ["alice, Shared access"]
+    assert index.query("account_switcher_details", label_contains="SHARED") == ()
+
+    again = index.query("account_switcher_details", type="Cell", label_contains="SHARED", ignore_case=True)
+    assert again is cells
+
+
+@pytest.mark.parametrize("username, expected", [
+    ("rebeltalentmanagement", "rebeltalentmanagement,__3_likes_and_2_more___,_Shared_access"),
+    ("rebeltalentmanagementla", "rebeltalentmanagementla,__4_chats_and_17_more___,_Shared_access"),
+    ("masteryk9", "masteryk9,_Shared_access"),
+])
+def test_account_rows_resolve_in_the_checked_in_map(username, expected):
+    ui_map = UIMapCache().get("iphone16_pro")
+
+    key, data = ui_map.index.resolve("account_switcher_details", f"{username},_")
+
+    assert key == expected
+    assert data is ui_map["account_switcher_details"][expected]